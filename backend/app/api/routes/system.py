@@ -3,6 +3,8 @@ from fastapi import APIRouter, HTTPException
 
 from app.models.schemas import (
     LogsResponse,
+    ProfilingRequest,
+    ProfilingSort,
     ServiceActionRequest,
     ServiceActionResponse,
     ServiceInfo,
@@ -10,6 +12,7 @@ from app.models.schemas import (
     SystemStatusResponse,
 )
 from app.services.thread_manager import thread_manager
+from modules.monitor.utils.metrics import get_metrics_registry
 
 
 router = APIRouter(prefix="/api", tags=["system"])
@@ -101,3 +104,42 @@ async def start_all_services():
 async def stop_all_services():
     results = thread_manager.stop_all()
     return {"success": all(results.values()), "results": results}
+
+
+@router.get("/system/metrics")
+async def get_system_metrics():
+    """监控热路径分阶段耗时直方图与组件指标"""
+    return get_metrics_registry().snapshot()
+
+
+@router.delete("/system/metrics")
+async def reset_system_metrics():
+    """清空耗时直方图"""
+    get_metrics_registry().reset()
+    return {"success": True}
+
+
+@router.get("/system/profiling")
+async def get_profiling(top: int = 30, sort: ProfilingSort = ProfilingSort.CUMULATIVE):
+    """采样 cProfile 与 tracemalloc 结果"""
+    profiler = get_metrics_registry().profiler
+    return {
+        "status": profiler.get_status(),
+        "cprofile": profiler.cprofile_stats(top, sort.value),
+        "tracemalloc": profiler.tracemalloc_top(top),
+    }
+
+
+@router.post("/system/profiling")
+async def update_profiling(request: ProfilingRequest):
+    """运行时开关采样 cProfile / tracemalloc"""
+    profiler = get_metrics_registry().profiler
+    if request.cprofile is True:
+        profiler.start_cprofile(request.sample_every)
+    elif request.cprofile is False:
+        profiler.stop_cprofile()
+    if request.tracemalloc is True:
+        profiler.start_tracemalloc()
+    elif request.tracemalloc is False:
+        profiler.stop_tracemalloc()
+    return {"success": True, "status": profiler.get_status()}
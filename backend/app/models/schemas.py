@@ -57,6 +57,27 @@ class LogsResponse(BaseModel):
     total: int
 
 
+class ProfilingSort(str, Enum):
+    """采样剖析结果排序字段（pstats 排序键）"""
+    CUMULATIVE = "cumulative"
+    TOTTIME = "tottime"
+    NCALLS = "ncalls"
+    PCALLS = "pcalls"
+    FILENAME = "filename"
+    LINE = "line"
+    NAME = "name"
+    NFL = "nfl"
+    MODULE = "module"
+    STDNAME = "stdname"
+
+
+class ProfilingRequest(BaseModel):
+    """运行时剖析开关（未提供的字段保持不变）"""
+    cprofile: Optional[bool] = None
+    tracemalloc: Optional[bool] = None
+    sample_every: int = Field(10, ge=1, description="每 N 次收盘处理剖析一次")
+
+
 class AlertEntry(BaseModel):
     """告警条目"""
     symbol: str
@@ -7,6 +7,7 @@ from typing import Any, Dict, List, Optional, Protocol, Tuple, runtime_checkable
 from modules.config.settings import get_config
 from modules.constants import VALID_INTERVALS
 from modules.monitor.clients.binance_rest import BinanceRestClient
+from modules.monitor.data.kline_repository import get_kline_repository
 from modules.monitor.data.models import Kline
 from modules.monitor.utils.logger import get_logger
 
@@ -246,7 +247,9 @@ def fetch_klines(
     """获取K线数据
     
     支持两种模式：
-    1. 实盘模式：直接从 Binance REST API 获取
+    1. 实盘模式：已收盘K线从本地K线仓库读取（只请求本地缺失部分），附带当前未收盘K线
+       （仓库按 store_open_ttl_seconds 缓存，有效期内不重复请求）；
+       未启用仓库或周期不支持时直接从 Binance REST API 获取
     2. 回测模式：从注入的 KlineProvider 获取历史数据切片
     
     Args:
@@ -265,6 +268,13 @@ def fetch_klines(
                 return None, "未获取到K线数据（回测模式）"
             return klines, None
         
+        repository = get_kline_repository()
+        if repository is not None and repository.supports(interval):
+            klines = repository.get_klines(symbol, interval, limit, include_open=True)
+            if not klines:
+                return None, "未获取到K线数据，请检查 symbol/interval 或稍后重试"
+            return klines, None
+        
         client = get_binance_client()
         raw = client.get_klines(symbol, interval, limit)
         if not raw:
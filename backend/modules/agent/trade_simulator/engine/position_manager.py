@@ -25,10 +25,22 @@ class PositionManager:
         self.risk = risk_service
         self.state = state_manager
         self.lock = lock
-        self.rest = BinanceRestClient(config)
+        self._config = config
+        self._rest: Optional[BinanceRestClient] = None
         self.max_leverage = self.cfg.max_leverage
         self.ws_interval = self.cfg.ws_interval
 
+    @property
+    def rest(self) -> BinanceRestClient:
+        """REST客户端（首次获取价格时创建）"""
+        if self._rest is None:
+            self._rest = BinanceRestClient(self._config)
+        return self._rest
+
+    @rest.setter
+    def rest(self, client) -> None:
+        self._rest = client
+
     def get_latest_close_price(self, symbol: str) -> Optional[float]:
         """获取最新收盘价"""
         try:
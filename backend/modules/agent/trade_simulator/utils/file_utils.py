@@ -9,6 +9,7 @@ from enum import Enum
 from typing import Any, Dict
 
 from modules.monitor.utils.logger import get_logger
+from modules.monitor.utils.serializer import dumps_line
 
 logger = get_logger('agent.trade_simulator.utils.file_utils')
 
@@ -85,7 +86,7 @@ def locked_append_jsonl(path: str, record: Any, fsync: bool = True) -> None:
         with open(path, 'a', encoding='utf-8') as f:
             fcntl.flock(f.fileno(), fcntl.LOCK_EX)
             try:
-                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.write(dumps_line(record))
                 f.flush()
                 if fsync:
                     os.fsync(f.fileno())
@@ -106,7 +107,7 @@ def locked_write_jsonl(path: str, records: list[Any], fsync: bool = True) -> Non
             fcntl.flock(f.fileno(), fcntl.LOCK_EX)
             try:
                 for record in records:
-                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    f.write(dumps_line(record))
                 f.flush()
                 if fsync:
                     os.fsync(f.fileno())
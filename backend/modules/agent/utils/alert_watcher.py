@@ -1,35 +1,86 @@
-"""告警文件监控器 - 监控 alerts.jsonl 文件变化并触发工作流"""
+"""告警监控器 - 接收监控告警并触发工作流
+
+告警来源：
+- 进程内：监控与工作流在同一进程（ThreadManager）运行时，直接订阅告警输出管道的事件总线，
+  无轮询、无文件读取
+- 文件：监控在其他进程运行时，用 watchdog（inotify 等系统文件事件）监听 alerts.jsonl 的追加写入
+
+进程内有监控发布告警时，文件中的新增行只推进读取位置不再解析（同一记录已由事件总线送达），
+alerts.jsonl 仅作为持久化审计记录。
+"""
+import json
 import os
+import queue
 import time
 import threading
 from typing import Callable, Optional, Set
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from modules.monitor.alerts.sinks import AlertEventBus, get_alert_event_bus
 from modules.monitor.utils.logger import get_logger
 
+# 监控线程控制信号
+_STOP = object()
+_FILE_CHANGED = object()
+
+
+class _AlertFileHandler(FileSystemEventHandler):
+    """只关心告警文件本身的文件系统事件"""
+    
+    def __init__(self, path: str, on_change: Callable[[], None]):
+        super().__init__()
+        self.path = os.path.abspath(path)
+        self.on_change = on_change
+    
+    def _match(self, path) -> bool:
+        if isinstance(path, bytes):
+            path = os.fsdecode(path)
+        return os.path.abspath(path) == self.path
+    
+    def on_modified(self, event):
+        if self._match(event.src_path):
+            self.on_change()
+    
+    def on_created(self, event):
+        if self._match(event.src_path):
+            self.on_change()
+    
+    def on_moved(self, event):
+        if self._match(event.dest_path):
+            self.on_change()
+
 
 class AlertFileWatcher:
-    """监控 alerts.jsonl 文件的变化，当有新告警写入时触发回调
+    """接收新告警（进程内事件总线或 alerts.jsonl 文件事件）并触发回调
     
     内置去重机制：同一 K 线周期内的多次告警会被合并，避免短时间内重复触发 workflow
     """
     
     DEDUP_WINDOW_SECONDS = 120  # 去重时间窗口（秒），同一窗口内的告警会被合并
     
-    def __init__(self, alerts_file_path: str, callback: Callable):
+    def __init__(self, alerts_file_path: str, callback: Callable,
+                 event_bus: Optional[AlertEventBus] = None):
         """
-        初始化告警文件监控器
+        初始化告警监控器
         
         Args:
             alerts_file_path: alerts.jsonl 文件的绝对路径
             callback: 当检测到新告警时的回调函数
+            event_bus: 告警事件总线（默认使用进程内共享实例）
         """
         self.alerts_file_path = alerts_file_path
         self.callback = callback
+        self.event_bus = event_bus or get_alert_event_bus()
         self.logger = get_logger('agent.utils.alert_watcher')
         
         self._running = False
         self._thread: Optional[threading.Thread] = None
-        self._last_position = 0  # 记录上次读取的文件位置
-        self._last_mtime = 0  # 记录上次修改时间
+        self._observer: Optional[Observer] = None
+        # 事件总线记录与文件变化通知，由监控线程统一处理（不阻塞告警输出线程）
+        self._inbox: queue.SimpleQueue = queue.SimpleQueue()
+        self._last_position = 0  # 记录上次读取的文件位置（字节）
         
         self._last_trigger_time: float = 0  # 上次触发 workflow 的时间
         self._pending_symbols: Set[str] = set()  # 待处理的币种（去重窗口内累积）
@@ -40,17 +91,11 @@ class AlertFileWatcher:
         # 确保文件存在
         if not os.path.exists(alerts_file_path):
             os.makedirs(os.path.dirname(alerts_file_path), exist_ok=True)
-            with open(alerts_file_path, 'w', encoding='utf-8') as f:
-                pass  # 创建空文件
+            open(alerts_file_path, 'w', encoding='utf-8').close()  # 创建空文件
             self.logger.info(f"创建告警文件: {alerts_file_path}")
         
         # 初始化文件位置到文件末尾(避免启动时读取历史数据)
-        with open(alerts_file_path, 'r', encoding='utf-8') as f:
-            f.seek(0, 2)  # 移动到文件末尾
-            self._last_position = f.tell()
-        
-        # 初始化 _last_mtime 为文件当前的修改时间，避免首次告警被跳过
-        self._last_mtime = os.path.getmtime(alerts_file_path)
+        self._last_position = os.path.getsize(alerts_file_path)
     
     def start(self):
         """启动监控线程"""
@@ -59,9 +104,19 @@ class AlertFileWatcher:
             return
         
         self._running = True
-        self._thread = threading.Thread(target=self._watch_loop, daemon=True)
+        self._thread = threading.Thread(target=self._watch_loop, daemon=True, name="AlertWatcher")
         self._thread.start()
-        self.logger.info(f"✓ 告警文件监控器已启动: {self.alerts_file_path}")
+        self.event_bus.subscribe(self._on_bus_record)
+        
+        self._observer = Observer()
+        self._observer.schedule(
+            _AlertFileHandler(self.alerts_file_path, self._on_file_changed),
+            os.path.dirname(os.path.abspath(self.alerts_file_path)),
+            recursive=False
+        )
+        self._observer.daemon = True
+        self._observer.start()
+        self.logger.info(f"✓ 告警监控器已启动: 进程内事件总线 + 文件事件 {self.alerts_file_path}")
     
     def stop(self):
         """停止监控线程"""
@@ -69,83 +124,99 @@ class AlertFileWatcher:
             return
         
         self._running = False
+        self.event_bus.unsubscribe(self._on_bus_record)
+        if self._observer:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
         
         with self._dedup_lock:
             if self._dedup_timer:
                 self._dedup_timer.cancel()
                 self._dedup_timer = None
         
+        self._inbox.put(_STOP)
         if self._thread:
             self._thread.join(timeout=5)
-        self.logger.info("告警文件监控器已停止")
+        self.logger.info("告警监控器已停止")
+    
+    def _on_bus_record(self, record: dict):
+        """事件总线回调（在告警输出线程中执行，只入队）"""
+        self._inbox.put(record)
+    
+    def _on_file_changed(self):
+        """文件事件回调（在 watchdog 线程中执行，只入队）"""
+        self._inbox.put(_FILE_CHANGED)
     
     def _watch_loop(self):
         """监控循环主逻辑"""
-        poll_interval = 0.5  # 轮询间隔(秒)
-        
         while self._running:
+            item = self._inbox.get()
+            if item is _STOP:
+                break
             try:
-                # 检查文件是否存在
-                if not os.path.exists(self.alerts_file_path):
-                    self.logger.warning(f"告警文件不存在: {self.alerts_file_path}")
-                    time.sleep(poll_interval)
-                    continue
-                
-                # 获取文件修改时间
-                current_mtime = os.path.getmtime(self.alerts_file_path)
-                
-                # 如果文件被修改了
-                if current_mtime > self._last_mtime:
-                    self._last_mtime = current_mtime
-                    
-                    # 读取新增的内容
-                    with open(self.alerts_file_path, 'r', encoding='utf-8') as f:
-                        # 移动到上次读取的位置
-                        f.seek(self._last_position)
-                        
-                        # 读取新增的行
-                        new_lines = f.readlines()
-                        
-                        # 更新位置
-                        self._last_position = f.tell()
-                        
-                        # 如果有新内容，触发回调
-                        if new_lines:
-                            self.logger.info(f"📋 检测到新告警记录 ({len(new_lines)} 条)")
-                            self._handle_new_alerts(new_lines)
-                
-                time.sleep(poll_interval)
-                
+                if item is _FILE_CHANGED:
+                    self._read_new_lines()
+                else:
+                    self._handle_record(item)
             except Exception as e:
-                self.logger.error(f"监控告警文件时出错: {e}", exc_info=True)
-                time.sleep(poll_interval)
+                self.logger.error(f"处理告警时出错: {e}", exc_info=True)
     
-    def _handle_new_alerts(self, new_lines: list):
-        """处理新的告警记录（带去重逻辑）"""
-        import json
+    def _read_new_lines(self):
+        """读取文件新增的完整行"""
+        try:
+            size = os.path.getsize(self.alerts_file_path)
+        except OSError:
+            self.logger.warning(f"告警文件不存在: {self.alerts_file_path}")
+            return
+        if size < self._last_position:
+            # 文件被截断或替换，从头读取
+            self._last_position = 0
+        if size == self._last_position:
+            return
+        
+        with open(self.alerts_file_path, 'rb') as f:
+            f.seek(self._last_position)
+            data = f.read()
+        # 只处理到最后一个换行符，写入中的半行留到下次
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return
+        self._last_position += end
         
+        if self.event_bus.has_publishers():
+            # 同进程监控写入的记录已通过事件总线送达
+            return
+        
+        new_lines = data[:end].decode('utf-8', errors='replace').splitlines()
+        self.logger.info(f"📋 检测到新告警记录 ({len(new_lines)} 条)")
+        self._handle_new_alerts(new_lines)
+    
+    def _handle_new_alerts(self, new_lines: list):
+        """处理文件中新的告警记录"""
         for line in new_lines:
             line = line.strip()
             if not line:
                 continue
             
             try:
-                alert_record = json.loads(line)
-                
-                if alert_record.get('type') == 'aggregate' and alert_record.get('source') == 'monitor':
-                    symbols = alert_record.get('symbols', [])
-                    pending_count = alert_record.get('pending_count', 0)
-                    
-                    if pending_count > 0:
-                        self._add_to_pending(symbols, alert_record)
-                    else:
-                        self.logger.debug("  → 空告警记录，跳过")
-                
+                self._handle_record(json.loads(line))
             except json.JSONDecodeError as e:
                 self.logger.error(f"解析告警记录失败: {e}\n内容: {line}")
             except Exception as e:
                 self.logger.error(f"处理告警记录时出错: {e}", exc_info=True)
     
+    def _handle_record(self, alert_record: dict):
+        """处理一条聚合告警记录（带去重逻辑）"""
+        if alert_record.get('type') == 'aggregate' and alert_record.get('source') == 'monitor':
+            symbols = alert_record.get('symbols', [])
+            pending_count = alert_record.get('pending_count', 0)
+            
+            if pending_count > 0:
+                self._add_to_pending(symbols, alert_record)
+            else:
+                self.logger.debug("  → 空告警记录，跳过")
+    
     def _add_to_pending(self, symbols: list, alert_record: dict):
         """添加到待处理队列，并启动/重置去重定时器"""
         self.logger.debug(f"[DEBUG] _add_to_pending 开始, symbols={symbols}")
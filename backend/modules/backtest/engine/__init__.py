@@ -1,6 +1,6 @@
 """回测引擎模块"""
 from modules.backtest.engine.backtest_engine import BacktestEngine
-from modules.backtest.engine.backtest_trade_engine import BacktestTradeEngine
+from modules.backtest.engine.backtest_trade_engine import BacktestTradeEngine, BacktestTradeEnginePool
 from modules.backtest.engine.position_logger import PositionLogger
 from modules.backtest.engine.stats_collector import BacktestStatsCollector, StepMetrics
 from modules.backtest.engine.result_collector import ResultCollector
@@ -9,6 +9,7 @@ from modules.backtest.engine.workflow_executor import WorkflowExecutor
 __all__ = [
     'BacktestEngine',
     'BacktestTradeEngine',
+    'BacktestTradeEnginePool',
     'BacktestStatsCollector',
     'PositionLogger',
     'StepMetrics',
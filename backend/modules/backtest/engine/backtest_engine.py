@@ -15,6 +15,7 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
 from typing import Any, Callable, Dict, List, Optional, Tuple
 
+from modules.agent.builder import create_workflow
 from modules.agent.engine import get_engine
 from modules.agent.tools.tool_utils import get_kline_provider, set_kline_provider
 from modules.backtest.context import set_backtest_mode
@@ -155,12 +156,15 @@ class BacktestEngine:
         self._original_engine = get_engine()
         self._original_provider = get_kline_provider()
         
+        self._total_steps = self._calculate_total_steps()
+        
         logger.info("加载历史K线数据...")
         self.kline_provider = BacktestKlineProvider(
             symbols=self.config.symbols,
             start_time=self.config.start_time,
             end_time=self.config.end_time,
             interval=self.config.interval,
+            on_progress=self._report_download_progress,
         )
         
         set_kline_provider(self.kline_provider)
@@ -187,19 +191,43 @@ class BacktestEngine:
             position_logger=self._position_logger,
         )
         
+        # workflow 图与每步状态无关，整个回测只构建、编译一次
+        workflow_app = create_workflow(get_config()).compile()
+        
         self._executor = WorkflowExecutor(
             config=self.config,
             kline_provider=self.kline_provider,
             backtest_id=self.backtest_id,
             position_simulator=self._position_simulator,
+            workflow_app=workflow_app,
         )
         
-        self._total_steps = self._calculate_total_steps()
         self._stats = BacktestStatsCollector(self._total_steps)
         self._result_collector = ResultCollector(self.result)
         
         logger.info(f"回测环境初始化完成, 仓位记录文件: {self._position_logger.positions_file_path}")
     
+    def _report_download_progress(self, completed_pages: int, total_pages: int) -> None:
+        """历史K线下载进度（回测步骤开始前）
+        
+        Args:
+            completed_pages: 已下载页数
+            total_pages: 需要下载的总页数
+        """
+        if not self.on_progress:
+            return
+        progress = BacktestProgress(
+            current_time=self.config.start_time,
+            total_steps=self._total_steps,
+            completed_steps=0,
+            current_step_info=f"下载历史K线 {completed_pages}/{total_pages} 页",
+            max_concurrency=self.config.concurrency,
+        )
+        try:
+            self.on_progress(progress)
+        except Exception as e:
+            logger.error(f"进度回调失败: {e}")
+    
     def _cleanup(self) -> None:
         """清理回测环境"""
         logger.info("清理回测环境...")
@@ -1,96 +1,149 @@
-"""回测交易引擎 - 继承TradeSimulatorEngine，使用独立的状态文件"""
+"""回测交易引擎 - 纯内存的账户/持仓引擎，可按步骤重置复用"""
 from __future__ import annotations
 
-import copy
-import os
-from typing import Any, Dict, List, Optional
+import threading
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional
 
-from modules.agent.trade_simulator.engine.simulator import TradeSimulatorEngine
-from modules.agent.trade_simulator.models import Account
+from modules.agent.trade_simulator.engine.limit_order_manager import LimitOrderManager
+from modules.agent.trade_simulator.engine.position_manager import PositionManager
+from modules.agent.trade_simulator.engine.risk_service import RiskService
+from modules.agent.trade_simulator.engine.state_manager import StateManager
+from modules.agent.trade_simulator.engine.tpsl_manager import TPSLManager
+from modules.agent.trade_simulator.models import Account, Position
 from modules.monitor.utils.logger import get_logger
 
 logger = get_logger('backtest.engine.trade')
 
 
-class BacktestTradeEngine(TradeSimulatorEngine):
+def _freeze(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def create_backtest_config(config: Mapping, initial_balance: float) -> Mapping:
+    """创建回测专用的只读配置视图
+    
+    禁用文件持久化并设置初始资金；整个回测只创建一次，所有步骤的交易引擎共享。
+    
+    Args:
+        config: 基础配置
+        initial_balance: 初始资金
+    
+    Returns:
+        只读配置（嵌套字典为 MappingProxyType，列表为元组）
+    """
+    agent_cfg = dict(config.get('agent', {}))
+    agent_cfg['trade_state_path'] = None
+    agent_cfg['position_history_path'] = None
+    agent_cfg['state_path'] = None
+    agent_cfg['disable_persistence'] = True
+    
+    sim_cfg = dict(agent_cfg.get('simulator', {}))
+    sim_cfg['initial_balance'] = initial_balance
+    agent_cfg['simulator'] = sim_cfg
+    
+    return _freeze({**config, 'agent': agent_cfg})
+
+
+class _InMemoryState:
+    """回测状态：不持久化、不写平仓历史（交易结果由 PositionLogger 统一记录）"""
+    
+    pos_to_dict = staticmethod(StateManager.pos_to_dict)
+    
+    def persist(self) -> None:
+        pass
+    
+    def log_operation(self, event: str, payload: Dict[str, Any]) -> None:
+        pass
+
+
+class _SimulatedPricePositionManager(PositionManager):
+    """以回测模拟价格作为最新价的持仓管理（不访问交易所）"""
+    
+    def __init__(self, *args, price_source: Callable[[str], Optional[float]]):
+        super().__init__(*args)
+        self._price_source = price_source
+    
+    def get_latest_close_price(self, symbol: str) -> Optional[float]:
+        return self._price_source(symbol)
+
+
+class BacktestTradeEngine:
     """回测专用交易引擎
     
-    继承自 TradeSimulatorEngine，主要区别：
-    1. 使用独立的状态文件路径（按 backtest_id 隔离）
-    2. 不启动 WebSocket 订阅（回测不需要实时行情）
-    3. 支持设置模拟价格用于开仓/平仓
+    与 TradeSimulatorEngine 提供相同的交易接口，复用其持仓、止盈止损、限价单和风控计算，区别：
+    1. 账户与持仓只在内存中，不恢复/持久化状态，不写平仓历史，不使用写入队列
+    2. 不创建 WebSocket 订阅与 REST 客户端，最新价取自 set_simulated_price/update_mark_prices
+    3. 配置为回测共享的只读视图（create_backtest_config），不再逐步深拷贝
+    4. 可通过 reset 清空状态后供下一个步骤复用（见 BacktestTradeEnginePool）
     """
     
-    def __init__(self, config: Dict, backtest_id: str, initial_balance: float = 10000.0):
+    def __init__(self, config: Mapping, backtest_id: str, initial_balance: float = 10000.0):
         """初始化回测交易引擎
         
         Args:
-            config: 基础配置
-            backtest_id: 回测ID，用于隔离状态文件
+            config: 基础配置，或 create_backtest_config 创建的只读配置
+            backtest_id: 回测ID（步骤级）
             initial_balance: 初始资金
         """
+        if not isinstance(config, MappingProxyType):
+            config = create_backtest_config(config, initial_balance)
+        self.config = config
         self.backtest_id = backtest_id
         self._simulated_prices: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self._running = False
         
-        backtest_config = self._create_backtest_config(config, backtest_id, initial_balance)
-        
-        super().__init__(backtest_config)
+        self.account = Account(balance=initial_balance, equity=initial_balance)
+        self.positions: Dict[str, Position] = {}
         
-        self.account.balance = initial_balance
-        self.account.equity = initial_balance
+        self.state_manager = _InMemoryState()
+        self.risk_service = RiskService(config, self.account)
+        self.position_manager = _SimulatedPricePositionManager(
+            config, self.account, self.positions,
+            self.risk_service, self.state_manager, self._lock,
+            price_source=self.get_simulated_price,
+        )
+        self.tpsl_manager = TPSLManager(
+            config, self.account, self.positions,
+            self.risk_service, self.state_manager, self.position_manager, self._lock
+        )
+        self.limit_order_manager = LimitOrderManager(
+            config, self.account, self.positions,
+            self.position_manager, self._lock
+        )
         
-        logger.info(f"回测交易引擎初始化完成: backtest_id={backtest_id}, "
-                   f"initial_balance={initial_balance}")
+        logger.debug(f"回测交易引擎初始化完成: backtest_id={backtest_id}, "
+                     f"initial_balance={initial_balance}")
     
-    def _create_backtest_config(
-        self, 
-        config: Dict, 
-        backtest_id: str,
-        initial_balance: float
-    ) -> Dict:
-        """创建回测专用配置
+    def reset(self, backtest_id: str, initial_balance: float) -> None:
+        """清空账户、持仓、挂单与模拟价格，供下一个步骤复用
         
-        回测步骤使用内存状态，不创建独立目录，避免产生大量临时目录。
-        交易结果通过 PositionLogger 统一记录到主回测目录的 all_positions.jsonl。
+        各服务持有同一个账户/持仓/挂单对象的引用，因此原地清空而不是替换。
         
         Args:
-            config: 基础配置
-            backtest_id: 回测ID
+            backtest_id: 新的回测ID（步骤级）
             initial_balance: 初始资金
-        
-        Returns:
-            修改后的配置，禁用文件持久化
         """
-        bt_config = copy.deepcopy(config)
-        
-        if 'agent' not in bt_config:
-            bt_config['agent'] = {}
-        
-        bt_config['agent']['trade_state_path'] = None
-        bt_config['agent']['position_history_path'] = None
-        bt_config['agent']['state_path'] = None
-        bt_config['agent']['disable_persistence'] = True
-        
-        if 'simulator' not in bt_config['agent']:
-            bt_config['agent']['simulator'] = {}
-        bt_config['agent']['simulator']['initial_balance'] = initial_balance
-        
-        return bt_config
+        with self._lock:
+            self.backtest_id = backtest_id
+            vars(self.account).update(vars(Account(balance=initial_balance, equity=initial_balance)))
+            self.positions.clear()
+            self.limit_order_manager.orders.clear()
+            self._simulated_prices.clear()
+            self._running = False
     
     def start(self) -> None:
-        """启动引擎 - 回测模式不需要启动WebSocket订阅"""
+        """启动引擎 - 回测模式没有需要启动的服务"""
         self._running = True
-        logger.info("回测交易引擎已启动（无WebSocket订阅）")
     
     def stop(self) -> None:
         """停止引擎"""
         self._running = False
-        self.state_manager.persist()
-        logger.info("回测交易引擎已停止")
-    
-    def _rebuild_ws(self) -> None:
-        """重建WS订阅 - 回测模式不需要"""
-        pass
     
     def set_simulated_price(self, symbol: str, price: float) -> None:
         """设置模拟价格
@@ -128,6 +181,23 @@ class BacktestTradeEngine(TradeSimulatorEngine):
         
         self.risk_service.mark_account(self.positions)
     
+    def get_account_summary(self) -> Dict[str, Any]:
+        """获取账户汇总"""
+        with self._lock:
+            self.risk_service.mark_account(self.positions)
+            summary = self.account.to_dict()
+            
+            margin_usage_rate = 0.0
+            if summary['balance'] > 0:
+                margin_usage_rate = (summary['reserved_margin_sum'] / summary['balance']) * 100
+            
+            summary['margin_usage_rate'] = round(margin_usage_rate, 2)
+            return summary
+    
+    def get_positions_summary(self) -> List[Dict[str, Any]]:
+        """获取持仓汇总"""
+        return self.position_manager.get_positions_summary()
+    
     def open_position(
         self, 
         symbol: str, 
@@ -167,7 +237,6 @@ class BacktestTradeEngine(TradeSimulatorEngine):
         
         if 'error' not in result:
             self.risk_service.mark_account(self.positions)
-            self.state_manager.persist()
         
         return result
     
@@ -198,10 +267,63 @@ class BacktestTradeEngine(TradeSimulatorEngine):
         
         if 'error' not in result:
             self.risk_service.mark_account(self.positions)
-            self.state_manager.persist()
         
         return result
     
+    def update_tp_sl(
+        self,
+        symbol: str,
+        tp_price: Optional[float] = None,
+        sl_price: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """更新TP/SL（通过交易对）"""
+        return self.tpsl_manager.update_tp_sl(symbol, tp_price, sl_price)
+    
+    def create_limit_order(
+        self,
+        symbol: str,
+        side: str,
+        limit_price: float,
+        margin_usdt: float,
+        leverage: int,
+        tp_price: Optional[float] = None,
+        sl_price: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """创建限价单
+        
+        Args:
+            symbol: 交易对
+            side: 方向（long/short）
+            limit_price: 挂单价格
+            margin_usdt: 保证金金额
+            leverage: 杠杆倍数
+            tp_price: 止盈价
+            sl_price: 止损价
+        """
+        return self.limit_order_manager.create_limit_order(
+            symbol, side, limit_price, margin_usdt, leverage, tp_price, sl_price
+        )
+    
+    def cancel_limit_order(self, order_id: str) -> Dict[str, Any]:
+        """取消单个限价单
+        
+        Args:
+            order_id: 订单ID
+        """
+        return self.limit_order_manager.cancel_order(order_id)
+    
+    def cancel_limit_orders_by_symbol(self, symbol: str) -> Dict[str, Any]:
+        """取消指定交易对的所有待成交限价单
+        
+        Args:
+            symbol: 交易对
+        """
+        return self.limit_order_manager.cancel_orders_by_symbol(symbol)
+    
+    def get_pending_orders_summary(self) -> List[Dict[str, Any]]:
+        """获取待成交订单摘要"""
+        return self.limit_order_manager.get_pending_orders_summary()
+    
     def check_tp_sl(
         self, 
         symbol: str, 
@@ -293,29 +415,18 @@ class BacktestTradeEngine(TradeSimulatorEngine):
             'c': close_price,
         }
         
-        filled_orders_before = [
-            o for o in self.limit_order_manager.orders.values() 
-            if o.status == 'filled'
+        pending_before = [
+            o for o in self.limit_order_manager.orders.values()
+            if o.status == 'pending'
         ]
         
         self.limit_order_manager.on_kline(symbol, kline_data)
         
-        filled_orders_after = [
-            o for o in self.limit_order_manager.orders.values() 
+        return [
+            self.limit_order_manager._order_to_dict(o)
+            for o in pending_before
             if o.status == 'filled'
         ]
-        
-        new_filled = [
-            self.limit_order_manager._order_to_dict(o) 
-            for o in filled_orders_after 
-            if o not in filled_orders_before
-        ]
-        
-        if new_filled:
-            self.state_manager.persist()
-            self.limit_order_manager.persist()
-        
-        return new_filled
     
     def get_pending_limit_orders(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
         """获取待成交的限价单
@@ -350,3 +461,58 @@ class BacktestTradeEngine(TradeSimulatorEngine):
             "pending_orders": pending_orders,
             "pending_orders_count": len(pending_orders),
         }
+
+
+class BacktestTradeEnginePool:
+    """回测交易引擎池
+    
+    同一回测的所有步骤共享一份只读配置；步骤结束后引擎归还到池中，
+    下一个步骤取出时重置状态复用，引擎数量只随最大并发数增长。
+    """
+    
+    def __init__(self, config: Mapping, backtest_id: str, initial_balance: float):
+        """初始化
+        
+        Args:
+            config: 基础配置
+            backtest_id: 回测ID
+            initial_balance: 每个步骤的初始资金
+        """
+        self.backtest_id = backtest_id
+        self.initial_balance = initial_balance
+        self._config = create_backtest_config(config, initial_balance)
+        self._idle: List[BacktestTradeEngine] = []
+        self._lock = threading.Lock()
+        self.created = 0
+    
+    def acquire(self, step_id: str) -> BacktestTradeEngine:
+        """取出一个已重置并启动的引擎
+        
+        Args:
+            step_id: 步骤ID（组成步骤级回测ID）
+        
+        Returns:
+            回测交易引擎
+        """
+        engine_id = f"{self.backtest_id}_{step_id}"
+        with self._lock:
+            engine = self._idle.pop() if self._idle else None
+            if engine is None:
+                self.created += 1
+        
+        if engine is None:
+            engine = BacktestTradeEngine(self._config, engine_id, self.initial_balance)
+        else:
+            engine.reset(engine_id, self.initial_balance)
+        engine.start()
+        return engine
+    
+    def release(self, engine: BacktestTradeEngine) -> None:
+        """停止引擎并归还到池中
+        
+        Args:
+            engine: acquire 取出的引擎
+        """
+        engine.stop()
+        with self._lock:
+            self._idle.append(engine)
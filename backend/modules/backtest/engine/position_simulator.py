@@ -4,16 +4,22 @@
 - 模拟市价单开仓后的止盈止损
 - 模拟限价单成交及后续止盈止损
 - 生成交易结果记录
+
+入场后的K线以数组切片取出，止盈止损与限价单成交按最高/最低价布尔掩码一次定位首个触发K线，
+只在触发的那根K线上调用交易引擎平仓/成交，结果与逐根K线检查一致。
 """
 from __future__ import annotations
 
 import uuid
 from datetime import datetime, timedelta
-from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
 
 from modules.backtest.engine.backtest_trade_engine import BacktestTradeEngine
 from modules.backtest.models import BacktestConfig, BacktestTradeResult
 from modules.backtest.providers.kline_provider import BacktestKlineProvider
+from modules.monitor.data.kline_buffer import FIELD_INDEX
 from modules.monitor.utils.logger import get_logger
 
 if TYPE_CHECKING:
@@ -27,12 +33,88 @@ INTERVAL_MINUTES_MAP = {
     "1h": 60, "2h": 120, "4h": 240, "6h": 360, "12h": 720, "1d": 1440,
 }
 
+MAX_HOLDING_BARS = 1000
+
+_TS = FIELD_INDEX['timestamp']
+_HIGH = FIELD_INDEX['high']
+_LOW = FIELD_INDEX['low']
+_CLOSE = FIELD_INDEX['close']
+
 
 def get_interval_minutes(interval: str) -> int:
     """将K线周期转换为分钟数"""
     return INTERVAL_MINUTES_MAP.get(interval, 15)
 
 
+def _first_true(mask: np.ndarray) -> int:
+    if mask.size == 0:
+        return -1
+    index = int(np.argmax(mask))
+    return index if mask[index] else -1
+
+
+def first_tp_sl_touch(
+    highs: np.ndarray,
+    lows: np.ndarray,
+    side: str,
+    tp_price: Optional[float],
+    sl_price: Optional[float],
+) -> int:
+    """定位首个触及止盈或止损的K线
+    
+    与 BacktestTradeEngine.check_tp_sl 的触发条件一致（价格为空或为0时不检查）；
+    同一根K线同时触及时由 check_tp_sl 按止损处理。
+    
+    Args:
+        highs: 入场后各K线最高价
+        lows: 入场后各K线最低价
+        side: 持仓方向 (long/short)
+        tp_price: 止盈价
+        sl_price: 止损价
+    
+    Returns:
+        首个触发K线的下标，没有触发返回 -1
+    """
+    hit = np.zeros(len(highs), dtype=bool)
+    if side == 'long':
+        if tp_price:
+            hit |= highs >= tp_price
+        if sl_price:
+            hit |= lows <= sl_price
+    else:
+        if tp_price:
+            hit |= lows <= tp_price
+        if sl_price:
+            hit |= highs >= sl_price
+    return _first_true(hit)
+
+
+def first_limit_fill(
+    highs: np.ndarray,
+    lows: np.ndarray,
+    orders: Iterable[Tuple[str, float]],
+) -> int:
+    """定位首个使任一限价单成交的K线
+    
+    与 LimitOrderManager.on_kline 的成交条件一致：多单最低价下探到挂单价，空单最高价上涨到挂单价。
+    
+    Args:
+        highs: 各K线最高价
+        lows: 各K线最低价
+        orders: (方向, 挂单价) 列表
+    
+    Returns:
+        首个成交K线的下标，没有成交返回 -1
+    """
+    hit = np.zeros(len(highs), dtype=bool)
+    for side, limit_price in orders:
+        if side == 'long':
+            hit |= lows <= limit_price
+        else:
+            hit |= highs >= limit_price
+    return _first_true(hit)
+
+
 class PositionSimulator:
     """仓位模拟器
     
@@ -89,46 +171,45 @@ class PositionSimulator:
         actual_entry_time = filled_time if filled_time else entry_time
         order_created_time = entry_time if filled_time else None
         
-        current_time = actual_entry_time + self._step_delta
-        holding_bars = 0
-        max_bars = 1000
+        rows = self._rows_after(symbol, actual_entry_time)
+        start = 0
         
-        while current_time <= self.config.end_time and holding_bars < max_bars:
-            kline = self.kline_provider.get_kline_at_time(
-                symbol, self.config.interval, current_time
+        while pos.status == 'open':
+            index = first_tp_sl_touch(
+                rows[start:, _HIGH], rows[start:, _LOW], pos.side, pos.tp_price, pos.sl_price
             )
+            if index < 0:
+                break
+            index += start
+            row = rows[index]
             
-            if kline:
-                holding_bars += 1
-                
-                result = trade_engine.check_tp_sl(
-                    symbol,
-                    current_price=kline.close,
-                    high_price=kline.high,
-                    low_price=kline.low
-                )
-                
-                if result and 'error' not in result:
-                    return self._create_trade_result(
-                        result=result,
-                        saved_data=saved_pos_data,
-                        entry_time=actual_entry_time,
-                        exit_time=current_time,
-                        holding_bars=holding_bars,
-                        workflow_run_id=workflow_run_id,
-                        order_type=order_type,
-                        limit_price=limit_price,
-                        order_created_time=order_created_time,
-                    )
+            result = trade_engine.check_tp_sl(
+                symbol,
+                current_price=float(row[_CLOSE]),
+                high_price=float(row[_HIGH]),
+                low_price=float(row[_LOW])
+            )
             
-            current_time += self._step_delta
+            if result and 'error' not in result:
+                return self._create_trade_result(
+                    result=result,
+                    saved_data=saved_pos_data,
+                    entry_time=actual_entry_time,
+                    exit_time=self._step_time(actual_entry_time, row[_TS]),
+                    holding_bars=index + 1,
+                    workflow_run_id=workflow_run_id,
+                    order_type=order_type,
+                    limit_price=limit_price,
+                    order_created_time=order_created_time,
+                )
+            start = index + 1
         
         return self._handle_timeout_close(
             trade_engine=trade_engine,
             symbol=symbol,
             saved_data=saved_pos_data,
             entry_time=actual_entry_time,
-            holding_bars=holding_bars,
+            holding_bars=len(rows),
             workflow_run_id=workflow_run_id,
             order_type=order_type,
             limit_price=limit_price,
@@ -159,43 +240,46 @@ class PositionSimulator:
         symbol = order['symbol']
         limit_price = order.get('limit_price', 0)
         
-        current_time = entry_time + self._step_delta
-        max_bars = 1000
-        bars_checked = 0
-        
-        while current_time <= self.config.end_time and bars_checked < max_bars:
-            kline = self.kline_provider.get_kline_at_time(
-                symbol, self.config.interval, current_time
-            )
+        rows = self._rows_after(symbol, entry_time)
+        start = 0
+        
+        # 同一交易对的其他挂单也会在各自触发的K线上成交，与逐根K线检查一致
+        while start < len(rows):
+            pending = [
+                (o.side, o.limit_price)
+                for o in trade_engine.limit_order_manager.orders.values()
+                if o.symbol == symbol and o.status == 'pending'
+            ]
+            index = first_limit_fill(rows[start:, _HIGH], rows[start:, _LOW], pending)
+            if index < 0:
+                break
+            index += start
+            row = rows[index]
             
-            if kline:
-                bars_checked += 1
-                
-                filled_orders = trade_engine.check_limit_orders(
-                    symbol,
-                    high_price=kline.high,
-                    low_price=kline.low,
-                    close_price=kline.close
-                )
-                
-                if filled_orders:
-                    for filled in filled_orders:
-                        if filled['id'] == order['id']:
-                            logger.debug(f"限价单成交: {symbol} @ {filled['filled_price']} (创建于 {entry_time}, 成交于 {current_time})")
-                            
-                            if symbol in trade_engine.positions and \
-                               trade_engine.positions[symbol].status == 'open':
-                                return self.simulate_position_outcome(
-                                    trade_engine, 
-                                    symbol, 
-                                    entry_time,
-                                    workflow_run_id,
-                                    order_type="limit",
-                                    limit_price=limit_price,
-                                    filled_time=current_time,
-                                )
+            filled_orders = trade_engine.check_limit_orders(
+                symbol,
+                high_price=float(row[_HIGH]),
+                low_price=float(row[_LOW]),
+                close_price=float(row[_CLOSE])
+            )
             
-            current_time += self._step_delta
+            for filled in filled_orders:
+                if filled['id'] == order['id']:
+                    filled_time = self._step_time(entry_time, row[_TS])
+                    logger.debug(f"限价单成交: {symbol} @ {filled['filled_price']} (创建于 {entry_time}, 成交于 {filled_time})")
+                    
+                    if symbol in trade_engine.positions and \
+                       trade_engine.positions[symbol].status == 'open':
+                        return self.simulate_position_outcome(
+                            trade_engine, 
+                            symbol, 
+                            entry_time,
+                            workflow_run_id,
+                            order_type="limit",
+                            limit_price=limit_price,
+                            filled_time=filled_time,
+                        )
+            start = index + 1
         
         pending = trade_engine.get_pending_limit_orders(symbol)
         if pending:
@@ -206,6 +290,31 @@ class PositionSimulator:
         
         return None
     
+    def _rows_after(self, symbol: str, after: datetime) -> np.ndarray:
+        """入场后逐周期检查的K线数组
+        
+        依次检查 after + k * 周期（不晚于回测结束时间）所在的K线，即开盘时间在
+        (after, after + K * 周期] 内的K线，最多 MAX_HOLDING_BARS 根。
+        
+        Args:
+            symbol: 交易对
+            after: 入场（或挂单）时间
+        
+        Returns:
+            K线数组视图，列顺序见 kline_buffer.FIELDS
+        """
+        steps = (self.config.end_time - after) // self._step_delta
+        rows = self.kline_provider.get_kline_rows(
+            symbol, self.config.interval, after, after + max(steps, 0) * self._step_delta
+        )
+        start = int(np.searchsorted(rows[:, _TS], after.timestamp() * 1000, side='right'))
+        return rows[start:start + MAX_HOLDING_BARS]
+    
+    def _step_time(self, after: datetime, open_time_ms: float) -> datetime:
+        """落在开盘时间为 open_time_ms 的K线内的检查时刻 after + k * 周期"""
+        elapsed = timedelta(milliseconds=float(open_time_ms)) - timedelta(seconds=after.timestamp())
+        return after + -(-elapsed // self._step_delta) * self._step_delta
+    
     def _save_position_data(self, pos) -> Dict[str, Any]:
         """保存仓位数据用于后续生成交易记录"""
         original_tp = pos.original_tp_price or pos.tp_price
@@ -9,7 +9,6 @@ from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 from langchain_core.runnables import RunnableConfig
 
-from modules.agent.builder import create_workflow
 from modules.agent.engine import set_engine, clear_thread_local_engine
 from modules.agent.state import AgentState
 from modules.agent.tools.tool_utils import set_kline_provider, clear_context_kline_provider
@@ -19,13 +18,15 @@ from modules.agent.utils.workflow_trace_storage import (
     record_workflow_start,
     record_workflow_end,
 )
-from modules.backtest.engine.backtest_trade_engine import BacktestTradeEngine
+from modules.backtest.engine.backtest_trade_engine import BacktestTradeEngine, BacktestTradeEnginePool
 from modules.backtest.models import BacktestConfig, BacktestTradeResult
 from modules.backtest.providers.kline_provider import BacktestKlineProvider, set_backtest_time
 from modules.config.settings import get_config
 from modules.monitor.utils.logger import get_logger
 
 if TYPE_CHECKING:
+    from langgraph.graph.state import CompiledStateGraph
+    
     from modules.backtest.engine.position_simulator import PositionSimulator
 
 logger = get_logger('backtest.executor')
@@ -35,10 +36,13 @@ class WorkflowExecutor:
     """Workflow 执行器
     
     负责执行单个回测步骤的 workflow，包括：
-    - 设置回测上下文（时间、价格、交易引擎）
+    - 设置回测上下文（时间、价格、交易引擎；交易引擎从引擎池取出，步骤结束后归还复用）
     - 执行 workflow
     - 模拟止盈止损
     - 清理上下文
+    
+    编译后的 workflow 由所有步骤共享：图本身不保存运行状态（无 checkpointer），
+    每步的告警、时间、交易引擎通过 RunnableConfig 与上下文变量传入，可在多线程中并发 invoke。
     """
     
     def __init__(
@@ -47,11 +51,14 @@ class WorkflowExecutor:
         kline_provider: BacktestKlineProvider,
         backtest_id: str,
         position_simulator: "PositionSimulator",
+        workflow_app: "CompiledStateGraph",
     ):
         self.config = config
         self.kline_provider = kline_provider
         self.backtest_id = backtest_id
         self._position_simulator = position_simulator
+        self._workflow_app = workflow_app
+        self._engine_pool = BacktestTradeEnginePool(get_config(), backtest_id, config.initial_balance)
     
     def execute_step(
         self,
@@ -86,7 +93,7 @@ class WorkflowExecutor:
         set_backtest_time(current_time)
         set_kline_provider(self.kline_provider, context_local=True)
         
-        trade_engine = self._create_trade_engine(step_id)
+        trade_engine = self._engine_pool.acquire(step_id)
         
         try:
             self._update_prices(trade_engine, current_time)
@@ -122,18 +129,7 @@ class WorkflowExecutor:
         finally:
             clear_thread_local_engine()
             clear_context_kline_provider()
-            trade_engine.stop()
-    
-    def _create_trade_engine(self, step_id: str) -> BacktestTradeEngine:
-        """创建隔离的交易引擎"""
-        cfg = get_config()
-        engine = BacktestTradeEngine(
-            config=cfg,
-            backtest_id=f"{self.backtest_id}_{step_id}",
-            initial_balance=self.config.initial_balance,
-        )
-        engine.start()
-        return engine
+            self._engine_pool.release(trade_engine)
     
     def _update_prices(self, trade_engine: BacktestTradeEngine, current_time: datetime) -> None:
         """更新交易引擎的价格"""
@@ -197,13 +193,9 @@ class WorkflowExecutor:
         
         如果需要更精细的超时控制，应该在 LangGraph 层面配置。
         """
-        cfg = get_config()
-        graph = create_workflow(cfg)
-        workflow_app = graph.compile()
-        
         try:
             with workflow_trace_context(workflow_run_id):
-                workflow_app.invoke(
+                self._workflow_app.invoke(
                     AgentState(),
                     config=self._wrap_config(mock_alert, workflow_run_id, current_time)
                 )
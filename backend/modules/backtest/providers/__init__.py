@@ -1,4 +1,5 @@
 """回测数据提供者模块"""
+from modules.backtest.providers.kline_downloader import KlineDownloader
 from modules.backtest.providers.kline_provider import BacktestKlineProvider
 
-__all__ = ['BacktestKlineProvider']
+__all__ = ['BacktestKlineProvider', 'KlineDownloader']
@@ -0,0 +1,110 @@
+"""回测历史K线并发下载器
+
+把回测所需的 (交易对, 周期, 区间) 中本地缺失的部分按页（单次REST请求）并发下载到K线仓库：
+- 所有交易对、周期的缺页一起提交到线程池，请求权重由REST客户端统一限频
+- 每页下载后立即写入仓库（启用批量写入时由仓库按间隔写入存储，下载结束时 flush），
+  失败的页在下一轮重新规划（只剩未下载的部分）；
+  进程中断后再次回测同样只下载剩余部分，区间重叠的回测无需重复下载
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional, Tuple
+
+from modules.monitor.data.kline_repository import KlineRepository
+from modules.monitor.utils.logger import get_logger
+
+logger = get_logger('backtest.providers.downloader')
+
+# (交易对, 周期, 起始时间戳, 结束时间戳)，时间戳为毫秒
+DownloadTask = Tuple[str, str, int, int]
+
+
+class KlineDownloader:
+    """按页并发下载历史K线到本地仓库"""
+
+    def __init__(
+        self,
+        repository: KlineRepository,
+        max_workers: int = 8,
+        max_rounds: int = 3,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ):
+        """初始化
+
+        Args:
+            repository: 本地K线仓库（需带REST客户端）
+            max_workers: 并发请求数
+            max_rounds: 最多下载轮数（首轮之后的轮次只重试失败的页）
+            on_progress: 进度回调 (已完成页数, 总页数)
+        """
+        self.repository = repository
+        self.max_workers = max(int(max_workers), 1)
+        self.max_rounds = max(int(max_rounds), 1)
+        self.on_progress = on_progress
+
+    def _plan(self, tasks: List[DownloadTask]) -> List[DownloadTask]:
+        """所有任务中本地缺失的页"""
+        return [
+            (symbol, interval, page_start, page_end)
+            for symbol, interval, start, end in tasks
+            for page_start, page_end in self.repository.plan_pages(symbol, interval, start, end)
+        ]
+
+    def _report(self, completed: int, total: int) -> None:
+        if self.on_progress is None:
+            return
+        try:
+            self.on_progress(completed, total)
+        except Exception as e:
+            logger.error(f"下载进度回调失败: {e}")
+
+    def download(self, tasks: List[DownloadTask]) -> List[DownloadTask]:
+        """下载所有任务中本地缺失的K线
+
+        Args:
+            tasks: 下载任务列表
+
+        Returns:
+            重试后仍失败的页（为空表示全部下载完成）
+        """
+        pages = self._plan(tasks)
+        total = len(pages)
+        if total == 0:
+            return []
+        logger.info(f"开始下载历史K线: {len(tasks)} 个序列, 共 {total} 页")
+
+        completed = 0
+        report_every = max(total // 100, 1)
+        failed: List[DownloadTask] = []
+        for round_index in range(self.max_rounds):
+            if round_index > 0:
+                # 已下载的页已写入仓库，重新规划只剩失败的部分
+                pages = self._plan(tasks)
+                if not pages:
+                    failed = []
+                    break
+                logger.warning(f"重试下载历史K线: 第 {round_index + 1} 轮, {len(pages)} 页")
+
+            failed = []
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pages))) as executor:
+                future_to_page = {
+                    executor.submit(self.repository.fetch_page, *page): page
+                    for page in pages
+                }
+                for future in as_completed(future_to_page):
+                    page = future_to_page[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logger.warning(f"下载K线失败: {page[0]} {page[1]} {page[2]}-{page[3]} - {e}")
+                        failed.append(page)
+                        continue
+                    completed += 1
+                    if completed % report_every == 0 or completed == total:
+                        self._report(completed, total)
+
+            if not failed:
+                break
+
+        self.repository.flush()
+        logger.info(f"历史K线下载完成: 成功 {completed}/{total} 页, 失败 {len(failed)} 页")
+        return failed
@@ -1,10 +1,20 @@
-"""回测K线数据提供者 - 从Binance API预加载历史数据并按时间切片返回"""
+"""回测K线数据提供者 - 从本地K线仓库预加载历史数据并按时间切片返回
+
+每个 (交易对, 周期) 预加载后保存为按开盘时间升序的K线列表与 NumPy 开盘时间数组，
+按模拟时间切片时二分查找（O(log N)），回测全程不随数据量线性扫描。
+"""
 import contextvars
-from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
 
 from modules.config.settings import get_config
+from modules.backtest.providers.kline_downloader import DownloadTask, KlineDownloader
 from modules.monitor.clients.binance_rest import BinanceRestClient
+from modules.monitor.data.kline_repository import KlineRepository, get_kline_repository
+from modules.monitor.data.kline_store import KlineStore, klines_to_rows
 from modules.monitor.data.models import Kline
 from modules.monitor.utils.logger import get_logger
 
@@ -50,10 +60,29 @@ def _get_kline_open_time(kline: Kline) -> datetime:
     return datetime.fromtimestamp(kline.timestamp / 1000, tz=timezone.utc)
 
 
-def _get_kline_close_time(kline: Kline, interval_minutes: int) -> datetime:
-    """获取K线收盘时间（datetime格式）"""
-    open_time = datetime.fromtimestamp(kline.timestamp / 1000, tz=timezone.utc)
-    return open_time + timedelta(minutes=interval_minutes)
+class _KlineSeries:
+    """单个 (交易对, 周期) 的预加载K线"""
+
+    __slots__ = ('klines', 'open_times', 'rows', 'interval_ms')
+
+    def __init__(self, klines: List[Kline], interval_ms: int):
+        # 按开盘时间升序且无重复
+        self.klines = klines
+        self.open_times = np.fromiter((k.timestamp for k in klines), dtype=np.int64, count=len(klines))
+        # (n, ROW_WIDTH)：开盘时间、OHLCV 等，供按区间批量读取
+        self.rows = klines_to_rows(klines)
+        self.interval_ms = interval_ms
+
+    def closed_before(self, time_ms: int) -> int:
+        """收盘时间不晚于 time_ms 的K线数量（即切片上界）"""
+        return int(np.searchsorted(self.open_times, time_ms - self.interval_ms, side='right'))
+
+    def index_at(self, time_ms: int) -> int:
+        """包含 time_ms 的K线下标（不存在时返回 -1）"""
+        index = int(np.searchsorted(self.open_times, time_ms, side='right')) - 1
+        if index >= 0 and time_ms < self.open_times[index] + self.interval_ms:
+            return index
+        return -1
 
 
 class BacktestKlineProvider:
@@ -70,7 +99,8 @@ class BacktestKlineProvider:
         symbols: List[str],
         start_time: datetime,
         end_time: datetime,
-        interval: str = "15m"
+        interval: str = "15m",
+        on_progress: Optional[Callable[[int, int], None]] = None,
     ):
         """初始化回测K线提供者
         
@@ -79,6 +109,7 @@ class BacktestKlineProvider:
             start_time: 回测开始时间
             end_time: 回测结束时间
             interval: K线周期，默认15m
+            on_progress: 历史K线下载进度回调 (已完成页数, 总页数)
         """
         self.symbols = [s.upper() for s in symbols]
         
@@ -91,8 +122,9 @@ class BacktestKlineProvider:
         self.interval = interval
         
         self._default_time = start_time
+        self._on_progress = on_progress
         
-        self._kline_cache: Dict[str, Dict[str, List[Kline]]] = {}
+        self._kline_cache: Dict[str, Dict[str, _KlineSeries]] = {}
         
         self._load_historical_data()
     
@@ -105,16 +137,22 @@ class BacktestKlineProvider:
         return mapping.get(interval, 15)
     
     def _load_historical_data(self) -> None:
-        """从Binance API预加载历史K线数据
+        """预加载历史K线数据
         
-        支持长时间范围（最多2年）的数据加载，通过分批请求实现。
+        本地K线仓库中缺失的区间由 KlineDownloader 按页并发下载并写回仓库（重复回测、
+        区间重叠的回测无需再次下载，中途失败后再次回测只下载剩余部分），然后从仓库读取。
+        未启用本地仓库时下载到临时目录，加载完成后删除。
         """
         total_days = (self.end_time - self.start_time).days
         logger.info(f"开始加载历史K线数据: symbols={self.symbols}, "
                    f"start={self.start_time}, end={self.end_time}, 共 {total_days} 天")
         
         cfg = get_config()
-        client = BinanceRestClient(cfg)
+        repository = get_kline_repository()
+        temp_dir = None
+        if repository is None:
+            temp_dir = tempfile.TemporaryDirectory(prefix='backtest_klines_')
+            repository = KlineRepository(KlineStore(temp_dir.name), BinanceRestClient(cfg))
         
         start_ms = int(self.start_time.timestamp() * 1000)
         end_ms = int(self.end_time.timestamp() * 1000)
@@ -123,66 +161,63 @@ class BacktestKlineProvider:
         if self.interval not in intervals_to_load:
             intervals_to_load.append(self.interval)
         
+        buffer_bars = 100
+        tasks: List[DownloadTask] = []
         for symbol in self.symbols:
             self._kline_cache[symbol] = {}
-            logger.info(f"加载 {symbol} 的历史数据...")
-            
             for interval in intervals_to_load:
+                if not repository.supports(interval):
+                    logger.warning(f"  {symbol} {interval}: 不支持的K线周期，跳过")
+                    self._set_klines(symbol, interval, [])
+                    continue
+                buffer_ms = buffer_bars * self._get_interval_minutes(interval) * 60 * 1000
+                tasks.append((symbol, interval, start_ms - buffer_ms, end_ms))
+        
+        try:
+            downloader = KlineDownloader(
+                repository,
+                max_workers=cfg.get('kline', {}).get('history_download_workers', 8),
+                on_progress=self._on_progress,
+            )
+            failed = downloader.download(tasks)
+            if failed:
+                logger.warning(f"{len(failed)} 页K线下载失败，读取时再次尝试补齐")
+            
+            for symbol, interval, actual_start, _ in tasks:
                 try:
-                    all_klines: List[Kline] = []
-                    current_start = start_ms
-                    interval_minutes = self._get_interval_minutes(interval)
-                    buffer_bars = 100
-                    buffer_ms = buffer_bars * interval_minutes * 60 * 1000
-                    actual_start = current_start - buffer_ms
-                    
-                    batch_count = 0
-                    while current_start < end_ms:
-                        raw = client.get_klines(
-                            symbol=symbol,
-                            interval=interval,
-                            limit=1500,
-                            start_time=actual_start if current_start == start_ms else current_start,
-                            end_time=end_ms
-                        )
-                        
-                        if not raw:
-                            break
-                        
-                        klines = [Kline.from_rest_api(k) for k in raw]
-                        all_klines.extend(klines)
-                        batch_count += 1
-                        
-                        if len(raw) < 1500:
-                            break
-                        
-                        last_kline = klines[-1]
-                        last_close_time = _get_kline_close_time(last_kline, interval_minutes)
-                        current_start = int(last_close_time.timestamp() * 1000) + 1
-                        
-                        if batch_count % 10 == 0:
-                            progress = (current_start - start_ms) / (end_ms - start_ms) * 100
-                            logger.info(f"  {symbol} {interval}: 已加载 {len(all_klines)} 根K线 ({progress:.1f}%)")
-                    
-                    seen_times = set()
-                    unique_klines = []
-                    for k in all_klines:
-                        if k.timestamp not in seen_times:
-                            seen_times.add(k.timestamp)
-                            unique_klines.append(k)
-                    
-                    unique_klines.sort(key=lambda k: k.timestamp)
-                    self._kline_cache[symbol][interval] = unique_klines
-                    
-                    logger.info(f"  {symbol} {interval}: 加载完成 - {len(unique_klines)} 根K线 (共 {batch_count} 批)")
-                    
+                    klines = repository.get_range(symbol, interval, actual_start, end_ms)
+                    self._set_klines(symbol, interval, klines)
+                    logger.info(f"  {symbol} {interval}: 加载完成 - {len(klines)} 根K线")
                 except Exception as e:
                     logger.error(f"加载K线数据失败: {symbol} {interval} - {e}")
-                    self._kline_cache[symbol][interval] = []
+                    self._set_klines(symbol, interval, [])
+        finally:
+            if temp_dir is not None:
+                repository.rest_client.close()
+                temp_dir.cleanup()
         
-        client.close()
         logger.info("历史K线数据加载完成")
     
+    def _set_klines(self, symbol: str, interval: str, klines: List[Kline]) -> _KlineSeries:
+        """保存预加载的K线（按开盘时间去重并升序排列）并建立时间索引
+        
+        Args:
+            symbol: 交易对
+            interval: K线周期
+            klines: K线列表（开盘时间重复时保留先出现的）
+        
+        Returns:
+            建立索引后的序列
+        """
+        open_times = np.fromiter((k.timestamp for k in klines), dtype=np.int64, count=len(klines))
+        if len(open_times) > 1 and not (np.diff(open_times) > 0).all():
+            _, first_index = np.unique(open_times, return_index=True)
+            klines = [klines[i] for i in first_index.tolist()]
+        
+        series = _KlineSeries(klines, self._get_interval_minutes(interval) * 60 * 1000)
+        self._kline_cache.setdefault(symbol, {})[interval] = series
+        return series
+    
     def set_current_time(self, t: datetime) -> None:
         """设置当前模拟时间（使用 contextvars，支持 asyncio）
         
@@ -238,16 +273,12 @@ class BacktestKlineProvider:
             if interval not in self._kline_cache[symbol]:
                 return []
         
-        all_klines = self._kline_cache[symbol][interval]
-        interval_minutes = self._get_interval_minutes(interval)
-        
-        current_time_ms = int(current_time.timestamp() * 1000)
-        filtered = [k for k in all_klines 
-                   if k.timestamp + interval_minutes * 60 * 1000 <= current_time_ms]
-        
-        result = filtered[-limit:] if len(filtered) > limit else filtered
+        if limit <= 0:
+            return []
         
-        return result
+        series = self._kline_cache[symbol][interval]
+        hi = series.closed_before(int(current_time.timestamp() * 1000))
+        return series.klines[max(hi - limit, 0):hi]
     
     def get_current_price(self, symbol: str) -> Optional[float]:
         """获取当前模拟时间的价格
@@ -279,14 +310,28 @@ class BacktestKlineProvider:
         if symbol not in self._kline_cache or interval not in self._kline_cache[symbol]:
             return None
         
-        all_klines = self._kline_cache[symbol][interval]
-        interval_minutes = self._get_interval_minutes(interval)
-        target_time_ms = int(target_time.timestamp() * 1000)
+        series = self._kline_cache[symbol][interval]
+        index = series.index_at(int(target_time.timestamp() * 1000))
+        return series.klines[index] if index >= 0 else None
+    
+    def get_kline_rows(self, symbol: str, interval: str, start_time: datetime, end_time: datetime) -> np.ndarray:
+        """获取开盘时间在 [start_time, end_time] 内的K线数组（视图，不复制）
+        
+        Args:
+            symbol: 交易对
+            interval: K线周期
+            start_time: 起始时间
+            end_time: 结束时间
+        
+        Returns:
+            (n, ROW_WIDTH) 数组，列顺序见 kline_buffer.FIELDS；没有数据时为空数组
+        """
+        symbol = symbol.upper()
         
-        for k in all_klines:
-            open_time_ms = k.timestamp
-            close_time_ms = k.timestamp + interval_minutes * 60 * 1000
-            if open_time_ms <= target_time_ms < close_time_ms:
-                return k
+        if symbol not in self._kline_cache or interval not in self._kline_cache[symbol]:
+            return klines_to_rows([])
         
-        return None
+        series = self._kline_cache[symbol][interval]
+        lo = np.searchsorted(series.open_times, int(start_time.timestamp() * 1000), side='left')
+        hi = np.searchsorted(series.open_times, int(end_time.timestamp() * 1000), side='right')
+        return series.rows[lo:hi]
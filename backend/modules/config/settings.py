@@ -78,6 +78,11 @@ class ConfigLoader:
             if key in agent_cfg and not os.path.isabs(agent_cfg[key]):
                 agent_cfg[key] = os.path.join(backend_dir, agent_cfg[key])
         
+        # K线本地存储目录（相对于 backend 目录）
+        kline_cfg = config.get('kline', {})
+        if kline_cfg.get('store_dir') and not os.path.isabs(kline_cfg['store_dir']):
+            kline_cfg['store_dir'] = os.path.join(backend_dir, kline_cfg['store_dir'])
+        
         # 验证 simulator 配置存在（数值配置从 config.yaml 读取）
         if 'simulator' not in agent_cfg:
             raise ValueError("config.yaml 的 agent 节中缺少 'simulator' 配置")
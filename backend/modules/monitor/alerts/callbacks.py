@@ -1,142 +1,156 @@
-"""告警发送回调封装：解耦聚合告警写入与邮件发送"""
-import os
-import json
+"""告警发送回调封装：生成聚合告警记录并交给告警输出管道（JSONL/邮件/事件总线）"""
 from datetime import datetime, timezone
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from .notifier import EmailNotifier
+from .sinks import AlertSinkPipeline, EmailAlertSink, EventBusAlertSink, JsonlAlertSink
 from ..data.models import AnomalyResult
 from ..utils.logger import get_logger
 
 logger = get_logger('alerts')
 
+REASON_MAP = {
+    'ATR': 'ATR波动超阈值',
+    'PRICE': '价格变化超阈值',
+    'VOLUME': '成交量异常',
+    'BB_WIDTH': '布林带宽度异常',
+    'BB_BREAKOUT': '布林带突破',
+    'OI_SURGE': '持仓量激增',
+    'OI_ZSCORE': '持仓量Z-Score异常',
+    'MA_DEVIATION': '均线乖离异常',
+    'RSI_OVERBOUGHT': 'RSI超买',
+    'RSI_OVERSOLD': 'RSI超卖',
+    'MA_BULLISH_CROSS': '均线金叉',
+    'MA_BEARISH_CROSS': '均线死叉',
+    'LONG_UPPER_WICK': '长上影线',
+    'LONG_LOWER_WICK': '长下影线',
+    'OI_DIVERGENCE': '持仓量背离',
+    'BB_SQUEEZE': '布林带收窄',
+}
 
-def create_send_alerts_callback(notifier: EmailNotifier, config: Dict):
-    """创建聚合告警发送回调
-    负责：
-    - 调用邮件发送
-    - 将聚合告警以结构化JSON写入JSONL供旁路Agent读取
+
+def build_aggregate_record(alerts: List[AnomalyResult], config: Dict,
+                           now_utc: Optional[datetime] = None) -> Dict:
+    """生成写入 alerts.jsonl 的聚合告警记录
+    
+    Args:
+        alerts: 告警列表
+        config: 配置字典
+        now_utc: 记录时间（默认当前UTC时间）
+    
+    Returns:
+        聚合记录字典
     """
-    def _callback(alerts: List[AnomalyResult]):
-        # 检查邮件功能是否启用（环境变量配置）
-        email_env_enabled = config.get('env', {}).get('email_enabled', False)
-        # 检查是否启用告警邮件发送（config.yaml配置）
-        send_email_enabled = email_env_enabled and config.get('alert', {}).get('send_email', True)
-        
-        email_status = '启用' if send_email_enabled else ('禁用(缺少SMTP配置)' if not email_env_enabled else '禁用(config.yaml)')
-        logger.info(f"📧 聚合告警 ({len(alerts)}个币种) [邮件发送: {email_status}]")
-        
-        # 使用普通监控的告警路径（规则策略使用独立的实时告警）
-        agent_cfg = config.get('agent', {})
-        jsonl_path = agent_cfg.get('alerts_jsonl_path', 'modules/data/alerts.jsonl')
-        
-        os.makedirs(os.path.dirname(jsonl_path), exist_ok=True)
-        now_utc = datetime.now(timezone.utc)
-        
-        if not alerts:
-            # 无告警也记录到JSONL
-            try:
-                record = {
-                    'type': 'aggregate',
-                    'ts': now_utc.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                    'interval': config['kline']['interval'],
-                    'symbols': [],
-                    'entries': [],
-                    'email_subject': '异动告警 (0)',
-                    'email_excerpt': '本次周期检查无币种触发阈值报警',
-                    'alert_window_start': now_utc.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                    'alert_window_end': now_utc.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                    'pending_count': 0,
-                    'source': 'monitor',
-                }
-                with open(jsonl_path, 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
-                logger.info(f"  ✓ 无告警记录已写入JSONL: {jsonl_path}")
-            except Exception as w_err:
-                logger.error(f"写入alerts.jsonl失败(无告警): {w_err}")
-            return
-        
-        # 根据配置决定是否发送邮件
-        email_sent = False
-        if send_email_enabled:
-            email_sent = notifier.send_alert(alerts)
-            if email_sent:
-                logger.info("  ✓ 邮件已发送")
+    now_utc = now_utc or datetime.now(timezone.utc)
+    now_str = now_utc.strftime('%Y-%m-%dT%H:%M:%SZ')
+    
+    if not alerts:
+        # 无告警也记录到JSONL
+        return {
+            'type': 'aggregate',
+            'ts': now_str,
+            'interval': config['kline']['interval'],
+            'symbols': [],
+            'entries': [],
+            'email_subject': '异动告警 (0)',
+            'email_excerpt': '本次周期检查无币种触发阈值报警',
+            'alert_window_start': now_str,
+            'alert_window_end': now_str,
+            'pending_count': 0,
+            'source': 'monitor',
+        }
+    
+    # 生成主题与简要摘要
+    email_subject = f"异动告警 ({len(alerts)})"
+    top_symbols = [a.symbol for a in alerts[:5]]
+    email_excerpt = f"本次聚合包含 {len(alerts)} 个币种：{', '.join(top_symbols)}"
+    # 计算窗口时间（按告警时间戳）
+    ts_list = [a.timestamp for a in alerts if a.timestamp]
+    window_start = min(ts_list) if ts_list else int(now_utc.timestamp() * 1000)
+    window_end = max(ts_list) if ts_list else int(now_utc.timestamp() * 1000)
+    # 构建entries
+    entries = []
+    for a in alerts:
+        reasons = []
+        for t in a.triggered_indicators:
+            if t == 'ENGULFING':
+                reasons.append(f'{a.engulfing_type}')
+            elif t in REASON_MAP:
+                reasons.append(REASON_MAP[t])
             else:
-                logger.error("  ✗ 邮件发送失败")
+                reasons.append(t)
+        entries.append({
+            'symbol': a.symbol,
+            'price': a.price,
+            'price_change_rate': a.price_change_rate,
+            'atr_zscore': a.atr_zscore,
+            'price_change_zscore': a.price_change_zscore,
+            'volume_zscore': a.volume_zscore,
+            'engulfing_type': a.engulfing_type,
+            'triggered_indicators': a.triggered_indicators,
+            'anomaly_level': a.anomaly_level,
+            'reasons': reasons,
+        })
+    return {
+        'type': 'aggregate',
+        'ts': now_str,
+        'interval': config['kline']['interval'],
+        'symbols': [a.symbol for a in alerts],
+        'entries': entries,
+        'email_subject': email_subject,
+        'email_excerpt': email_excerpt,
+        'alert_window_start': datetime.fromtimestamp(window_start/1000, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'alert_window_end': datetime.fromtimestamp(window_end/1000, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'pending_count': len(alerts),
+        'source': 'monitor',
+    }
+
+
+def is_email_sink_enabled(config: Dict) -> bool:
+    """邮件功能（环境变量）与告警邮件开关（config.yaml）是否同时启用"""
+    email_env_enabled = config.get('env', {}).get('email_enabled', False)
+    return email_env_enabled and config.get('alert', {}).get('send_email', True)
+
+
+def create_alert_pipeline(config: Dict, notifier: Optional[EmailNotifier] = None) -> AlertSinkPipeline:
+    """创建告警输出管道：JSONL（始终第一个） → 邮件（启用时） → 进程内事件总线
+    
+    Args:
+        config: 配置字典
+        notifier: 邮件通知器（需以 keep_alive=True 创建以复用SMTP连接）
+    
+    Returns:
+        AlertSinkPipeline
+    """
+    alert_cfg = config.get('alert', {})
+    # 使用普通监控的告警路径（规则策略使用独立的实时告警）
+    jsonl_path = config.get('agent', {}).get('alerts_jsonl_path', 'modules/data/alerts.jsonl')
+    
+    sinks = [JsonlAlertSink(jsonl_path)]
+    if notifier is not None and is_email_sink_enabled(config):
+        sinks.append(EmailAlertSink(notifier))
+    if alert_cfg.get('event_bus_enabled', True):
+        sinks.append(EventBusAlertSink())
+    
+    return AlertSinkPipeline(
+        sinks,
+        build_record=lambda alerts: build_aggregate_record(alerts, config),
+        queue_size=alert_cfg.get('sink_queue_size', 100),
+        max_retries=alert_cfg.get('sink_max_retries', 3),
+        retry_backoff=alert_cfg.get('sink_retry_backoff_seconds', 1.0),
+    )
+
+
+def create_send_alerts_callback(pipeline: AlertSinkPipeline, config: Dict):
+    """创建聚合告警发送回调（在告警调度线程中执行，只负责分发，立即返回）"""
+    def _callback(alerts: List[AnomalyResult]):
+        if is_email_sink_enabled(config):
+            email_status = '启用'
+        elif not config.get('env', {}).get('email_enabled', False):
+            email_status = '禁用(缺少SMTP配置)'
         else:
-            logger.info("  ⊘ 邮件发送已禁用（仅写入JSONL）")
-            email_sent = True  # 标记为成功，继续写入JSONL
-        
-        if email_sent:
-            # 写入JSONL（有告警）
-            try:
-                # 生成主题与简要摘要
-                email_subject = f"异动告警 ({len(alerts)})"
-                top_symbols = [a.symbol for a in alerts[:5]]
-                email_excerpt = f"本次聚合包含 {len(alerts)} 个币种：{', '.join(top_symbols)}"
-                # 计算窗口时间（按告警时间戳）
-                ts_list = [a.timestamp for a in alerts if a.timestamp]
-                window_start = min(ts_list) if ts_list else int(now_utc.timestamp() * 1000)
-                window_end = max(ts_list) if ts_list else int(now_utc.timestamp() * 1000)
-                # 构建entries
-                entries = []
-                for a in alerts:
-                    reasons = []
-                    reason_map = {
-                        'ATR': 'ATR波动超阈值',
-                        'PRICE': '价格变化超阈值',
-                        'VOLUME': '成交量异常',
-                        'BB_WIDTH': '布林带宽度异常',
-                        'BB_BREAKOUT': '布林带突破',
-                        'OI_SURGE': '持仓量激增',
-                        'OI_ZSCORE': '持仓量Z-Score异常',
-                        'MA_DEVIATION': '均线乖离异常',
-                        'RSI_OVERBOUGHT': 'RSI超买',
-                        'RSI_OVERSOLD': 'RSI超卖',
-                        'MA_BULLISH_CROSS': '均线金叉',
-                        'MA_BEARISH_CROSS': '均线死叉',
-                        'LONG_UPPER_WICK': '长上影线',
-                        'LONG_LOWER_WICK': '长下影线',
-                        'OI_DIVERGENCE': '持仓量背离',
-                        'BB_SQUEEZE': '布林带收窄',
-                    }
-                    for t in a.triggered_indicators:
-                        if t == 'ENGULFING':
-                            reasons.append(f'{a.engulfing_type}')
-                        elif t in reason_map:
-                            reasons.append(reason_map[t])
-                        else:
-                            reasons.append(t)
-                    entries.append({
-                        'symbol': a.symbol,
-                        'price': a.price,
-                        'price_change_rate': a.price_change_rate,
-                        'atr_zscore': a.atr_zscore,
-                        'price_change_zscore': a.price_change_zscore,
-                        'volume_zscore': a.volume_zscore,
-                        'engulfing_type': a.engulfing_type,
-                        'triggered_indicators': a.triggered_indicators,
-                        'anomaly_level': a.anomaly_level,
-                        'reasons': reasons,
-                    })
-                record = {
-                    'type': 'aggregate',
-                    'ts': now_utc.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                    'interval': config['kline']['interval'],
-                    'symbols': [a.symbol for a in alerts],
-                    'entries': entries,
-                    'email_subject': email_subject,
-                    'email_excerpt': email_excerpt,
-                    'alert_window_start': datetime.fromtimestamp(window_start/1000, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
-                    'alert_window_end': datetime.fromtimestamp(window_end/1000, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
-                    'pending_count': len(alerts),
-                    'source': 'monitor',
-                }
-                with open(jsonl_path, 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
-                logger.info(f"  ✓ 已写入JSONL: {jsonl_path}")
-            except Exception as w_err:
-                logger.error(f"写入alerts.jsonl失败: {w_err}")
+            email_status = '禁用(config.yaml)'
+        logger.info(f"📧 聚合告警 ({len(alerts)}个币种) [邮件发送: {email_status}] → {', '.join(pipeline.sink_names)}")
+        pipeline.publish(alerts)
     
     return _callback
\ No newline at end of file
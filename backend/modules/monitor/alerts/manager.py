@@ -1,16 +1,26 @@
 """告警管理器"""
+import queue
 import threading
 import time
 from typing import Dict, List, Optional, Callable
 from ..data.models import AnomalyResult
+from ..utils.logger import get_logger
+
+logger = get_logger('alert_manager')
+
+# 调度线程控制信号
+_STOP = object()
+_FLUSH = object()
 
 
 class AlertManager:
     """告警管理器
     
     使用防抖机制聚合同一周期内的告警：
-    - 每次添加告警后重置定时器
-    - 定时器到期（10秒内无新告警）后批量发送
+    - 告警经无锁队列（queue.SimpleQueue）投递给单个常驻调度线程，K线处理路径不持有锁
+    - 调度线程每收到告警将截止时间（monotonic）顺延 debounce_seconds
+    - 截止时间到期（期间无新告警）后批量发送，超出 max_batch_size 时按 anomaly_level 优先保留
+    - K线周期全部收盘时 flush() 立即发送，不必等待防抖到期
     """
     
     def __init__(self, config: Dict):
@@ -19,11 +29,14 @@ class AlertManager:
         self.debounce_seconds = config['alert'].get('debounce_seconds', 10)
         
         self._last_alert_time: Dict[str, float] = {}
+        # 仅由调度线程（或其停止后的调用方）访问
         self._pending_alerts: Dict[str, AnomalyResult] = {}
         self._send_callback: Optional[Callable] = None
         
-        self._debounce_timer: Optional[threading.Timer] = None
-        self._lock = threading.Lock()
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stopped = False
     
     def should_alert(self, symbol: str) -> bool:
         """判断是否应该发送告警"""
@@ -37,73 +50,113 @@ class AlertManager:
         return True
     
     def add_alert(self, result: AnomalyResult):
-        """添加告警并重置防抖定时器"""
-        with self._lock:
-            self._last_alert_time[result.symbol] = time.time()
-            self._pending_alerts[result.symbol] = result
-            self._reset_debounce_timer()
+        """添加告警（投递到调度线程，防抖截止时间由调度线程顺延）"""
+        self._last_alert_time[result.symbol] = time.time()
+        self._queue.put(result)
+        if self._thread is None:
+            self._ensure_started()
     
-    def _reset_debounce_timer(self):
-        """重置防抖定时器（需在锁内调用）"""
-        if self._debounce_timer is not None:
-            self._debounce_timer.cancel()
-        
-        self._debounce_timer = threading.Timer(
-            self.debounce_seconds, 
-            self._on_debounce_timeout
-        )
-        self._debounce_timer.daemon = True
-        self._debounce_timer.start()
+    def _ensure_started(self):
+        """首次添加告警时启动调度线程"""
+        with self._start_lock:
+            if self._thread is not None or self._stopped:
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                daemon=True,
+                name="AlertScheduler"
+            )
+            self._thread.start()
     
-    def _on_debounce_timeout(self):
-        """防抖定时器到期，触发发送"""
-        with self._lock:
-            self._debounce_timer = None
-            self._trigger_send()
+    def _run(self):
+        """调度线程：收集告警，防抖到期后批量发送"""
+        deadline: Optional[float] = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            
+            if item is _STOP:
+                return
+            if item is _FLUSH:
+                # 队列先进先出，flush 之前投递的告警均已并入待发送
+                deadline = time.monotonic()
+            elif item is not None:
+                self._pending_alerts[item.symbol] = item
+                deadline = time.monotonic() + self.debounce_seconds
+                continue
+            
+            if deadline is not None and time.monotonic() >= deadline:
+                deadline = None
+                try:
+                    self._trigger_send()
+                except Exception as e:
+                    logger.error(f"发送告警失败: {e}", exc_info=True)
+    
+    def flush(self):
+        """立即发送已投递的告警（K线周期完成时调用）"""
+        if self._thread is not None:
+            self._queue.put(_FLUSH)
     
     def set_send_callback(self, callback: Callable):
         """设置发送回调"""
         self._send_callback = callback
     
+    def _take_batch(self) -> List[AnomalyResult]:
+        """取出待发送告警（按 anomaly_level、触发项数量降序，同级保持到达顺序）"""
+        ranked = sorted(
+            self._pending_alerts.values(),
+            key=lambda a: (a.anomaly_level, len(a.triggered_indicators)),
+            reverse=True
+        )
+        self._pending_alerts.clear()
+        
+        alerts = ranked[:self.max_batch_size]
+        dropped = ranked[self.max_batch_size:]
+        if dropped:
+            details = ', '.join([f"{a.symbol}(L{a.anomaly_level}, {len(a.triggered_indicators)}项触发)" for a in dropped])
+            logger.warning(f"告警超限，丢弃 {len(dropped)} 个: {details}")
+        return alerts
+    
     def _trigger_send(self):
-        """触发发送告警（需在锁内调用）"""
+        """触发发送告警（调度线程内调用）"""
         if not self._pending_alerts:
             return
         
-        alerts = list(self._pending_alerts.values())[:self.max_batch_size]
-        
-        if len(self._pending_alerts) > self.max_batch_size:
-            from ..utils.logger import get_logger
-            logger = get_logger('alert_manager')
-            drop_count = len(self._pending_alerts) - self.max_batch_size
-            dropped = list(self._pending_alerts.values())[self.max_batch_size:]
-            details = ', '.join([f"{a.symbol}({len(a.triggered_indicators)}项触发)" for a in dropped])
-            logger.warning(f"告警超限，丢弃 {drop_count} 个: {details}")
-        
-        self._pending_alerts.clear()
+        alerts = self._take_batch()
         
         if self._send_callback:
             self._send_callback(alerts)
     
+    def _drain_queue(self):
+        """把队列中尚未被调度线程取走的告警并入待发送（调度线程停止后调用）"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP and item is not _FLUSH:
+                self._pending_alerts[item.symbol] = item
+    
     def force_send_pending(self) -> List[AnomalyResult]:
-        """强制发送所有待发送的告警"""
-        with self._lock:
-            if self._debounce_timer is not None:
-                self._debounce_timer.cancel()
-                self._debounce_timer = None
-            
-            alerts = list(self._pending_alerts.values())[:self.max_batch_size]
-            self._pending_alerts.clear()
-            return alerts
+        """强制取出所有待发送的告警（会先停止调度线程）"""
+        self.stop()
+        self._drain_queue()
+        if not self._pending_alerts:
+            return []
+        return self._take_batch()
     
     def stop(self):
-        """停止告警管理器"""
-        with self._lock:
-            if self._debounce_timer is not None:
-                self._debounce_timer.cancel()
-                self._debounce_timer = None
+        """停止告警管理器（待发送告警保留，可由 force_send_pending 取出）"""
+        with self._start_lock:
+            self._stopped = True
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout=5)
     
     def get_pending_count(self) -> int:
-        """获取待发送告警数量"""
-        with self._lock:
-            return len(self._pending_alerts)
+        """获取待发送告警数量（含尚未被调度线程取走的，按交易对合并前计数）"""
+        return len(self._pending_alerts) + self._queue.qsize()
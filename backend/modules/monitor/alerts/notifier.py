@@ -1,5 +1,6 @@
 """邮件通知器"""
 import smtplib
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import List, Dict
@@ -11,11 +12,12 @@ from ..utils.helpers import format_price, format_percentage, get_anomaly_stars,
 class EmailNotifier:
     """QQ邮箱通知器"""
     
-    def __init__(self, config: Dict):
+    def __init__(self, config: Dict, keep_alive: bool = False):
         """初始化
         
         Args:
             config: 配置字典
+            keep_alive: 是否复用SMTP连接（告警输出管道使用，需在结束时调用 close）
         """
         env = config['env']
         self.enabled = env.get('email_enabled', False)
@@ -25,6 +27,9 @@ class EmailNotifier:
         self.smtp_password = env.get('smtp_password', '')
         self.smtp_use_tls = env.get('smtp_use_tls', True)
         self.alert_email = env.get('alert_email', '')
+        self.keep_alive = keep_alive
+        self._server = None
+        self._server_lock = threading.Lock()
     
     def is_enabled(self) -> bool:
         """检查邮件功能是否启用
@@ -222,17 +227,54 @@ class EmailNotifier:
         html_part = MIMEText(html_body, 'html', 'utf-8')
         msg.attach(html_part)
         
+        if not self.keep_alive:
+            try:
+                server = self._connect()
+                server.sendmail(self.smtp_user, [self.alert_email], msg.as_string())
+                server.quit()
+                return True
+            except Exception as e:
+                raise Exception(f"SMTP发送失败: {e}")
+        
+        with self._server_lock:
+            # 复用连接：连接被服务器关闭时重连一次
+            for attempt in range(2):
+                try:
+                    if self._server is None:
+                        self._server = self._connect()
+                    self._server.sendmail(self.smtp_user, [self.alert_email], msg.as_string())
+                    return True
+                except (smtplib.SMTPServerDisconnected, OSError) as e:
+                    self._close_server()
+                    if attempt:
+                        raise Exception(f"SMTP发送失败: {e}")
+                except Exception as e:
+                    self._close_server()
+                    raise Exception(f"SMTP发送失败: {e}")
+        return False
+    
+    def _connect(self) -> smtplib.SMTP:
+        """建立已登录的SMTP连接"""
+        if self.smtp_use_tls:
+            server = smtplib.SMTP(self.smtp_host, self.smtp_port)
+            server.starttls()
+        else:
+            server = smtplib.SMTP_SSL(self.smtp_host, self.smtp_port)
+        server.login(self.smtp_user, self.smtp_password)
+        return server
+    
+    def _close_server(self):
+        """关闭复用的SMTP连接（需持有 _server_lock）"""
+        if self._server is None:
+            return
         try:
-            if self.smtp_use_tls:
-                server = smtplib.SMTP(self.smtp_host, self.smtp_port)
-                server.starttls()
-            else:
-                server = smtplib.SMTP_SSL(self.smtp_host, self.smtp_port)
-            
-            server.login(self.smtp_user, self.smtp_password)
-            server.sendmail(self.smtp_user, [self.alert_email], msg.as_string())
-            server.quit()
-            return True
-        except Exception as e:
-            raise Exception(f"SMTP发送失败: {e}")
+            self._server.quit()
+        except Exception:
+            pass
+        self._server = None
+    
+    def close(self):
+        """关闭复用的SMTP连接"""
+        with self._server_lock:
+            self._close_server()
 
@@ -0,0 +1,275 @@
+"""告警输出管道
+
+聚合告警由 AlertSinkPipeline 分发给多个相互独立的输出（sink）：
+- 每个 sink 有自己的有界队列与工作线程，失败按指数退避重试，互不阻塞
+- 分发顺序即注册顺序，JSONL 写入始终排在第一位（本地追加写，毫秒级完成），
+  邮件等网络输出的延迟或失败不会推迟 Agent 读取告警
+- 每个 sink 记录投递/失败/丢弃次数与投递延迟，见 get_metrics()
+"""
+import os
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+from ..data.models import AnomalyResult
+from ..utils.logger import get_logger
+from ..utils.metrics import get_metrics_registry
+from ..utils.serializer import dumps_line
+from .notifier import EmailNotifier
+
+logger = get_logger('alert_sinks')
+_metrics = get_metrics_registry()
+
+_STOP = object()
+
+
+class AlertSink(ABC):
+    """告警输出基类（deliver 失败时抛出异常以触发重试）"""
+
+    name = 'sink'
+
+    @abstractmethod
+    def deliver(self, alerts: List[AnomalyResult], record: Dict):
+        """投递一批告警
+
+        Args:
+            alerts: 告警列表（已按优先级排序）
+            record: 对应的 JSONL 聚合记录
+        """
+
+    def close(self):
+        """释放资源（工作线程退出时调用）"""
+
+
+class JsonlAlertSink(AlertSink):
+    """写入 alerts.jsonl（供旁路 Agent 读取）"""
+
+    name = 'jsonl'
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def deliver(self, alerts: List[AnomalyResult], record: Dict):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(dumps_line(record))
+
+
+class EmailAlertSink(AlertSink):
+    """发送告警邮件（复用 SMTP 长连接）"""
+
+    name = 'email'
+
+    def __init__(self, notifier: EmailNotifier):
+        self.notifier = notifier
+
+    def deliver(self, alerts: List[AnomalyResult], record: Dict):
+        if not alerts:
+            return
+        if not self.notifier.send_alert(alerts):
+            raise RuntimeError("邮件发送失败")
+
+    def close(self):
+        self.notifier.close()
+
+
+class AlertEventBus:
+    """进程内告警事件总线（订阅者在事件总线 sink 的工作线程中被回调）
+
+    发布者（EventBusAlertSink）在存续期间登记，订阅者据此判断同进程内是否有监控在发布告警。
+    """
+
+    def __init__(self):
+        self._subscribers: List[Callable[[Dict], None]] = []
+        self._publishers = 0
+        self._lock = threading.Lock()
+
+    def register_publisher(self):
+        """登记发布者"""
+        with self._lock:
+            self._publishers += 1
+
+    def unregister_publisher(self):
+        """注销发布者"""
+        with self._lock:
+            self._publishers = max(self._publishers - 1, 0)
+
+    def has_publishers(self) -> bool:
+        """同进程内是否有发布者"""
+        return self._publishers > 0
+
+    def subscribe(self, callback: Callable[[Dict], None]):
+        """订阅聚合告警记录"""
+        with self._lock:
+            self._subscribers = self._subscribers + [callback]
+
+    def unsubscribe(self, callback: Callable[[Dict], None]):
+        """取消订阅"""
+        with self._lock:
+            self._subscribers = [cb for cb in self._subscribers if cb is not callback]
+
+    def publish(self, record: Dict):
+        """向所有订阅者发布记录（单个订阅者异常不影响其他订阅者）"""
+        for callback in self._subscribers:
+            try:
+                callback(record)
+            except Exception as e:
+                logger.error(f"告警订阅者处理失败: {e}", exc_info=True)
+
+
+_event_bus = AlertEventBus()
+
+
+def get_alert_event_bus() -> AlertEventBus:
+    """获取进程内共享的告警事件总线"""
+    return _event_bus
+
+
+class EventBusAlertSink(AlertSink):
+    """发布到进程内事件总线"""
+
+    name = 'event_bus'
+
+    def __init__(self, bus: Optional[AlertEventBus] = None):
+        self.bus = bus or get_alert_event_bus()
+        self.bus.register_publisher()
+
+    def deliver(self, alerts: List[AnomalyResult], record: Dict):
+        self.bus.publish(record)
+
+    def close(self):
+        self.bus.unregister_publisher()
+
+
+class _SinkWorker:
+    """单个 sink 的队列、工作线程与指标"""
+
+    def __init__(self, sink: AlertSink, queue_size: int, max_retries: int, retry_backoff: float):
+        self.sink = sink
+        self.max_retries = max(int(max_retries), 0)
+        self.retry_backoff = retry_backoff
+        self._queue: queue.Queue = queue.Queue(maxsize=max(int(queue_size), 1))
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._metrics = {
+            'delivered': 0,
+            'failed': 0,
+            'dropped': 0,
+            'retries': 0,
+            'latency_ms_last': 0.0,
+            'latency_ms_max': 0.0,
+            'latency_ms_total': 0.0,
+        }
+        self._thread = threading.Thread(
+            target=self._run,
+            daemon=True,
+            name=f"AlertSink-{sink.name}"
+        )
+        self._thread.start()
+
+    def submit(self, alerts: List[AnomalyResult], record: Dict):
+        """入队（队列满时丢弃并计数）"""
+        try:
+            self._queue.put_nowait((alerts, record, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self._metrics['dropped'] += 1
+            logger.warning(f"告警输出 {self.sink.name} 队列已满，丢弃 {len(alerts)} 个告警")
+
+    def _run(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    return
+                self._deliver(*item)
+        finally:
+            try:
+                self.sink.close()
+            except Exception as e:
+                logger.warning(f"关闭告警输出 {self.sink.name} 失败: {e}")
+
+    def _deliver(self, alerts: List[AnomalyResult], record: Dict, enqueued_at: float):
+        attempt = 0
+        while True:
+            try:
+                self.sink.deliver(alerts, record)
+                break
+            except Exception as e:
+                if attempt >= self.max_retries or self._stop_event.is_set():
+                    with self._lock:
+                        self._metrics['failed'] += 1
+                    logger.error(f"告警输出 {self.sink.name} 失败（已重试{attempt}次）: {e}")
+                    return
+                delay = self.retry_backoff * (2 ** attempt)
+                attempt += 1
+                with self._lock:
+                    self._metrics['retries'] += 1
+                logger.warning(f"告警输出 {self.sink.name} 失败，{delay:.1f}秒后第{attempt}次重试: {e}")
+                self._stop_event.wait(delay)
+
+        latency = time.monotonic() - enqueued_at
+        _metrics.record(f"alert.sink.{self.sink.name}", latency)
+        latency_ms = latency * 1000
+        with self._lock:
+            m = self._metrics
+            m['delivered'] += 1
+            m['latency_ms_last'] = latency_ms
+            m['latency_ms_max'] = max(m['latency_ms_max'], latency_ms)
+            m['latency_ms_total'] += latency_ms
+
+    def stop(self, timeout: float):
+        """处理完已入队的告警后退出（超时后放弃剩余重试）"""
+        self._queue.put(_STOP)
+        self._thread.join(timeout=timeout)
+        if self._thread.is_alive():
+            self._stop_event.set()
+            self._thread.join(timeout=1)
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            m = dict(self._metrics)
+        total = m.pop('latency_ms_total')
+        m['latency_ms_avg'] = total / m['delivered'] if m['delivered'] else 0.0
+        m['queued'] = self._queue.qsize()
+        return m
+
+
+class AlertSinkPipeline:
+    """告警输出管道：按注册顺序分发到各 sink 的独立队列"""
+
+    def __init__(self, sinks: List[AlertSink], build_record: Callable[[List[AnomalyResult]], Dict],
+                 queue_size: int = 100, max_retries: int = 3, retry_backoff: float = 1.0):
+        """初始化
+
+        Args:
+            sinks: 输出列表（分发顺序）
+            build_record: 由告警列表生成 JSONL 聚合记录的函数
+            queue_size: 每个 sink 的队列容量
+            max_retries: 失败重试次数
+            retry_backoff: 首次重试等待秒数（之后指数增长）
+        """
+        self.build_record = build_record
+        self._workers = [_SinkWorker(sink, queue_size, max_retries, retry_backoff) for sink in sinks]
+
+    @property
+    def sink_names(self) -> List[str]:
+        return [w.sink.name for w in self._workers]
+
+    def publish(self, alerts: List[AnomalyResult]):
+        """分发一批告警（立即返回）"""
+        record = self.build_record(alerts)
+        for worker in self._workers:
+            worker.submit(alerts, record)
+
+    def stop(self, timeout: float = 10.0):
+        """处理完已入队的告警后停止所有 sink"""
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.stop(max(deadline - time.monotonic(), 0.1))
+
+    def get_metrics(self) -> Dict[str, Dict]:
+        """各 sink 的投递指标"""
+        return {w.sink.name: w.get_metrics() for w in self._workers}
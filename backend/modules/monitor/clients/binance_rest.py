@@ -3,11 +3,64 @@ import requests
 import time
 import hmac
 import hashlib
-from typing import List, Dict, Any, Optional
+import threading
+from typing import List, Dict, Any, Optional, Tuple
 from urllib.parse import urlencode
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from ..utils.helpers import retry_on_exception
+from ..utils.rate_limiter import RequestWeightGovernor
+from ..utils.serializer import loads
+
+# 同一进程内访问同一地址的客户端共享权重限频（交易所按IP统计）
+_governors: Dict[str, RequestWeightGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_weight_governor(base_url: str, max_weight_per_minute: int = 2400,
+                        safety_ratio: float = 0.9) -> RequestWeightGovernor:
+    """获取指定API地址的共享权重限频器
+    
+    Args:
+        base_url: API地址
+        max_weight_per_minute: 每分钟权重上限（仅首次创建时生效）
+        safety_ratio: 本地预算比例（仅首次创建时生效）
+    
+    Returns:
+        共享的 RequestWeightGovernor
+    """
+    with _governors_lock:
+        governor = _governors.get(base_url)
+        if governor is None:
+            governor = RequestWeightGovernor(max_weight_per_minute, safety_ratio)
+            _governors[base_url] = governor
+        return governor
+
+
+def _klines_weight(limit: int) -> int:
+    """klines 接口权重（随 limit 分档）"""
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+class _InFlightCall:
+    """进行中的请求（供相同请求的并发调用方等待结果）"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+    
+    def wait(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
 
 
 class BinanceRestClient:
@@ -41,10 +94,19 @@ class BinanceRestClient:
         adapter = HTTPAdapter(
             max_retries=retry_strategy,
             pool_connections=10,  # 连接池大小
-            pool_maxsize=20
+            pool_maxsize=config['api'].get('pool_maxsize', 20)
         )
         self.session.mount("https://", adapter)
         self.session.mount("http://", adapter)
+        
+        # 请求权重限频（同地址的客户端共享）与相同请求合并
+        self.governor = get_weight_governor(
+            self.base_url,
+            config['api'].get('max_weight_per_minute', 2400),
+            config['api'].get('weight_safety_ratio', 0.9),
+        )
+        self._inflight: Dict[Tuple, _InFlightCall] = {}
+        self._inflight_lock = threading.Lock()
     
     def close(self):
         """关闭 Session 连接池"""
@@ -57,6 +119,61 @@ class BinanceRestClient:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
     
+    def _observe_response(self, response: requests.Response):
+        """根据响应头校准权重用量，限频/封禁时暂停后续请求"""
+        used_weight = response.headers.get('X-MBX-USED-WEIGHT-1M')
+        if used_weight:
+            try:
+                self.governor.update_used_weight(int(used_weight))
+            except ValueError:
+                pass
+        if response.status_code in (418, 429):
+            try:
+                retry_after = float(response.headers.get('Retry-After', 60))
+            except ValueError:
+                retry_after = 60.0
+            self.governor.pause(retry_after)
+    
+    def _public_get(self, path: str, params: Optional[Dict[str, Any]] = None, weight: int = 1) -> Any:
+        """公共行情GET请求（经权重限频，相同的并发请求只发送一次）
+        
+        相同请求的并发调用方共享同一个返回对象，调用方不应修改返回值。
+        
+        Args:
+            path: 接口路径
+            params: 查询参数
+            weight: 请求权重
+        
+        Returns:
+            解析后的JSON
+        """
+        params = params or {}
+        key = (path, tuple(sorted(params.items())))
+        with self._inflight_lock:
+            call = self._inflight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _InFlightCall()
+                self._inflight[key] = call
+        
+        if not is_leader:
+            return call.wait()
+        
+        try:
+            self.governor.acquire(weight)
+            response = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+            self._observe_response(response)
+            response.raise_for_status()
+            call.result = loads(response.content)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+    
     @retry_on_exception(max_retries=5, delay=1.0, exceptions=(requests.RequestException,))
     def get_exchange_info(self) -> Dict[str, Any]:
         """获取交易所信息
@@ -64,10 +181,7 @@ class BinanceRestClient:
         Returns:
             交易所信息字典
         """
-        url = f"{self.base_url}/fapi/v1/exchangeInfo"
-        response = self.session.get(url, timeout=self.timeout)
-        response.raise_for_status()
-        return response.json()
+        return self._public_get("/fapi/v1/exchangeInfo", weight=1)
     
     @retry_on_exception(max_retries=5, delay=1.0, exceptions=(requests.RequestException,))
     def get_klines(self, symbol: str, interval: str, limit: int = 500,
@@ -103,7 +217,6 @@ class BinanceRestClient:
                 ]
             ]
         """
-        url = f"{self.base_url}/fapi/v1/klines"
         params = {
             'symbol': symbol,
             'interval': interval,
@@ -115,9 +228,7 @@ class BinanceRestClient:
         if end_time is not None:
             params['endTime'] = end_time
         
-        response = self.session.get(url, params=params, timeout=self.timeout)
-        response.raise_for_status()
-        return response.json()
+        return self._public_get("/fapi/v1/klines", params, weight=_klines_weight(params['limit']))
     
     @retry_on_exception(max_retries=5, delay=1.0, exceptions=(requests.RequestException,))
     def get_24hr_ticker(self, symbol: Optional[str] = None) -> Any:
@@ -129,14 +240,12 @@ class BinanceRestClient:
         Returns:
             24小时统计数据
         """
-        url = f"{self.base_url}/fapi/v1/ticker/24hr"
         params = {}
         if symbol:
             params['symbol'] = symbol
         
-        response = self.session.get(url, params=params, timeout=self.timeout)
-        response.raise_for_status()
-        return response.json()
+        # 不带symbol时权重为40
+        return self._public_get("/fapi/v1/ticker/24hr", params, weight=1 if symbol else 40)
     
     def get_all_usdt_perpetual_symbols(self, min_volume_24h: float = 0) -> List[str]:
         """获取所有USDT永续合约交易对
@@ -199,7 +308,6 @@ class BinanceRestClient:
             - 仅支持最近1个月的数据
             - IP限频为1000次/5min
         """
-        url = f"{self.base_url}/futures/data/openInterestHist"
         params = {
             'symbol': symbol,
             'period': period,
@@ -211,9 +319,8 @@ class BinanceRestClient:
         if end_time:
             params['endTime'] = end_time
         
-        response = self.session.get(url, params=params, timeout=self.timeout)
-        response.raise_for_status()
-        return response.json()
+        # 该接口另有独立的请求次数限频（由调用方控制），不计入权重
+        return self._public_get("/futures/data/openInterestHist", params, weight=0)
     
     def _sign_request(self, params: Dict[str, Any]) -> str:
         """生成请求签名
@@ -1,34 +1,73 @@
 """币安WebSocket客户端"""
-import json
 import time
 import threading
 from typing import List, Callable, Optional, Dict, Set
 import websocket
+from .kline_fast_parser import parse_realtime_update
 from ..utils.logger import get_logger
+from ..utils.serializer import loads, dumps, JSONDecodeError
+from ..utils.metrics import get_metrics_registry
 
 logger = get_logger('binance_ws')
+_metrics = get_metrics_registry()
+
+# 单条 SUBSCRIBE/UNSUBSCRIBE 请求最多携带的stream数量
+SUBSCRIBE_BATCH_SIZE = 200
+# 单连接入站消息限制为10条/秒，分批发送时的间隔（秒）
+SUBSCRIBE_BATCH_INTERVAL = 0.2
 
 
 class BinanceWSClient:
     """币安WebSocket客户端"""
     
-    def __init__(self, config: Dict, on_kline_callback: Callable):
+    def __init__(self, config: Dict, on_kline_callback: Callable,
+                 on_realtime_callback: Optional[Callable] = None):
         """初始化
         
         Args:
             config: 配置字典
             on_kline_callback: K线数据回调函数
+            on_realtime_callback: 未收盘K线快速回调(symbol, 开盘时间, 最低价, 收盘价)，
+                提供时未收盘更新不做完整解析、不调用 on_kline_callback
         """
         self.config = config
         self.base_url = config['websocket']['base_url']
         self.reconnect_delay = config['websocket']['reconnect_delay']
         self.max_reconnect_attempts = config['websocket']['max_reconnect_attempts']
         self.on_kline_callback = on_kline_callback
+        self.on_realtime_callback = on_realtime_callback
         
         self.ws: Optional[websocket.WebSocketApp] = None
         self.is_running = False
         self.reconnect_count = 0
         self.ws_thread: Optional[threading.Thread] = None
+        
+        # 当前订阅（动态增减后重连时按此重建URL）
+        self.symbols: Set[str] = set()
+        self.interval: str = ""
+        self._request_id = 0
+        self._send_lock = threading.Lock()
+    
+    def _stream_name(self, symbol: str) -> str:
+        return f"{symbol.lower()}@kline_{self.interval}"
+    
+    def _create_app(self) -> websocket.WebSocketApp:
+        """按当前订阅创建WebSocket应用"""
+        # 订阅集合可能被更新线程同时修改，先在锁内取快照
+        with self._send_lock:
+            symbols = sorted(self.symbols)
+        streams_str = "/".join(self._stream_name(symbol) for symbol in symbols)
+        url = f"{self.base_url}/stream?streams={streams_str}"
+        
+        return websocket.WebSocketApp(
+            url,
+            on_open=self._on_open,
+            on_message=self._on_message,
+            on_error=self._on_error,
+            on_close=self._on_close,
+            on_ping=self._on_ping,
+            on_pong=self._on_pong
+        )
     
     def connect(self, symbols: List[str], interval: str):
         """连接WebSocket
@@ -37,24 +76,14 @@ class BinanceWSClient:
             symbols: 交易对列表
             interval: K线间隔
         """
-        # 构建streams
-        streams = [f"{symbol.lower()}@kline_{interval}" for symbol in symbols]
-        streams_str = "/".join(streams)
-        
-        url = f"{self.base_url}/stream?streams={streams_str}"
+        with self._send_lock:
+            self.symbols = set(symbols)
+        self.interval = interval
         
         logger.info(f"连接WebSocket: {len(symbols)}个交易对, 间隔={interval}")
         
         # 创建WebSocket连接
-        self.ws = websocket.WebSocketApp(
-            url,
-            on_open=self._on_open,
-            on_message=self._on_message,
-            on_error=self._on_error,
-            on_close=self._on_close,
-            on_ping=self._on_ping,
-            on_pong=self._on_pong
-        )
+        self.ws = self._create_app()
         
         self.is_running = True
         self.reconnect_count = 0
@@ -74,9 +103,11 @@ class BinanceWSClient:
             except Exception as e:
                 logger.error(f"WebSocket运行错误: {e}")
             
-            # 如果还在运行状态，尝试重连
+            # 如果还在运行状态，尝试重连（按当前订阅重建URL，包含期间动态增减的交易对）
             if self.is_running:
                 self._try_reconnect()
+                if self.is_running:
+                    self.ws = self._create_app()
     
     def _try_reconnect(self):
         """尝试重连"""
@@ -92,6 +123,63 @@ class BinanceWSClient:
         logger.warning(f"WebSocket断开，{delay}秒后尝试第{self.reconnect_count}次重连...")
         time.sleep(delay)
     
+    def subscribe(self, symbols: List[str]) -> bool:
+        """在当前连接上动态订阅交易对（不重连）
+        
+        Args:
+            symbols: 交易对列表
+        
+        Returns:
+            请求是否已发送（失败时连接会重建并按新订阅生效）
+        """
+        with self._send_lock:
+            new_symbols = [s for s in symbols if s not in self.symbols]
+            self.symbols.update(new_symbols)
+        if not new_symbols:
+            return True
+        return self._send_method('SUBSCRIBE', new_symbols)
+    
+    def unsubscribe(self, symbols: List[str]) -> bool:
+        """在当前连接上动态退订交易对（不重连）
+        
+        Args:
+            symbols: 交易对列表
+        
+        Returns:
+            请求是否已发送（失败时连接会重建并按新订阅生效）
+        """
+        with self._send_lock:
+            gone = [s for s in symbols if s in self.symbols]
+            self.symbols.difference_update(gone)
+        if not gone:
+            return True
+        return self._send_method('UNSUBSCRIBE', gone)
+    
+    def _send_method(self, method: str, symbols: List[str]) -> bool:
+        """发送订阅变更请求
+        
+        连接未就绪或发送失败时主动断开，由 _run_forever 按当前订阅重连，保证最终一致。
+        """
+        params = [self._stream_name(symbol) for symbol in symbols]
+        try:
+            with self._send_lock:
+                for i in range(0, len(params), SUBSCRIBE_BATCH_SIZE):
+                    if i > 0:
+                        time.sleep(SUBSCRIBE_BATCH_INTERVAL)
+                    self._request_id += 1
+                    self.ws.send(dumps({
+                        'method': method,
+                        'params': params[i:i + SUBSCRIBE_BATCH_SIZE],
+                        'id': self._request_id,
+                    }))
+            logger.info(f"{method}: {len(symbols)}个交易对")
+            return True
+        except Exception as e:
+            logger.warning(f"{method} 发送失败，将重连以应用订阅变更: {e}")
+            if self.ws:
+                self.ws.close()
+            return False
+    
     def _on_open(self, ws):
         """连接建立回调"""
         logger.info("WebSocket连接建立成功")
@@ -100,7 +188,15 @@ class BinanceWSClient:
     def _on_message(self, ws, message):
         """消息接收回调"""
         try:
-            data = json.loads(message)
+            # 未收盘更新快速路径：只取 t/l/c，跳过完整解析
+            if self.on_realtime_callback is not None:
+                update = parse_realtime_update(message)
+                if update is not None:
+                    self.on_realtime_callback(*update)
+                    return
+            
+            with _metrics.timer('ws.parse'):
+                data = loads(message)
             
             # WebSocket返回的数据格式: {"stream": "...", "data": {...}}
             if 'stream' in data and 'data' in data:
@@ -114,8 +210,12 @@ class BinanceWSClient:
                     
                     # 调用回调函数
                     self.on_kline_callback(symbol, kline_data)
+            
+            # SUBSCRIBE/UNSUBSCRIBE 响应: {"result": null, "id": 1}
+            elif 'error' in data:
+                logger.error(f"订阅请求失败: {data}")
         
-        except json.JSONDecodeError:
+        except JSONDecodeError:
             logger.error(f"JSON解析失败: {message[:100]}")
         except Exception as e:
             logger.error(f"处理消息失败: {e}")
@@ -171,15 +271,18 @@ class BinanceWSClient:
 class MultiConnectionManager:
     """多连接管理器"""
     
-    def __init__(self, config: Dict, on_kline_callback: Callable):
+    def __init__(self, config: Dict, on_kline_callback: Callable,
+                 on_realtime_callback: Optional[Callable] = None):
         """初始化
         
         Args:
             config: 配置字典
             on_kline_callback: K线数据回调函数
+            on_realtime_callback: 未收盘K线快速回调（见 BinanceWSClient）
         """
         self.config = config
         self.on_kline_callback = on_kline_callback
+        self.on_realtime_callback = on_realtime_callback
         self.max_streams = config['websocket']['max_streams_per_connection']
         self.clients: List[BinanceWSClient] = []
         self.current_symbols: Set[str] = set()
@@ -221,7 +324,7 @@ class MultiConnectionManager:
             
             # 为每组创建一个连接
             for i, group in enumerate(symbol_groups):
-                client = BinanceWSClient(self.config, self.on_kline_callback)
+                client = BinanceWSClient(self.config, self.on_kline_callback, self.on_realtime_callback)
                 client.connect(group, interval)
                 self.clients.append(client)
                 logger.info(f"连接 {i+1}/{len(symbol_groups)}: {len(group)}个交易对")
@@ -233,11 +336,16 @@ class MultiConnectionManager:
     def update_symbols(self, added: List[str], removed: List[str]):
         """动态更新交易对订阅
         
+        通过 SUBSCRIBE/UNSUBSCRIBE 只变更受影响连接上的stream，其余交易对不受影响；
+        仅当已有连接全部达到 max_streams_per_connection 时才新建连接。
+        
         Args:
             added: 新增的交易对列表
             removed: 移除的交易对列表
         """
         with self._lock:
+            added = [s for s in added if s not in self.current_symbols]
+            removed = [s for s in removed if s in self.current_symbols]
             if not added and not removed:
                 return
             
@@ -249,19 +357,41 @@ class MultiConnectionManager:
             for symbol in removed:
                 self.current_symbols.discard(symbol)
             
-            # 简单策略：完全重建连接
-            # 注：这会有短暂中断，但保证数据一致性
-            self._rebuild_connections()
-    
-    def _rebuild_connections(self):
-        """重建所有WebSocket连接（使用 connect_all 统一逻辑）"""
-        logger.info("重建WebSocket连接...")
-        
-        # 直接调用 connect_all，它会自动清理旧连接
-        symbols = sorted(list(self.current_symbols))
-        self.connect_all(symbols, self.interval)
-        
-        logger.info(f"WebSocket重建完成: {len(symbols)}个交易对")
+            # 尚未建立过连接（connect_all 未调用）
+            if not self.interval:
+                return
+            
+            # 退订：只在所属连接上发送 UNSUBSCRIBE，连接变空时关闭
+            removed_set = set(removed)
+            for client in list(self.clients):
+                gone = sorted(s for s in client.symbols if s in removed_set)
+                if not gone:
+                    continue
+                if len(gone) == len(client.symbols):
+                    client.close()
+                    self.clients.remove(client)
+                else:
+                    client.unsubscribe(gone)
+            
+            # 订阅：优先填充已有连接的剩余容量，全部满载时才新建连接
+            pending = list(added)
+            for client in self.clients:
+                if not pending:
+                    break
+                room = self.max_streams - len(client.symbols)
+                if room <= 0:
+                    continue
+                client.subscribe(pending[:room])
+                pending = pending[room:]
+            
+            for i in range(0, len(pending), self.max_streams):
+                group = pending[i:i + self.max_streams]
+                client = BinanceWSClient(self.config, self.on_kline_callback, self.on_realtime_callback)
+                client.connect(group, self.interval)
+                self.clients.append(client)
+                logger.info(f"新建WebSocket连接: {len(group)}个交易对")
+            
+            logger.info(f"WebSocket订阅更新完成: {len(self.current_symbols)}个交易对, {len(self.clients)}个连接")
     
     def close_all(self):
         """关闭所有连接"""
@@ -393,7 +523,7 @@ class BinanceUserDataWSClient:
     def _on_message(self, ws, message):
         """消息接收回调"""
         try:
-            data = json.loads(message)
+            data = loads(message)
             event_type = data.get('e')
             
             if event_type == 'ACCOUNT_UPDATE':
@@ -405,7 +535,7 @@ class BinanceUserDataWSClient:
             else:
                 logger.debug(f"收到其他事件类型: {event_type}")
         
-        except json.JSONDecodeError:
+        except JSONDecodeError:
             logger.error(f"用户数据流 JSON 解析失败: {message[:100]}")
         except Exception as e:
             logger.error(f"用户数据流消息处理失败: {e}")
@@ -0,0 +1,49 @@
+"""K线推送快速解析
+
+币安每约250ms推送一次未收盘K线，这些更新只用于实时最低价。
+这里直接在原始消息字符串上定位 t/l/c 字段，跳过整条消息的 json.loads 与 Kline 对象构造；
+收盘K线或无法识别的消息返回 None，由调用方走完整解析。
+"""
+from typing import Optional, Tuple
+
+_KLINE_EVENT = '"e":"kline"'
+_NOT_CLOSED = '"x":false'
+
+
+def _string_field(message: str, key: str, start: int) -> str:
+    """读取 "key":"value" 形式的字符串字段"""
+    begin = message.index(key, start) + len(key)
+    return message[begin:message.index('"', begin)]
+
+
+def _number_field(message: str, key: str, start: int) -> str:
+    """读取 "key":123 形式的数值字段"""
+    begin = message.index(key, start) + len(key)
+    end = begin
+    length = len(message)
+    while end < length and message[end] not in ',}':
+        end += 1
+    return message[begin:end]
+
+
+def parse_realtime_update(message: str) -> Optional[Tuple[str, int, float, float]]:
+    """解析未收盘K线推送
+
+    Args:
+        message: WebSocket原始消息（组合流格式）
+
+    Returns:
+        (交易对, 开盘时间, 最低价, 收盘价)；收盘K线或非K线消息返回None
+    """
+    if _NOT_CLOSED not in message or _KLINE_EVENT not in message:
+        return None
+    try:
+        kline_start = message.index('"k":{')
+        return (
+            _string_field(message, '"s":"', message.index('"data":')),
+            int(_number_field(message, '"t":', kline_start)),
+            float(_string_field(message, '"l":"', kline_start)),
+            float(_string_field(message, '"c":"', kline_start)),
+        )
+    except ValueError:
+        return None
@@ -0,0 +1,216 @@
+"""K线周期收盘协调器
+
+按K线开盘时间登记处理完成的收盘交易对：订阅的交易对全部到齐、或首个收盘后超时，
+发出一个 BarCycleEvent（收盘数量、登记延迟分布、缺失交易对、异常统计），
+跳过检测的交易对（如窗口缺口未补齐）计入缺失、不参与批量检测；
+在工作线程中依次回调订阅者（跨交易对批量检测、周期汇总日志、告警立即发送）。
+周期发出后才登记的收盘作为迟到事件单独发出。
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+from ..data.models import AnomalyResult
+from ..utils.logger import get_logger
+
+logger = get_logger('bar_cycle')
+
+
+@dataclass
+class BarCycleEvent:
+    """一个K线周期的收盘事件"""
+    open_time: int
+    symbols: List[str]
+    missing: List[str]
+    complete: bool
+    late: bool
+    first_lag_ms: float
+    last_lag_ms: float
+    anomaly_count: int = 0
+    top_indicators: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def spread_ms(self) -> float:
+        """首个与最后一个收盘登记的间隔"""
+        return self.last_lag_ms - self.first_lag_ms
+
+    def add_anomalies(self, anomalies: Iterable[AnomalyResult]):
+        """计入异常（批量检测在周期事件中完成后调用）"""
+        for anomaly in anomalies:
+            self.anomaly_count += 1
+            for name in anomaly.triggered_indicators:
+                self.top_indicators[name] = self.top_indicators.get(name, 0) + 1
+
+    def to_dict(self) -> Dict:
+        """转换为字典（缺失交易对只保留前20个）"""
+        return {
+            'open_time': self.open_time,
+            'closed': len(self.symbols),
+            'missing_count': len(self.missing),
+            'missing': self.missing[:20],
+            'complete': self.complete,
+            'late': self.late,
+            'first_lag_ms': self.first_lag_ms,
+            'last_lag_ms': self.last_lag_ms,
+            'spread_ms': self.spread_ms,
+            'anomaly_count': self.anomaly_count,
+            'top_indicators': dict(self.top_indicators),
+        }
+
+
+class _Cohort:
+    """同一开盘时间的收盘登记"""
+
+    __slots__ = ('symbols', 'skipped', 'remaining', 'anomalies', 'deadline', 'late', 'first_at', 'last_at')
+
+    def __init__(self, expected: set, deadline: float, late: bool, now_ms: float):
+        self.symbols: List[str] = []
+        self.skipped: List[str] = []
+        self.remaining = expected
+        self.anomalies: List[AnomalyResult] = []
+        self.deadline = deadline
+        self.late = late
+        self.first_at = now_ms
+        self.last_at = now_ms
+
+
+class BarCycleCoordinator:
+    """K线周期收盘协调器"""
+
+    def __init__(
+        self,
+        expected_symbols: Callable[[], Iterable[str]],
+        interval_ms: int,
+        timeout_seconds: float = 2.0
+    ):
+        """初始化
+
+        Args:
+            expected_symbols: 返回当前订阅交易对的函数（每个周期首个收盘时调用一次）
+            interval_ms: K线周期毫秒数（计算登记延迟）
+            timeout_seconds: 首个交易对收盘后等待其余交易对的最长时间
+        """
+        self.expected_symbols = expected_symbols
+        self.interval_ms = interval_ms
+        self.timeout_seconds = timeout_seconds
+
+        self._subscribers: List[Callable[[BarCycleEvent], None]] = []
+        self._cohorts: Dict[int, _Cohort] = {}
+        self._ready: List[int] = []
+        self._emitted_open_time: Optional[int] = None
+        self._last_event: Optional[BarCycleEvent] = None
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, callback: Callable[[BarCycleEvent], None]):
+        """订阅周期事件（按订阅顺序在工作线程中回调，需在 start 前调用）"""
+        self._subscribers.append(callback)
+
+    def start(self):
+        """启动工作线程"""
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run,
+            daemon=True,
+            name="BarCycleCoordinator"
+        )
+        self._thread.start()
+
+    def stop(self):
+        """停止工作线程（未发出的周期立即发出）"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+
+    def add(self, symbol: str, open_time: int, anomaly: Optional[AnomalyResult] = None,
+            skipped: bool = False):
+        """登记一个处理完成的收盘交易对
+
+        Args:
+            symbol: 交易对符号
+            open_time: K线开盘时间（毫秒）
+            anomaly: 逐个检测模式下该交易对计入统计的异常
+            skipped: 本周期跳过检测（不再等待该交易对，但计入缺失、不参与批量检测）
+        """
+        now_ms = time.time() * 1000
+        with self._cond:
+            cohort = self._cohorts.get(open_time)
+            if cohort is None:
+                late = self._emitted_open_time is not None and open_time <= self._emitted_open_time
+                if late:
+                    cohort = _Cohort(set(), 0.0, True, now_ms)
+                else:
+                    cohort = _Cohort(set(self.expected_symbols()), time.monotonic() + self.timeout_seconds,
+                                     False, now_ms)
+                self._cohorts[open_time] = cohort
+            (cohort.skipped if skipped else cohort.symbols).append(symbol)
+            cohort.remaining.discard(symbol)
+            cohort.last_at = now_ms
+            if anomaly is not None:
+                cohort.anomalies.append(anomaly)
+
+            if not cohort.remaining:
+                self._ready.append(open_time)
+            self._cond.notify()
+
+    def get_last_event(self) -> Dict:
+        """最近一次发出的周期事件（未迟到的）"""
+        event = self._last_event
+        return event.to_dict() if event is not None else {}
+
+    def _build_event(self, open_time: int, cohort: _Cohort) -> BarCycleEvent:
+        close_at = open_time + self.interval_ms
+        event = BarCycleEvent(
+            open_time=open_time,
+            symbols=cohort.symbols,
+            missing=sorted(cohort.remaining.union(cohort.skipped)),
+            complete=not cohort.remaining and not cohort.skipped,
+            late=cohort.late,
+            first_lag_ms=cohort.first_at - close_at,
+            last_lag_ms=cohort.last_at - close_at,
+        )
+        event.add_anomalies(cohort.anomalies)
+        return event
+
+    def _take_due(self) -> List[BarCycleEvent]:
+        """取出已到齐或已超时的周期（需持有锁）"""
+        now = time.monotonic()
+        due = set(self._ready)
+        due.update(t for t, c in self._cohorts.items() if c.deadline <= now or not self._running)
+        self._ready.clear()
+        events = []
+        for open_time in sorted(due):
+            cohort = self._cohorts.pop(open_time, None)
+            if cohort is None:
+                continue
+            if self._emitted_open_time is None or open_time > self._emitted_open_time:
+                self._emitted_open_time = open_time
+            events.append(self._build_event(open_time, cohort))
+        return events
+
+    def _run(self):
+        """工作线程循环"""
+        while True:
+            with self._cond:
+                events = self._take_due()
+                if not events:
+                    if not self._running:
+                        return
+                    deadlines = [c.deadline for c in self._cohorts.values()]
+                    timeout = max(min(deadlines) - time.monotonic(), 0) if deadlines else None
+                    self._cond.wait(timeout)
+                    continue
+
+            for event in events:
+                if not event.late:
+                    self._last_event = event
+                for callback in self._subscribers:
+                    try:
+                        callback(event)
+                    except Exception as e:
+                        logger.error(f"处理周期事件失败 (open_time={event.open_time}, "
+                                     f"{len(event.symbols)}个交易对): {e}", exc_info=True)
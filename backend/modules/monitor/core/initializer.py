@@ -1,9 +1,10 @@
 """系统初始化器"""
 import time
-from typing import List, Dict
+from typing import List, Dict, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from ..clients.binance_rest import BinanceRestClient
 from ..data.kline_manager import KlineManager
+from ..data.kline_repository import KlineRepository
 from ..data.models import Kline
 from ..utils.logger import get_logger
 
@@ -13,20 +14,25 @@ logger = get_logger('initializer')
 class SystemInitializer:
     """系统初始化器 - 负责启动时的数据预加载"""
     
-    def __init__(self, rest_client: BinanceRestClient, kline_manager: KlineManager, config: Dict):
+    def __init__(self, rest_client: BinanceRestClient, kline_manager: KlineManager, config: Dict,
+                 repository: Optional[KlineRepository] = None):
         """初始化
         
         Args:
             rest_client: REST API客户端
             kline_manager: K线管理器
             config: 配置字典
+            repository: 本地K线仓库（提供时只通过REST补齐本地缺失的K线）
         """
         self.rest_client = rest_client
         self.kline_manager = kline_manager
         self.config = config
+        self.repository = repository
         
         self.interval = config['kline']['interval']
         self.warmup_size = config['kline']['warmup_size']
+        # 请求权重由 REST 客户端统一限频，并发数只受连接池约束
+        self.max_workers = config['kline'].get('warmup_workers', 10)
     
     def initialize_historical_data(self, symbols: List[str]) -> bool:
         """初始化历史数据（并发获取）
@@ -44,7 +50,7 @@ class SystemInitializer:
         failed_symbols = []
         
         # 使用线程池并发获取
-        max_workers = min(10, len(symbols))  # 最多10个并发
+        max_workers = max(min(self.max_workers, len(symbols)), 1)
         
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             # 提交所有任务
@@ -92,6 +98,14 @@ class SystemInitializer:
             是否成功
         """
         try:
+            if self.repository is not None:
+                klines = self.repository.get_klines(symbol, self.interval, self.warmup_size)
+                if not klines:
+                    logger.warning(f"{symbol}: 未获取到K线数据")
+                    return False
+                self.kline_manager.initialize_symbol(symbol, klines)
+                return True
+            
             # 获取历史K线
             raw_klines = self.rest_client.get_klines(
                 symbol=symbol,
@@ -119,6 +133,19 @@ class SystemInitializer:
             logger.error(f"{symbol}: 获取K线失败 - {e}")
             return False
     
+    def persist(self, symbols: List[str]):
+        """将K线管理器中的已收盘K线（含缺口补齐的K线）写入本地仓库（关闭时调用）
+        
+        Args:
+            symbols: 交易对列表
+        """
+        if self.repository is None:
+            return
+        for symbol in symbols:
+            self.repository.add(symbol, self.interval, self.kline_manager.get_klines(symbol))
+        self.repository.flush()
+        logger.info(f"已保存{len(symbols)}个交易对的K线到本地仓库")
+    
     def verify_initialization(self, symbols: List[str], min_required: int) -> bool:
         """验证初始化结果
         
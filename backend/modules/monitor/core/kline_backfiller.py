@@ -0,0 +1,116 @@
+"""K线缺口补齐
+
+断线重连或推送丢失后，K线窗口中会出现时间缺口。收盘K线处理前，
+用 REST klines（start_time/end_time）补齐缺失的K线，补齐的K线标记为 is_backfilled，
+并发请求数由信号量限制，避免重连后大量交易对同时补齐触发限频。
+"""
+import threading
+import time
+from typing import Dict, List
+
+from ..clients.binance_rest import BinanceRestClient
+from ..data.kline_manager import KlineManager
+from ..data.models import Kline
+from ..utils.helpers import interval_to_ms
+from ..utils.logger import get_logger
+
+logger = get_logger('kline_backfiller')
+
+# 单次请求最多返回的K线数量
+MAX_KLINES_PER_REQUEST = 1500
+
+
+class KlineBackfiller:
+    """K线缺口补齐服务"""
+
+    def __init__(self, rest_client: BinanceRestClient, kline_manager: KlineManager, config: Dict):
+        """初始化
+
+        Args:
+            rest_client: REST API客户端
+            kline_manager: K线管理器（需提供 interval_ms 以检测缺口）
+            config: 配置字典
+        """
+        self.rest_client = rest_client
+        self.kline_manager = kline_manager
+
+        kline_cfg = config['kline']
+        self.interval = kline_cfg['interval']
+        self.interval_ms = interval_to_ms(self.interval)
+        self.history_size = kline_cfg['history_size']
+        self._semaphore = threading.BoundedSemaphore(max(int(kline_cfg.get('backfill_max_concurrent', 4)), 1))
+
+        # 指标
+        self._metrics_lock = threading.Lock()
+        self._filled = 0
+        self._failed = 0
+        self._bars = 0
+
+    def backfill(self, symbol: str) -> bool:
+        """补齐交易对的时间缺口
+
+        只请求最新K线之前、窗口范围内缺失的部分（超出窗口的缺口无需补齐）。
+
+        Args:
+            symbol: 交易对符号
+
+        Returns:
+            窗口内是否已无缺口
+        """
+        gap_start = self.kline_manager.get_gap(symbol)
+        if gap_start is None:
+            return True
+
+        latest = self.kline_manager.get_latest_kline(symbol)
+        if latest is None:
+            return False
+
+        start_time = max(gap_start, latest.timestamp - self.history_size * self.interval_ms)
+        count = (latest.timestamp - start_time) // self.interval_ms
+        started = time.time()
+
+        with self._semaphore:
+            try:
+                raw_klines = self.rest_client.get_klines(
+                    symbol=symbol,
+                    interval=self.interval,
+                    limit=min(max(count, 1), MAX_KLINES_PER_REQUEST),
+                    start_time=start_time,
+                    end_time=latest.timestamp - 1,
+                )
+            except Exception as e:
+                raw_klines = None
+                logger.warning(f"{symbol}: 补齐K线失败 - {e}")
+
+        if not raw_klines:
+            with self._metrics_lock:
+                self._failed += 1
+            return False
+
+        klines: List[Kline] = []
+        for raw in raw_klines:
+            kline = Kline.from_rest_api(raw)
+            if kline.timestamp < latest.timestamp:
+                kline.is_backfilled = True
+                klines.append(kline)
+
+        filled = self.kline_manager.fill_gap(symbol, klines)
+        with self._metrics_lock:
+            self._bars += len(klines)
+            if filled:
+                self._filled += 1
+            else:
+                self._failed += 1
+
+        logger.info(f"{symbol}: 补齐{len(klines)}根K线（{time.time() - started:.2f}秒）"
+                    f"{'' if filled else '，仍有缺口'}")
+        return filled
+
+    def get_metrics(self) -> Dict:
+        """获取补齐统计
+
+        Returns:
+            {'filled': 补齐成功次数, 'failed': 失败次数, 'bars': 补齐K线总数}
+        """
+        with self._metrics_lock:
+            return {'filled': self._filled, 'failed': self._failed, 'bars': self._bars}
@@ -0,0 +1,176 @@
+"""K线处理队列
+
+WebSocket 接收线程只负责解析并入队，处理（指标计算、检测、告警）由工作线程池完成，
+避免处理变慢时接收线程停止读取导致连接被服务端断开。
+
+- 按交易对排队：同一交易对的消息按到达顺序、同一时刻只由一个工作线程处理
+- 未收盘更新（x=false）按交易对合并，只保留最新一条
+- 收盘K线（x=true）永不丢弃；队列超出容量时丢弃无法合并的未收盘更新
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Set
+
+from ..utils.logger import get_logger
+from ..utils.metrics import get_metrics_registry
+
+logger = get_logger('kline_queue')
+_metrics = get_metrics_registry()
+
+
+class KlineWorkQueue:
+    """按交易对合并的有界K线处理队列"""
+
+    def __init__(
+        self,
+        handler: Callable[[str, Dict], None],
+        workers: int = 4,
+        capacity: int = 10000
+    ):
+        """初始化
+
+        Args:
+            handler: 处理函数(symbol, kline_data)，在工作线程中调用
+            workers: 工作线程数
+            capacity: 队列容量（待处理消息条数）
+        """
+        self.handler = handler
+        self.workers = max(int(workers), 1)
+        self.capacity = capacity
+
+        # {symbol: deque([[kline_data, 入队时间], ...])}
+        self._pending: Dict[str, Deque[list]] = {}
+        # 有待处理消息且未被工作线程占用的交易对
+        self._ready: Deque[str] = deque()
+        self._busy: Set[str] = set()
+        self._depth = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._threads: List[threading.Thread] = []
+
+        # 指标
+        self._coalesced = 0
+        self._dropped = 0
+        self._processed = 0
+        self._last_lag = 0.0
+        self._max_lag = 0.0
+
+    def start(self):
+        """启动工作线程"""
+        self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, daemon=True, name=f"KlineWorker-{i}")
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"K线处理队列启动（工作线程: {self.workers}, 容量: {self.capacity}）")
+
+    def stop(self, timeout: float = 5.0):
+        """停止工作线程（不等待队列清空）"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads.clear()
+
+    def put(self, symbol: str, kline_data: Dict):
+        """入队（WebSocket接收线程调用，不阻塞）
+
+        Args:
+            symbol: 交易对符号
+            kline_data: WebSocket K线数据（k字段）
+        """
+        is_closed = bool(kline_data.get('x'))
+        now = time.monotonic()
+
+        with self._cond:
+            items = self._pending.get(symbol)
+
+            # 未收盘更新：与队尾同一根K线的未收盘更新合并
+            if not is_closed and items:
+                last = items[-1]
+                if not last[0].get('x') and last[0].get('t') == kline_data.get('t'):
+                    last[0] = kline_data
+                    self._coalesced += 1
+                    return
+
+            if self._depth >= self.capacity and not is_closed:
+                self._dropped += 1
+                return
+
+            if items is None:
+                items = deque()
+                self._pending[symbol] = items
+            items.append([kline_data, now])
+            self._depth += 1
+
+            if symbol not in self._busy and len(items) == 1:
+                self._ready.append(symbol)
+                self._cond.notify()
+
+    def _worker(self):
+        """工作线程循环"""
+        while True:
+            with self._cond:
+                while self._running and not self._ready:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                symbol = self._ready.popleft()
+                kline_data, enqueued_at = self._pending[symbol].popleft()
+                self._depth -= 1
+                self._busy.add(symbol)
+                lag = time.monotonic() - enqueued_at
+                self._last_lag = lag
+                if lag > self._max_lag:
+                    self._max_lag = lag
+
+            _metrics.record('queue.wait', lag)
+            try:
+                self.handler(symbol, kline_data)
+            except Exception as e:
+                logger.error(f"处理 {symbol} K线失败: {e}", exc_info=True)
+
+            with self._cond:
+                self._busy.discard(symbol)
+                self._processed += 1
+                if self._pending[symbol]:
+                    self._ready.append(symbol)
+                    self._cond.notify()
+                else:
+                    del self._pending[symbol]
+
+    def get_depth(self) -> int:
+        """当前待处理消息数"""
+        return self._depth
+
+    def get_metrics(self, reset_max: bool = False) -> Dict:
+        """获取队列深度与延迟指标
+
+        Args:
+            reset_max: 读取后是否重置最大延迟
+
+        Returns:
+            指标字典（延迟单位毫秒，为入队到开始处理的时间）
+        """
+        now = time.monotonic()
+        with self._cond:
+            oldest = min((items[0][1] for items in self._pending.values() if items), default=None)
+            closed_pending = sum(
+                1 for items in self._pending.values() for item in items if item[0].get('x')
+            )
+            metrics = {
+                'depth': self._depth,
+                'pending_symbols': len(self._pending),
+                'closed_pending': closed_pending,
+                'oldest_lag_ms': (now - oldest) * 1000 if oldest is not None else 0.0,
+                'last_lag_ms': self._last_lag * 1000,
+                'max_lag_ms': self._max_lag * 1000,
+                'processed': self._processed,
+                'coalesced': self._coalesced,
+                'dropped': self._dropped,
+            }
+            if reset_max:
+                self._max_lag = 0.0
+        return metrics
@@ -0,0 +1,201 @@
+"""持仓量预取服务
+
+在K线周期边界，用线程池为所有监控中的交易对刷新 openInterestHist，
+结果写入 OpenInterestCache，指标计算只读缓存。收盘检测不等待持仓量：缓存尚未包含本周期持仓量的
+交易对先跳过持仓量触发项，由监控主流程通过 request() 提交刷新（与预取同一线程池按提交顺序执行，
+同一交易对的在途请求合并，统一经过限频器），完成后补算持仓量指标并重新检测。
+预取跳过本周期已刷新的交易对。
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from ..clients.binance_rest import BinanceRestClient
+from ..data.oi_cache import OpenInterestCache
+from ..utils.helpers import interval_to_ms
+from ..utils.logger import get_logger
+from ..utils.rate_limiter import SlidingWindowRateLimiter
+
+logger = get_logger('oi_prefetcher')
+
+
+class OIPrefetcher:
+    """持仓量预取服务"""
+
+    def __init__(
+        self,
+        rest_client: BinanceRestClient,
+        cache: OpenInterestCache,
+        config: Dict,
+        get_symbols: Callable[[], List[str]]
+    ):
+        """初始化
+
+        Args:
+            rest_client: REST API客户端
+            cache: 持仓量共享缓存
+            config: 配置字典
+            get_symbols: 返回当前监控交易对列表的函数
+        """
+        self.rest_client = rest_client
+        self.cache = cache
+        self.get_symbols = get_symbols
+
+        oi_cfg = config.get('open_interest', {})
+        self.interval = config['kline']['interval']
+        self.interval_ms = interval_to_ms(self.interval)
+        self.history_size = oi_cfg.get('history_size', 30)
+        self.workers = oi_cfg.get('prefetch_workers', 8)
+        self.offset_seconds = oi_cfg.get('prefetch_offset_seconds', 0.0)
+        # 接口限频 1000次/5min，默认预留余量
+        self.rate_limiter = SlidingWindowRateLimiter(oi_cfg.get('rate_limit_per_5min', 900), 300)
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # 在途请求：{symbol: Future}，预取与指标计算器的请求共用
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # 指标
+        self._metrics_lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self._errors = 0
+        self._last_cycle_seconds = 0.0
+        self._last_cycle_at = 0.0
+
+    def start(self):
+        """启动预取线程（立即执行一轮，之后按周期边界刷新）"""
+        self._stop_event.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="OIPrefetch")
+        self._thread = threading.Thread(target=self._run, daemon=True, name="OIPrefetcher")
+        self._thread.start()
+        logger.info(f"启动持仓量预取（线程数: {self.workers}, 限频: {self.rate_limiter.max_requests}次/5min）")
+
+    def stop(self):
+        """停止预取"""
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _seconds_until_next_cycle(self) -> float:
+        """距下一个周期边界（加偏移）的秒数"""
+        now_ms = time.time() * 1000
+        next_boundary = (now_ms // self.interval_ms + 1) * self.interval_ms
+        return (next_boundary - now_ms) / 1000 + self.offset_seconds
+
+    def _run(self):
+        """预取线程循环"""
+        while not self._stop_event.is_set():
+            try:
+                self.refresh_all()
+            except Exception as e:
+                logger.error(f"持仓量预取失败: {e}", exc_info=True)
+            self._stop_event.wait(self._seconds_until_next_cycle())
+
+    def refresh_all(self):
+        """刷新所有监控交易对的持仓量（阻塞至本轮完成，本周期边界后已刷新的交易对跳过）"""
+        boundary_seconds = (time.time() * 1000 // self.interval_ms) * self.interval_ms / 1000
+        symbols = [
+            symbol for symbol in self.get_symbols()
+            if (self.cache.get(symbol) or {}).get('fetched_at', 0) < boundary_seconds
+        ]
+        if not symbols or self._executor is None:
+            return
+
+        started = time.monotonic()
+        futures = [self.request(symbol) for symbol in symbols]
+        ok = sum(1 for f in futures if f is not None and f.result())
+        elapsed = time.monotonic() - started
+
+        with self._metrics_lock:
+            self._last_cycle_seconds = elapsed
+            self._last_cycle_at = time.time()
+        logger.debug(f"持仓量预取完成: {ok}/{len(symbols)}个交易对, 耗时{elapsed:.1f}秒")
+
+    def request(self, symbol: str) -> Optional[Future]:
+        """提交单个交易对的持仓量获取（已有在途请求时复用）
+
+        Args:
+            symbol: 交易对符号
+
+        Returns:
+            结果为是否成功的 Future（预取未启动时返回None）
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(symbol)
+            if future is not None:
+                return future
+            if self._executor is None or self._stop_event.is_set():
+                return None
+            try:
+                future = self._executor.submit(self._fetch, symbol)
+            except RuntimeError:
+                # 线程池已关闭
+                return None
+            self._inflight[symbol] = future
+        future.add_done_callback(lambda f: self._release(symbol, f))
+        return future
+
+    def _release(self, symbol: str, future: Future):
+        with self._inflight_lock:
+            if self._inflight.get(symbol) is future:
+                del self._inflight[symbol]
+
+    def _fetch(self, symbol: str) -> bool:
+        """获取单个交易对的持仓量并写入缓存"""
+        if self._stop_event.is_set():
+            return False
+        self.rate_limiter.acquire()
+        started = time.monotonic()
+        try:
+            data = self.rest_client.get_open_interest_hist(symbol, self.interval, self.history_size)
+        except Exception as e:
+            with self._metrics_lock:
+                self._errors += 1
+            logger.warning(f"获取 {symbol} 持仓量失败: {e}")
+            return False
+
+        with self._metrics_lock:
+            self._latencies.append(time.monotonic() - started)
+        if data:
+            self.cache.set(symbol, data)
+        return True
+
+    def get_metrics(self) -> Dict:
+        """获取预取指标（数据新鲜度与请求耗时）
+
+        Returns:
+            指标字典
+        """
+        staleness = sorted(self.cache.get_staleness().values())
+        with self._metrics_lock:
+            latencies = sorted(self._latencies)
+            errors = self._errors
+            last_cycle_seconds = self._last_cycle_seconds
+            last_cycle_at = self._last_cycle_at
+
+        def percentile(values: List[float], q: float) -> float:
+            if not values:
+                return 0.0
+            return values[min(int(len(values) * q), len(values) - 1)]
+
+        interval_seconds = self.interval_ms / 1000
+        return {
+            'cached_symbols': len(staleness),
+            'staleness_max_seconds': staleness[-1] if staleness else 0.0,
+            'staleness_p50_seconds': percentile(staleness, 0.5),
+            # 超过两个周期未成功刷新的交易对数量
+            'stale_symbols': sum(1 for s in staleness if s > 2 * interval_seconds),
+            'fetch_latency_p50_ms': percentile(latencies, 0.5) * 1000,
+            'fetch_latency_p95_ms': percentile(latencies, 0.95) * 1000,
+            'fetch_latency_max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+            'fetch_errors': errors,
+            'last_cycle_seconds': last_cycle_seconds,
+            'last_cycle_at': last_cycle_at,
+            'rate_limit_usage': self.rate_limiter.get_usage(),
+        }
@@ -0,0 +1,158 @@
+"""多周期K线合成
+
+从单一 1m K线流增量合成更高周期（3m…1d）K线。高周期K线的开盘时间按周期毫秒数整除对齐
+（与币安一致，日线对齐到 UTC 0 点；周线/月线不满足，不支持）。
+
+只有从第一分钟起完整观察到的周期才会输出：启动时或断流后不完整的周期直接丢弃，
+由缺口检测与REST补齐（见 KlineBackfiller）处理，避免用残缺数据合成K线。
+"""
+from typing import Dict, List, Optional, Tuple
+
+from ..utils.helpers import interval_to_ms
+from .models import Kline
+
+
+class _Bucket:
+    """正在合成的高周期K线（只包含已收盘的分钟）"""
+
+    __slots__ = ('open_time', 'next_time', 'valid', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, open_time: int, valid: bool):
+        self.open_time = open_time
+        # 下一根应到达的基础K线开盘时间
+        self.next_time = open_time
+        self.valid = valid
+        self.open: Optional[float] = None
+        self.high = float('-inf')
+        self.low = float('inf')
+        self.close = 0.0
+        self.volume = 0.0
+
+    def fold(self, kline: Kline):
+        if self.open is None:
+            self.open = kline.open
+        self.high = max(self.high, kline.high)
+        self.low = min(self.low, kline.low)
+        self.close = kline.close
+        self.volume += kline.volume
+
+    def to_kline(self, current: Optional[Kline] = None, is_closed: bool = False) -> Kline:
+        """生成K线（current 为当前未收盘的基础K线）"""
+        if current is None:
+            return Kline(self.open_time, self.open, self.high, self.low, self.close, self.volume, is_closed)
+        return Kline(
+            self.open_time,
+            self.open if self.open is not None else current.open,
+            max(self.high, current.high),
+            min(self.low, current.low),
+            current.close,
+            self.volume + current.volume,
+            is_closed,
+        )
+
+
+class BarAggregator:
+    """从基础周期K线合成多个高周期K线
+
+    同一交易对的 update 需按时间顺序串行调用（K线处理队列保证）。
+    """
+
+    def __init__(self, intervals: List[str], base_interval: str = '1m'):
+        """初始化
+
+        Args:
+            intervals: 需要合成的周期列表（不含基础周期，基础K线由调用方直接处理）
+            base_interval: 基础周期
+        """
+        self.base_interval = base_interval
+        self.base_ms = interval_to_ms(base_interval)
+        self.intervals: Dict[str, int] = {}
+        for interval in dict.fromkeys(intervals):
+            if not self.supports(interval):
+                raise ValueError(f"不支持从 {base_interval} 合成周期: {interval}")
+            interval_ms = interval_to_ms(interval)
+            if interval_ms == self.base_ms:
+                raise ValueError(f"基础周期 {base_interval} 无需合成")
+            if interval_ms % self.base_ms:
+                raise ValueError(f"周期 {interval} 不是 {base_interval} 的整数倍")
+            self.intervals[interval] = interval_ms
+        # {(symbol, interval): _Bucket}
+        self._buckets: Dict[Tuple[str, str], _Bucket] = {}
+
+    @staticmethod
+    def supports(interval: str) -> bool:
+        """周期开盘时间是否按周期整除对齐（周线/月线不满足）"""
+        return interval[-1] in ('m', 'h') or interval == '1d'
+
+    def update(self, symbol: str, kline: Kline) -> List[Tuple[str, Kline]]:
+        """输入一根基础周期K线（收盘或未收盘）
+
+        Args:
+            symbol: 交易对符号
+            kline: 基础周期K线
+
+        Returns:
+            [(周期, K线), ...]：本次更新后各周期的当前K线，is_closed 表示该周期已收盘；
+            不完整（未从第一分钟起观察到）的周期不输出
+        """
+        results = []
+        for interval, interval_ms in self.intervals.items():
+            key = (symbol, interval)
+            open_time = kline.timestamp - kline.timestamp % interval_ms
+            bucket = self._buckets.get(key)
+            if bucket is None or bucket.open_time < open_time:
+                bucket = _Bucket(open_time, valid=kline.timestamp == open_time)
+                self._buckets[key] = bucket
+            elif bucket.open_time > open_time:
+                continue  # 迟到的旧周期数据
+
+            if not bucket.valid or kline.timestamp < bucket.next_time:
+                continue
+            if kline.timestamp > bucket.next_time:
+                # 缺失分钟，本周期作废
+                bucket.valid = False
+                continue
+
+            if not kline.is_closed:
+                results.append((interval, bucket.to_kline(kline)))
+                continue
+
+            bucket.fold(kline)
+            bucket.next_time = kline.timestamp + self.base_ms
+            if bucket.next_time == open_time + interval_ms:
+                results.append((interval, bucket.to_kline(is_closed=True)))
+                del self._buckets[key]
+            else:
+                results.append((interval, bucket.to_kline()))
+        return results
+
+    def realtime_low(self, symbol: str, interval: str, base_open_time: int, low: float) -> Optional[Tuple[int, float]]:
+        """合成周期的实时最低价（供未收盘K线快速路径使用）
+
+        Args:
+            symbol: 交易对符号
+            interval: 合成周期
+            base_open_time: 当前基础K线开盘时间
+            low: 当前基础K线最低价
+
+        Returns:
+            (合成K线开盘时间, 实时最低价)，周期不完整时返回None
+        """
+        interval_ms = self.intervals.get(interval)
+        if interval_ms is None:
+            return None
+        bucket = self._buckets.get((symbol, interval))
+        if bucket is None:
+            # 周期第一分钟尚未收盘
+            if base_open_time % interval_ms == 0:
+                return base_open_time, low
+            return None
+        if not bucket.valid or bucket.open_time != base_open_time - base_open_time % interval_ms \
+                or base_open_time != bucket.next_time:
+            return None
+        return bucket.open_time, min(bucket.low, low)
+
+    def remove_symbol(self, symbol: str):
+        """移除交易对的合成状态"""
+        for key in [k for k in self._buckets if k[0] == symbol]:
+            del self._buckets[key]
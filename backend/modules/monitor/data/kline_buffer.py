@@ -0,0 +1,225 @@
+"""列式K线环形缓冲区
+
+每个交易对预分配 float64 列（timestamp/open/high/low/close/volume/is_closed/is_backfilled），
+写入时同时写入 i 与 i+capacity 两个位置（镜像环形缓冲），
+因此任意时刻窗口内的数据在内存中都是连续的，可直接返回零拷贝视图。
+
+共享模式下所有交易对的缓冲区是同一个 (字段 × 交易对 × 2*capacity) 数组的行视图，
+便于跨交易对一次性取出 (交易对 × 历史) 矩阵。
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .models import Kline
+
+# 列字段顺序
+FIELDS = ('timestamp', 'open', 'high', 'low', 'close', 'volume', 'is_closed', 'is_backfilled')
+FIELD_INDEX: Dict[str, int] = {name: i for i, name in enumerate(FIELDS)}
+
+_TS = FIELD_INDEX['timestamp']
+
+
+def _kline_row(kline: Kline) -> tuple:
+    return (
+        float(kline.timestamp), kline.open, kline.high, kline.low,
+        kline.close, kline.volume, 1.0 if kline.is_closed else 0.0,
+        1.0 if kline.is_backfilled else 0.0,
+    )
+
+
+def _row_to_kline(row: Sequence[float]) -> Kline:
+    return Kline(
+        timestamp=int(row[0]),
+        open=row[1],
+        high=row[2],
+        low=row[3],
+        close=row[4],
+        volume=row[5],
+        is_closed=bool(row[6]),
+        is_backfilled=bool(row[7]),
+    )
+
+
+class KlineRingBuffer:
+    """单个交易对的列式环形缓冲区"""
+
+    __slots__ = ('capacity', '_data', '_pos', '_count')
+
+    def __init__(self, capacity: int, storage: Optional[np.ndarray] = None):
+        """初始化
+
+        Args:
+            capacity: 保留的K线数量
+            storage: 形状为 (len(FIELDS), 2*capacity) 的底层数组（共享模式下为大数组的视图）
+        """
+        self.capacity = capacity
+        if storage is None:
+            storage = np.zeros((len(FIELDS), 2 * capacity), dtype=np.float64)
+        self._data = storage
+        self._pos = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _write(self, slot: int, row: tuple):
+        self._data[:, slot] = row
+        self._data[:, slot + self.capacity] = row
+
+    def append(self, kline: Kline):
+        """追加一根K线（窗口已满时覆盖最旧的一根）
+
+        Args:
+            kline: K线数据
+        """
+        self._write(self._pos, _kline_row(kline))
+        self._pos = (self._pos + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def replace_last(self, kline: Kline):
+        """替换最新一根K线（同一周期的实时更新）
+
+        Args:
+            kline: K线数据
+        """
+        if self._count == 0:
+            self.append(kline)
+            return
+        self._write((self._pos - 1) % self.capacity, _kline_row(kline))
+
+    def load(self, klines: List[Kline]):
+        """批量载入历史K线（覆盖已有数据）
+
+        Args:
+            klines: 按时间升序的K线列表
+        """
+        klines = klines[-self.capacity:]
+        n = len(klines)
+        self._pos = 0
+        self._count = 0
+        if n == 0:
+            return
+        rows = np.array([_kline_row(k) for k in klines], dtype=np.float64).T
+        self._data[:, :n] = rows
+        self._data[:, self.capacity:self.capacity + n] = rows
+        self._pos = n % self.capacity
+        self._count = n
+
+    def clear(self):
+        """清空缓冲区"""
+        self._pos = 0
+        self._count = 0
+
+    def _window(self, count: Optional[int]) -> slice:
+        n = self._count if count is None else max(0, min(count, self._count))
+        # 镜像区 [capacity, 2*capacity) 与 [0, capacity) 内容一致，以 pos+capacity 为右端即连续
+        end = self._pos + self.capacity
+        return slice(end - n, end)
+
+    def view(self, field: str, count: Optional[int] = None) -> np.ndarray:
+        """获取字段的零拷贝只读连续视图（按时间升序）
+
+        视图在该交易对下一次写入前有效，需要长期持有时请自行 copy()。
+
+        Args:
+            field: 字段名（见 FIELDS）
+            count: 最近N根（None表示全部）
+
+        Returns:
+            一维 float64 视图
+        """
+        view = self._data[FIELD_INDEX[field], self._window(count)]
+        view.flags.writeable = False
+        return view
+
+    def columns(self, count: Optional[int] = None) -> np.ndarray:
+        """获取全部字段的二维只读视图，形状 (len(FIELDS), n)"""
+        view = self._data[:, self._window(count)]
+        view.flags.writeable = False
+        return view
+
+    def window_end(self) -> int:
+        """窗口在底层数组中的右端列（不含），供共享模式批量取数"""
+        return self._pos + self.capacity
+
+    def last_timestamp(self) -> Optional[int]:
+        """最新K线时间戳"""
+        if self._count == 0:
+            return None
+        return int(self._data[_TS, (self._pos - 1) % self.capacity])
+
+    def latest(self) -> Optional[Kline]:
+        """最新一根K线"""
+        if self._count == 0:
+            return None
+        return _row_to_kline(self._data[:, (self._pos - 1) % self.capacity].tolist())
+
+    def to_klines(self, count: Optional[int] = None) -> List[Kline]:
+        """物化为 Kline 列表（兼容旧接口）"""
+        cols = self.columns(count).tolist()
+        return [_row_to_kline(row) for row in zip(*cols)]
+
+
+class SharedKlineStorage:
+    """所有交易对共用的 (字段 × 行 × 2*capacity) 数组
+
+    行数不足时追加新的数据块而不是复制扩容，已分配的缓冲区视图始终有效，
+    写线程无需加锁。交易对数量不超过 rows_per_block 时所有数据位于同一个数组中。
+    """
+
+    def __init__(self, capacity: int, rows_per_block: int = 256):
+        """初始化
+
+        Args:
+            capacity: 每个交易对保留的K线数量
+            rows_per_block: 每个数据块的交易对行数
+        """
+        self.capacity = capacity
+        self.rows_per_block = max(rows_per_block, 1)
+        self.blocks: List[np.ndarray] = []
+        self._free_rows: List[int] = []
+
+    def allocate(self) -> Tuple[int, KlineRingBuffer]:
+        """分配一行并返回 (全局行号, 缓冲区)"""
+        if not self._free_rows:
+            self._add_block()
+        row = self._free_rows.pop()
+        block, local = divmod(row, self.rows_per_block)
+        return row, KlineRingBuffer(self.capacity, self.blocks[block][:, local, :])
+
+    def release(self, row: int):
+        """释放行"""
+        self._free_rows.append(row)
+
+    def _add_block(self):
+        base = len(self.blocks) * self.rows_per_block
+        self.blocks.append(
+            np.zeros((len(FIELDS), self.rows_per_block, 2 * self.capacity), dtype=np.float64)
+        )
+        self._free_rows.extend(range(base + self.rows_per_block - 1, base - 1, -1))
+
+    def gather(self, field: str, rows: List[int], ends: List[int], count: int) -> np.ndarray:
+        """一次性取出多行的最近count列，形状 (len(rows), count)
+
+        Args:
+            field: 字段名
+            rows: 全局行号列表
+            ends: 各行窗口右端列（KlineRingBuffer.window_end，需保证窗口内至少有count根）
+            count: 列数
+        """
+        field_idx = FIELD_INDEX[field]
+        rows_arr = np.asarray(rows, dtype=np.intp)
+        cols = np.asarray(ends, dtype=np.intp)[:, None] + np.arange(-count, 0, dtype=np.intp)
+        block_ids, local_rows = np.divmod(rows_arr, self.rows_per_block)
+
+        if len(self.blocks) == 1:
+            return self.blocks[0][field_idx][local_rows[:, None], cols]
+
+        result = np.empty((len(rows_arr), count), dtype=np.float64)
+        for block_id in np.unique(block_ids):
+            mask = block_ids == block_id
+            plane = self.blocks[block_id][field_idx]
+            result[mask] = plane[local_rows[mask][:, None], cols[mask]]
+        return result
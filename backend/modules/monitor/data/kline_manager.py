@@ -1,38 +1,79 @@
 """K线数据缓存管理"""
-from collections import deque
+import threading
 from typing import Dict, List, Optional
+
+import numpy as np
+
 from .models import Kline
+from .kline_buffer import KlineRingBuffer, SharedKlineStorage
 
 
 class KlineManager:
-    """K线数据管理器"""
+    """K线数据管理器
+    
+    底层为每个交易对预分配的列式环形缓冲区（见 kline_buffer），
+    get_array/get_matrix 返回 NumPy 数组，get_klines 等旧接口按需物化为 Kline 列表。
+    """
     
-    def __init__(self, history_size: int = 30):
+    def __init__(self, history_size: int = 30, shared_matrix: bool = False,
+                 rows_per_block: int = 512, interval_ms: Optional[int] = None):
         """初始化
         
         Args:
             history_size: 保留的历史K线数量
+            shared_matrix: 是否将所有交易对存放在同一个二维数组中（便于跨交易对批量计算）
+            rows_per_block: 共享模式下每个数据块的交易对行数（不足时追加数据块）
+            interval_ms: K线间隔毫秒数（提供时检测时间缺口，见 get_gap）
         """
         self.history_size = history_size
-        self._klines: Dict[str, deque] = {}
+        self.shared_matrix = shared_matrix
+        self.interval_ms = interval_ms
+        self._buffers: Dict[str, KlineRingBuffer] = {}
+        self._rows: Dict[str, int] = {}
+        self._shared: Optional[SharedKlineStorage] = (
+            SharedKlineStorage(history_size, rows_per_block) if shared_matrix else None
+        )
+        # 仅保护缓冲区的创建/释放，写入路径无锁
+        self._alloc_lock = threading.Lock()
         self._realtime_low: Dict[str, float] = {}
+        # {symbol: 第一根缺失K线的开盘时间}
+        self._gaps: Dict[str, int] = {}
+        self._realtime_ts: Dict[str, int] = {}
+    
+    def _get_buffer(self, symbol: str) -> KlineRingBuffer:
+        buffer = self._buffers.get(symbol)
+        if buffer is not None:
+            return buffer
+        with self._alloc_lock:
+            buffer = self._buffers.get(symbol)
+            if buffer is None:
+                if self._shared is not None:
+                    row, buffer = self._shared.allocate()
+                    self._rows[symbol] = row
+                else:
+                    buffer = KlineRingBuffer(self.history_size)
+                self._buffers[symbol] = buffer
+            return buffer
     
     def update(self, symbol: str, kline: Kline):
         """更新K线数据
         
+        与上一根K线的开盘时间相差超过一个周期时（如断线重连），记录时间缺口。
+        
         Args:
             symbol: 交易对符号
             kline: K线数据
         """
-        if symbol not in self._klines:
-            self._klines[symbol] = deque(maxlen=self.history_size)
-        
-        klines = self._klines[symbol]
+        buffer = self._get_buffer(symbol)
+        last_timestamp = buffer.last_timestamp()
         
-        if len(klines) > 0 and klines[-1].timestamp == kline.timestamp:
-            klines[-1] = kline
+        if last_timestamp == kline.timestamp:
+            buffer.replace_last(kline)
         else:
-            klines.append(kline)
+            if (self.interval_ms and last_timestamp is not None
+                    and kline.timestamp - last_timestamp > self.interval_ms):
+                self._gaps.setdefault(symbol, last_timestamp + self.interval_ms)
+            buffer.append(kline)
     
     def get_klines(self, symbol: str, count: Optional[int] = None) -> List[Kline]:
         """获取K线数据
@@ -44,13 +85,10 @@ class KlineManager:
         Returns:
             K线列表
         """
-        if symbol not in self._klines:
+        buffer = self._buffers.get(symbol)
+        if buffer is None:
             return []
-        
-        klines = list(self._klines[symbol])
-        if count is None:
-            return klines
-        return klines[-count:]
+        return buffer.to_klines(count)
     
     def get_latest_kline(self, symbol: str) -> Optional[Kline]:
         """获取最新的K线
@@ -61,9 +99,15 @@ class KlineManager:
         Returns:
             最新K线，如果不存在返回None
         """
-        if symbol not in self._klines or len(self._klines[symbol]) == 0:
+        buffer = self._buffers.get(symbol)
+        if buffer is None:
             return None
-        return self._klines[symbol][-1]
+        return buffer.latest()
+    
+    def get_kline_count(self, symbol: str) -> int:
+        """获取交易对已缓存的K线数量"""
+        buffer = self._buffers.get(symbol)
+        return len(buffer) if buffer is not None else 0
     
     def has_enough_data(self, symbol: str, required_count: int) -> bool:
         """检查是否有足够的数据
@@ -75,7 +119,47 @@ class KlineManager:
         Returns:
             是否有足够数据
         """
-        return symbol in self._klines and len(self._klines[symbol]) >= required_count
+        return self.get_kline_count(symbol) >= required_count
+    
+    def get_array(self, symbol: str, field: str, count: Optional[int] = None) -> np.ndarray:
+        """获取字段的零拷贝只读视图
+        
+        视图在该交易对下一次 update 前有效，需要跨更新持有时请 copy()。
+        
+        Args:
+            symbol: 交易对符号
+            field: 字段名（timestamp/open/high/low/close/volume/is_closed/is_backfilled）
+            count: 最近N根（None表示全部）
+        
+        Returns:
+            一维 float64 数组（按时间升序）
+        """
+        buffer = self._buffers.get(symbol)
+        if buffer is None:
+            return np.empty(0, dtype=np.float64)
+        return buffer.view(field, count)
+    
+    def get_matrix(self, field: str, symbols: List[str], count: int) -> np.ndarray:
+        """获取多个交易对最近count根K线的字段矩阵
+        
+        共享模式下为一次向量化取数，否则逐交易对堆叠。调用方需保证各交易对至少有count根。
+        
+        Args:
+            field: 字段名
+            symbols: 交易对列表（决定矩阵行顺序）
+            count: 每个交易对取最近N根
+        
+        Returns:
+            形状 (len(symbols), count) 的 float64 数组
+        """
+        if not symbols:
+            return np.empty((0, count), dtype=np.float64)
+        if self._shared is not None:
+            buffers = [self._buffers[s] for s in symbols]
+            rows = [self._rows[s] for s in symbols]
+            ends = [b.window_end() for b in buffers]
+            return self._shared.gather(field, rows, ends, count)
+        return np.stack([self._buffers[s].view(field, count) for s in symbols])
     
     def get_closes(self, symbol: str, count: Optional[int] = None) -> List[float]:
         """获取收盘价列表
@@ -87,8 +171,7 @@ class KlineManager:
         Returns:
             收盘价列表
         """
-        klines = self.get_klines(symbol, count)
-        return [k.close for k in klines]
+        return self.get_array(symbol, 'close', count).tolist()
     
     def get_volumes(self, symbol: str, count: Optional[int] = None) -> List[float]:
         """获取成交量列表
@@ -100,8 +183,7 @@ class KlineManager:
         Returns:
             成交量列表
         """
-        klines = self.get_klines(symbol, count)
-        return [k.volume for k in klines]
+        return self.get_array(symbol, 'volume', count).tolist()
     
     def initialize_symbol(self, symbol: str, klines: List[Kline]):
         """初始化交易对的历史数据
@@ -110,11 +192,53 @@ class KlineManager:
             symbol: 交易对符号
             klines: 历史K线列表
         """
-        self._klines[symbol] = deque(klines[-self.history_size:], maxlen=self.history_size)
+        self._get_buffer(symbol).load(klines)
+    
+    def get_gap(self, symbol: str) -> Optional[int]:
+        """获取未补齐的时间缺口
+        
+        Args:
+            symbol: 交易对符号
+        
+        Returns:
+            第一根缺失K线的开盘时间，无缺口返回None
+        """
+        return self._gaps.get(symbol)
+    
+    def fill_gap(self, symbol: str, klines: List[Kline]) -> bool:
+        """用补齐的K线填充缺口（与已有数据按时间合并，已有数据优先）
+        
+        Args:
+            symbol: 交易对符号
+            klines: 补齐的K线列表
+        
+        Returns:
+            窗口内是否已无缺口
+        """
+        buffer = self._buffers.get(symbol)
+        if buffer is None:
+            return False
+        
+        merged = {k.timestamp: k for k in klines}
+        merged.update((k.timestamp, k) for k in buffer.to_klines())
+        window = [merged[ts] for ts in sorted(merged)][-self.history_size:]
+        buffer.load(window)
+        
+        # 窗口内仍有缺口时保留第一处缺口
+        for prev, curr in zip(window, window[1:]):
+            if self.interval_ms and curr.timestamp - prev.timestamp > self.interval_ms:
+                self._gaps[symbol] = prev.timestamp + self.interval_ms
+                return False
+        self._gaps.pop(symbol, None)
+        return True
+    
+    def get_symbols(self) -> List[str]:
+        """获取已缓存的交易对列表"""
+        return list(self._buffers.keys())
     
     def get_symbol_count(self) -> int:
         """获取管理的交易对数量"""
-        return len(self._klines)
+        return len(self._buffers)
     
     def clear(self, symbol: Optional[str] = None):
         """清空数据
@@ -122,20 +246,27 @@ class KlineManager:
         Args:
             symbol: 交易对符号（None表示清空所有）
         """
-        if symbol:
-            if symbol in self._klines:
-                del self._klines[symbol]
-        else:
-            self._klines.clear()
+        with self._alloc_lock:
+            symbols = [symbol] if symbol else list(self._buffers.keys())
+            for s in symbols:
+                self._gaps.pop(s, None)
+                if self._buffers.pop(s, None) is None:
+                    continue
+                row = self._rows.pop(s, None)
+                if row is not None and self._shared is not None:
+                    self._shared.release(row)
     
-    def update_realtime_low(self, symbol: str, low: float):
+    def update_realtime_low(self, symbol: str, low: float, timestamp: Optional[int] = None):
         """更新实时K线的最低价
         
         Args:
             symbol: 交易对符号
             low: 当前K线最低价
+            timestamp: 当前K线开盘时间（提供时收盘清理只清除不晚于该K线的记录）
         """
         self._realtime_low[symbol] = low
+        if timestamp is not None:
+            self._realtime_ts[symbol] = timestamp
     
     def get_realtime_low(self, symbol: str) -> Optional[float]:
         """获取实时K线的最低价
@@ -148,11 +279,14 @@ class KlineManager:
         """
         return self._realtime_low.get(symbol)
     
-    def clear_realtime_low(self, symbol: str):
+    def clear_realtime_low(self, symbol: str, timestamp: Optional[int] = None):
         """清除实时最低价（K线收盘时调用）
         
         Args:
             symbol: 交易对符号
+            timestamp: 收盘K线开盘时间（提供时保留更晚K线的实时记录）
         """
-        if symbol in self._realtime_low:
-            del self._realtime_low[symbol]
+        if timestamp is not None and self._realtime_ts.get(symbol, timestamp) > timestamp:
+            return
+        self._realtime_low.pop(symbol, None)
+        self._realtime_ts.pop(symbol, None)
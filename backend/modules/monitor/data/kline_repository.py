@@ -0,0 +1,471 @@
+"""本地K线仓库
+
+监控、Agent工具与回测共用的多周期K线数据源：已收盘K线保存在 KlineStore（追加写文件），
+首次访问时载入内存，按 (交易对, 周期, 截止时间, 数量) 查询；本地缺失的区间才通过REST补齐并写回存储。
+监控的收盘K线与REST补齐的K线都会写入仓库，同一进程内各子系统共享同一份数据。
+
+设置 flush_interval 时新增K线先在内存排队，由后台线程按间隔批量追加到存储（关闭时 flush），
+异常退出丢失的最近K线下次启动时通过REST补齐；存储设置 max_rows 时内存数据按同样的上限裁剪。
+
+当前未收盘K线不写入存储，在内存中保留 open_ttl 秒（监控推送或REST获取），期间重复查询不再请求REST。
+"""
+import atexit
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..utils.helpers import interval_to_ms
+from ..utils.logger import get_logger
+from .kline_store import KlineStore, klines_to_rows, rows_to_klines
+from .models import Kline
+
+logger = get_logger('kline_repository')
+
+# 单次REST请求最多返回的K线数量
+MAX_KLINES_PER_REQUEST = 1500
+
+
+class _Series:
+    """单个 (交易对, 周期) 的内存数据
+
+    已收盘K线保存在预分配的缓冲区中，追加时写入空余行，容量不足时按2倍扩容（均摊O(1)）。
+    rows 为缓冲区已用部分的视图；已写入的行不会被原地修改，锁外持有的视图始终有效。
+    """
+
+    __slots__ = ('_buffer', '_size', 'checked', 'lock', 'open_kline', 'open_at')
+
+    def __init__(self, rows: np.ndarray):
+        self.rows = rows
+        # 已向REST确认过的区间（其中缺失的K线在交易所也不存在，如上线前或停机维护）
+        self.checked: List[Tuple[int, int]] = []
+        self.lock = threading.Lock()
+        # 最近一次得到的未收盘K线及其获取时间（time.monotonic()）
+        self.open_kline: Optional[Kline] = None
+        self.open_at = 0.0
+
+    @property
+    def rows(self) -> np.ndarray:
+        """(n, ROW_WIDTH)，按开盘时间升序且无重复"""
+        return self._buffer[:self._size]
+
+    @rows.setter
+    def rows(self, rows: np.ndarray):
+        self._buffer = rows
+        self._size = len(rows)
+
+    def append(self, rows: np.ndarray):
+        """在末尾追加K线（调用方持有 lock，且 rows 晚于已有数据）"""
+        size = self._size + len(rows)
+        if size > len(self._buffer):
+            buffer = np.empty((max(size, 2 * len(self._buffer), 64), self._buffer.shape[1]),
+                              dtype=self._buffer.dtype)
+            buffer[:self._size] = self._buffer[:self._size]
+            self._buffer = buffer
+        self._buffer[self._size:size] = rows
+        self._size = size
+
+
+class KlineRepository:
+    """本地K线仓库（线程安全）"""
+
+    def __init__(self, store: KlineStore, rest_client=None, flush_interval: float = 0.0,
+                 open_ttl: float = 0.0):
+        """初始化
+
+        Args:
+            store: 本地K线存储
+            rest_client: REST API客户端（None表示只读本地数据）
+            flush_interval: 批量写入存储的间隔（秒，0表示每次合并时同步写入）
+            open_ttl: 未收盘K线在内存中的有效期（秒，0表示每次查询都请求REST）
+        """
+        self.store = store
+        self.rest_client = rest_client
+        self.flush_interval = flush_interval
+        self.open_ttl = open_ttl
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        self._series_lock = threading.Lock()
+
+        self._pending: Dict[Tuple[str, str], List[np.ndarray]] = {}
+        self._pending_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    @staticmethod
+    def supports(interval: str) -> bool:
+        """周期是否可由仓库提供（开盘时间需按周期整除对齐，周线/月线不满足）"""
+        return interval[-1] in ('m', 'h') or interval == '1d'
+
+    def _get_series(self, symbol: str, interval: str) -> _Series:
+        key = (symbol, interval)
+        series = self._series.get(key)
+        if series is not None:
+            return series
+        # 读文件不持有全局锁（不阻塞其他交易对），并发首次访问时以先登记者为准
+        rows = self.store.read_rows(symbol, interval)
+        with self._series_lock:
+            return self._series.setdefault(key, _Series(rows))
+
+    def add(self, symbol: str, interval: str, klines: List[Kline]):
+        """写入已收盘K线（已存在的开盘时间保持不变，未收盘K线会被忽略）
+
+        Args:
+            symbol: 交易对符号
+            interval: K线周期
+            klines: K线列表
+        """
+        series = self._get_series(symbol, interval)
+        with series.lock:
+            self._merge(series, symbol, interval, [k for k in klines if k.is_closed])
+
+    def update_open(self, symbol: str, interval: str, kline: Kline):
+        """写入当前未收盘K线（监控的实时更新，只保留在内存）
+
+        Args:
+            symbol: 交易对符号
+            interval: K线周期
+            kline: 未收盘K线
+        """
+        if kline.is_closed or self.open_ttl <= 0:
+            return
+        series = self._get_series(symbol, interval)
+        with series.lock:
+            self._set_open(series, kline)
+
+    @staticmethod
+    def _set_open(series: _Series, kline: Kline):
+        """记录未收盘K线（调用方持有 series.lock，不回退到更早的K线）"""
+        current = series.open_kline
+        if current is None or kline.timestamp >= current.timestamp:
+            series.open_kline = kline
+            series.open_at = time.monotonic()
+
+    def _get_open(self, series: _Series, open_time: int) -> Optional[Kline]:
+        """有效期内、开盘时间为 open_time 的未收盘K线"""
+        with series.lock:
+            kline = series.open_kline
+            if (kline is None or kline.timestamp != open_time
+                    or time.monotonic() - series.open_at > self.open_ttl):
+                return None
+            return kline
+
+    def _merge(self, series: _Series, symbol: str, interval: str, klines: List[Kline]):
+        """合并到内存并追加新增部分到存储（调用方持有 series.lock）"""
+        if not klines:
+            return
+        new_rows = klines_to_rows(klines)
+        if len(new_rows) > 1:
+            new_rows = new_rows[np.unique(new_rows[:, 0], return_index=True)[1]]
+        existing = series.rows[:, 0]
+
+        if len(existing) == 0 or new_rows[0, 0] > existing[-1]:
+            # 常见情况：新收盘的K线晚于已有数据，直接追加
+            series.append(new_rows)
+        else:
+            new_rows = new_rows[~np.isin(new_rows[:, 0], existing)]
+            if len(new_rows) == 0:
+                return
+            rows = np.concatenate([series.rows, new_rows])
+            series.rows = rows[np.argsort(rows[:, 0], kind='stable')]
+        self._trim(series)
+        self._write(symbol, interval, new_rows)
+
+    def _trim(self, series: _Series):
+        """超过存储保留上限的2倍时裁剪为最近 max_rows 根（调用方持有 series.lock）"""
+        max_rows = self.store.max_rows
+        if not max_rows or len(series.rows) <= 2 * max_rows:
+            return
+        series.rows = series.rows[-max_rows:]
+        first = int(series.rows[0, 0])
+        # 裁掉部分不再视为已确认，之后请求时重新下载
+        series.checked = [(max(cs, first), ce) for cs, ce in series.checked if ce >= first]
+
+    def _write(self, symbol: str, interval: str, rows: np.ndarray):
+        """追加到存储（启用批量写入时排队，由后台线程写入）"""
+        if self.flush_interval <= 0:
+            self.store.append_rows(symbol, interval, rows)
+            return
+        with self._pending_lock:
+            self._pending.setdefault((symbol, interval), []).append(rows)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name="KlineStoreFlusher")
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """将排队的K线写入存储"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for (symbol, interval), chunks in pending.items():
+            self.store.append_rows(symbol, interval, np.concatenate(chunks))
+
+    def close(self):
+        """停止后台写入线程并写入排队的K线"""
+        self._stop_event.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+        self.flush()
+
+    def _missing_ranges(self, series: _Series, start: int, end: int, interval_ms: int) -> List[Tuple[int, int]]:
+        """本地缺失的开盘时间区间 [(起, 止), ...]（闭区间，已确认过的区间除外）"""
+        ts = series.rows[:, 0]
+        lo = np.searchsorted(ts, start, side='left')
+        hi = np.searchsorted(ts, end, side='right')
+        window = ts[lo:hi].astype(np.int64)
+
+        holes = []
+        if len(window) == 0:
+            holes.append((start, end))
+        else:
+            if window[0] > start:
+                holes.append((start, int(window[0]) - interval_ms))
+            for i in np.nonzero(np.diff(window) > interval_ms)[0]:
+                holes.append((int(window[i]) + interval_ms, int(window[i + 1]) - interval_ms))
+            if window[-1] < end:
+                holes.append((int(window[-1]) + interval_ms, end))
+
+        return [
+            (s, e) for s, e in holes
+            if not any(cs <= s and e <= ce for cs, ce in series.checked)
+        ]
+
+    @staticmethod
+    def _mark_checked(series: _Series, start: int, end: int, interval_ms: int):
+        """记录已确认区间，与相邻或重叠的区间合并（调用方持有 series.lock）"""
+        merged = []
+        for cs, ce in sorted(series.checked):
+            if cs <= end + interval_ms and start <= ce + interval_ms:
+                start, end = min(start, cs), max(end, ce)
+            else:
+                merged.append((cs, ce))
+        merged.append((start, end))
+        series.checked = merged
+
+    def _fetch(self, symbol: str, interval: str, start: int, end: int, interval_ms: int) -> List[Kline]:
+        """通过REST获取开盘时间在 [start, end] 内的K线（分批）"""
+        klines: List[Kline] = []
+        cursor = start
+        while cursor <= end:
+            limit = min((end - cursor) // interval_ms + 1, MAX_KLINES_PER_REQUEST)
+            raw = self.rest_client.get_klines(
+                symbol=symbol, interval=interval, limit=limit, start_time=cursor, end_time=end
+            )
+            if not raw:
+                break
+            batch = [Kline.from_rest_api(k) for k in raw]
+            klines.extend(batch)
+            if len(raw) < limit:
+                break
+            cursor = batch[-1].timestamp + interval_ms
+        return klines
+
+    def _ensure(self, series: _Series, symbol: str, interval: str,
+                start: int, end: int, interval_ms: int) -> Optional[Kline]:
+        """补齐 [start, end] 内本地缺失的K线（调用方不持有 series.lock）
+
+        缺失区间在锁内规划，REST请求在锁外发出（不阻塞监控写入该交易对），结果再加锁合并。
+
+        Returns:
+            区间内未收盘的K线（不写入存储），没有则为None
+        """
+        if self.rest_client is None:
+            return None
+        with series.lock:
+            holes = self._missing_ranges(series, start, end, interval_ms)
+        now_ms = int(time.time() * 1000)
+        open_kline = None
+        for hole_start, hole_end in holes:
+            fetched = self._fetch(symbol, interval, hole_start, hole_end, interval_ms)
+            closed = []
+            for kline in fetched:
+                if kline.timestamp + interval_ms <= now_ms:
+                    closed.append(kline)
+                else:
+                    kline.is_closed = False
+                    open_kline = kline
+            with series.lock:
+                self._merge(series, symbol, interval, closed)
+                # 只记录已完全收盘的区间，未来的K线仍需请求
+                checked_end = min(hole_end, (now_ms // interval_ms - 1) * interval_ms)
+                if checked_end >= hole_start:
+                    self._mark_checked(series, hole_start, checked_end, interval_ms)
+        return open_kline
+
+    def plan_pages(self, symbol: str, interval: str, start_time: int, end_time: int) -> List[Tuple[int, int]]:
+        """本地缺失的开盘时间区间，按单次REST请求上限切分为页
+
+        Args:
+            symbol: 交易对符号
+            interval: K线周期
+            start_time: 起始时间戳（毫秒）
+            end_time: 结束时间戳（毫秒）
+
+        Returns:
+            [(页起始开盘时间, 页结束开盘时间), ...]，闭区间，可分别调用 fetch_page 并发下载
+        """
+        interval_ms = interval_to_ms(interval)
+        start = -(-start_time // interval_ms) * interval_ms
+        end = end_time // interval_ms * interval_ms
+        if end < start or self.rest_client is None:
+            return []
+
+        series = self._get_series(symbol, interval)
+        with series.lock:
+            holes = self._missing_ranges(series, start, end, interval_ms)
+        page_ms = MAX_KLINES_PER_REQUEST * interval_ms
+        return [
+            (page_start, min(page_start + page_ms - interval_ms, hole_end))
+            for hole_start, hole_end in holes
+            for page_start in range(hole_start, hole_end + 1, page_ms)
+        ]
+
+    def fetch_page(self, symbol: str, interval: str, start: int, end: int) -> int:
+        """通过一次REST请求下载一页K线并立即写入仓库
+
+        请求在锁外发出，多页可并发下载；每页成功后即写入存储并记为已确认，
+        中途失败时重新 plan_pages 只会得到尚未下载的页。
+
+        Args:
+            symbol: 交易对符号
+            interval: K线周期
+            start: 页起始开盘时间（毫秒，按周期对齐）
+            end: 页结束开盘时间（毫秒，不超过 MAX_KLINES_PER_REQUEST 根）
+
+        Returns:
+            写入的已收盘K线数量
+        """
+        interval_ms = interval_to_ms(interval)
+        limit = min((end - start) // interval_ms + 1, MAX_KLINES_PER_REQUEST)
+        raw = self.rest_client.get_klines(
+            symbol=symbol, interval=interval, limit=limit, start_time=start, end_time=end
+        )
+        now_ms = int(time.time() * 1000)
+        closed = [
+            kline for kline in (Kline.from_rest_api(k) for k in raw or [])
+            if kline.timestamp + interval_ms <= now_ms
+        ]
+
+        series = self._get_series(symbol, interval)
+        with series.lock:
+            self._merge(series, symbol, interval, closed)
+            checked_end = min(end, (now_ms // interval_ms - 1) * interval_ms)
+            if checked_end >= start:
+                self._mark_checked(series, start, checked_end, interval_ms)
+        return len(closed)
+
+    def get_klines(self, symbol: str, interval: str, limit: int,
+                   end_time: Optional[int] = None, include_open: bool = False) -> List[Kline]:
+        """获取截至 end_time 已收盘的最近 limit 根K线
+
+        Args:
+            symbol: 交易对符号
+            interval: K线周期
+            limit: 返回数量
+            end_time: 截止时间戳（毫秒，收盘时间不晚于该时刻；None表示当前时间）
+            include_open: 是否附带当前未收盘K线（仅 end_time 为None时有效，占用返回数量中的一根）
+
+        Returns:
+            按时间升序的K线列表
+        """
+        if limit <= 0:
+            return []
+        interval_ms = interval_to_ms(interval)
+        include_open = include_open and end_time is None
+        end_time = int(time.time() * 1000) if end_time is None else end_time
+        last_open = (end_time // interval_ms - 1) * interval_ms
+        closed_count = limit - 1 if include_open else limit
+        first_open = last_open - (closed_count - 1) * interval_ms
+
+        series = self._get_series(symbol, interval)
+        # 未收盘K线在有效期内时直接使用，只补齐已收盘部分
+        open_kline = self._get_open(series, last_open + interval_ms) if include_open else None
+        fetch_end = last_open + interval_ms if include_open and open_kline is None else last_open
+        fetched_open = self._ensure(series, symbol, interval, min(first_open, fetch_end), fetch_end, interval_ms)
+        with series.lock:
+            if fetched_open is not None and self.open_ttl > 0:
+                self._set_open(series, fetched_open)
+            ts = series.rows[:, 0]
+            hi = np.searchsorted(ts, last_open, side='right')
+            rows = series.rows[max(hi - closed_count, 0):hi] if closed_count > 0 else series.rows[:0]
+        open_kline = open_kline or fetched_open
+
+        klines = rows_to_klines(rows)
+        if include_open and open_kline is not None:
+            klines.append(open_kline)
+        return klines
+
+    def get_range(self, symbol: str, interval: str, start_time: int, end_time: int) -> List[Kline]:
+        """获取开盘时间在 [start_time, end_time] 内的已收盘K线
+
+        Args:
+            symbol: 交易对符号
+            interval: K线周期
+            start_time: 起始时间戳（毫秒）
+            end_time: 结束时间戳（毫秒）
+
+        Returns:
+            按时间升序的K线列表
+        """
+        interval_ms = interval_to_ms(interval)
+        start = -(-start_time // interval_ms) * interval_ms
+        end = end_time // interval_ms * interval_ms
+        if end < start:
+            return []
+
+        series = self._get_series(symbol, interval)
+        self._ensure(series, symbol, interval, start, end, interval_ms)
+        with series.lock:
+            ts = series.rows[:, 0]
+            lo = np.searchsorted(ts, start, side='left')
+            hi = np.searchsorted(ts, end, side='right')
+            rows = series.rows[lo:hi]
+        return rows_to_klines(rows)
+
+
+_repository: Optional[KlineRepository] = None
+_repository_lock = threading.Lock()
+
+
+def get_kline_repository() -> Optional[KlineRepository]:
+    """获取进程内共享的K线仓库（未启用本地存储时返回None）
+
+    Returns:
+        KlineRepository 单例
+    """
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                from modules.config.settings import get_config
+
+                from ..clients.binance_rest import BinanceRestClient
+
+                config = get_config()
+                kline_cfg = config.get('kline', {})
+                if not kline_cfg.get('store_enabled') or not kline_cfg.get('store_dir'):
+                    return None
+                _repository = KlineRepository(
+                    KlineStore(kline_cfg['store_dir'], max_rows=kline_cfg.get('store_max_rows')),
+                    BinanceRestClient(config),
+                    flush_interval=kline_cfg.get('store_flush_seconds', 0.0),
+                    open_ttl=kline_cfg.get('store_open_ttl_seconds', 0.0),
+                )
+                # 进程退出前写入排队的K线
+                atexit.register(_repository.flush)
+                logger.info(f"本地K线仓库: {kline_cfg['store_dir']}")
+    return _repository
+
+
+def reset_kline_repository() -> None:
+    """重置K线仓库单例（用于配置变更或测试）"""
+    global _repository
+    with _repository_lock:
+        if _repository is not None:
+            _repository.close()
+            if _repository.rest_client is not None:
+                _repository.rest_client.close()
+        _repository = None
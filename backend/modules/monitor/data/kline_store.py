@@ -0,0 +1,166 @@
+"""本地K线存储
+
+每个 (周期, 交易对) 一个追加写的二进制文件 {base_dir}/{interval}/{symbol}.bin，
+每根K线为一行 float64（字段顺序同 kline_buffer.FIELDS），新的已收盘K线只追加写入。
+内存索引、区间查询与REST补齐见 kline_repository.KlineRepository。
+
+读取时按时间戳去重（后写入的优先）并排序，进程异常退出留下的半行会被忽略；
+设置 max_rows 时，文件行数超过 2*max_rows 后压缩为最近 max_rows 行。
+"""
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ..utils.logger import get_logger
+from .kline_buffer import FIELDS
+from .models import Kline
+
+logger = get_logger('kline_store')
+
+ROW_WIDTH = len(FIELDS)
+_ROW_BYTES = ROW_WIDTH * np.dtype(np.float64).itemsize
+
+
+def klines_to_rows(klines: List[Kline]) -> np.ndarray:
+    """K线列表转换为 (n, ROW_WIDTH) 数组"""
+    return np.array([
+        (float(k.timestamp), k.open, k.high, k.low, k.close, k.volume,
+         1.0 if k.is_closed else 0.0, 1.0 if k.is_backfilled else 0.0)
+        for k in klines
+    ], dtype=np.float64).reshape(-1, ROW_WIDTH)
+
+
+def rows_to_klines(rows: np.ndarray) -> List[Kline]:
+    """(n, ROW_WIDTH) 数组转换为K线列表"""
+    return [
+        Kline(
+            timestamp=int(row[0]), open=row[1], high=row[2], low=row[3],
+            close=row[4], volume=row[5], is_closed=bool(row[6]), is_backfilled=bool(row[7]),
+        )
+        for row in rows.tolist()
+    ]
+
+
+class KlineStore:
+    """按交易对/周期持久化的已收盘K线（线程安全）"""
+
+    def __init__(self, base_dir: str, max_rows: Optional[int] = None):
+        """初始化
+
+        Args:
+            base_dir: 存储目录
+            max_rows: 每个文件保留的K线数量（None表示不压缩；回测历史也保存在同一文件中，需覆盖最长回测区间）
+        """
+        self.base_dir = base_dir
+        self.max_rows = max(int(max_rows), 1) if max_rows else None
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.base_dir, interval, f"{symbol}.bin")
+
+    def _lock(self, path: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._locks.get(path)
+            if lock is None:
+                lock = threading.Lock()
+                self._locks[path] = lock
+            return lock
+
+    def _read_rows(self, path: str) -> np.ndarray:
+        """读取文件全部有效行（按时间戳去重、升序）"""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return np.empty((0, ROW_WIDTH), dtype=np.float64)
+        rows = np.fromfile(path, dtype=np.float64, count=(size // _ROW_BYTES) * ROW_WIDTH)
+        rows = rows.reshape(-1, ROW_WIDTH)
+        if len(rows) == 0:
+            return rows
+        # 稳定排序后每个时间戳保留最后写入的一行
+        rows = rows[np.argsort(rows[:, 0], kind='stable')]
+        ts = rows[:, 0]
+        keep = np.append(ts[1:] != ts[:-1], True)
+        return rows[keep]
+
+    def _write_rows(self, path: str, rows: np.ndarray):
+        """原子重写文件"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        rows.astype(np.float64, copy=False).tofile(tmp_path)
+        os.replace(tmp_path, path)
+
+    def append(self, symbol: str, interval: str, klines: List[Kline]):
+        """追加已收盘K线（未收盘K线会被忽略）
+
+        Args:
+            symbol: 交易对符号
+            interval: K线周期
+            klines: K线列表
+        """
+        klines = [k for k in klines if k.is_closed]
+        if klines:
+            self.append_rows(symbol, interval, klines_to_rows(klines))
+
+    def append_rows(self, symbol: str, interval: str, rows: np.ndarray):
+        """追加已收盘K线数组
+
+        Args:
+            symbol: 交易对符号
+            interval: K线周期
+            rows: (n, ROW_WIDTH) 数组
+        """
+        if len(rows) == 0:
+            return
+        path = self._path(symbol, interval)
+        with self._lock(path):
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # 截掉异常退出留下的半行，保证追加的行对齐
+                if os.path.exists(path):
+                    size = os.path.getsize(path)
+                    if size % _ROW_BYTES:
+                        os.truncate(path, size - size % _ROW_BYTES)
+                with open(path, 'ab') as f:
+                    f.write(rows.astype(np.float64, copy=False).tobytes())
+                if self.max_rows and os.path.getsize(path) > 2 * self.max_rows * _ROW_BYTES:
+                    self._write_rows(path, self._read_rows(path)[-self.max_rows:])
+            except OSError as e:
+                logger.warning(f"{symbol}: 写入K线存储失败 - {e}")
+
+    def read_rows(self, symbol: str, interval: str) -> np.ndarray:
+        """读取已存储的全部K线
+
+        Args:
+            symbol: 交易对符号
+            interval: K线周期
+
+        Returns:
+            (n, ROW_WIDTH) 数组，按开盘时间升序且无重复
+        """
+        path = self._path(symbol, interval)
+        with self._lock(path):
+            return self._read_rows(path)
+
+    def load(self, symbol: str, interval: str, limit: Optional[int] = None) -> List[Kline]:
+        """读取已存储的K线
+
+        Args:
+            symbol: 交易对符号
+            interval: K线周期
+            limit: 最近N根（None表示全部）
+
+        Returns:
+            按时间升序的K线列表
+        """
+        rows = self.read_rows(symbol, interval)
+        if limit is not None:
+            rows = rows[-limit:] if limit > 0 else rows[:0]
+        return rows_to_klines(rows)
+
+    def last_timestamp(self, symbol: str, interval: str) -> Optional[int]:
+        """最后一根已存储K线的开盘时间"""
+        rows = self.read_rows(symbol, interval)
+        return int(rows[-1, 0]) if len(rows) else None
@@ -13,6 +13,8 @@ class Kline:
     close: float
     volume: float
     is_closed: bool
+    # REST补齐的K线（断线期间缺失），不作为告警触发K线
+    is_backfilled: bool = False
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Kline':
@@ -131,3 +133,5 @@ class IndicatorValues:
     is_oi_divergence: bool = False
     oi_divergence_type: str = "无背离"
     is_oi_surge: bool = False
+    is_oi_stale: bool = False  # 持仓量未包含本K线收盘数据（沿用上一周期缓存）
+    is_backfilled: bool = False  # 最新K线由REST补齐（断线期间的历史K线，不告警）
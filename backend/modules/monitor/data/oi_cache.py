@@ -0,0 +1,61 @@
+"""持仓量数据共享缓存
+
+由 OIPrefetcher 写入、IndicatorCalculator 只读。
+"""
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class OpenInterestCache:
+    """持仓量历史数据缓存（线程安全）"""
+
+    def __init__(self):
+        # {symbol: {'data': [...], 'last_update': 数据最新时间戳(ms), 'fetched_at': 获取时间(s)}}
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def set(self, symbol: str, data: List[Dict]):
+        """写入交易对的持仓量历史（整体替换，读者拿到的始终是完整快照）
+
+        Args:
+            symbol: 交易对符号
+            data: openInterestHist 原始响应（按时间升序）
+        """
+        last_update = int(data[-1].get('timestamp', 0)) if data else 0
+        entry = {'data': data, 'last_update': last_update, 'fetched_at': time.time()}
+        with self._lock:
+            self._entries[symbol] = entry
+
+    def get(self, symbol: str) -> Optional[Dict]:
+        """读取交易对的缓存条目
+
+        Args:
+            symbol: 交易对符号
+
+        Returns:
+            缓存条目（不存在返回None）
+        """
+        return self._entries.get(symbol)
+
+    def remove(self, symbol: str):
+        """移除交易对"""
+        with self._lock:
+            self._entries.pop(symbol, None)
+
+    def get_staleness(self, now: Optional[float] = None) -> Dict[str, float]:
+        """各交易对距上次成功获取的秒数
+
+        Args:
+            now: 当前时间（秒，默认time.time()）
+
+        Returns:
+            {symbol: 秒数}
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            entries = list(self._entries.items())
+        return {symbol: now - entry['fetched_at'] for symbol, entry in entries}
+
+    def __len__(self) -> int:
+        return len(self._entries)
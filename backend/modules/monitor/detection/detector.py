@@ -4,8 +4,9 @@
 - 核心组A（波动性）+ 核心组B（突破/动量）双重确认
 - 辅助指标用于计算异常等级
 """
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 import time
+import numpy as np
 from ..data.models import IndicatorValues, AnomalyResult
 from .strategy import DetectionStrategy
 from .constants import CORE_GROUP_A, CORE_GROUP_B, STRONG_THRESHOLDS
@@ -35,6 +36,10 @@ class AnomalyDetector:
         if indicators is None:
             return None
         
+        # 补齐的K线在断线期间已收盘，告警已失去时效
+        if indicators.is_backfilled:
+            return None
+        
         is_anomaly, triggered_indicators = self.strategy.detect(indicators)
         
         if not is_anomaly:
@@ -55,6 +60,28 @@ class AnomalyDetector:
             engulfing_type=indicators.engulfing_type
         )
     
+    def detect_batch(self, batch, build_indicators: Callable[[int], IndicatorValues],
+                     oi_pending: bool = False) -> List[AnomalyResult]:
+        """批量检测异常
+        
+        先以向量化掩码筛出候选行，只为候选行构造 IndicatorValues 并走 detect 确认，
+        触发列表与异常等级与逐个检测完全一致。
+        
+        Args:
+            batch: 批量指标（BatchIndicators）
+            build_indicators: 按行号构造完整指标对象（含形态与持仓量）的回调
+            oi_pending: 持仓量指标是否尚待补充（见 DetectionStrategy.detect_batch_mask）
+        
+        Returns:
+            异常结果列表
+        """
+        results = []
+        for index in np.flatnonzero(self.strategy.detect_batch_mask(batch, oi_pending)):
+            anomaly = self.detect(build_indicators(int(index)))
+            if anomaly is not None:
+                results.append(anomaly)
+        return results
+    
     def _calculate_level(self, ind: IndicatorValues, triggered: List[str]) -> int:
         """计算异常等级（1-5星）
         
@@ -6,6 +6,7 @@
 3. 两组都满足才触发告警，辅助指标用于计算异常等级
 """
 from typing import Dict, List, Tuple
+import numpy as np
 from ..data.models import IndicatorValues
 from .constants import DEFAULT_THRESHOLDS
 
@@ -45,6 +46,36 @@ class DetectionStrategy:
         
         return True, group_a + group_b + auxiliary
     
+    def detect_batch_mask(self, batch, oi_pending: bool = False) -> np.ndarray:
+        """批量双门槛初筛（跨交易对向量化）
+        
+        持仓量指标按交易对单独获取，批量结果中没有这些字段；oi_pending 为 True 时
+        核心组B不设门槛，候选行补齐持仓量后再由 detect 逐个确认。
+        
+        Args:
+            batch: 批量指标（BatchIndicators）
+            oi_pending: 持仓量指标是否尚待补充
+        
+        Returns:
+            候选行布尔掩码
+        """
+        t = self.thresholds
+        group_a = (
+            (np.abs(batch.atr_zscore) > t['atr_zscore']).astype(np.int8)
+            + (np.abs(batch.price_change_zscore) > t['price_zscore'])
+            + (batch.volume_zscore > t['volume_zscore'])
+            + (np.abs(batch.bb_width_zscore) > t['bb_width_zscore'])
+        )
+        mask = group_a >= int(t['min_group_a'])
+        if oi_pending:
+            return mask
+        
+        group_b = (
+            (batch.is_bb_breakout_upper | batch.is_bb_breakout_lower).astype(np.int8)
+            + (np.abs(batch.ma_deviation_zscore) > t['ma_deviation_zscore'])
+        )
+        return mask & (group_b >= int(t['min_group_b']))
+    
     def _check_group_a(self, ind: IndicatorValues) -> List[str]:
         """检查核心组A：波动性指标
         
@@ -84,10 +115,11 @@ class DetectionStrategy:
         if ind.is_bb_breakout_upper or ind.is_bb_breakout_lower:
             triggered.append('BB_BREAKOUT')
         
-        if ind.is_oi_surge:
+        # 持仓量过期（未含本K线收盘数据）时不参与判定，避免重复上一周期的信号
+        if ind.is_oi_surge and not ind.is_oi_stale:
             triggered.append('OI_SURGE')
         
-        if abs(ind.oi_zscore) > self.thresholds['oi_zscore']:
+        if abs(ind.oi_zscore) > self.thresholds['oi_zscore'] and not ind.is_oi_stale:
             triggered.append('OI_ZSCORE')
         
         if abs(ind.ma_deviation_zscore) > self.thresholds['ma_deviation_zscore']:
@@ -123,7 +155,7 @@ class DetectionStrategy:
         if ind.is_long_lower_wick:
             triggered.append('LONG_LOWER_WICK')
         
-        if ind.is_oi_divergence:
+        if ind.is_oi_divergence and not ind.is_oi_stale:
             triggered.append('OI_DIVERGENCE')
         
         if ind.is_bb_squeeze:
@@ -1,18 +1,41 @@
-"""Z-Score计算"""
+"""Z-Score计算
+
+三种口径（detection.zscore_method）：
+- standard：均值/标准差
+- ewma：指数加权均值/方差（span 默认为历史长度），对近期变化更敏感
+- robust：中位数/MAD 修正Z-Score，对成交量等厚尾分布不易被极端值拉偏
+
+EwmaStats / RollingMedianMAD 为流式估计器，启用增量指标引擎时按交易对、按指标维护
+（均值/方差的滑动窗口见 indicators.incremental.RollingStats）。
+单值函数形式每次按完整历史重算，用于全量计算（默认）：窗口滑动时 Wilder/EMA 重新播种，
+ATR/RSI/均线乖离的整段历史随之改变，无法流式更新；*_rows 形式供跨交易对批量检测使用。
+"""
+import math
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Deque, List, Sequence, Tuple, Optional
+
 import numpy as np
-from typing import List, Tuple, Optional
 
+ZSCORE_METHODS = ('standard', 'ewma', 'robust')
+
+# 修正Z-Score系数（正态分布下 MAD ≈ 0.6745σ）
+MAD_SCALE = 0.6745
 
-def calculate_mean_std(values: List[float]) -> Tuple[float, float]:
+# 标准差相对阈值：低于该值视为0（避免递推残差放大Z-Score）
+_STD_EPSILON = 1e-12
+
+
+def calculate_mean_std(values: Sequence[float]) -> Tuple[float, float]:
     """计算均值和标准差
     
     Args:
-        values: 数值列表
-        
+        values: 数值列表或NumPy数组
+    
     Returns:
         (均值, 标准差)
     """
-    if not values:
+    if len(values) == 0:
         return 0.0, 0.0
     
     mean = float(np.mean(values))
@@ -20,19 +43,19 @@ def calculate_mean_std(values: List[float]) -> Tuple[float, float]:
     return mean, std
 
 
-def calculate_zscore(value: float, historical_values: List[float]) -> float:
+def calculate_zscore(value: float, historical_values: Sequence[float]) -> float:
     """计算Z-Score
     
     Z-Score = (当前值 - 均值) / 标准差
     
     Args:
         value: 当前值
-        historical_values: 历史值列表
-        
+        historical_values: 历史值列表或NumPy数组
+    
     Returns:
         Z-Score值
     """
-    if not historical_values:
+    if len(historical_values) == 0:
         return 0.0
     
     mean, std = calculate_mean_std(historical_values)
@@ -45,6 +68,39 @@ def calculate_zscore(value: float, historical_values: List[float]) -> float:
     return float(zscore)
 
 
+def calculate_zscore_rows(values: np.ndarray, historical: np.ndarray) -> np.ndarray:
+    """按行批量计算Z-Score（跨交易对向量化）
+    
+    历史矩阵中的 NaN 视为缺失值；标准差为0或无有效历史的行返回0。
+    
+    Args:
+        values: 当前值，形状 (N,)
+        historical: 历史值矩阵，形状 (N, M)
+    
+    Returns:
+        Z-Score数组，形状 (N,)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    historical = np.asarray(historical, dtype=np.float64)
+    if historical.shape[1] == 0:
+        return np.zeros_like(values)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if np.isnan(historical).any():
+            valid = ~np.isnan(historical)
+            counts = valid.sum(axis=1)
+            filled = np.where(valid, historical, 0.0)
+            mean = filled.sum(axis=1) / counts
+            var = np.where(valid, (historical - mean[:, None]) ** 2, 0.0).sum(axis=1) / counts
+            std = np.sqrt(var)
+        else:
+            mean = historical.mean(axis=1)
+            std = historical.std(axis=1)
+        zscores = (values - mean) / std
+    
+    return np.where((std > 0) & np.isfinite(zscores), zscores, 0.0)
+
+
 def is_outlier(zscore: float, threshold: float = 2.0) -> bool:
     """判断是否为异常值
     
@@ -58,25 +114,323 @@ def is_outlier(zscore: float, threshold: float = 2.0) -> bool:
     return abs(zscore) > threshold
 
 
-def calculate_modified_zscore(value: float, historical_values: List[float]) -> float:
+def calculate_modified_zscore(value: float, historical_values: Sequence[float]) -> float:
     """计算修正Z-Score（基于中位数，更robust）
     
     Args:
         value: 当前值
-        historical_values: 历史值列表
-        
+        historical_values: 历史值列表或NumPy数组
+    
     Returns:
         修正Z-Score值
     """
-    if not historical_values:
+    if len(historical_values) == 0:
         return 0.0
     
-    median = float(np.median(historical_values))
-    mad = float(np.median([abs(v - median) for v in historical_values]))
+    values = np.asarray(historical_values, dtype=np.float64)
+    median = float(np.median(values))
+    mad = float(np.median(np.abs(values - median)))
     
     if mad == 0:
         return 0.0
     
-    modified_zscore = 0.6745 * (value - median) / mad
+    modified_zscore = MAD_SCALE * (value - median) / mad
     return float(modified_zscore)
 
+
+def _ewma_alpha(span: float) -> float:
+    return 2.0 / (max(span, 1.0) + 1.0)
+
+
+def calculate_ewma_zscore(value: float, historical_values: Sequence[float],
+                          span: Optional[float] = None) -> float:
+    """计算指数加权Z-Score（按时间顺序递推历史的EWMA均值/方差）
+    
+    Args:
+        value: 当前值
+        historical_values: 历史值（按时间升序）
+        span: 加权跨度（默认为历史长度）
+    
+    Returns:
+        Z-Score值
+    """
+    n = len(historical_values)
+    if n == 0:
+        return 0.0
+    
+    stats = EwmaStats(span if span is not None else n)
+    for v in historical_values:
+        stats.push(float(v))
+    return stats.zscore(value)
+
+
+def calculate_zscore_by_method(value: float, historical_values: Sequence[float],
+                               method: str = 'standard') -> float:
+    """按口径计算Z-Score（完整历史重算，增量引擎使用对应的流式估计器）
+    
+    Args:
+        value: 当前值
+        historical_values: 历史值（按时间升序）
+        method: standard / ewma / robust
+    
+    Returns:
+        Z-Score值
+    """
+    if method == 'robust':
+        return calculate_modified_zscore(value, historical_values)
+    if method == 'ewma':
+        return calculate_ewma_zscore(value, historical_values)
+    return calculate_zscore(value, historical_values)
+
+
+def calculate_modified_zscore_rows(values: np.ndarray, historical: np.ndarray) -> np.ndarray:
+    """按行批量计算修正Z-Score（NaN 视为缺失值）
+    
+    Args:
+        values: 当前值，形状 (N,)
+        historical: 历史值矩阵，形状 (N, M)
+    
+    Returns:
+        修正Z-Score数组，形状 (N,)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    historical = np.asarray(historical, dtype=np.float64)
+    if historical.shape[1] == 0:
+        return np.zeros_like(values)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if np.isnan(historical).any():
+            valid_rows = ~np.isnan(historical).all(axis=1)
+            median = np.full(len(values), np.nan)
+            mad = np.full(len(values), np.nan)
+            rows = historical[valid_rows]
+            median[valid_rows] = np.nanmedian(rows, axis=1)
+            mad[valid_rows] = np.nanmedian(np.abs(rows - median[valid_rows, None]), axis=1)
+        else:
+            median = np.median(historical, axis=1)
+            mad = np.median(np.abs(historical - median[:, None]), axis=1)
+        zscores = MAD_SCALE * (values - median) / mad
+    
+    return np.where((mad > 0) & np.isfinite(zscores), zscores, 0.0)
+
+
+def calculate_ewma_zscore_rows(values: np.ndarray, historical: np.ndarray) -> np.ndarray:
+    """按行批量计算指数加权Z-Score（span 为每行有效历史长度，NaN 跳过）
+    
+    Args:
+        values: 当前值，形状 (N,)
+        historical: 历史值矩阵，形状 (N, M)，按时间升序
+    
+    Returns:
+        Z-Score数组，形状 (N,)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    historical = np.asarray(historical, dtype=np.float64)
+    if historical.shape[1] == 0:
+        return np.zeros_like(values)
+    
+    valid = ~np.isnan(historical)
+    alpha = 2.0 / (np.maximum(valid.sum(axis=1), 1) + 1.0)
+    mean = np.full(len(values), np.nan)
+    var = np.zeros(len(values))
+    for column, column_valid in zip(historical.T, valid.T):
+        seed = column_valid & np.isnan(mean)
+        mean[seed] = column[seed]
+        step = column_valid & ~seed
+        diff = np.where(step, column - mean, 0.0)
+        incr = alpha * diff
+        mean = np.where(step, mean + incr, mean)
+        var = np.where(step, (1.0 - alpha) * (var + diff * incr), var)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.sqrt(np.maximum(var, 0.0))
+        std = np.where(std > _STD_EPSILON * np.maximum(np.abs(mean), 1.0), std, 0.0)
+        zscores = (values - mean) / std
+    return np.where((std > 0) & np.isfinite(zscores), zscores, 0.0)
+
+
+def calculate_zscore_rows_by_method(values: np.ndarray, historical: np.ndarray,
+                                    method: str = 'standard') -> np.ndarray:
+    """按口径批量计算Z-Score
+    
+    Args:
+        values: 当前值，形状 (N,)
+        historical: 历史值矩阵，形状 (N, M)
+        method: standard / ewma / robust
+    
+    Returns:
+        Z-Score数组，形状 (N,)
+    """
+    if method == 'robust':
+        return calculate_modified_zscore_rows(values, historical)
+    if method == 'ewma':
+        return calculate_ewma_zscore_rows(values, historical)
+    return calculate_zscore_rows(values, historical)
+
+
+class EwmaStats:
+    """指数加权均值/方差（O(1) 更新，无需保留历史）
+    
+    首个值作为初始均值，之后按 mean += α·Δ、var = (1-α)(var + Δ·αΔ) 递推，
+    与 calculate_ewma_zscore 对同一序列的结果一致。
+    """
+    
+    __slots__ = ('alpha', '_count', '_mean', '_var')
+    
+    def __init__(self, span: float):
+        """初始化
+        
+        Args:
+            span: 加权跨度（α = 2/(span+1)）
+        """
+        self.alpha = _ewma_alpha(span)
+        self._count = 0
+        self._mean = 0.0
+        self._var = 0.0
+    
+    def push(self, value: float):
+        """追加一个值"""
+        if self._count == 0:
+            self._mean = value
+            self._var = 0.0
+        else:
+            diff = value - self._mean
+            incr = self.alpha * diff
+            self._mean += incr
+            self._var = (1.0 - self.alpha) * (self._var + diff * incr)
+        self._count += 1
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    @property
+    def mean(self) -> float:
+        """加权均值"""
+        return self._mean
+    
+    @property
+    def std(self) -> float:
+        """加权标准差"""
+        if self._var <= 0:
+            return 0.0
+        std = math.sqrt(self._var)
+        if std <= _STD_EPSILON * max(abs(self._mean), 1.0):
+            return 0.0
+        return std
+    
+    def zscore(self, value: float) -> float:
+        """计算value相对当前估计的Z-Score（无数据或标准差为0时返回0）"""
+        if self._count == 0:
+            return 0.0
+        std = self.std
+        if std == 0:
+            return 0.0
+        return float((value - self._mean) / std)
+    
+    def clear(self):
+        """清空状态"""
+        self._count = 0
+        self._mean = 0.0
+        self._var = 0.0
+
+
+class RollingMedianMAD:
+    """定长滑动窗口的中位数/MAD（修正Z-Score）
+    
+    有序数组增删为二分查找 + 小块内存移动；MAD 为两段有序偏差序列（中位数左侧、右侧）
+    合并后的中位数，用二分选择第k小，O(log n) 得出，结果与 np.median 口径一致。
+    """
+    
+    __slots__ = ('size', '_values', '_sorted')
+    
+    def __init__(self, size: int):
+        """初始化
+        
+        Args:
+            size: 窗口大小（<=0 表示不保留任何值）
+        """
+        self.size = max(int(size), 0)
+        self._values: Deque[float] = deque()
+        self._sorted: List[float] = []
+    
+    def push(self, value: float):
+        """追加一个值，窗口已满时淘汰最旧的值"""
+        if self.size == 0:
+            return
+        if len(self._values) == self.size:
+            old = self._values.popleft()
+            del self._sorted[bisect_left(self._sorted, old)]
+        self._values.append(value)
+        insort(self._sorted, value)
+    
+    def __len__(self) -> int:
+        return len(self._values)
+    
+    @property
+    def median(self) -> float:
+        """窗口中位数"""
+        s = self._sorted
+        n = len(s)
+        if n == 0:
+            return 0.0
+        mid = n // 2
+        if n % 2:
+            return s[mid]
+        return (s[mid - 1] + s[mid]) / 2.0
+    
+    def _kth_deviation(self, k: int, median: float, split: int) -> float:
+        """|x - median| 中第k小（0起）的值"""
+        s = self._sorted
+        left_len = split
+        right_len = len(s) - split
+        
+        def left(i: int) -> float:
+            return median - s[split - 1 - i]
+        
+        def right(j: int) -> float:
+            return s[split + j] - median
+        
+        lo = max(0, k + 1 - right_len)
+        hi = min(k + 1, left_len)
+        while lo <= hi:
+            i = (lo + hi) // 2
+            j = k + 1 - i
+            left_max = left(i - 1) if i > 0 else float('-inf')
+            left_next = left(i) if i < left_len else float('inf')
+            right_max = right(j - 1) if j > 0 else float('-inf')
+            right_next = right(j) if j < right_len else float('inf')
+            if left_max > right_next:
+                hi = i - 1
+            elif right_max > left_next:
+                lo = i + 1
+            else:
+                return max(left_max, right_max)
+        raise RuntimeError("MAD选择失败")  # pragma: no cover - 有序数组下不会发生
+    
+    @property
+    def mad(self) -> float:
+        """窗口中位数绝对偏差"""
+        n = len(self._sorted)
+        if n == 0:
+            return 0.0
+        median = self.median
+        split = bisect_left(self._sorted, median)
+        mid = n // 2
+        if n % 2:
+            return self._kth_deviation(mid, median, split)
+        return (self._kth_deviation(mid - 1, median, split) + self._kth_deviation(mid, median, split)) / 2.0
+    
+    def zscore(self, value: float) -> float:
+        """计算value相对当前窗口的修正Z-Score（语义同 calculate_modified_zscore）"""
+        if not self._values:
+            return 0.0
+        mad = self.mad
+        if mad == 0:
+            return 0.0
+        return float(MAD_SCALE * (value - self.median) / mad)
+    
+    def clear(self):
+        """清空窗口"""
+        self._values.clear()
+        self._sorted.clear()
+
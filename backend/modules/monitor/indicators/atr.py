@@ -2,6 +2,7 @@
 使用Wilder平滑方法，这是ATR的标准计算方式
 """
 from typing import List, Optional
+import numpy as np
 from ..data.models import Kline
 
 
@@ -106,3 +107,46 @@ def calculate_atr_list(klines: List[Kline], period: int = 14, use_wilder: bool =
     
     return atr_values
 
+
+
+def calculate_true_range_array(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray) -> np.ndarray:
+    """向量化计算真实波幅序列（列式K线数据）
+    
+    Args:
+        highs: 最高价数组
+        lows: 最低价数组
+        closes: 收盘价数组
+    
+    Returns:
+        长度为 len(closes)-1 的TR数组（第i个对应第i+1根K线）
+    """
+    prev_close = closes[:-1]
+    high = highs[1:]
+    low = lows[1:]
+    return np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def calculate_atr_list_from_arrays(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray,
+                                   period: int = 14) -> List[float]:
+    """基于列式数组计算Wilder ATR序列（结果与 calculate_atr_list 一致）
+    
+    Args:
+        highs: 最高价数组
+        lows: 最低价数组
+        closes: 收盘价数组
+        period: ATR周期
+    
+    Returns:
+        ATR值列表
+    """
+    if len(closes) < period + 1:
+        return []
+    
+    trs = calculate_true_range_array(highs, lows, closes).tolist()
+    
+    atr = sum(trs[:period]) / period
+    atr_values = [atr]
+    for tr in trs[period:]:
+        atr = atr * (period - 1) / period + tr / period
+        atr_values.append(atr)
+    return atr_values
@@ -0,0 +1,294 @@
+"""跨交易对批量指标计算
+
+K线收盘批次内的所有交易对以 (交易对 × 历史) 矩阵一次性计算指标与Z-Score，
+口径与 IndicatorCalculator 的全量计算一致。只处理窗口已满（history_size 根）的交易对，
+其余交易对由调用方回退到逐个计算。
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ..data.kline_manager import KlineManager
+from ..data.models import IndicatorValues
+from ..detection.zscore import calculate_zscore_rows_by_method
+from .pattern import calculate_wick_ratios, get_engulfing_type, is_engulfing_bar
+
+
+@dataclass
+class BatchIndicators:
+    """批量指标结果（每个字段为长度等于交易对数量的数组）"""
+    symbols: List[str]
+    close: np.ndarray
+    atr: np.ndarray
+    atr_zscore: np.ndarray
+    price_change_rate: np.ndarray
+    price_change_zscore: np.ndarray
+    volume: np.ndarray
+    volume_ma: np.ndarray
+    volume_zscore: np.ndarray
+    stddev: np.ndarray
+    rsi: np.ndarray
+    rsi_zscore: np.ndarray
+    ema_fast: np.ndarray
+    ema_slow: np.ndarray
+    is_ma_bullish_cross: np.ndarray
+    is_ma_bearish_cross: np.ndarray
+    ma_deviation: np.ndarray
+    ma_deviation_zscore: np.ndarray
+    bb_upper: np.ndarray
+    bb_middle: np.ndarray
+    bb_lower: np.ndarray
+    bb_width: np.ndarray
+    bb_width_zscore: np.ndarray
+    is_bb_breakout_upper: np.ndarray
+    is_bb_breakout_lower: np.ndarray
+    is_bb_squeeze: np.ndarray
+    # (交易对 × history_size-1) 价格变化率矩阵，用于持仓量背离分析
+    price_changes: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+
+class BatchIndicatorCalculator:
+    """跨交易对向量化指标计算器"""
+
+    def __init__(self, kline_manager: KlineManager, config: Dict):
+        """初始化
+
+        Args:
+            kline_manager: K线管理器（建议开启 shared_matrix 以一次取出矩阵）
+            config: 配置字典
+        """
+        self.kline_manager = kline_manager
+        self.config = config
+
+        indi_cfg = config['indicators']
+        self.atr_period = indi_cfg['atr_period']
+        self.stddev_period = indi_cfg['stddev_period']
+        self.volume_ma_period = indi_cfg['volume_ma_period']
+        self.bb_period = indi_cfg.get('bb_period', 20)
+        self.bb_std_multiplier = indi_cfg.get('bb_std_multiplier', 2.0)
+        self.rsi_period = indi_cfg.get('rsi_period', 14)
+        self.ema_fast_period = indi_cfg.get('ema_fast_period', 12)
+        self.ema_slow_period = indi_cfg.get('ema_slow_period', 26)
+        self.long_wick_ratio_threshold = indi_cfg.get('long_wick_ratio_threshold', 0.6)
+        self.engulfing_strict = indi_cfg.get('engulfing_strict_mode', True)
+        self.zscore_method = config.get('detection', {}).get('zscore_method', 'standard')
+
+    def split_eligible(self, symbols: List[str]) -> tuple:
+        """按窗口是否已满拆分交易对
+
+        Args:
+            symbols: 交易对列表
+
+        Returns:
+            (可批量计算的交易对, 需逐个计算的交易对)
+        """
+        history = self.kline_manager.history_size
+        eligible, others = [], []
+        for symbol in symbols:
+            if self.kline_manager.get_kline_count(symbol) == history:
+                eligible.append(symbol)
+            else:
+                others.append(symbol)
+        return eligible, others
+
+    def calculate(self, symbols: List[str]) -> Optional[BatchIndicators]:
+        """批量计算指标
+
+        Args:
+            symbols: 窗口已满的交易对列表（见 split_eligible）
+
+        Returns:
+            批量指标，交易对为空或窗口不足以计算时返回None
+        """
+        n = self.kline_manager.history_size
+        required = max(
+            self.atr_period, self.stddev_period, self.volume_ma_period,
+            self.bb_period, self.rsi_period, self.ema_slow_period,
+        ) + 1
+        if not symbols or n < max(required, self.rsi_period + 3, self.bb_period + 2):
+            return None
+
+        km = self.kline_manager
+        opens = km.get_matrix('open', symbols, n)
+        highs = km.get_matrix('high', symbols, n)
+        lows = km.get_matrix('low', symbols, n)
+        closes = km.get_matrix('close', symbols, n)
+        volumes = km.get_matrix('volume', symbols, n)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self._calculate(symbols, opens, highs, lows, closes, volumes)
+
+    def _calculate(self, symbols, opens, highs, lows, closes, volumes) -> BatchIndicators:
+        current_close = closes[:, -1]
+        current_volume = volumes[:, -1]
+
+        # ATR（Wilder平滑，沿时间轴递推、跨交易对向量化）
+        p = self.atr_period
+        prev_close = closes[:, :-1]
+        trs = np.maximum(
+            highs[:, 1:] - lows[:, 1:],
+            np.maximum(np.abs(highs[:, 1:] - prev_close), np.abs(lows[:, 1:] - prev_close)),
+        )
+        atr_cols = trs.shape[1] - p + 1
+        atr_series = np.empty((len(symbols), atr_cols))
+        atr_series[:, 0] = trs[:, :p].sum(axis=1) / p
+        for k in range(1, atr_cols):
+            atr_series[:, k] = atr_series[:, k - 1] * (p - 1) / p + trs[:, p - 1 + k] / p
+        atr = atr_series[:, -1]
+        atr_zscore = calculate_zscore_rows_by_method(atr, atr_series[:, :-1], self.zscore_method)
+
+        # 价格变化率（窗口首根不计入）
+        all_changes = np.where(opens != 0, (closes - opens) / np.where(opens != 0, opens, 1.0), 0.0)
+        price_changes = all_changes[:, 1:]
+        price_change_rate = price_changes[:, -1]
+        price_change_zscore = calculate_zscore_rows_by_method(price_change_rate, price_changes[:, :-1], self.zscore_method)
+
+        # 成交量
+        volume_ma = volumes[:, -self.volume_ma_period:].mean(axis=1)
+        volume_zscore = calculate_zscore_rows_by_method(current_volume, volumes[:, :-1], self.zscore_method)
+
+        # 标准差
+        stddev = closes[:, -self.stddev_period:].std(axis=1)
+
+        # 布林带：宽度序列第j列对应以第 bb_period-1+j 根结尾的窗口
+        windows = sliding_window_view(closes, self.bb_period, axis=1)
+        bb_mid_series = windows.mean(axis=2)
+        bb_std_series = windows.std(axis=2)
+        bb_upper_series = bb_mid_series + self.bb_std_multiplier * bb_std_series
+        bb_lower_series = bb_mid_series - self.bb_std_multiplier * bb_std_series
+        span = bb_upper_series - bb_lower_series
+        widths = np.where(bb_mid_series != 0, span / np.where(bb_mid_series != 0, bb_mid_series, 1.0), span)
+        bb_upper = bb_upper_series[:, -1]
+        bb_middle = bb_mid_series[:, -1]
+        bb_lower = bb_lower_series[:, -1]
+        bb_width = widths[:, -1]
+        # 与全量计算一致：历史不含当前与上一根结尾的窗口
+        bb_width_zscore = calculate_zscore_rows_by_method(bb_width, widths[:, :-2], self.zscore_method)
+
+        # RSI（Wilder平滑）
+        p = self.rsi_period
+        changes = np.diff(closes, axis=1)
+        gains = np.maximum(changes, 0.0)
+        losses = np.abs(np.minimum(changes, 0.0))
+        avg_gain = gains[:, :p].mean(axis=1)
+        avg_loss = losses[:, :p].mean(axis=1)
+        rsi_cols = changes.shape[1] - p
+        rsi_series = np.empty((len(symbols), rsi_cols))
+        for k in range(rsi_cols):
+            avg_gain = (avg_gain * (p - 1) + gains[:, p + k]) / p
+            avg_loss = (avg_loss * (p - 1) + losses[:, p + k]) / p
+            rsi_series[:, k] = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+        rsi = rsi_series[:, -1]
+        rsi_zscore = calculate_zscore_rows_by_method(rsi, rsi_series[:, :-1], self.zscore_method)
+
+        # EMA
+        ema_fast_series = self._ema_rows(closes, self.ema_fast_period)
+        ema_slow_series = self._ema_rows(closes, self.ema_slow_period)
+        ema_fast = ema_fast_series[:, -1]
+        ema_slow = ema_slow_series[:, -1]
+        prev_fast = ema_fast_series[:, -2]
+        prev_slow = ema_slow_series[:, -2]
+        is_ma_bullish_cross = (prev_fast <= prev_slow) & (ema_fast > ema_slow)
+        is_ma_bearish_cross = (prev_fast >= prev_slow) & (ema_fast < ema_slow)
+
+        safe_slow = np.where(ema_slow_series != 0, ema_slow_series, 1.0)
+        devs = np.where(ema_slow_series != 0, (closes - ema_slow_series) / safe_slow, np.nan)
+        ma_deviation = np.nan_to_num(devs[:, -1], nan=0.0)
+        ma_deviation_zscore = calculate_zscore_rows_by_method(ma_deviation, devs[:, 1:-1], self.zscore_method)
+
+        return BatchIndicators(
+            symbols=list(symbols),
+            close=current_close,
+            atr=atr,
+            atr_zscore=atr_zscore,
+            price_change_rate=price_change_rate,
+            price_change_zscore=price_change_zscore,
+            volume=current_volume,
+            volume_ma=volume_ma,
+            volume_zscore=volume_zscore,
+            stddev=stddev,
+            rsi=rsi,
+            rsi_zscore=rsi_zscore,
+            ema_fast=ema_fast,
+            ema_slow=ema_slow,
+            is_ma_bullish_cross=is_ma_bullish_cross,
+            is_ma_bearish_cross=is_ma_bearish_cross,
+            ma_deviation=ma_deviation,
+            ma_deviation_zscore=ma_deviation_zscore,
+            bb_upper=bb_upper,
+            bb_middle=bb_middle,
+            bb_lower=bb_lower,
+            bb_width=bb_width,
+            bb_width_zscore=bb_width_zscore,
+            is_bb_breakout_upper=current_close > bb_upper,
+            is_bb_breakout_lower=current_close < bb_lower,
+            is_bb_squeeze=bb_width_zscore < -2.0,
+            price_changes=price_changes,
+        )
+
+    @staticmethod
+    def _ema_rows(values: np.ndarray, period: int) -> np.ndarray:
+        """逐列递推EMA（首值为第一根收盘价，与 calculate_ema_list 一致）"""
+        k = 2 / (period + 1)
+        ema = np.empty_like(values)
+        ema[:, 0] = values[:, 0]
+        for i in range(1, values.shape[1]):
+            ema[:, i] = values[:, i] * k + ema[:, i - 1] * (1 - k)
+        return ema
+
+    def to_indicator_values(self, batch: BatchIndicators, index: int) -> IndicatorValues:
+        """将批量结果的一行展开为 IndicatorValues（补充形态指标，持仓量字段为默认值）
+
+        Args:
+            batch: 批量指标
+            index: 行号
+
+        Returns:
+            指标值对象
+        """
+        symbol = batch.symbols[index]
+        previous, current = self.kline_manager.get_klines(symbol, 2)
+        upper_wick_ratio, lower_wick_ratio = calculate_wick_ratios(current)
+        rsi = float(batch.rsi[index])
+
+        return IndicatorValues(
+            symbol=symbol,
+            atr=float(batch.atr[index]),
+            atr_zscore=float(batch.atr_zscore[index]),
+            price_change_rate=float(batch.price_change_rate[index]),
+            price_change_zscore=float(batch.price_change_zscore[index]),
+            volume=float(batch.volume[index]),
+            volume_ma=float(batch.volume_ma[index]),
+            volume_zscore=float(batch.volume_zscore[index]),
+            stddev=float(batch.stddev[index]),
+            is_engulfing=is_engulfing_bar(current, previous, require_body_engulf=self.engulfing_strict),
+            engulfing_type=get_engulfing_type(current, previous, strict=self.engulfing_strict),
+            rsi=rsi,
+            rsi_zscore=float(batch.rsi_zscore[index]),
+            is_rsi_overbought=rsi >= 70,
+            is_rsi_oversold=rsi <= 30,
+            ema_fast=float(batch.ema_fast[index]),
+            ema_slow=float(batch.ema_slow[index]),
+            is_ma_bullish_cross=bool(batch.is_ma_bullish_cross[index]),
+            is_ma_bearish_cross=bool(batch.is_ma_bearish_cross[index]),
+            ma_deviation=float(batch.ma_deviation[index]),
+            ma_deviation_zscore=float(batch.ma_deviation_zscore[index]),
+            bb_upper=float(batch.bb_upper[index]),
+            bb_middle=float(batch.bb_middle[index]),
+            bb_lower=float(batch.bb_lower[index]),
+            bb_width=float(batch.bb_width[index]),
+            bb_width_zscore=float(batch.bb_width_zscore[index]),
+            is_bb_breakout_upper=bool(batch.is_bb_breakout_upper[index]),
+            is_bb_breakout_lower=bool(batch.is_bb_breakout_lower[index]),
+            is_bb_squeeze=bool(batch.is_bb_squeeze[index]),
+            upper_wick_ratio=upper_wick_ratio,
+            lower_wick_ratio=lower_wick_ratio,
+            is_long_upper_wick=upper_wick_ratio >= self.long_wick_ratio_threshold,
+            is_long_lower_wick=lower_wick_ratio >= self.long_wick_ratio_threshold,
+            is_backfilled=current.is_backfilled,
+        )
@@ -1,9 +1,11 @@
 """指标计算器 - 统一接口"""
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from ..data.kline_manager import KlineManager
 from ..data.models import IndicatorValues
-from .atr import calculate_atr, calculate_atr_list
+from .atr import calculate_atr_list_from_arrays
 from .volatility import (
     calculate_std_dev,
     calculate_price_change_rate,
@@ -14,6 +16,7 @@ from .volatility import (
     calculate_rsi_list,
 )
 from .volume import calculate_volume_ma
+from .incremental import IncrementalIndicatorEngine
 from .pattern import is_engulfing_bar, get_engulfing_type, calculate_wick_ratios
 from .open_interest import (
     parse_oi_hist_response,
@@ -24,23 +27,31 @@ from .open_interest import (
     analyze_oi_divergence,
     detect_oi_surge,
 )
-from ..detection.zscore import calculate_zscore
+from ..detection.zscore import calculate_zscore_by_method
+from ..data.oi_cache import OpenInterestCache
+from ..utils.helpers import interval_to_ms
+from ..utils.logger import get_logger
+from ..utils.metrics import get_metrics_registry
 
 
 class IndicatorCalculator:
     """技术指标计算器"""
     
-    def __init__(self, kline_manager: KlineManager, config: Dict, rest_client=None):
+    def __init__(self, kline_manager: KlineManager, config: Dict, rest_client=None,
+                 oi_cache: Optional[OpenInterestCache] = None):
         """初始化
         
         Args:
             kline_manager: K线管理器
             config: 配置字典
-            rest_client: REST API客户端（用于获取持仓量数据）
+            rest_client: REST API客户端（未提供 oi_cache 时用于同步获取持仓量数据）
+            oi_cache: 持仓量共享缓存（由 OIPrefetcher 刷新，提供时只读缓存不发起请求）
         """
         self.kline_manager = kline_manager
         self.config = config
         self.rest_client = rest_client
+        self.oi_cache = oi_cache
+        self.metrics = get_metrics_registry()
         
         # 从配置读取周期参数
         self.atr_period = config['indicators']['atr_period']
@@ -54,6 +65,8 @@ class IndicatorCalculator:
         self.ema_fast_period = indi_cfg.get('ema_fast_period', 12)
         self.ema_slow_period = indi_cfg.get('ema_slow_period', 26)
         self.long_wick_ratio_threshold = indi_cfg.get('long_wick_ratio_threshold', 0.6)
+        # Z-Score 口径：standard / ewma / robust
+        self.zscore_method = config.get('detection', {}).get('zscore_method', 'standard')
         # 持仓量配置
         self.oi_ma_period = indi_cfg.get('oi_ma_period', 20)
         self.oi_momentum_period = indi_cfg.get('oi_momentum_period', 10)
@@ -63,6 +76,17 @@ class IndicatorCalculator:
         
         # 持仓量数据缓存：{symbol: {'data': [...], 'last_update': timestamp}}
         self._oi_cache = {}
+        # 预取模式下持仓量过期的K线：{symbol: (K线时间戳, 价格变化率序列)}，预取刷新后重算
+        self._stale_oi: Dict[str, Tuple[int, List[float]]] = {}
+        
+        # 增量指标引擎（默认关闭，每根K线全量重算；启用后递推类指标与全量结果近似一致）
+        # 批量检测按窗口全量口径计算，逐个回退的交易对也必须全量计算，否则两条路径结果不一致
+        self.incremental_engine: Optional[IncrementalIndicatorEngine] = None
+        batch_enabled = config.get('detection', {}).get('batch_mode', {}).get('enabled', False)
+        if indi_cfg.get('incremental', False) and batch_enabled:
+            get_logger('calculator').warning("批量检测已启用，忽略 indicators.incremental（使用全量计算）")
+        elif indi_cfg.get('incremental', False):
+            self.incremental_engine = IncrementalIndicatorEngine(config, kline_manager.history_size)
     
     def calculate_all(self, symbol: str) -> Optional[IndicatorValues]:
         """计算所有指标
@@ -74,47 +98,95 @@ class IndicatorCalculator:
             指标值对象，数据不足返回None
         """
         # 检查是否有足够的数据
-        required_count = max(
-            self.atr_period,
-            self.stddev_period,
-            self.volume_ma_period,
-            self.bb_period,
-            self.rsi_period,
-            self.ema_slow_period,
-        ) + 1
-        if not self.kline_manager.has_enough_data(symbol, required_count):
+        if not self.kline_manager.has_enough_data(symbol, self.get_required_kline_count()):
+            return None
+        
+        if self.incremental_engine is not None:
+            with self.metrics.timer('indicators.incremental'):
+                indicators, price_changes = self._calculate_incremental(symbol)
+        else:
+            indicators, price_changes = self._calculate_full(symbol)
+        if indicators is None:
             return None
         
-        # 获取K线数据
-        klines = self.kline_manager.get_klines(symbol)
+        latest_kline = self.kline_manager.get_latest_kline(symbol)
+        indicators.is_backfilled = latest_kline.is_backfilled
+        
+        # 持仓量指标（与K线周期同步更新）
+        if self.has_oi_source():
+            with self.metrics.timer('indicators.oi'):
+                self.apply_open_interest(indicators, latest_kline.timestamp, price_changes)
+        
+        return indicators
+    
+    def _calculate_incremental(self, symbol: str) -> Tuple[Optional[IndicatorValues], List[float]]:
+        """增量计算：连续收盘时 O(1) 推进，出现缺口或重复时按窗口重建
+        
+        Args:
+            symbol: 交易对符号
+        
+        Returns:
+            (指标值, 价格变化率序列)
+        """
+        engine = self.incremental_engine
+        latest_kline = self.kline_manager.get_latest_kline(symbol)
+        last_ts = engine.get_last_timestamp(symbol)
+        
+        if last_ts is not None and latest_kline.timestamp - last_ts == self._get_interval_ms():
+            indicators = engine.update(symbol, latest_kline)
+        else:
+            indicators = engine.rebuild(symbol, self.kline_manager.get_klines(symbol))
+        
+        return indicators, engine.get_price_changes(symbol)
+    
+    def _calculate_full(self, symbol: str) -> Tuple[Optional[IndicatorValues], List[float]]:
+        """全量计算：基于完整K线窗口重算所有序列
+        
+        Args:
+            symbol: 交易对符号
+        
+        Returns:
+            (指标值, 价格变化率序列)
+        """
+        # 分段计时（按指标族）
+        metrics = self.metrics
+        t = time.perf_counter()
+        
+        # 获取K线数据（列式零拷贝视图）
+        km = self.kline_manager
+        opens = km.get_array(symbol, 'open')
+        highs = km.get_array(symbol, 'high')
+        lows = km.get_array(symbol, 'low')
+        closes = km.get_array(symbol, 'close')
+        volumes = km.get_array(symbol, 'volume')
+        klines = km.get_klines(symbol, 2)
         latest_kline = klines[-1]
-        closes = self.kline_manager.get_closes(symbol)
-        volumes = self.kline_manager.get_volumes(symbol)
         current_close = latest_kline.close
         current_volume = latest_kline.volume
         
-        # 计算ATR
-        atr = calculate_atr(klines, self.atr_period)
-        if atr is None:
-            return None
-        
-        # 历史ATR用于Z-Score
-        atr_list = calculate_atr_list(klines, self.atr_period)
-        atr_zscore = calculate_zscore(atr, atr_list[:-1]) if len(atr_list) > 1 else 0.0
+        # 计算ATR（历史ATR用于Z-Score）
+        atr_list = calculate_atr_list_from_arrays(highs, lows, closes, self.atr_period)
+        if not atr_list:
+            return None, []
+        atr = atr_list[-1]
+        atr_zscore = calculate_zscore_by_method(atr, atr_list[:-1], self.zscore_method) if len(atr_list) > 1 else 0.0
+        t = metrics.lap('indicators.atr', t)
         
         # 价格变化率
         price_change_rate = calculate_price_change_rate(latest_kline)
-        price_changes = []
-        for i in range(1, len(klines)):
-            pc = calculate_price_change_rate(klines[i])
-            price_changes.append(pc)
-        price_change_zscore = calculate_zscore(price_change_rate, price_changes[:-1]) if len(price_changes) > 1 else 0.0
+        all_changes = np.divide(closes - opens, opens, out=np.zeros_like(closes), where=opens != 0)
+        price_changes = all_changes[1:].tolist()
+        price_change_zscore = calculate_zscore_by_method(price_change_rate, price_changes[:-1], self.zscore_method) if len(price_changes) > 1 else 0.0
+        t = metrics.lap('indicators.price', t)
         
         # 成交量指标
         volume_ma = calculate_volume_ma(volumes, self.volume_ma_period)
         if volume_ma is None:
-            return None
-        volume_zscore = calculate_zscore(current_volume, volumes[:-1]) if len(volumes) > 1 else 0.0
+            return None, []
+        volume_ma = float(volume_ma)
+        volume_zscore = calculate_zscore_by_method(current_volume, volumes[:-1], self.zscore_method) if len(volumes) > 1 else 0.0
+        
+        t = metrics.lap('indicators.volume', t)
         
         # 标准差
         stddev = calculate_std_dev(closes, self.stddev_period) or 0.0
@@ -131,6 +203,7 @@ class IndicatorCalculator:
         upper_wick_ratio, lower_wick_ratio = calculate_wick_ratios(latest_kline)
         is_long_upper_wick = upper_wick_ratio >= self.long_wick_ratio_threshold
         is_long_lower_wick = lower_wick_ratio >= self.long_wick_ratio_threshold
+        t = metrics.lap('indicators.pattern', t)
         
         # 布林带
         bb_bands = calculate_bollinger_bands(closes, self.bb_period, self.bb_std_multiplier)
@@ -143,28 +216,28 @@ class IndicatorCalculator:
         if bb_bands is not None:
             bb_upper, bb_middle, bb_lower = bb_bands
             bb_width = calculate_bollinger_bandwidth(closes, self.bb_period, self.bb_std_multiplier) or 0.0
-            # 计算历史宽度用于Z-Score
-            bb_width_history = []
-            for i in range(self.bb_period, len(closes)):
-                recent = closes[i-self.bb_period:i]
-                bands = calculate_bollinger_bands(recent, self.bb_period, self.bb_std_multiplier)
-                if bands:
-                    u, m, l = bands
-                    w = (u - l) / m if m != 0 else (u - l)
-                    bb_width_history.append(float(w))
-            bb_width_zscore = calculate_zscore(bb_width, bb_width_history[:-1]) if len(bb_width_history) > 1 else 0.0
+            # 计算历史宽度用于Z-Score（窗口分别以倒数第2根及更早的K线结尾）
+            windows = sliding_window_view(closes[:-1], self.bb_period)
+            m = windows.mean(axis=1)
+            sd = windows.std(axis=1)
+            u = m + self.bb_std_multiplier * sd
+            l = m - self.bb_std_multiplier * sd
+            bb_width_history = np.divide(u - l, m, out=u - l, where=m != 0).tolist()
+            bb_width_zscore = calculate_zscore_by_method(bb_width, bb_width_history[:-1], self.zscore_method) if len(bb_width_history) > 1 else 0.0
             # 突破判定
             is_bb_breakout_upper = current_close > bb_upper
             is_bb_breakout_lower = current_close < bb_lower
             # Squeeze 判定（带宽显著收缩）
             is_bb_squeeze = bb_width_zscore < -2.0
+        t = metrics.lap('indicators.bollinger', t)
         
         # RSI
         rsi = calculate_rsi(closes, self.rsi_period) or 0.0
         rsi_history = calculate_rsi_list(closes, self.rsi_period)
-        rsi_zscore = calculate_zscore(rsi, rsi_history[:-1]) if len(rsi_history) > 1 else 0.0
+        rsi_zscore = calculate_zscore_by_method(rsi, rsi_history[:-1], self.zscore_method) if len(rsi_history) > 1 else 0.0
         is_rsi_overbought = rsi >= 70
         is_rsi_oversold = rsi <= 30
+        t = metrics.lap('indicators.rsi', t)
         
         # EMA 金叉/死叉与乖离
         ema_fast_list = calculate_ema_list(closes, self.ema_fast_period)
@@ -183,98 +256,13 @@ class IndicatorCalculator:
             ma_deviation = (current_close - ema_slow) / ema_slow
         ma_dev_history = []
         if len(ema_slow_list) > 1:
-            for i in range(1, len(ema_slow_list)):
-                base = ema_slow_list[i]
-                close_i = closes[i] if i < len(closes) else closes[-1]
-                if base != 0:
-                    ma_dev_history.append((close_i - base) / base)
-        ma_deviation_zscore = calculate_zscore(ma_deviation, ma_dev_history[:-1]) if len(ma_dev_history) > 1 else 0.0
+            bases = np.asarray(ema_slow_list[1:])
+            devs = (closes[1:len(ema_slow_list)] - bases) / np.where(bases != 0, bases, 1.0)
+            ma_dev_history = devs[bases != 0].tolist()
+        ma_deviation_zscore = calculate_zscore_by_method(ma_deviation, ma_dev_history[:-1], self.zscore_method) if len(ma_dev_history) > 1 else 0.0
+        metrics.lap('indicators.ema', t)
         
-        # 持仓量指标（与K线周期同步更新）
-        open_interest = 0.0
-        open_interest_value = 0.0
-        oi_change_rate = 0.0
-        oi_value_change_rate = 0.0
-        oi_zscore = 0.0
-        oi_ma = 0.0
-        oi_momentum = 0.0
-        is_oi_divergence = False
-        oi_divergence_type = "无背离"
-        is_oi_surge = False
-        
-        if self.oi_enabled and self.rest_client:
-            try:
-                # 检查缓存是否需要更新（每个K线周期更新一次）
-                current_timestamp = latest_kline.timestamp
-                cache = self._oi_cache.get(symbol)
-                need_update = (
-                    cache is None or 
-                    current_timestamp - cache.get('last_update', 0) >= self._get_interval_ms()
-                )
-                
-                if need_update:
-                    # 获取持仓量历史数据
-                    interval = self.config['kline']['interval']
-                    raw_oi = self.rest_client.get_open_interest_hist(
-                        symbol, interval, self.oi_history_size
-                    )
-                    if raw_oi:
-                        self._oi_cache[symbol] = {
-                            'data': raw_oi,
-                            'last_update': current_timestamp
-                        }
-                        cache = self._oi_cache[symbol]
-                
-                # 计算持仓量指标
-                if cache and cache.get('data'):
-                    oi_data = cache['data']
-                    oi_values, oi_value_values, timestamps = parse_oi_hist_response(oi_data)
-                    
-                    if len(oi_values) > 0:
-                        open_interest = oi_values[-1]
-                        open_interest_value = oi_value_values[-1]
-                        
-                        # 计算变化率
-                        if len(oi_values) >= 2:
-                            oi_change_rate = calculate_oi_change_rate(oi_values[-1], oi_values[-2])
-                            oi_value_change_rate = calculate_oi_change_rate(
-                                oi_value_values[-1], oi_value_values[-2]
-                            )
-                        
-                        # 计算变化率列表用于Z-Score
-                        oi_changes = []
-                        for i in range(1, len(oi_values)):
-                            change = calculate_oi_change_rate(oi_values[i], oi_values[i-1])
-                            oi_changes.append(change)
-                        
-                        if len(oi_changes) >= 2:
-                            oi_zscore = calculate_oi_zscore(oi_changes) or 0.0
-                        
-                        # MA和动量
-                        oi_ma = calculate_oi_ma(oi_values, self.oi_ma_period) or 0.0
-                        oi_momentum = calculate_oi_momentum(oi_values, self.oi_momentum_period) or 0.0
-                        
-                        # 检测激增
-                        if len(oi_changes) > 0:
-                            is_oi_surge = detect_oi_surge(
-                                oi_change_rate, oi_changes, 2.5
-                            )
-                        
-                        # 分析背离
-                        if len(price_changes) >= self.oi_divergence_window and len(oi_changes) >= self.oi_divergence_window:
-                            is_oi_divergence, oi_divergence_type = analyze_oi_divergence(
-                                price_changes, oi_changes, self.oi_divergence_window,
-                                price_threshold=0.5,
-                                oi_threshold=1.0
-                            )
-                        
-            except Exception as e:
-                # 持仓量获取失败不影响其他指标
-                from ..utils.logger import get_logger
-                logger = get_logger('calculator')
-                logger.warning(f"获取 {symbol} 持仓量失败: {e}")
-        
-        return IndicatorValues(
+        indicators = IndicatorValues(
             symbol=symbol,
             atr=atr,
             atr_zscore=atr_zscore,
@@ -309,37 +297,141 @@ class IndicatorCalculator:
             lower_wick_ratio=lower_wick_ratio,
             is_long_upper_wick=is_long_upper_wick,
             is_long_lower_wick=is_long_lower_wick,
-            # 持仓量字段
-            open_interest=open_interest,
-            open_interest_value=open_interest_value,
-            oi_change_rate=oi_change_rate,
-            oi_value_change_rate=oi_value_change_rate,
-            oi_zscore=oi_zscore,
-            oi_ma=oi_ma,
-            oi_momentum=oi_momentum,
-            is_oi_divergence=is_oi_divergence,
-            oi_divergence_type=oi_divergence_type,
-            is_oi_surge=is_oi_surge,
         )
+        return indicators, price_changes
+    
+    def has_oi_source(self) -> bool:
+        """是否计算持仓量指标（已启用且有缓存或REST客户端）"""
+        return self.oi_enabled and (self.oi_cache is not None or self.rest_client is not None)
+    
+    def apply_open_interest(self, indicators: IndicatorValues, current_timestamp: int,
+                            price_changes: List[float]):
+        """计算持仓量指标并写入指标对象
+        
+        Args:
+            indicators: 指标值对象（原地更新持仓量字段）
+            current_timestamp: 最新K线时间戳
+            price_changes: 价格变化率序列（用于背离分析）
+        """
+        symbol = indicators.symbol
+        try:
+            if self.oi_cache is not None:
+                # 预取模式：只读共享缓存，不含本K线收盘时的持仓量时标记过期（由 refresh_open_interest 补算）
+                cache = self.oi_cache.get(symbol)
+                indicators.is_oi_stale = not self._oi_covers(cache, current_timestamp)
+                if indicators.is_oi_stale:
+                    self._stale_oi[symbol] = (current_timestamp, list(price_changes))
+                else:
+                    self._stale_oi.pop(symbol, None)
+                need_update = False
+            else:
+                # 检查缓存是否需要更新（每个K线周期更新一次）
+                cache = self._oi_cache.get(symbol)
+                need_update = (
+                    cache is None or 
+                    current_timestamp - cache.get('last_update', 0) >= self._get_interval_ms()
+                )
+            
+            if need_update:
+                # 获取持仓量历史数据
+                interval = self.config['kline']['interval']
+                raw_oi = self.rest_client.get_open_interest_hist(
+                    symbol, interval, self.oi_history_size
+                )
+                if raw_oi:
+                    self._oi_cache[symbol] = {
+                        'data': raw_oi,
+                        'last_update': current_timestamp
+                    }
+                    cache = self._oi_cache[symbol]
+            
+            # 计算持仓量指标
+            if cache and cache.get('data'):
+                oi_data = cache['data']
+                oi_values, oi_value_values, timestamps = parse_oi_hist_response(oi_data)
+                
+                if len(oi_values) > 0:
+                    indicators.open_interest = oi_values[-1]
+                    indicators.open_interest_value = oi_value_values[-1]
+                    
+                    # 计算变化率
+                    if len(oi_values) >= 2:
+                        indicators.oi_change_rate = calculate_oi_change_rate(oi_values[-1], oi_values[-2])
+                        indicators.oi_value_change_rate = calculate_oi_change_rate(
+                            oi_value_values[-1], oi_value_values[-2]
+                        )
+                    
+                    # 计算变化率列表用于Z-Score
+                    oi_changes = []
+                    for i in range(1, len(oi_values)):
+                        change = calculate_oi_change_rate(oi_values[i], oi_values[i-1])
+                        oi_changes.append(change)
+                    
+                    if len(oi_changes) >= 2:
+                        indicators.oi_zscore = calculate_oi_zscore(oi_changes) or 0.0
+                    
+                    # MA和动量
+                    indicators.oi_ma = calculate_oi_ma(oi_values, self.oi_ma_period) or 0.0
+                    indicators.oi_momentum = calculate_oi_momentum(oi_values, self.oi_momentum_period) or 0.0
+                    
+                    # 检测激增
+                    if len(oi_changes) > 0:
+                        indicators.is_oi_surge = detect_oi_surge(
+                            indicators.oi_change_rate, oi_changes, 2.5
+                        )
+                    
+                    # 分析背离
+                    if len(price_changes) >= self.oi_divergence_window and len(oi_changes) >= self.oi_divergence_window:
+                        indicators.is_oi_divergence, indicators.oi_divergence_type = analyze_oi_divergence(
+                            price_changes, oi_changes, self.oi_divergence_window,
+                            price_threshold=0.5,
+                            oi_threshold=1.0
+                        )
+        
+        except Exception as e:
+            # 持仓量获取失败不影响其他指标
+            logger = get_logger('calculator')
+            logger.warning(f"获取 {symbol} 持仓量失败: {e}")
+    
+    def refresh_open_interest(self, indicators: IndicatorValues, current_timestamp: int) -> bool:
+        """预取刷新后重新计算过期的持仓量指标（只读缓存）
+        
+        Args:
+            indicators: 首次计算时标记为过期的指标对象（原地更新持仓量字段）
+            current_timestamp: 该K线时间戳
+        
+        Returns:
+            是否已更新为本K线收盘时的持仓量（缓存仍未覆盖或K线已不是最近一次过期记录时为False）
+        """
+        symbol = indicators.symbol
+        pending = self._stale_oi.get(symbol)
+        if pending is None or pending[0] != current_timestamp:
+            return False
+        if not self._oi_covers(self.oi_cache.get(symbol), current_timestamp):
+            return False
+        self.apply_open_interest(indicators, current_timestamp, pending[1])
+        return not indicators.is_oi_stale
+    
+    def _oi_covers(self, entry: Optional[Dict], current_timestamp: int) -> bool:
+        """共享缓存是否已包含指定K线收盘时的持仓量
+        
+        数据最新时间戳达到收盘时间，或在收盘之后获取（交易所尚未发布时与同步获取结果一致）。
+        
+        Args:
+            entry: 共享缓存条目
+            current_timestamp: K线开盘时间戳
+        
+        Returns:
+            是否无需刷新
+        """
+        if entry is None:
+            return False
+        close_ms = current_timestamp + self._get_interval_ms()
+        return entry['last_update'] >= close_ms or entry['fetched_at'] * 1000 >= close_ms
     
     def _get_interval_ms(self) -> int:
         """获取K线间隔的毫秒数"""
-        interval = self.config['kline']['interval']
-        unit = interval[-1]
-        value = int(interval[:-1])
-        
-        if unit == 'm':
-            return value * 60 * 1000
-        elif unit == 'h':
-            return value * 60 * 60 * 1000
-        elif unit == 'd':
-            return value * 24 * 60 * 60 * 1000
-        elif unit == 'w':
-            return value * 7 * 24 * 60 * 60 * 1000
-        elif unit == 'M':
-            return value * 30 * 24 * 60 * 60 * 1000  # 近似
-        else:
-            return 15 * 60 * 1000  # 默认15分钟
+        return interval_to_ms(self.config['kline']['interval'])
     
     def get_required_kline_count(self) -> int:
         """获取计算所需的最小K线数量"""
@@ -0,0 +1,473 @@
+"""增量指标引擎
+
+每根收盘K线以 O(1) 更新交易对的滚动状态（Wilder ATR/RSI、EMA、滚动均值/方差、
+各 Z-Score 历史窗口），避免每次从完整 deque 重算全部指标序列。
+
+窗口口径与全量计算（calculator._calculate_full）保持一致：
+- 成交量 Z-Score：前 history_size-1 根成交量
+- 价格变化/均线乖离 Z-Score：前 history_size-2 根（不含窗口首根）
+- ATR/RSI Z-Score：前 history_size-period-1 / history_size-period-2 个值
+- 布林带宽度 Z-Score：不含当前与上一根的 history_size-bb_period-1 个宽度
+
+注意：全量计算在窗口滑动后会以新的窗口首根重新播种 Wilder/EMA 递推，
+增量引擎则连续递推，两者差异按 (period-1)/period 的窗口长度次幂衰减。
+重新播种会改变窗口内全部历史递推值（RSI、均线乖离对播种值非线性），无法以 O(1) 精确跟踪，
+因此 ATR/RSI/EMA 及其 Z-Score 与全量计算只近似一致，默认关闭（indicators.incremental）。
+Z-Score 口径为 ewma 时同理（span 为窗口长度）；standard/robust 的窗口类指标与全量计算逐值一致。
+"""
+import math
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from ..data.models import IndicatorValues, Kline
+from ..detection.zscore import ZSCORE_METHODS, EwmaStats, RollingMedianMAD
+from .pattern import calculate_wick_ratios, get_engulfing_type, is_engulfing_bar
+from .volatility import calculate_price_change_rate
+
+# 标准差相对阈值：低于该值视为0（避免滑动删除后的浮点残差放大Z-Score）
+_STD_EPSILON = 1e-12
+# 二阶矩相对峰值塌缩到该比例以下时精确重算（增删公式在方差骤降时误差最大）
+_M2_COLLAPSE_RATIO = 1e-8
+
+
+class RollingStats:
+    """定长滑动窗口的均值/方差
+
+    使用 Welford 增删公式 O(1) 更新，每滑动一整个窗口（或方差骤降时）精确重算一次，
+    以消除累积误差。
+    """
+
+    __slots__ = ('size', '_values', '_mean', '_m2', '_m2_peak', '_removals')
+
+    def __init__(self, size: int):
+        """初始化
+
+        Args:
+            size: 窗口大小（<=0 表示不保留任何值）
+        """
+        self.size = max(int(size), 0)
+        self._values: Deque[float] = deque()
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._m2_peak = 0.0
+        self._removals = 0
+
+    def push(self, value: float):
+        """追加一个值，窗口已满时淘汰最旧的值
+
+        Args:
+            value: 新值
+        """
+        if self.size == 0:
+            return
+
+        values = self._values
+        if len(values) == self.size:
+            old = values.popleft()
+            n = len(values)
+            if n == 0:
+                self._mean = 0.0
+                self._m2 = 0.0
+            else:
+                delta = old - self._mean
+                self._mean -= delta / n
+                self._m2 -= delta * (old - self._mean)
+            self._removals += 1
+
+        values.append(value)
+        delta = value - self._mean
+        self._mean += delta / len(values)
+        self._m2 += delta * (value - self._mean)
+
+        if self._m2 > self._m2_peak:
+            self._m2_peak = self._m2
+        if self._removals >= self.size or (
+            self._removals and self._m2 <= _M2_COLLAPSE_RATIO * self._m2_peak
+        ):
+            self._recompute()
+
+    def _recompute(self):
+        """精确重算均值与二阶矩"""
+        n = len(self._values)
+        self._removals = 0
+        if n == 0:
+            self._mean = 0.0
+            self._m2 = 0.0
+            self._m2_peak = 0.0
+            return
+        mean = math.fsum(self._values) / n
+        self._mean = mean
+        self._m2 = math.fsum((v - mean) ** 2 for v in self._values)
+        self._m2_peak = self._m2
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    @property
+    def mean(self) -> float:
+        """窗口均值"""
+        return self._mean if self._values else 0.0
+
+    @property
+    def std(self) -> float:
+        """窗口总体标准差（与 np.std 口径一致）"""
+        n = len(self._values)
+        if n == 0:
+            return 0.0
+        var = self._m2 / n
+        if var <= 0:
+            return 0.0
+        std = math.sqrt(var)
+        if std <= _STD_EPSILON * max(abs(self._mean), 1.0):
+            return 0.0
+        return std
+
+    def zscore(self, value: float) -> float:
+        """计算value相对当前窗口的Z-Score（语义同 calculate_zscore）
+
+        Args:
+            value: 当前值
+
+        Returns:
+            Z-Score值，窗口为空或标准差为0时返回0
+        """
+        if not self._values:
+            return 0.0
+        std = self.std
+        if std == 0:
+            return 0.0
+        return float((value - self._mean) / std)
+
+    def clear(self):
+        """清空窗口"""
+        self._values.clear()
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._m2_peak = 0.0
+        self._removals = 0
+
+
+class _SymbolState:
+    """单个交易对的增量状态"""
+
+    __slots__ = (
+        'count', 'last_timestamp', 'prev_kline',
+        'tr_seed', 'atr',
+        'gain_seed', 'loss_seed', 'gain_count', 'avg_gain', 'avg_loss', 'rsi',
+        'ema_fast', 'ema_slow',
+        'closes_std', 'closes_bb', 'volumes_ma',
+        'atr_hist', 'pc_hist', 'volume_hist', 'rsi_hist', 'bb_width_hist', 'ma_dev_hist',
+        'pending_bb_width', 'price_changes',
+    )
+
+    def __init__(self, engine: 'IncrementalIndicatorEngine'):
+        history = engine.history_size
+        self.count = 0
+        self.last_timestamp: Optional[int] = None
+        self.prev_kline: Optional[Kline] = None
+
+        # Wilder ATR
+        self.tr_seed = 0.0
+        self.atr: Optional[float] = None
+
+        # Wilder RSI
+        self.gain_seed = 0.0
+        self.loss_seed = 0.0
+        self.gain_count = 0
+        self.avg_gain: Optional[float] = None
+        self.avg_loss: Optional[float] = None
+        self.rsi: Optional[float] = None
+
+        # EMA
+        self.ema_fast: Optional[float] = None
+        self.ema_slow: Optional[float] = None
+
+        # 滚动窗口
+        self.closes_std = RollingStats(engine.stddev_period)
+        self.closes_bb = RollingStats(engine.bb_period)
+        self.volumes_ma = RollingStats(engine.volume_ma_period)
+
+        # Z-Score 历史窗口
+        self.atr_hist = engine.zscore_window(history - engine.atr_period - 1)
+        self.pc_hist = engine.zscore_window(history - 2)
+        self.volume_hist = engine.zscore_window(history - 1)
+        self.rsi_hist = engine.zscore_window(history - engine.rsi_period - 2)
+        self.bb_width_hist = engine.zscore_window(history - engine.bb_period - 1)
+        self.ma_dev_hist = engine.zscore_window(history - 2)
+        self.pending_bb_width: Optional[float] = None
+
+        # 最近的价格变化率（持仓量背离分析使用）
+        self.price_changes: Deque[float] = deque(maxlen=max(history - 1, 1))
+
+
+class IncrementalIndicatorEngine:
+    """按交易对维护滚动状态的增量指标引擎"""
+
+    def __init__(self, config: Dict, history_size: int):
+        """初始化
+
+        Args:
+            config: 配置字典
+            history_size: K线窗口大小（与 KlineManager.history_size 一致）
+        """
+        indi_cfg = config['indicators']
+        self.history_size = history_size
+        self.atr_period = indi_cfg['atr_period']
+        self.stddev_period = indi_cfg['stddev_period']
+        self.volume_ma_period = indi_cfg['volume_ma_period']
+        self.bb_period = indi_cfg.get('bb_period', 20)
+        self.bb_std_multiplier = indi_cfg.get('bb_std_multiplier', 2.0)
+        self.rsi_period = indi_cfg.get('rsi_period', 14)
+        self.ema_fast_period = indi_cfg.get('ema_fast_period', 12)
+        self.ema_slow_period = indi_cfg.get('ema_slow_period', 26)
+        self.long_wick_ratio_threshold = indi_cfg.get('long_wick_ratio_threshold', 0.6)
+        self.engulfing_strict = indi_cfg.get('engulfing_strict_mode', True)
+        self.zscore_method = config.get('detection', {}).get('zscore_method', 'standard')
+        if self.zscore_method not in ZSCORE_METHODS:
+            raise ValueError(f"未知的Z-Score口径: {self.zscore_method}（可选: {', '.join(ZSCORE_METHODS)}）")
+
+        self.required_count = max(
+            self.atr_period,
+            self.stddev_period,
+            self.volume_ma_period,
+            self.bb_period,
+            self.rsi_period,
+            self.ema_slow_period,
+        ) + 1
+
+        self._states: Dict[str, _SymbolState] = {}
+
+    def zscore_window(self, size: int):
+        """按配置的口径创建 Z-Score 历史窗口
+
+        Args:
+            size: 窗口大小
+
+        Returns:
+            RollingStats / EwmaStats / RollingMedianMAD（均提供 zscore/push/clear）
+        """
+        if self.zscore_method == 'robust':
+            return RollingMedianMAD(size)
+        if self.zscore_method == 'ewma':
+            return EwmaStats(size)
+        return RollingStats(size)
+
+    def get_last_timestamp(self, symbol: str) -> Optional[int]:
+        """获取交易对已处理的最后一根K线时间戳
+
+        Args:
+            symbol: 交易对符号
+
+        Returns:
+            时间戳，未初始化返回None
+        """
+        state = self._states.get(symbol)
+        return state.last_timestamp if state else None
+
+    def get_price_changes(self, symbol: str) -> List[float]:
+        """获取窗口内的价格变化率序列（不含窗口首根，含当前K线）
+
+        Args:
+            symbol: 交易对符号
+
+        Returns:
+            价格变化率列表
+        """
+        state = self._states.get(symbol)
+        return list(state.price_changes) if state else []
+
+    def rebuild(self, symbol: str, klines: List[Kline]) -> Optional[IndicatorValues]:
+        """丢弃状态并用完整K线窗口重新播种
+
+        Args:
+            symbol: 交易对符号
+            klines: 窗口内的收盘K线（按时间升序）
+
+        Returns:
+            最新K线的指标值，数据不足返回None
+        """
+        self._states[symbol] = _SymbolState(self)
+        result = None
+        for kline in klines[-self.history_size:]:
+            result = self.update(symbol, kline)
+        return result
+
+    def remove(self, symbol: str):
+        """移除交易对状态
+
+        Args:
+            symbol: 交易对符号
+        """
+        self._states.pop(symbol, None)
+
+    def update(self, symbol: str, kline: Kline) -> Optional[IndicatorValues]:
+        """以一根收盘K线推进状态（O(1)）
+
+        Args:
+            symbol: 交易对符号
+            kline: 收盘K线
+
+        Returns:
+            指标值（持仓量字段为默认值），窗口K线不足时返回None
+        """
+        state = self._states.get(symbol)
+        if state is None:
+            state = _SymbolState(self)
+            self._states[symbol] = state
+
+        prev = state.prev_kline
+        index = state.count
+        close = kline.close
+        volume = kline.volume
+
+        # ATR（Wilder平滑，首值为前period个TR的均值）
+        atr_zscore = 0.0
+        if prev is not None:
+            tr = max(
+                kline.high - kline.low,
+                abs(kline.high - prev.close),
+                abs(kline.low - prev.close),
+            )
+            period = self.atr_period
+            if state.atr is None:
+                state.tr_seed += tr
+                if index == period:
+                    state.atr = state.tr_seed / period
+            else:
+                state.atr = state.atr * (period - 1) / period + tr / period
+            if state.atr is not None:
+                atr_zscore = state.atr_hist.zscore(state.atr)
+                state.atr_hist.push(state.atr)
+
+        # 价格变化率（窗口首根不计入历史）
+        price_change_rate = calculate_price_change_rate(kline)
+        price_change_zscore = 0.0
+        if index > 0:
+            price_change_zscore = state.pc_hist.zscore(price_change_rate)
+            state.pc_hist.push(price_change_rate)
+            state.price_changes.append(price_change_rate)
+
+        # 成交量
+        volume_zscore = state.volume_hist.zscore(volume)
+        state.volume_hist.push(volume)
+        state.volumes_ma.push(volume)
+
+        # 收盘价窗口：标准差与布林带
+        state.closes_std.push(close)
+        state.closes_bb.push(close)
+        bb_upper = bb_middle = bb_lower = 0.0
+        bb_width = 0.0
+        bb_width_zscore = 0.0
+        bb_ready = len(state.closes_bb) >= self.bb_period
+        if bb_ready:
+            bb_middle = state.closes_bb.mean
+            bb_std = state.closes_bb.std
+            bb_upper = bb_middle + self.bb_std_multiplier * bb_std
+            bb_lower = bb_middle - self.bb_std_multiplier * bb_std
+            bb_width = bb_upper - bb_lower
+            if bb_middle != 0:
+                bb_width = bb_width / bb_middle
+            bb_width_zscore = state.bb_width_hist.zscore(bb_width)
+            if state.pending_bb_width is not None:
+                state.bb_width_hist.push(state.pending_bb_width)
+            state.pending_bb_width = bb_width
+
+        # RSI（Wilder平滑，首值在第period+1个变化后产生）
+        rsi_zscore = 0.0
+        if prev is not None:
+            change = close - prev.close
+            gain = max(change, 0.0)
+            loss = abs(min(change, 0.0))
+            period = self.rsi_period
+            if state.avg_gain is None:
+                state.gain_seed += gain
+                state.loss_seed += loss
+                state.gain_count += 1
+                if state.gain_count == period:
+                    state.avg_gain = state.gain_seed / period
+                    state.avg_loss = state.loss_seed / period
+            else:
+                state.avg_gain = (state.avg_gain * (period - 1) + gain) / period
+                state.avg_loss = (state.avg_loss * (period - 1) + loss) / period
+                if state.avg_loss == 0:
+                    state.rsi = 100.0
+                else:
+                    rs = state.avg_gain / state.avg_loss
+                    state.rsi = 100.0 - (100.0 / (1.0 + rs))
+                rsi_zscore = state.rsi_hist.zscore(state.rsi)
+                state.rsi_hist.push(state.rsi)
+
+        # EMA 金叉/死叉与乖离
+        prev_fast = state.ema_fast
+        prev_slow = state.ema_slow
+        if prev_fast is None:
+            state.ema_fast = float(close)
+            state.ema_slow = float(close)
+        else:
+            k_fast = 2 / (self.ema_fast_period + 1)
+            k_slow = 2 / (self.ema_slow_period + 1)
+            state.ema_fast = float(close * k_fast + prev_fast * (1 - k_fast))
+            state.ema_slow = float(close * k_slow + prev_slow * (1 - k_slow))
+        ema_fast = state.ema_fast
+        ema_slow = state.ema_slow
+
+        ma_deviation = 0.0
+        if ema_slow != 0:
+            ma_deviation = (close - ema_slow) / ema_slow
+        ma_deviation_zscore = 0.0
+        if index > 0:
+            ma_deviation_zscore = state.ma_dev_hist.zscore(ma_deviation)
+            if ema_slow != 0:
+                state.ma_dev_hist.push(ma_deviation)
+
+        state.count += 1
+        state.last_timestamp = kline.timestamp
+        state.prev_kline = kline
+
+        if min(state.count, self.history_size) < self.required_count or state.atr is None:
+            return None
+
+        is_ma_bullish_cross = (prev_fast <= prev_slow) and (ema_fast > ema_slow)
+        is_ma_bearish_cross = (prev_fast >= prev_slow) and (ema_fast < ema_slow)
+
+        is_engulfing = is_engulfing_bar(kline, prev, require_body_engulf=self.engulfing_strict)
+        engulfing_type = get_engulfing_type(kline, prev, strict=self.engulfing_strict)
+        upper_wick_ratio, lower_wick_ratio = calculate_wick_ratios(kline)
+
+        rsi = state.rsi if state.rsi is not None else 0.0
+
+        return IndicatorValues(
+            symbol=symbol,
+            atr=state.atr,
+            atr_zscore=atr_zscore,
+            price_change_rate=price_change_rate,
+            price_change_zscore=price_change_zscore,
+            volume=volume,
+            volume_ma=state.volumes_ma.mean,
+            volume_zscore=volume_zscore,
+            stddev=state.closes_std.std,
+            is_engulfing=is_engulfing,
+            engulfing_type=engulfing_type,
+            rsi=rsi,
+            rsi_zscore=rsi_zscore,
+            is_rsi_overbought=rsi >= 70,
+            is_rsi_oversold=rsi <= 30,
+            ema_fast=ema_fast,
+            ema_slow=ema_slow,
+            is_ma_bullish_cross=is_ma_bullish_cross,
+            is_ma_bearish_cross=is_ma_bearish_cross,
+            ma_deviation=ma_deviation,
+            ma_deviation_zscore=ma_deviation_zscore,
+            bb_upper=bb_upper,
+            bb_middle=bb_middle,
+            bb_lower=bb_lower,
+            bb_width=bb_width,
+            bb_width_zscore=bb_width_zscore,
+            is_bb_breakout_upper=bb_ready and close > bb_upper,
+            is_bb_breakout_lower=bb_ready and close < bb_lower,
+            is_bb_squeeze=bb_width_zscore < -2.0,
+            upper_wick_ratio=upper_wick_ratio,
+            lower_wick_ratio=lower_wick_ratio,
+            is_long_upper_wick=upper_wick_ratio >= self.long_wick_ratio_threshold,
+            is_long_lower_wick=lower_wick_ratio >= self.long_wick_ratio_threshold,
+        )
@@ -121,12 +121,14 @@ def calculate_ema_list(values: List[float], period: int) -> List[float]:
     """计算EMA序列（用于检测金叉/死叉）
     
     使用Wilder平滑：EMA_t = value_t * k + EMA_{t-1} * (1-k)，其中k = 2/(period+1)
+    
+    values 可以是列表或NumPy数组。
     """
-    if not values:
+    if len(values) == 0:
         return []
     k = 2 / (period + 1)
     ema_values: List[float] = []
-    for i, v in enumerate(values):
+    for i, v in enumerate(np.asarray(values, dtype=np.float64).tolist()):
         if i == 0:
             ema_values.append(float(v))
         else:
@@ -146,17 +148,22 @@ def calculate_rsi(closes: List[float], period: int = 14) -> Optional[float]:
 
 
 def calculate_rsi_list(closes: List[float], period: int = 14) -> List[float]:
-    """计算RSI序列（用于Z-Score与趋势判断）"""
+    """计算RSI序列（用于Z-Score与趋势判断）
+    
+    closes 可以是列表或NumPy数组。
+    """
     if len(closes) < period + 1:
         return []
     # 计算每步涨跌幅
-    changes = [closes[i] - closes[i-1] for i in range(1, len(closes))]
-    gains = [max(c, 0.0) for c in changes]
-    losses = [abs(min(c, 0.0)) for c in changes]
+    changes = np.diff(np.asarray(closes, dtype=np.float64))
+    gains_arr = np.maximum(changes, 0.0)
+    losses_arr = np.abs(np.minimum(changes, 0.0))
     
     # 初始化平均涨跌
-    avg_gain = np.mean(gains[:period])
-    avg_loss = np.mean(losses[:period])
+    avg_gain = float(np.mean(gains_arr[:period]))
+    avg_loss = float(np.mean(losses_arr[:period]))
+    gains = gains_arr.tolist()
+    losses = losses_arr.tolist()
     
     rsi_values: List[float] = []
     # 从第 period+1 根开始滚动计算
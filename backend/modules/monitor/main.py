@@ -1,11 +1,11 @@
 """加密货币异动监控系统 - 主程序"""
+import dataclasses
 import signal
 import sys
 import time
 import os
 import json
-from typing import Dict, List
-from datetime import datetime, timezone
+from typing import Dict, List, Optional
 
 from modules.config.settings import load_config
 from modules.monitor.utils.logger import setup_logger, get_logger
@@ -14,24 +14,32 @@ from modules.monitor.clients.binance_ws import MultiConnectionManager
 from modules.monitor.core.exchange_manager import ExchangeManager
 from modules.monitor.core.initializer import SystemInitializer
 from modules.monitor.core.symbol_updater import SymbolUpdater
+from modules.monitor.core.bar_cycle import BarCycleCoordinator, BarCycleEvent
+from modules.monitor.core.oi_prefetcher import OIPrefetcher
+from modules.monitor.core.kline_queue import KlineWorkQueue
+from modules.monitor.core.kline_backfiller import KlineBackfiller
 from modules.monitor.data.kline_manager import KlineManager
-from modules.monitor.data.models import Kline, AnomalyResult
+from modules.monitor.data.oi_cache import OpenInterestCache
+from modules.monitor.data.kline_repository import get_kline_repository
+from modules.monitor.data.bar_aggregator import BarAggregator
+from modules.monitor.data.models import Kline, AnomalyResult, IndicatorValues
 from modules.monitor.indicators.calculator import IndicatorCalculator
+from modules.monitor.indicators.batch import BatchIndicatorCalculator
 from modules.monitor.detection.detector import AnomalyDetector
 from modules.monitor.alerts.manager import AlertManager
 from modules.monitor.alerts.notifier import EmailNotifier
-from modules.monitor.alerts.callbacks import create_send_alerts_callback
+from modules.monitor.alerts.callbacks import create_alert_pipeline, create_send_alerts_callback
+from modules.monitor.utils.helpers import interval_to_ms
+from modules.monitor.utils.metrics import configure_metrics, get_metrics_registry
 
 logger = None
 ws_manager = None
 symbol_updater = None
 
-_cycle_stats = {
-    'last_cycle_time': None,
-    'closed_count': 0,
-    'anomaly_count': 0,
-    'top_indicators': {},
-}
+# 热路径分阶段耗时（/api/system/metrics 与周期汇总日志）
+_metrics = get_metrics_registry()
+# 周期汇总日志输出的耗时阶段
+_SUMMARY_STAGES = ['queue.wait', 'bar.total', 'indicators.incremental', 'indicators.oi', 'detect', 'batch.total']
 
 
 def signal_handler(sig, frame):
@@ -54,14 +62,22 @@ def initialize_system(config: Dict):
     logger.info("加密货币异动监控系统启动")
     logger.info("=" * 60)
     
+    configure_metrics(config)
+    
     # 1. REST客户端
     logger.info("1. 初始化币安REST API...")
     rest_client = BinanceRestClient(config)
     logger.info("   ✓ API连接成功")
     
-    # 2. K线管理器
+    # 2. K线管理器（批量检测需要共享矩阵存储）
     logger.info("2. 初始化K线管理器...")
-    kline_manager = KlineManager(history_size=config['kline']['history_size'])
+    batch_config = config.get('detection', {}).get('batch_mode', {})
+    batch_enabled = batch_config.get('enabled', False)
+    kline_manager = KlineManager(
+        history_size=config['kline']['history_size'],
+        shared_matrix=batch_enabled or config['kline'].get('shared_matrix', False),
+        interval_ms=interval_to_ms(config['kline']['interval']),
+    )
     logger.info(f"   ✓ 保留{config['kline']['history_size']}根K线")
     
     # 3. 获取交易对
@@ -70,15 +86,30 @@ def initialize_system(config: Dict):
     symbols = exchange_manager.get_tradable_symbols()
     logger.info(f"   ✓ {len(symbols)}个USDT永续合约")
     
-    # 4. 加载历史数据
+    # 4. 加载历史数据（启用本地存储时只补齐上次关闭后缺失的部分）
     logger.info("4. 加载历史K线数据...")
-    initializer = SystemInitializer(rest_client, kline_manager, config)
+    # 本地K线仓库与Agent工具、回测共用（进程内单例）
+    kline_repository = get_kline_repository()
+    initializer = SystemInitializer(rest_client, kline_manager, config, repository=kline_repository)
     initializer.initialize_historical_data(symbols)
     logger.info(f"   ✓ 历史数据就绪")
     
-    # 5. 指标计算器
+    # 5. 指标计算器（持仓量由预取服务刷新，计算时只读缓存）
     logger.info("5. 初始化指标计算器...")
-    indicator_calculator = IndicatorCalculator(kline_manager, config, rest_client)
+    oi_config = config.get('open_interest', {})
+    oi_cache = None
+    if oi_config.get('enabled') and oi_config.get('prefetch', True):
+        oi_cache = OpenInterestCache()
+    oi_prefetcher = None
+    if oi_cache is not None:
+        # 预取模式：计算器不持有REST客户端，所有持仓量请求经预取服务限频
+        oi_prefetcher = OIPrefetcher(
+            rest_client, oi_cache, config,
+            get_symbols=lambda: _get_monitored_symbols(components),
+        )
+        indicator_calculator = IndicatorCalculator(kline_manager, config, oi_cache=oi_cache)
+    else:
+        indicator_calculator = IndicatorCalculator(kline_manager, config, rest_client)
     logger.info(f"   ✓ ATR={config['indicators']['atr_period']}, "
                 f"StdDev={config['indicators']['stddev_period']}, "
                 f"OI={'启用' if config.get('open_interest', {}).get('enabled') else '禁用'}")
@@ -90,9 +121,15 @@ def initialize_system(config: Dict):
     logger.info(f"   ✓ 双门槛机制: 核心A(ATR/PRICE/VOL/BB_WIDTH)>={thresholds['min_group_a']}, "
                 f"核心B(BB_BREAKOUT/OI/MA_DEV)>={thresholds['min_group_b']}")
     
+    # 6.1 跨交易对批量检测（可选）
+    batch_calculator = None
+    if batch_enabled:
+        batch_calculator = BatchIndicatorCalculator(kline_manager, config)
+        logger.info(f"   ✓ 批量检测: 周期到齐或超时{config['kline'].get('cycle_timeout_seconds', 2.0)}秒后统一检测")
+    
     # 7. 邮件通知器
     logger.info("7. 初始化QQ邮箱...")
-    notifier = EmailNotifier(config)
+    notifier = EmailNotifier(config, keep_alive=True)
     if notifier.is_enabled():
         notifier.send_test_email()
         logger.info(f"   ✓ {config['env']['smtp_user']}")
@@ -103,94 +140,384 @@ def initialize_system(config: Dict):
     logger.info("8. 初始化告警管理器...")
     alert_manager = AlertManager(config)
     
-    # 8.1 设置聚合告警回调（解耦）
-    alert_manager.set_send_callback(create_send_alerts_callback(notifier, config))
-    logger.info(f"   ✓ 防抖={config['alert'].get('debounce_seconds', 10)}秒")
+    # 8.1 设置聚合告警回调（解耦：JSONL/邮件/事件总线各自独立队列异步输出）
+    alert_pipeline = create_alert_pipeline(config, notifier)
+    alert_manager.set_send_callback(create_send_alerts_callback(alert_pipeline, config))
+    logger.info(f"   ✓ 防抖={config['alert'].get('debounce_seconds', 10)}秒, 输出: {', '.join(alert_pipeline.sink_names)}")
     
-    return {
+    components = {
         'config': config,
         'rest_client': rest_client,
         'kline_manager': kline_manager,
+        'kline_repository': kline_repository,
         'symbols': symbols,
         'initializer': initializer,
+        'backfiller': KlineBackfiller(rest_client, kline_manager, config),
         'indicator_calculator': indicator_calculator,
+        'batch_calculator': batch_calculator,
         'detector': detector,
         'alert_manager': alert_manager,
+        'alert_pipeline': alert_pipeline,
         'notifier': notifier,
+        'bar_cycle': None,
+        'oi_prefetcher': None,
+        'kline_queue': None,
+        'bar_aggregator': None,
     }
+    
+    # 订阅1m K线并合成监控周期及其他周期（合成周期收盘后写入K线仓库，供工具读取）
+    if config['websocket'].get('aggregate_from_1m', False):
+        intervals = [config['kline']['interval']] if config['kline']['interval'] != '1m' else []
+        intervals += list(config['kline'].get('aggregate_intervals', []))
+        components['bar_aggregator'] = BarAggregator(intervals, base_interval='1m')
+        logger.info(f"   ✓ 1m合成周期: {', '.join(components['bar_aggregator'].intervals)}")
+    
+    if oi_prefetcher is not None:
+        oi_prefetcher.start()
+        components['oi_prefetcher'] = oi_prefetcher
+    
+    # 周期收盘协调：订阅交易对全部处理完成或超时后发出周期事件（批量检测、周期汇总、告警立即发送）
+    bar_cycle = BarCycleCoordinator(
+        expected_symbols=lambda: _get_monitored_symbols(components),
+        interval_ms=interval_to_ms(config['kline']['interval']),
+        timeout_seconds=config['kline'].get('cycle_timeout_seconds', 2.0),
+    )
+    if batch_calculator is not None:
+        bar_cycle.subscribe(
+            lambda event: event.add_anomalies(process_bar_close_batch(event.symbols, components))
+        )
+    bar_cycle.subscribe(lambda event: _on_bar_cycle(event, components))
+    bar_cycle.start()
+    components['bar_cycle'] = bar_cycle
+    
+    # 接收与处理解耦：WebSocket线程只入队，工作线程池处理
+    ws_config = config['websocket']
+    if ws_config.get('process_queue', True):
+        kline_queue = KlineWorkQueue(
+            handler=lambda symbol, kline_data: process_kline(symbol, kline_data, components),
+            workers=ws_config.get('process_workers', 4),
+            capacity=ws_config.get('queue_capacity', 10000),
+        )
+        kline_queue.start()
+        components['kline_queue'] = kline_queue
+    
+    _register_metric_sources(components)
+    return components
 
 
-def _print_cycle_summary(config: Dict):
-    """打印周期汇总日志"""
-    global _cycle_stats
+def _register_metric_sources(components: Dict):
+    """登记组件指标来源（/api/system/metrics 快照时读取）"""
+    _metrics.register_source('rest_weight', components['rest_client'].governor.get_usage)
+    _metrics.register_source('alert_sinks', components['alert_pipeline'].get_metrics)
+    _metrics.register_source('alert_pending', lambda: {'count': components['alert_manager'].get_pending_count()})
+    _metrics.register_source('bar_cycle', components['bar_cycle'].get_last_event)
+    if components.get('kline_queue'):
+        _metrics.register_source('kline_queue', components['kline_queue'].get_metrics)
+    if components.get('oi_prefetcher'):
+        _metrics.register_source('oi_prefetcher', components['oi_prefetcher'].get_metrics)
+    if components.get('backfiller'):
+        _metrics.register_source('kline_backfill', components['backfiller'].get_metrics)
+
+
+def _unregister_metric_sources():
+    """注销组件指标来源（服务停止后不再引用已关闭的组件）"""
+    for name in ('rest_weight', 'alert_sinks', 'alert_pending', 'bar_cycle', 'kline_queue', 'oi_prefetcher',
+                 'kline_backfill'):
+        _metrics.unregister_source(name)
+
+
+def create_kline_callback(components: Dict):
+    """创建WebSocket K线回调（启用处理队列时只入队）"""
+    kline_queue = components.get('kline_queue')
+    if kline_queue is not None:
+        return kline_queue.put
+    
+    def on_kline_callback(symbol: str, kline_data: Dict):
+        process_kline(symbol, kline_data, components)
     
+    return on_kline_callback
+
+
+def create_realtime_callback(components: Dict):
+    """创建未收盘K线快速回调（只更新实时最低价，不构造Kline）
+    
+    Returns:
+        回调函数，未启用快速路径时返回None
+    """
+    if not components['config']['websocket'].get('fast_realtime_path', True):
+        return None
+    
+    kline_manager = components['kline_manager']
+    aggregator = components.get('bar_aggregator')
+    interval = components['config']['kline']['interval']
+    
+    def on_realtime_update(symbol: str, open_time: int, low: float, close: float):
+        kline_manager.update_realtime_low(symbol, low, open_time)
+    
+    def on_aggregated_realtime_update(symbol: str, open_time: int, low: float, close: float):
+        realtime = aggregator.realtime_low(symbol, interval, open_time, low)
+        if realtime is not None:
+            kline_manager.update_realtime_low(symbol, realtime[1], realtime[0])
+    
+    if aggregator is None or interval == aggregator.base_interval:
+        return on_realtime_update
+    return on_aggregated_realtime_update
+
+
+def get_stream_interval(config: Dict) -> str:
+    """WebSocket订阅周期（启用1m合成时订阅1m）"""
+    if config['websocket'].get('aggregate_from_1m', False):
+        return '1m'
+    return config['kline']['interval']
+
+
+def _get_monitored_symbols(components: Dict) -> List[str]:
+    """当前监控的交易对列表（动态更新器启动前使用初始列表）"""
+    if symbol_updater:
+        return symbol_updater.get_current_symbols()
+    return list(components['symbols'])
+
+
+def _print_cycle_summary(event: BarCycleEvent, config: Dict):
+    """打印周期汇总日志"""
     interval = config['kline']['interval']
-    closed = _cycle_stats['closed_count']
-    anomaly = _cycle_stats['anomaly_count']
     
-    if closed == 0:
+    if event.late:
+        logger.info(f"[{interval}周期] 迟到收盘={len(event.symbols)}个: {', '.join(event.symbols[:10])}")
         return
     
-    top_indicators = _cycle_stats['top_indicators']
-    top_3 = sorted(top_indicators.items(), key=lambda x: x[1], reverse=True)[:3]
+    top_3 = sorted(event.top_indicators.items(), key=lambda x: x[1], reverse=True)[:3]
     top_str = ', '.join([f"{k}={v}" for k, v in top_3]) if top_3 else "无"
     
-    logger.info(f"[{interval}周期] 收盘={closed}个, 异常={anomaly}个, 热门指标: {top_str}")
-    
-    _cycle_stats['closed_count'] = 0
-    _cycle_stats['anomaly_count'] = 0
-    _cycle_stats['top_indicators'] = {}
+    logger.info(f"[{interval}周期] 收盘={len(event.symbols)}个, 异常={event.anomaly_count}个, 热门指标: {top_str}")
+    logger.info(f"  收盘延迟: 首个{event.first_lag_ms:.0f}ms, 末个{event.last_lag_ms:.0f}ms, "
+                f"跨度{event.spread_ms:.0f}ms")
+    if event.missing:
+        more = f" 等{len(event.missing)}个" if len(event.missing) > 10 else ""
+        logger.warning(f"  超时未收盘: {', '.join(event.missing[:10])}{more}")
+    latency_str = _metrics.format_summary(_SUMMARY_STAGES)
+    if latency_str:
+        logger.info(f"  耗时: {latency_str}")
+
+
+def _on_bar_cycle(event: BarCycleEvent, components: Dict):
+    """周期事件：输出周期汇总，并立即发送本周期的告警（不再等待防抖到期）"""
+    config = components['config']
+    _print_cycle_summary(event, config)
+    if config['alert'].get('flush_on_cycle', True):
+        components['alert_manager'].flush()
 
 
 def process_kline(symbol: str, kline_data: Dict, components: Dict):
-    """处理K线数据"""
-    global _cycle_stats
-    
+    """处理K线数据（启用1m合成时先合成各周期）"""
     kline = Kline.from_dict(kline_data)
-    components['kline_manager'].update(symbol, kline)
+    aggregator = components.get('bar_aggregator')
+    if aggregator is None:
+        _process_interval_kline(symbol, kline, components)
+        return
+    
+    interval = components['config']['kline']['interval']
+    if interval == aggregator.base_interval:
+        _process_interval_kline(symbol, kline, components)
+    
+    repository = components.get('kline_repository')
+    for bar_interval, bar in aggregator.update(symbol, kline):
+        if bar_interval == interval:
+            _process_interval_kline(symbol, bar, components)
+        elif repository is not None:
+            if bar.is_closed:
+                repository.add(symbol, bar_interval, [bar])
+            else:
+                repository.update_open(symbol, bar_interval, bar)
+
+
+def _process_interval_kline(symbol: str, kline: Kline, components: Dict):
+    """处理监控周期的K线（更新窗口，收盘时检测）"""
+    with _metrics.timer('kline.update'):
+        components['kline_manager'].update(symbol, kline)
     
     if not kline.is_closed:
-        components['kline_manager'].update_realtime_low(symbol, kline.low)
+        components['kline_manager'].update_realtime_low(symbol, kline.low, kline.timestamp)
+        # 未收盘K线供工具查询（快速路径开启时不经过此处，由仓库按有效期缓存REST结果）
+        if components.get('kline_repository') is not None:
+            components['kline_repository'].update_open(symbol, components['config']['kline']['interval'], kline)
         return
     
-    components['kline_manager'].clear_realtime_low(symbol)
+    anomaly = None
+    with _metrics.timer('bar.total'):
+        ready = _prepare_closed_kline(symbol, kline, components)
+        if ready:
+            # 开启采样剖析时按间隔在 cProfile 下执行
+            anomaly = _metrics.profiler.sample(_process_closed_kline, symbol, kline, components)
+    
+    # 处理完成后登记到周期（全部到齐或超时后发出周期事件；跳过检测的交易对不参与批量检测）
+    if components.get('bar_cycle') is not None:
+        components['bar_cycle'].add(symbol, kline.timestamp, anomaly, skipped=not ready)
+
+
+def _prepare_closed_kline(symbol: str, kline: Kline, components: Dict) -> bool:
+    """收盘K线检测前的准备（清除实时最低价、补齐窗口缺口）
+    
+    Returns:
+        是否可以检测（窗口缺口补不齐时本周期不检测，避免用残缺窗口告警）
+    """
+    components['kline_manager'].clear_realtime_low(symbol, kline.timestamp)
+    
+    # 窗口有时间缺口（断线期间缺失K线）时先补齐
+    if components['kline_manager'].get_gap(symbol) is not None:
+        if not components['backfiller'].backfill(symbol):
+            logger.warning(f"{symbol}: K线缺口未补齐，跳过本周期检测")
+            return False
+    return True
+
+
+def _process_closed_kline(symbol: str, kline: Kline, components: Dict) -> Optional[AnomalyResult]:
+    """处理监控周期的收盘K线（写入仓库、计算指标并检测，窗口缺口已由 _prepare_closed_kline 补齐）
     
-    current_time = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M')
-    if _cycle_stats['last_cycle_time'] != current_time:
-        if _cycle_stats['last_cycle_time'] is not None:
-            _print_cycle_summary(components['config'] if 'config' in components else load_config())
-        _cycle_stats['last_cycle_time'] = current_time
+    Returns:
+        计入周期统计的异常（批量模式由周期事件统一检测，返回None）
+    """
+    if components.get('kline_repository') is not None:
+        components['kline_repository'].add(symbol, components['config']['kline']['interval'], [kline])
     
-    _cycle_stats['closed_count'] += 1
+    # 批量模式：由周期事件统一检测
+    if components.get('batch_calculator') is not None:
+        return None
     
-    indicators = components['indicator_calculator'].calculate_all(symbol)
+    with _metrics.timer('indicators.total'):
+        indicators = components['indicator_calculator'].calculate_all(symbol)
     if not indicators:
-        return
+        return None
     
-    anomaly = components['detector'].detect(indicators)
+    with _metrics.timer('detect'):
+        anomaly = components['detector'].detect(indicators)
+    if indicators.is_oi_stale:
+        _schedule_oi_recheck(indicators, kline, anomaly, components)
     if not anomaly:
-        return
+        return None
     
-    _cycle_stats['anomaly_count'] += 1
-    for ind in anomaly.triggered_indicators:
-        _cycle_stats['top_indicators'][ind] = _cycle_stats['top_indicators'].get(ind, 0) + 1
+    _handle_anomaly(symbol, anomaly, kline.close, components)
+    return anomaly
+
+
+def _schedule_oi_recheck(indicators: IndicatorValues, kline: Kline, anomaly: Optional[AnomalyResult],
+                         components: Dict, retries: int = 1):
+    """持仓量过期的收盘K线：向预取服务请求刷新，完成后补算持仓量指标并重新检测
+    
+    检测不等待持仓量请求；刷新后新增持仓量触发项时补发告警（未发送前替换待发送的同一交易对告警）。
+    
+    Args:
+        indicators: 首次检测使用的指标对象（持仓量已标记过期）
+        kline: 收盘K线
+        anomaly: 首次检测结果
+        retries: 刷新结果仍未覆盖本K线时（复用了收盘前的在途请求）的重试次数
+    """
+    prefetcher = components.get('oi_prefetcher')
+    if prefetcher is None:
+        return
+    future = prefetcher.request(indicators.symbol)
+    if future is None:
+        return
     
-    anomaly.price = kline.close
+    def on_done(_):
+        try:
+            refreshed = dataclasses.replace(indicators)
+            if not components['indicator_calculator'].refresh_open_interest(refreshed, kline.timestamp):
+                if retries > 0 and refreshed.is_oi_stale:
+                    _schedule_oi_recheck(indicators, kline, anomaly, components, retries - 1)
+                return
+            recheck = components['detector'].detect(refreshed)
+            if recheck is None:
+                return
+            if anomaly is None:
+                _handle_anomaly(recheck.symbol, recheck, kline.close, components)
+            elif set(recheck.triggered_indicators) - set(anomaly.triggered_indicators):
+                # 已告警的交易对不受冷却限制，更新为包含持仓量触发项的结果
+                recheck.price = kline.close
+                components['alert_manager'].add_alert(recheck)
+        except Exception as e:
+            logger.error(f"{indicators.symbol}: 持仓量补算失败: {e}", exc_info=True)
+    
+    future.add_done_callback(on_done)
+
+
+def process_bar_close_batch(symbols: List[str], components: Dict) -> List[AnomalyResult]:
+    """批量处理同一收盘周期的交易对
+    
+    窗口已满的交易对以矩阵方式一次性计算指标并做向量化初筛，
+    其余交易对（历史不足或刚加入）回退到逐个计算。
+    
+    Returns:
+        计入周期统计的异常列表
+    """
+    kline_manager = components['kline_manager']
+    calculator = components['indicator_calculator']
+    batch_calculator = components['batch_calculator']
+    detector = components['detector']
+    
+    start = time.perf_counter()
+    eligible, others = batch_calculator.split_eligible(symbols)
+    anomalies = []
+    
+    batch = batch_calculator.calculate(eligible)
+    _metrics.lap('batch.indicators', start)
+    # 持仓量过期的交易对，检测后交由预取服务刷新并补算
+    stale = []
+    if batch is None:
+        others = symbols
+    else:
+        oi_pending = calculator.has_oi_source()
+        
+        def build_indicators(index: int):
+            indicators = batch_calculator.to_indicator_values(batch, index)
+            if oi_pending:
+                latest_kline = kline_manager.get_latest_kline(indicators.symbol)
+                calculator.apply_open_interest(
+                    indicators, latest_kline.timestamp, batch.price_changes[index].tolist()
+                )
+                if indicators.is_oi_stale:
+                    stale.append(indicators)
+            return indicators
+        
+        anomalies.extend(detector.detect_batch(batch, build_indicators, oi_pending))
+    
+    for symbol in others:
+        indicators = calculator.calculate_all(symbol)
+        if indicators and indicators.is_oi_stale:
+            stale.append(indicators)
+        anomaly = detector.detect(indicators)
+        if anomaly:
+            anomalies.append(anomaly)
+    
+    for anomaly in anomalies:
+        _handle_anomaly(anomaly.symbol, anomaly, kline_manager.get_latest_kline(anomaly.symbol).close, components)
+    by_symbol = {anomaly.symbol: anomaly for anomaly in anomalies}
+    for indicators in stale:
+        _schedule_oi_recheck(indicators, kline_manager.get_latest_kline(indicators.symbol),
+                             by_symbol.get(indicators.symbol), components)
+    _metrics.lap('batch.total', start)
+    return anomalies
+
+
+def _handle_anomaly(symbol: str, anomaly: AnomalyResult, close_price: float, components: Dict):
+    """加入告警队列"""
+    anomaly.price = close_price
     
     if not components['alert_manager'].should_alert(symbol):
         return
     
-    components['alert_manager'].add_alert(anomaly)
+    with _metrics.timer('alert.enqueue'):
+        components['alert_manager'].add_alert(anomaly)
     
     # 记录日志
     stars = '⭐' * anomaly.anomaly_level
     engulfing_tag = f" [{anomaly.engulfing_type}]" if anomaly.engulfing_type != '非外包' else ""
     
     # 动态格式化价格
-    if kline.close >= 1:
-        price_str = f"${kline.close:,.4f}"
+    if close_price >= 1:
+        price_str = f"${close_price:,.4f}"
     else:
-        price_str = f"${kline.close:.8f}"
+        price_str = f"${close_price:.8f}"
     
     logger.warning(f"异常 {stars} {symbol} {price_str} ({anomaly.price_change_rate*100:+.2f}%){engulfing_tag} "
                    f"ATR={anomaly.atr_zscore:.1f} Price={anomaly.price_change_zscore:.1f} "
@@ -216,14 +543,12 @@ def main():
         # 初始化系统
         components = initialize_system(config)
         
-        # 创建WebSocket回调函数
-        def on_kline_callback(symbol: str, kline_data: Dict):
-            process_kline(symbol, kline_data, components)
-        
         # 9. 建立WebSocket
         logger.info("9. 建立WebSocket...")
-        ws_manager = MultiConnectionManager(config, on_kline_callback)
-        ws_manager.connect_all(components['symbols'], config['kline']['interval'])
+        ws_manager = MultiConnectionManager(
+            config, create_kline_callback(components), create_realtime_callback(components)
+        )
+        ws_manager.connect_all(components['symbols'], get_stream_interval(config))
         time.sleep(2)
         logger.info("   ✓ 连接成功")
         
@@ -232,6 +557,9 @@ def main():
         
         def on_symbols_changed(added: List[str], removed: List[str]):
             ws_manager.update_symbols(added, removed)
+            if components.get('bar_aggregator'):
+                for symbol in removed:
+                    components['bar_aggregator'].remove_symbol(symbol)
             if added:
                 components['initializer'].initialize_historical_data(added)
         
@@ -252,6 +580,17 @@ def main():
         while True:
             time.sleep(600)  # 每10分钟输出状态
             logger.info(f"运行中: {symbol_updater.get_symbol_count()}个交易对")
+            if components.get('kline_queue'):
+                queue_metrics = components['kline_queue'].get_metrics(reset_max=True)
+                logger.info(f"处理队列: 深度{queue_metrics['depth']}, "
+                            f"延迟{queue_metrics['last_lag_ms']:.0f}ms(最大{queue_metrics['max_lag_ms']:.0f}ms), "
+                            f"合并{queue_metrics['coalesced']}条")
+            if components.get('oi_prefetcher'):
+                oi_metrics = components['oi_prefetcher'].get_metrics()
+                logger.info(f"持仓量预取: 缓存{oi_metrics['cached_symbols']}个, "
+                            f"最大陈旧{oi_metrics['staleness_max_seconds']:.0f}秒, "
+                            f"延迟P95={oi_metrics['fetch_latency_p95_ms']:.0f}ms, "
+                            f"失败{oi_metrics['fetch_errors']}次")
     
     except KeyboardInterrupt:
         logger.info("用户中断")
@@ -259,10 +598,19 @@ def main():
         logger.error(f"系统错误: {e}", exc_info=True)
     finally:
         if 'components' in locals():
+            if components.get('oi_prefetcher'):
+                components['oi_prefetcher'].stop()
+            if components.get('kline_queue'):
+                components['kline_queue'].stop()
+            if components.get('bar_cycle'):
+                components['bar_cycle'].stop()
+            components['initializer'].persist(_get_monitored_symbols(components))
             components['alert_manager'].stop()
             pending = components['alert_manager'].force_send_pending()
             if pending:
-                components['notifier'].send_alert(pending)
+                components['alert_pipeline'].publish(pending)
+            components['alert_pipeline'].stop()
+            _unregister_metric_sources()
         
         if symbol_updater:
             symbol_updater.stop()
@@ -280,12 +628,11 @@ def run_monitor_service(is_stop_requested, add_log):
         
         components = initialize_system(config)
         
-        def on_kline_callback(symbol: str, kline_data: Dict):
-            process_kline(symbol, kline_data, components)
-        
         add_log("建立 WebSocket 连接...")
-        ws_manager = MultiConnectionManager(config, on_kline_callback)
-        ws_manager.connect_all(components['symbols'], config['kline']['interval'])
+        ws_manager = MultiConnectionManager(
+            config, create_kline_callback(components), create_realtime_callback(components)
+        )
+        ws_manager.connect_all(components['symbols'], get_stream_interval(config))
         time.sleep(2)
         add_log("WebSocket 连接成功")
         
@@ -293,6 +640,9 @@ def run_monitor_service(is_stop_requested, add_log):
         
         def on_symbols_changed(added: List[str], removed: List[str]):
             ws_manager.update_symbols(added, removed)
+            if components.get('bar_aggregator'):
+                for symbol in removed:
+                    components['bar_aggregator'].remove_symbol(symbol)
             if added:
                 components['initializer'].initialize_historical_data(added)
         
@@ -317,10 +667,19 @@ def run_monitor_service(is_stop_requested, add_log):
         raise
     finally:
         if 'components' in locals():
+            if components.get('oi_prefetcher'):
+                components['oi_prefetcher'].stop()
+            if components.get('kline_queue'):
+                components['kline_queue'].stop()
+            if components.get('bar_cycle'):
+                components['bar_cycle'].stop()
+            components['initializer'].persist(_get_monitored_symbols(components))
             components['alert_manager'].stop()
             pending = components['alert_manager'].force_send_pending()
             if pending:
-                components['notifier'].send_alert(pending)
+                components['alert_pipeline'].publish(pending)
+            components['alert_pipeline'].stop()
+            _unregister_metric_sources()
         
         if symbol_updater:
             symbol_updater.stop()
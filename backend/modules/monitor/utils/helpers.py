@@ -112,6 +112,32 @@ def retry_on_exception(max_retries: int = 5, delay: float = 1.0, exceptions: tup
     return decorator
 
 
+def interval_to_ms(interval: str) -> int:
+    """K线间隔转换为毫秒数
+    
+    Args:
+        interval: K线间隔（如 "1m"、"15m"、"4h"、"1d"）
+        
+    Returns:
+        毫秒数（无法识别的单位按15分钟处理）
+    """
+    unit = interval[-1]
+    value = int(interval[:-1])
+    
+    if unit == 'm':
+        return value * 60 * 1000
+    elif unit == 'h':
+        return value * 60 * 60 * 1000
+    elif unit == 'd':
+        return value * 24 * 60 * 60 * 1000
+    elif unit == 'w':
+        return value * 7 * 24 * 60 * 60 * 1000
+    elif unit == 'M':
+        return value * 30 * 24 * 60 * 60 * 1000  # 近似
+    else:
+        return 15 * 60 * 1000  # 默认15分钟
+
+
 def get_binance_kline_url(symbol: str, interval: str = '1m') -> str:
     """生成币安K线图表链接
     
@@ -0,0 +1,366 @@
+"""监控热路径耗时统计与运行时剖析
+
+- LatencyHistogram：HDR 风格的对数-线性分桶直方图（微秒整数，相对误差 ≤ 1/32），
+  记录为 O(1)，内存与样本数无关，可直接求任意分位数
+- MetricsRegistry：按阶段名称维护直方图（ws.parse、kline.update、indicators.*、detect 等），
+  并汇总各组件登记的指标来源（处理队列、告警输出等），供周期汇总日志与 /api/system/metrics 使用
+- Profiler：运行时开关的采样 cProfile（每 N 次收盘处理剖析一次）与 tracemalloc
+
+进程内共享实例见 get_metrics_registry()。
+"""
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+# 每个2的幂区间内的线性子桶数（2^6 = 64，上半区 32 个子桶，相对误差 ≤ 1/32）
+_SUB_BUCKET_BITS = 6
+_SUB_BUCKET_COUNT = 1 << _SUB_BUCKET_BITS
+_SUB_BUCKET_HALF = _SUB_BUCKET_COUNT >> 1
+
+SUMMARY_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+def _bucket_index(value: int) -> int:
+    if value < _SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - _SUB_BUCKET_BITS
+    return _SUB_BUCKET_COUNT + (shift - 1) * _SUB_BUCKET_HALF + (value >> shift) - _SUB_BUCKET_HALF
+
+
+def _bucket_bounds(index: int) -> tuple:
+    """桶覆盖的取值范围 [low, high]"""
+    if index < _SUB_BUCKET_COUNT:
+        return index, index
+    shift = (index - _SUB_BUCKET_COUNT) // _SUB_BUCKET_HALF + 1
+    top = (index - _SUB_BUCKET_COUNT) % _SUB_BUCKET_HALF + _SUB_BUCKET_HALF
+    return top << shift, ((top + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """延迟直方图（线程安全，单位微秒）"""
+
+    __slots__ = ('_counts', '_count', '_total', '_min', '_max', '_lock')
+
+    def __init__(self):
+        self._counts: List[int] = []
+        self._count = 0
+        self._total = 0
+        self._min = 0
+        self._max = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        """记录一次耗时（秒）"""
+        self.record_us(int(seconds * 1_000_000))
+
+    def record_us(self, value: int):
+        """记录一次耗时（微秒）"""
+        value = max(value, 0)
+        index = _bucket_index(value)
+        with self._lock:
+            counts = self._counts
+            if index >= len(counts):
+                counts.extend([0] * (index + 1 - len(counts)))
+            counts[index] += 1
+            if self._count == 0 or value < self._min:
+                self._min = value
+            if value > self._max:
+                self._max = value
+            self._count += 1
+            self._total += value
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _percentile(self, counts: List[int], count: int, percentile: float) -> int:
+        target = max(int(count * percentile / 100.0 + 0.5), 1)
+        seen = 0
+        for index, n in enumerate(counts):
+            seen += n
+            if seen >= target:
+                return _bucket_bounds(index)[1]
+        return self._max
+
+    def percentile(self, percentile: float) -> float:
+        """分位数（微秒，取所在桶上界，不超过最大值）"""
+        with self._lock:
+            if self._count == 0:
+                return 0.0
+            return float(min(self._percentile(self._counts, self._count, percentile), self._max))
+
+    def summary(self) -> Dict:
+        """汇总：次数、均值、最小/最大值与常用分位数（毫秒）"""
+        with self._lock:
+            count = self._count
+            if count == 0:
+                return {'count': 0}
+            result = {
+                'count': count,
+                'mean_ms': self._total / count / 1000.0,
+                'min_ms': self._min / 1000.0,
+                'max_ms': self._max / 1000.0,
+            }
+            for p in SUMMARY_PERCENTILES:
+                value = min(self._percentile(self._counts, count, p), self._max)
+                result[f"p{p:g}_ms".replace('.', '_')] = value / 1000.0
+            return result
+
+    def reset(self):
+        """清空"""
+        with self._lock:
+            self._counts = []
+            self._count = 0
+            self._total = 0
+            self._min = 0
+            self._max = 0
+
+
+class _StageTimer:
+    """阶段计时上下文"""
+
+    __slots__ = ('_histogram', '_start')
+
+    def __init__(self, histogram: LatencyHistogram):
+        self._histogram = histogram
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histogram.record(time.perf_counter() - self._start)
+        return False
+
+
+class _NullTimer:
+    """统计关闭时的空计时上下文"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Profiler:
+    """运行时开关的采样 cProfile 与 tracemalloc"""
+
+    def __init__(self):
+        self._profile: Optional[cProfile.Profile] = None
+        self._last_profile: Optional[cProfile.Profile] = None
+        self._sample_every = 10
+        self._calls = 0
+        self._sampled = 0
+        # cProfile 同一时刻只能剖析一个线程
+        self._profile_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._tracemalloc_owned = False
+
+    @property
+    def cprofile_enabled(self) -> bool:
+        return self._profile is not None
+
+    def start_cprofile(self, sample_every: int = 10):
+        """开启采样剖析（每 sample_every 次调用剖析一次，已开启时只更新采样间隔）"""
+        with self._state_lock:
+            self._sample_every = max(int(sample_every), 1)
+            if self._profile is None:
+                self._calls = 0
+                self._sampled = 0
+                self._profile = cProfile.Profile()
+
+    def stop_cprofile(self):
+        """关闭采样剖析（已收集的统计保留到下次开启）"""
+        with self._state_lock:
+            profile, self._profile = self._profile, None
+            self._last_profile = profile
+
+    def sample(self, func: Callable, *args, **kwargs):
+        """执行 func，命中采样时在 cProfile 下执行"""
+        profile = self._profile
+        if profile is None:
+            return func(*args, **kwargs)
+        self._calls += 1
+        if self._calls % self._sample_every or not self._profile_lock.acquire(blocking=False):
+            return func(*args, **kwargs)
+        try:
+            self._sampled += 1
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            self._profile_lock.release()
+
+    def cprofile_stats(self, top: int = 30, sort: str = 'cumulative') -> str:
+        """采样剖析结果（pstats 文本）"""
+        profile = self._profile or self._last_profile
+        if profile is None:
+            return ''
+        stream = io.StringIO()
+        with self._profile_lock:
+            try:
+                stats = pstats.Stats(profile, stream=stream)
+            except TypeError:
+                return ''  # 尚无采样
+            stats.sort_stats(sort).print_stats(top)
+        return stream.getvalue()
+
+    def start_tracemalloc(self, frames: int = 10):
+        """开启 tracemalloc（已由其他代码开启时沿用）"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._tracemalloc_owned = True
+
+    def stop_tracemalloc(self):
+        """关闭由本剖析器开启的 tracemalloc"""
+        if self._tracemalloc_owned and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._tracemalloc_owned = False
+
+    def tracemalloc_top(self, limit: int = 20) -> List[Dict]:
+        """按代码行汇总的内存分配排行"""
+        if not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        return [
+            {'location': str(stat.traceback[0]), 'size_kb': stat.size / 1024.0, 'count': stat.count}
+            for stat in snapshot.statistics('lineno')[:limit]
+        ]
+
+    def get_status(self) -> Dict:
+        """剖析开关与采样状态"""
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        return {
+            'cprofile': self.cprofile_enabled,
+            'sample_every': self._sample_every,
+            'sampled_calls': self._sampled,
+            'tracemalloc': tracemalloc.is_tracing(),
+            'traced_memory_kb': current / 1024.0,
+            'traced_peak_kb': peak / 1024.0,
+        }
+
+
+class MetricsRegistry:
+    """阶段耗时直方图与组件指标来源"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.profiler = Profiler()
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._sources: Dict[str, Callable[[], Dict]] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        """获取（或创建）阶段直方图"""
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.get(name)
+                if histogram is None:
+                    histogram = LatencyHistogram()
+                    self._histograms[name] = histogram
+        return histogram
+
+    def timer(self, name: str):
+        """阶段计时上下文（统计关闭时为空操作）"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self.histogram(name))
+
+    def record(self, name: str, seconds: float):
+        """记录一次阶段耗时（秒）"""
+        if self.enabled:
+            self.histogram(name).record(seconds)
+
+    def lap(self, name: str, start: float) -> float:
+        """记录从 start（perf_counter）到现在的耗时并返回当前时刻，用于分段计时"""
+        now = time.perf_counter()
+        if self.enabled:
+            self.histogram(name).record(now - start)
+        return now
+
+    def register_source(self, name: str, source: Callable[[], Dict]):
+        """登记组件指标来源（快照时调用）"""
+        with self._lock:
+            self._sources[name] = source
+
+    def unregister_source(self, name: str):
+        """注销组件指标来源"""
+        with self._lock:
+            self._sources.pop(name, None)
+
+    def snapshot(self) -> Dict:
+        """各阶段耗时汇总与组件指标"""
+        with self._lock:
+            histograms = dict(self._histograms)
+            sources = dict(self._sources)
+        components = {}
+        for name, source in sources.items():
+            try:
+                components[name] = source()
+            except Exception as e:
+                components[name] = {'error': str(e)}
+        return {
+            'enabled': self.enabled,
+            'stages': {name: histograms[name].summary() for name in sorted(histograms)},
+            'components': components,
+            'profiling': self.profiler.get_status(),
+        }
+
+    def format_summary(self, prefixes: Optional[List[str]] = None) -> str:
+        """单行耗时汇总（周期汇总日志使用）"""
+        parts = []
+        with self._lock:
+            items = sorted(self._histograms.items())
+        for name, histogram in items:
+            if prefixes and not any(name.startswith(p) for p in prefixes):
+                continue
+            summary = histogram.summary()
+            if summary['count'] == 0:
+                continue
+            parts.append(f"{name} P50={summary['p50_ms']:.2f}ms P99={summary['p99_ms']:.2f}ms")
+        return ' | '.join(parts)
+
+    def reset(self):
+        """清空所有直方图"""
+        with self._lock:
+            histograms = list(self._histograms.values())
+        for histogram in histograms:
+            histogram.reset()
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """获取进程内共享的指标注册表"""
+    return _registry
+
+
+def configure_metrics(config: Dict) -> MetricsRegistry:
+    """按配置设置共享注册表（metrics 节）
+
+    Args:
+        config: 配置字典
+
+    Returns:
+        共享的 MetricsRegistry
+    """
+    metrics_cfg = config.get('metrics', {})
+    _registry.enabled = metrics_cfg.get('enabled', True)
+    if metrics_cfg.get('cprofile', False):
+        _registry.profiler.start_cprofile(metrics_cfg.get('profile_sample_every', 10))
+    if metrics_cfg.get('tracemalloc', False):
+        _registry.profiler.start_tracemalloc()
+    return _registry
@@ -0,0 +1,149 @@
+"""请求限频"""
+import threading
+import time
+from collections import deque
+
+
+class SlidingWindowRateLimiter:
+    """滑动窗口限频器（线程安全）
+
+    任意 window_seconds 时间窗口内最多放行 max_requests 次请求，超出时阻塞等待。
+    """
+
+    def __init__(self, max_requests: int, window_seconds: float):
+        """初始化
+
+        Args:
+            max_requests: 窗口内最大请求数
+            window_seconds: 窗口长度（秒）
+        """
+        self.max_requests = max(int(max_requests), 1)
+        self.window_seconds = window_seconds
+        self._timestamps = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float = None) -> bool:
+        """获取一次请求配额
+
+        Args:
+            timeout: 最长等待秒数（None表示一直等待）
+
+        Returns:
+            是否获取成功
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._timestamps and now - self._timestamps[0] >= self.window_seconds:
+                    self._timestamps.popleft()
+                if len(self._timestamps) < self.max_requests:
+                    self._timestamps.append(now)
+                    return True
+                wait = self._timestamps[0] + self.window_seconds - now
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    def get_usage(self) -> int:
+        """当前窗口内已使用的请求数"""
+        with self._lock:
+            now = time.monotonic()
+            while self._timestamps and now - self._timestamps[0] >= self.window_seconds:
+                self._timestamps.popleft()
+            return len(self._timestamps)
+
+
+class RequestWeightGovernor:
+    """按请求权重限频（线程安全）
+
+    币安按IP、按自然分钟累计请求权重（默认 2400/分钟），超限返回 429，持续超限会被 418 封禁。
+    本地按分钟预扣权重，并用响应头 X-MBX-USED-WEIGHT-1M 校准（包含同IP其他进程的用量）；
+    收到 429/418 时按 Retry-After 暂停所有请求。同一进程内的客户端应共享同一实例。
+    """
+
+    def __init__(self, max_weight_per_minute: int = 2400, safety_ratio: float = 0.9):
+        """初始化
+
+        Args:
+            max_weight_per_minute: 交易所每分钟权重上限
+            safety_ratio: 本地预算占上限的比例（预留余量）
+        """
+        self.max_weight = max(int(max_weight_per_minute), 1)
+        self.budget = max(int(self.max_weight * safety_ratio), 1)
+        self._minute = 0
+        self._used = 0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _roll(self, now: float):
+        minute = int(now // 60)
+        if minute != self._minute:
+            self._minute = minute
+            self._used = 0
+
+    def acquire(self, weight: int = 1, timeout: float = None) -> bool:
+        """预扣请求权重（本分钟预算不足或处于暂停期时阻塞）
+
+        Args:
+            weight: 请求权重
+            timeout: 最长等待秒数（None表示一直等待）
+
+        Returns:
+            是否获取成功
+        """
+        weight = min(max(int(weight), 0), self.budget)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.time()
+                self._roll(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._used + weight <= self.budget:
+                    self._used += weight
+                    return True
+                else:
+                    wait = (self._minute + 1) * 60 - now
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(max(wait, 0.001))
+
+    def update_used_weight(self, used_weight: int):
+        """用服务端返回的本分钟已用权重校准
+
+        Args:
+            used_weight: X-MBX-USED-WEIGHT-1M 响应头的值
+        """
+        with self._lock:
+            self._roll(time.time())
+            if used_weight > self._used:
+                self._used = used_weight
+
+    def pause(self, seconds: float):
+        """暂停所有请求（收到 429/418 时调用）
+
+        Args:
+            seconds: 暂停秒数（Retry-After）
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.time() + seconds)
+
+    def get_usage(self) -> dict:
+        """当前分钟的权重使用情况"""
+        with self._lock:
+            now = time.time()
+            self._roll(now)
+            return {
+                'used': self._used,
+                'budget': self.budget,
+                'paused_seconds': max(self._paused_until - now, 0.0),
+            }
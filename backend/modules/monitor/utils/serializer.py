@@ -0,0 +1,90 @@
+"""JSON序列化后端
+
+行情解码与 JSONL 写入统一使用本模块。安装了 orjson 时使用 orjson，
+否则回退到标准库 json；两者输出均为不转义非ASCII字符的紧凑 JSON。
+
+也可通过 set_backend('json') 强制使用标准库（例如排查兼容性问题）。
+"""
+import json
+from typing import Any, Callable, Dict, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 取决于运行环境
+    orjson = None
+
+# orjson 的解码异常是 json.JSONDecodeError 的子类，调用方统一捕获此类型即可
+JSONDecodeError = json.JSONDecodeError
+
+
+def _std_dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def _std_loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def _orjson_dumps(obj: Any) -> str:
+        try:
+            return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode('utf-8')
+        except TypeError:
+            # orjson 不支持的类型（如自定义对象）交给标准库处理/报错
+            return _std_dumps(obj)
+
+    def _orjson_loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        return orjson.loads(data)
+
+
+_BACKENDS: Dict[str, tuple] = {'json': (_std_dumps, _std_loads)}
+if orjson is not None:
+    _BACKENDS['orjson'] = (_orjson_dumps, _orjson_loads)
+
+_backend_name = 'orjson' if orjson is not None else 'json'
+_dumps: Callable[[Any], str] = _BACKENDS[_backend_name][0]
+_loads: Callable[[Any], Any] = _BACKENDS[_backend_name][1]
+
+
+def set_backend(name: str):
+    """切换序列化后端
+
+    Args:
+        name: 'orjson' 或 'json'
+
+    Raises:
+        ValueError: 后端不可用
+    """
+    global _backend_name, _dumps, _loads
+    if name not in _BACKENDS:
+        raise ValueError(f"序列化后端不可用: {name}（可用: {', '.join(_BACKENDS)}）")
+    _backend_name = name
+    _dumps, _loads = _BACKENDS[name]
+
+
+def get_backend() -> str:
+    """当前序列化后端名称"""
+    return _backend_name
+
+
+def dumps(obj: Any) -> str:
+    """序列化为紧凑 JSON 字符串（不转义非ASCII字符）"""
+    return _dumps(obj)
+
+
+def dumps_line(obj: Any) -> str:
+    """序列化为一行 JSONL（含换行符）"""
+    return _dumps(obj) + '\n'
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """解析 JSON（str 或 bytes）
+
+    Raises:
+        JSONDecodeError: 格式错误
+    """
+    return _loads(data)
@@ -0,0 +1,88 @@
+"""JSON序列化后端吞吐对比（标准库 json vs orjson）
+
+- K线路径：解码收盘K线推送（BinanceWSClient._on_message 的 loads）
+- Trace写入：locked_append_jsonl 追加 workflow trace 事件（不 fsync）
+
+用法: python benchmarks/bench_serializer.py [--messages 20000] [--events 5000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor.utils import serializer
+from modules.agent.trade_simulator.utils.file_utils import locked_append_jsonl
+
+
+def make_kline_message(i: int) -> str:
+    symbol = f"SYM{i % 250}USDT"
+    return json.dumps({
+        "stream": f"{symbol.lower()}@kline_15m",
+        "data": {
+            "e": "kline", "E": 1700000123456 + i, "s": symbol,
+            "k": {
+                "t": 1700000100000, "T": 1700000999999, "s": symbol, "i": "15m",
+                "f": 100, "L": 200, "o": "1.2345", "c": "1.2400", "h": "1.2500", "l": "1.2300",
+                "v": "12345.6", "n": 100, "x": True, "q": "15000.1", "V": "6000.2", "Q": "7400.3", "B": "0",
+            },
+        },
+    }, separators=(',', ':'))
+
+
+def make_trace_event(i: int) -> dict:
+    return {
+        'type': 'tool_call', 'trace_id': f'tool_{i}', 'parent_id': 'node_1', 'run_id': 'wf_1',
+        'name': 'get_indicators', 'status': 'success', 'start_time': '2024-01-01T00:00:00+00:00',
+        'duration_ms': 123, 'payload': {'symbol': 'BTCUSDT', 'interval': '15m', 'note': '成交量异常放大'},
+        'output': {'rsi': 71.2, 'atr': [0.1 * k for k in range(20)]},
+    }
+
+
+def bench_decode(messages) -> float:
+    started = time.perf_counter()
+    for message in messages:
+        serializer.loads(message)
+    return len(messages) / (time.perf_counter() - started)
+
+
+def bench_trace(events) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'trace.jsonl')
+        started = time.perf_counter()
+        for event in events:
+            locked_append_jsonl(path, event, fsync=False)
+        return len(events) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--events', type=int, default=5000)
+    args = parser.parse_args()
+
+    messages = [make_kline_message(i) for i in range(args.messages)]
+    events = [make_trace_event(i) for i in range(args.events)]
+
+    results = {}
+    for backend in ('json', 'orjson'):
+        try:
+            serializer.set_backend(backend)
+        except ValueError:
+            print(f"{backend}: 未安装，跳过")
+            continue
+        results[backend] = (bench_decode(messages), bench_trace(events))
+        decode_rate, trace_rate = results[backend]
+        print(f"{backend:>6}: K线解码 {decode_rate:10,.0f} 条/秒 | Trace写入 {trace_rate:8,.0f} 条/秒")
+
+    if len(results) == 2:
+        print(f"orjson 提升: K线解码 {results['orjson'][0] / results['json'][0]:.2f}x, "
+              f"Trace写入 {results['orjson'][1] / results['json'][1]:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""WebSocket 未收盘K线处理耗时对比
+
+对比每条未收盘推送的两种处理方式（250个交易对 × 每秒4条推送的负载）：
+- 完整路径：json.loads + Kline.from_dict + KlineManager.update + update_realtime_low
+- 快速路径：parse_realtime_update + update_realtime_low
+
+用法: python benchmarks/bench_ws_parsing.py [--symbols 250] [--rounds 200]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor.clients.kline_fast_parser import parse_realtime_update
+from modules.monitor.data.kline_manager import KlineManager
+from modules.monitor.data.models import Kline
+
+
+def make_messages(symbol_count: int) -> list:
+    messages = []
+    for i in range(symbol_count):
+        symbol = f"SYM{i}USDT"
+        messages.append(json.dumps({
+            "stream": f"{symbol.lower()}@kline_15m",
+            "data": {
+                "e": "kline", "E": 1700000123456, "s": symbol,
+                "k": {
+                    "t": 1700000100000, "T": 1700000999999, "s": symbol, "i": "15m",
+                    "f": 100, "L": 200, "o": "1.2345", "c": "1.2400", "h": "1.2500", "l": "1.2300",
+                    "v": "12345.6", "n": 100, "x": False, "q": "15000.1", "V": "6000.2", "Q": "7400.3", "B": "0",
+                },
+            },
+        }, separators=(',', ':')))
+    return messages
+
+
+def full_path(messages, km):
+    for message in messages:
+        data = json.loads(message)
+        event = data['data']
+        kline = Kline.from_dict(event['k'])
+        km.update(event['s'], kline)
+        km.update_realtime_low(event['s'], kline.low, kline.timestamp)
+
+
+def fast_path(messages, km):
+    for message in messages:
+        symbol, open_time, low, close = parse_realtime_update(message)
+        km.update_realtime_low(symbol, low, open_time)
+
+
+def measure(func, messages, rounds: int) -> float:
+    km = KlineManager(history_size=100)
+    func(messages, km)  # 预热
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func(messages, km)
+    return (time.perf_counter() - started) / (rounds * len(messages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=250)
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    messages = make_messages(args.symbols)
+    full = measure(full_path, messages, args.rounds)
+    fast = measure(fast_path, messages, args.rounds)
+    per_second = args.symbols * 4
+
+    print(f"交易对: {args.symbols}, 推送: {per_second}条/秒")
+    print(f"完整路径: {full * 1e6:7.2f} µs/条, CPU占用 {full * per_second * 100:5.2f}%")
+    print(f"快速路径: {fast * 1e6:7.2f} µs/条, CPU占用 {fast * per_second * 100:5.2f}%")
+    print(f"节省: {(1 - fast / full) * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
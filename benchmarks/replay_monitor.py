@@ -0,0 +1,691 @@
+"""监控热路径回放基准
+
+把K线推送经真实的 BinanceWSClient._on_message → process_kline 路径回放（处理队列、指标计算、
+异常检测、告警管理器与输出管道均为生产组件），REST 客户端替换为本地替身（交易对列表与预加载
+历史来自回放数据，不访问网络）。推送来源三选一：
+- 合成：随机游走行情，按概率注入放量大波动K线以触发告警（默认）
+- 本地K线仓库（--store-dir）：每根已存储的K线展开为若干次未收盘更新 + 收盘帧
+- 录制帧（--frames）：每行一条组合流原始消息（与 on_message 收到的文本一致），预加载历史按首帧合成
+
+每个交易对规模在独立子进程中运行，输出：
+- 吞吐：推送条数 / 处理耗时（不含合成与按速度回放的等待）
+- 收盘延迟：收盘帧送入到告警发布到进程内事件总线的 P50/P99（默认防抖为0，只测处理链路）
+- 峰值内存：子进程 ru_maxrss
+默认关闭持仓量；--oi-latency-ms 开启持仓量预取并模拟接口延迟，每根K线收盘时缓存均未就绪，
+检测不等待持仓量，刷新完成后补算并补发告警（衡量持仓量延迟对收盘路径的影响）。
+每个规模默认运行3次，门禁指标取中位数。
+指定 --baseline 时与基线比较，吞吐下降或延迟/内存上升超出容差时以退出码1结束（回归门禁）。
+基线是录制机器上的绝对数值（make bench-baseline 重新录制），换机器或升级环境后应重新录制；
+为减小机器差异，每次运行在回放前后执行固定的校准负载（帧解析 + 数值计算），比较时吞吐与延迟的
+基线按 基线校准耗时 / 本次校准耗时 逐场景折算后再套用容差（内存不折算）。
+
+用法: python benchmarks/replay_monitor.py [--symbols 50,250,1000] [--bars 20] [--updates 4] [--speed 0]
+      [--repeat 3] [--frames FILE | --store-dir DIR] [--baseline FILE] [--tolerance 0.3] [--save-baseline FILE]
+      [--oi-latency-ms 0]
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.config.settings import load_config
+from modules.monitor import main as monitor_main
+from modules.monitor.alerts.sinks import get_alert_event_bus
+from modules.monitor.clients.binance_rest import get_weight_governor
+from modules.monitor.clients.binance_ws import BinanceWSClient
+from modules.monitor.data.kline_store import KlineStore
+from modules.monitor.utils.helpers import interval_to_ms
+from modules.monitor.utils.logger import setup_logger
+from modules.monitor.utils.metrics import LatencyHistogram, get_metrics_registry
+from modules.monitor.utils.serializer import loads
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# 合成行情的起始时间（UTC 2024-01-01）
+START_TIME = 1704067200000
+
+# 结果中保留的热路径阶段
+REPORT_STAGES = ['queue.wait', 'kline.update', 'bar.total', 'indicators.total', 'detect', 'alert.enqueue']
+
+# 回归门禁：指标 → 方向（1 越大越好，-1 越小越好）
+GATED_METRICS = {
+    'msgs_per_sec': 1,
+    'latency_p99_ms': -1,
+    'peak_rss_mb': -1,
+}
+# 延迟比较的绝对余量（毫秒），避免亚毫秒级抖动触发门禁
+LATENCY_SLACK_MS = 2.0
+# 按机器速度折算的指标（内存与机器速度无关，不折算）
+SPEED_SCALED_METRICS = {'msgs_per_sec', 'latency_p99_ms'}
+
+_FRAME = ('{{"stream":"{stream}@kline_{interval}","data":{{"e":"kline","E":{event_time},"s":"{symbol}",'
+          '"k":{{"t":{open_time},"T":{close_time},"s":"{symbol}","i":"{interval}","f":0,"L":0,'
+          '"o":"{o}","c":"{c}","h":"{h}","l":"{l}","v":"{v}","n":0,"x":{closed},'
+          '"q":"0","V":"0","Q":"0","B":"0"}}}}}}')
+
+# (事件时间, 原始消息, 收盘键)；收盘键为 (交易对, 收盘价)，未收盘帧为 None
+Frame = Tuple[int, str, Optional[Tuple[str, float]]]
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.8g}"
+
+
+def build_bar_frames(symbols: List[str], interval: str, open_time: int, interval_ms: int,
+                     bars: np.ndarray, updates: int) -> List[Frame]:
+    """一根K线的全部推送：updates 次未收盘更新（按进度插值）+ 收盘帧
+
+    Args:
+        symbols: 交易对列表
+        interval: K线周期
+        open_time: 开盘时间（毫秒）
+        interval_ms: 周期毫秒数
+        bars: (交易对数, 5) 的最终 OHLCV
+        updates: 每根K线的未收盘更新次数
+
+    Returns:
+        按事件时间排列的推送列表
+    """
+    o, h, l, c, v = bars.T
+    close_time = open_time + interval_ms - 1
+    frames = []
+    for step in range(updates + 1):
+        closed = step == updates
+        progress = (step + 1) / (updates + 1)
+        if closed:
+            ph, pl, pc, pv = h, l, c, v
+            event_time = open_time + interval_ms
+        else:
+            pc = o + (c - o) * progress
+            ph = np.maximum(o + (h - o) * progress, pc)
+            pl = np.minimum(o + (l - o) * progress, pc)
+            pv = v * progress
+            event_time = open_time + int(interval_ms * progress)
+        for i, symbol in enumerate(symbols):
+            close = _fmt(pc[i])
+            message = _FRAME.format(
+                stream=symbol.lower(), interval=interval, event_time=event_time, symbol=symbol,
+                open_time=open_time, close_time=close_time,
+                o=_fmt(o[i]), c=close, h=_fmt(ph[i]), l=_fmt(pl[i]), v=_fmt(pv[i]),
+                closed='true' if closed else 'false',
+            )
+            frames.append((event_time, message, (symbol, float(close)) if closed else None))
+    return frames
+
+
+def _in_progress_row(open_time: int, price: float) -> np.ndarray:
+    """回放首根K线的未收盘行（预加载时被当作当前周期丢弃）"""
+    return np.array([open_time, price, price, price, price, 0.0])
+
+
+class SyntheticSource:
+    """随机游走合成行情（按概率注入放量大波动K线以触发告警）"""
+
+    def __init__(self, symbol_count: int, interval: str, warmup: int, bars: int, updates: int,
+                 anomaly_rate: float, seed: int = 7):
+        self.interval = interval
+        self.interval_ms = interval_to_ms(interval)
+        self.symbols = [f"SYM{i}USDT" for i in range(symbol_count)]
+        self.bars = bars
+        self.updates = updates
+        self.anomaly_rate = anomaly_rate
+        self._rng = np.random.default_rng(seed)
+        self._sigma = self._rng.uniform(0.003, 0.012, symbol_count)
+        self._base_volume = self._rng.lognormal(8.0, 1.0, symbol_count)
+        self._price = self._rng.uniform(0.05, 500.0, symbol_count)
+
+        history = np.empty((symbol_count, warmup + 1, 6))
+        for i in range(warmup):
+            history[:, i, 0] = START_TIME + i * self.interval_ms
+            history[:, i, 1:] = self._next_bar(0.0)
+        self.replay_start = START_TIME + warmup * self.interval_ms
+        for index in range(symbol_count):
+            history[index, warmup] = _in_progress_row(self.replay_start, self._price[index])
+        self.history = {symbol: history[index] for index, symbol in enumerate(self.symbols)}
+
+    def _next_bar(self, anomaly_rate: float) -> np.ndarray:
+        """所有交易对的下一根K线 (交易对数, 5)"""
+        rng = self._rng
+        n = len(self._price)
+        returns = rng.standard_normal(n) * self._sigma
+        volume = self._base_volume * rng.lognormal(0.0, 0.4, n)
+        if anomaly_rate > 0:
+            mask = rng.random(n) < anomaly_rate
+            count = int(mask.sum())
+            returns[mask] = np.sign(rng.standard_normal(count)) * self._sigma[mask] * rng.uniform(6, 10, count)
+            volume[mask] *= rng.uniform(5, 12, count)
+        o = self._price
+        c = o * (1 + returns)
+        h = np.maximum(o, c) * (1 + np.abs(rng.standard_normal(n)) * self._sigma * 0.5)
+        l = np.minimum(o, c) * (1 - np.abs(rng.standard_normal(n)) * self._sigma * 0.5)
+        self._price = c
+        return np.column_stack([o, h, l, c, volume])
+
+    def iter_batches(self) -> Iterator[List[Frame]]:
+        """逐根K线生成推送"""
+        for b in range(self.bars):
+            open_time = self.replay_start + b * self.interval_ms
+            yield build_bar_frames(self.symbols, self.interval, open_time, self.interval_ms,
+                                   self._next_bar(self.anomaly_rate), self.updates)
+
+
+class StoreSource:
+    """本地K线仓库中的历史K线（最近 bars 根用于回放，之前的用于预加载）"""
+
+    def __init__(self, store_dir: str, symbol_count: int, interval: str, warmup: int, bars: int, updates: int):
+        self.interval = interval
+        self.interval_ms = interval_to_ms(interval)
+        self.updates = updates
+        self.bars = bars
+        store = KlineStore(store_dir)
+        folder = os.path.join(store_dir, interval)
+        names = sorted(name[:-4] for name in os.listdir(folder) if name.endswith('.bin'))
+        rows = {}
+        for symbol in names:
+            data = store.read_rows(symbol, interval)
+            if len(data) >= warmup + bars:
+                rows[symbol] = data[-(warmup + bars):, :6]
+            if len(rows) == symbol_count:
+                break
+        if not rows:
+            raise ValueError(f"{folder} 中没有至少 {warmup + bars} 根K线的交易对")
+        self.symbols = list(rows)
+        self._rows = np.stack([rows[s] for s in self.symbols])
+        self.history = {}
+        for index, symbol in enumerate(self.symbols):
+            first = self._rows[index, warmup]
+            self.history[symbol] = np.vstack([self._rows[index, :warmup], _in_progress_row(int(first[0]), first[1])])
+        self._warmup = warmup
+
+    def iter_batches(self) -> Iterator[List[Frame]]:
+        """逐根K线展开推送（各交易对按同一序号对齐）"""
+        for b in range(self.bars):
+            column = self._rows[:, self._warmup + b]
+            open_time = int(column[:, 0].max())
+            yield build_bar_frames(self.symbols, self.interval, open_time, self.interval_ms,
+                                   column[:, 1:6], self.updates)
+
+
+class RecordedSource:
+    """录制的组合流原始消息（每行一条，按文件顺序回放）"""
+
+    def __init__(self, path: str, warmup: int, chunk_size: int = 5000, seed: int = 7):
+        self.path = path
+        self.chunk_size = chunk_size
+        first = {}
+        self.interval = None
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                kline = self._parse(line)
+                if kline is None:
+                    continue
+                self.interval = self.interval or kline['i']
+                first.setdefault(kline['s'], (int(kline['t']), float(kline['o'])))
+        if not first:
+            raise ValueError(f"{path} 中没有K线推送")
+        self.interval_ms = interval_to_ms(self.interval)
+        self.symbols = sorted(first)
+
+        # 首帧之前的预加载历史：以首帧开盘价为终点反向随机游走
+        rng = np.random.default_rng(seed)
+        self.history = {}
+        for symbol in self.symbols:
+            open_time, price = first[symbol]
+            closes = price * np.exp(np.cumsum(rng.standard_normal(warmup) * 0.006))[::-1]
+            opens = np.concatenate([[closes[0]], closes[:-1]])
+            wick = 1 + np.abs(rng.standard_normal(warmup)) * 0.003
+            rows = np.column_stack([
+                open_time - (warmup - np.arange(warmup)) * self.interval_ms,
+                opens,
+                np.maximum(opens, closes) * wick,
+                np.minimum(opens, closes) / wick,
+                closes,
+                rng.lognormal(8.0, 1.0, warmup),
+            ])
+            self.history[symbol] = np.vstack([rows, _in_progress_row(open_time, price)])
+
+    @staticmethod
+    def _parse(line: str) -> Optional[Dict]:
+        line = line.strip()
+        if not line:
+            return None
+        event = loads(line).get('data', {})
+        return event.get('k') if event.get('e') == 'kline' else None
+
+    def iter_batches(self) -> Iterator[List[Frame]]:
+        """按块读取录制帧（解析收盘键的耗时不计入处理耗时）"""
+        batch = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                event = loads(line).get('data', {})
+                kline = event.get('k') if event.get('e') == 'kline' else None
+                key = (kline['s'], float(kline['c'])) if kline and kline.get('x') else None
+                batch.append((int(event.get('E', 0)), line, key))
+                if len(batch) >= self.chunk_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+
+class ReplayRestClient:
+    """BinanceRestClient 的本地替身：交易对列表与K线来自回放数据，持仓量按预加载历史合成"""
+
+    def __init__(self, config: Dict, history: Dict[str, np.ndarray], interval_ms: int, oi_latency: float = 0.0):
+        self.config = config
+        self.history = history
+        self.interval_ms = interval_ms
+        self.oi_latency = oi_latency
+        self.governor = get_weight_governor('replay://local')
+
+    def get_all_usdt_perpetual_symbols(self, min_volume_24h: float = 0) -> List[str]:
+        return list(self.history)
+
+    def get_klines(self, symbol: str, interval: str, limit: int = 500,
+                   start_time: Optional[int] = None, end_time: Optional[int] = None) -> List[List]:
+        rows = self.history.get(symbol)
+        if rows is None:
+            return []
+        if start_time is not None:
+            rows = rows[rows[:, 0] >= start_time]
+        if end_time is not None:
+            rows = rows[rows[:, 0] <= end_time]
+        rows = rows[:limit] if start_time is not None else rows[-limit:]
+        return [
+            [int(t), _fmt(o), _fmt(h), _fmt(l), _fmt(c), _fmt(v), int(t) + self.interval_ms - 1,
+             '0', 0, '0', '0', '0']
+            for t, o, h, l, c, v in rows.tolist()
+        ]
+
+    def get_open_interest_hist(self, symbol: str, period: str, limit: int = 30,
+                               start_time: Optional[int] = None, end_time: Optional[int] = None) -> List[Dict]:
+        rows = self.history.get(symbol)
+        if rows is None:
+            return []
+        time.sleep(self.oi_latency)
+        return [
+            {'sumOpenInterest': _fmt(1000.0 + i), 'sumOpenInterestValue': _fmt(5000.0 + i), 'timestamp': int(t)}
+            for i, t in enumerate(rows[-limit:, 0].tolist())
+        ]
+
+    def close(self):
+        pass
+
+
+def make_source(options: Dict, config: Dict):
+    """按选项创建推送来源"""
+    warmup = config['kline']['warmup_size']
+    interval = config['kline']['interval']
+    if options.get('frames'):
+        return RecordedSource(options['frames'], warmup)
+    if options.get('store_dir'):
+        return StoreSource(options['store_dir'], options['symbols'], interval, warmup,
+                           options['bars'], options['updates'])
+    return SyntheticSource(options['symbols'], interval, warmup, options['bars'], options['updates'],
+                           options['anomaly_rate'])
+
+
+def make_config(options: Dict, jsonl_path: str) -> Dict:
+    """基准配置：在 config.yaml 基础上关闭网络与持久化相关功能
+
+    就地修改已加载的全局配置，K线仓库等读取全局配置的单例也随之关闭。
+    """
+    config = load_config()
+    config['env']['email_enabled'] = False
+    config['kline']['store_enabled'] = False
+    config['alert']['send_email'] = False
+    config['alert']['cooldown_minutes'] = 0
+    config['alert']['debounce_seconds'] = options['debounce']
+    config['alert']['event_bus_enabled'] = True
+    config['agent']['alerts_jsonl_path'] = jsonl_path
+    # 持仓量预取按真实时间对齐周期边界，默认关闭；模拟接口延迟时开启（不限频，缓存按K线清空）
+    if options.get('oi_latency_ms', 0) > 0:
+        config['open_interest'].update({'enabled': True, 'prefetch': True, 'rate_limit_per_5min': 10 ** 9})
+    else:
+        config['open_interest']['enabled'] = False
+    # 回放按监控周期推送，不经1m合成
+    config['websocket']['aggregate_from_1m'] = False
+    config['symbols']['exclude'] = []
+    config['metrics']['enabled'] = True
+    return config
+
+
+def _wait_idle(components: Dict):
+    """等待处理队列清空（含正在处理的消息）"""
+    kline_queue = components.get('kline_queue')
+    if kline_queue is None:
+        return
+    while kline_queue.get_metrics()['pending_symbols']:
+        time.sleep(0.0005)
+
+
+def _wait_alerts(alert_manager, debounce: float):
+    """等待防抖到期的告警发出（最多等待 防抖 + 2 秒）"""
+    deadline = time.monotonic() + debounce + 2.0
+    while alert_manager.get_pending_count() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 为 KB，macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_replay(options: Dict) -> Dict:
+    """在当前进程中回放一个场景
+
+    Args:
+        options: 场景选项（symbols/bars/warmup_bars/updates/speed/debounce/anomaly_rate/frames/store_dir/log_level）
+
+    Returns:
+        场景结果
+    """
+    setup_logger().setLevel(getattr(logging, options['log_level'].upper(), logging.ERROR))
+    monitor_main.logger = setup_logger()
+    calibration = calibrate()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config = make_config(options, os.path.join(tmp_dir, 'alerts.jsonl'))
+        source = make_source(options, config)
+        config['kline']['interval'] = source.interval
+
+        # 初始化使用本地替身代替币安REST客户端
+        oi_latency = options.get('oi_latency_ms', 0) / 1000.0
+        monitor_main.BinanceRestClient = lambda cfg: ReplayRestClient(cfg, source.history, source.interval_ms,
+                                                                      oi_latency)
+        components = monitor_main.initialize_system(config)
+        registry = get_metrics_registry()
+        registry.reset()
+
+        closed_at: Dict[Tuple[str, float], float] = {}
+        latency = LatencyHistogram()
+        unmatched = [0]
+
+        def on_record(record: Dict):
+            now = time.perf_counter()
+            for entry in record.get('entries', []):
+                fed = closed_at.get((entry['symbol'], entry['price']))
+                if fed is None:
+                    unmatched[0] += 1
+                else:
+                    latency.record(now - fed)
+
+        bus = get_alert_event_bus()
+        bus.subscribe(on_record)
+        client = BinanceWSClient(config, monitor_main.create_kline_callback(components),
+                                 monitor_main.create_realtime_callback(components))
+
+        speed = options['speed']
+        messages = 0
+        closed = 0
+        busy = 0.0
+        first_event = None
+        wall_start = time.perf_counter()
+        alert_manager = components['alert_manager']
+        oi_prefetcher = components.get('oi_prefetcher')
+        for index, batch in enumerate(source.iter_batches()):
+            if oi_prefetcher is not None:
+                # 缓存按真实时间判断是否覆盖收盘，清空后每根K线收盘时持仓量均未就绪
+                for symbol in source.symbols:
+                    oi_prefetcher.cache.remove(symbol)
+            if index == options['warmup_bars']:
+                # 预热K线（增量指标引擎首次收盘时全量初始化）不计入结果
+                _wait_alerts(alert_manager, options['debounce'])
+                registry.reset()
+                latency.reset()
+                messages = closed = 0
+                busy = 0.0
+            started = time.perf_counter()
+            slept = 0.0
+            for event_time, message, key in batch:
+                if speed > 0:
+                    if first_event is None:
+                        first_event = event_time
+                        wall_start = time.perf_counter()
+                    delay = wall_start + (event_time - first_event) / 1000.0 / speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                        slept += delay
+                if key is not None:
+                    closed_at[key] = time.perf_counter()
+                    closed += 1
+                client._on_message(None, message)
+            messages += len(batch)
+            _wait_idle(components)
+            busy += time.perf_counter() - started - slept
+
+        # 等待防抖到期的告警发出，剩余的强制发出后关闭输出管道
+        _wait_alerts(alert_manager, options['debounce'])
+        if components.get('kline_queue'):
+            components['kline_queue'].stop()
+        if components.get('bar_cycle'):
+            components['bar_cycle'].stop()
+        if oi_prefetcher is not None:
+            oi_prefetcher.stop()
+        pending = alert_manager.force_send_pending()
+        pipeline = components['alert_pipeline']
+        if pending:
+            pipeline.publish(pending)
+        pipeline.stop()
+        bus.unsubscribe(on_record)
+
+        stages = registry.snapshot()['stages']
+        summary = latency.summary()
+        # 回放前后各校准一次，取较快者，反映本次运行期间的机器速度
+        calibration = min(calibration, calibrate())
+        return {
+            'symbols': len(source.symbols),
+            'messages': messages,
+            'closed_bars': closed,
+            'alerts': summary['count'],
+            'unmatched_alerts': unmatched[0],
+            'busy_seconds': busy,
+            'msgs_per_sec': messages / busy if busy > 0 else 0.0,
+            'latency_p50_ms': summary.get('p50_ms', 0.0),
+            'latency_p99_ms': summary.get('p99_ms', 0.0),
+            'latency_max_ms': summary.get('max_ms', 0.0),
+            'peak_rss_mb': _peak_rss_mb(),
+            'calibration_seconds': calibration,
+            'stages': {
+                name: {key: stages[name][key] for key in ('count', 'p50_ms', 'p99_ms')}
+                for name in REPORT_STAGES if stages.get(name, {}).get('count')
+            },
+        }
+
+
+def run_scenario(options: Dict, isolated: bool = True) -> Dict:
+    """运行一个场景（默认在独立子进程中运行，峰值内存互不影响）"""
+    if not isolated:
+        return run_replay(options)
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_replay, options).result()
+
+
+def calibrate(rounds: int = 5, iterations: int = 2000) -> float:
+    """运行固定的校准负载（帧解析 + 滑动窗口数值计算，与热路径的主要开销同类）
+
+    Args:
+        rounds: 运行轮数（取最快一轮，排除偶发干扰）
+        iterations: 每轮处理的帧数
+
+    Returns:
+        单轮耗时（秒）
+    """
+    message = _FRAME.format(stream='btcusdt', interval='1m', event_time=START_TIME, symbol='BTCUSDT',
+                            open_time=START_TIME, close_time=START_TIME + 59999,
+                            o='42000.1', c='42010.5', h='42020.0', l='41990.2', v='12.345', closed='true')
+    closes = np.random.default_rng(7).normal(42000.0, 10.0, 500)
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        zscore = 0.0
+        for index in range(iterations):
+            kline = loads(message)['data']['k']
+            closes[index % len(closes)] = float(kline['c'])
+            window = closes[-100:]
+            zscore += (window[-1] - window.mean()) / (window.std() + 1e-12)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def machine_info() -> Dict:
+    """录制基线的机器信息（仅用于提示基线是否来自同一环境）"""
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def median_result(runs: List[Dict]) -> Dict:
+    """多次运行取中位数（门禁指标逐项取中位数，其余字段取吞吐居中的一次）"""
+    runs = sorted(runs, key=lambda r: r['msgs_per_sec'])
+    result = dict(runs[len(runs) // 2])
+    for metric in list(GATED_METRICS) + ['calibration_seconds']:
+        values = [r[metric] for r in runs if r.get(metric) is not None]
+        if values:
+            result[metric] = float(np.median(values))
+    result['runs'] = len(runs)
+    return result
+
+
+def speed_ratio(result: Dict, expected: Dict) -> float:
+    """本次运行相对录制基线时的机器速度（基线校准耗时 / 本次校准耗时，缺少校准时为1）"""
+    current, reference = result.get('calibration_seconds'), expected.get('calibration_seconds')
+    if not current or not reference:
+        return 1.0
+    return reference / current
+
+
+def compare_with_baseline(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """与基线比较
+
+    吞吐基线乘以机器速度比、延迟基线除以机器速度比后再套用容差。
+
+    Args:
+        results: 本次结果（交易对规模 → 场景结果）
+        baseline: 基线结果（同结构）
+        tolerance: 允许的相对退化比例
+
+    Returns:
+        回归描述列表（为空表示通过）
+    """
+    regressions = []
+    for scenario, result in results.items():
+        expected = baseline.get(scenario)
+        if expected is None:
+            continue
+        ratio = speed_ratio(result, expected)
+        for metric, direction in GATED_METRICS.items():
+            current, reference = result.get(metric), expected.get(metric)
+            if current is None or reference is None:
+                continue
+            if metric in SPEED_SCALED_METRICS:
+                reference = reference * ratio if direction > 0 else reference / ratio
+            if direction > 0:
+                limit = reference * (1 - tolerance)
+                failed = current < limit
+            else:
+                limit = reference * (1 + tolerance)
+                if metric.startswith('latency'):
+                    limit += LATENCY_SLACK_MS
+                failed = current > limit
+            if failed:
+                regressions.append(f"{scenario}个交易对 {metric}: {current:.2f}"
+                                   f"（折算基线 {reference:.2f}，速度比 {ratio:.2f}x，界限 {limit:.2f}）")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', default='50,250,1000', help='交易对规模（逗号分隔）')
+    parser.add_argument('--bars', type=int, default=20, help='回放K线根数（录制帧来源不使用）')
+    parser.add_argument('--warmup-bars', type=int, default=1, help='不计入结果的预热K线根数')
+    parser.add_argument('--updates', type=int, default=4, help='每根K线的未收盘更新次数')
+    parser.add_argument('--speed', type=float, default=0.0, help='回放倍速（1=按事件时间实时回放，0=尽快）')
+    parser.add_argument('--repeat', type=int, default=3, help='每个规模运行次数（取中位数）')
+    parser.add_argument('--debounce', type=float, default=0.0, help='告警防抖秒数（默认0，只测处理链路）')
+    parser.add_argument('--anomaly-rate', type=float, default=0.02, help='合成行情每根K线的异动概率')
+    parser.add_argument('--frames', help='录制帧文件（每行一条组合流原始消息）')
+    parser.add_argument('--store-dir', help='本地K线仓库目录')
+    parser.add_argument('--baseline', help='基线结果文件（超出容差时退出码为1）')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='允许的相对退化比例')
+    parser.add_argument('--save-baseline', help='把本次结果写为基线文件')
+    parser.add_argument('--json', help='把本次结果写入 JSON 文件')
+    parser.add_argument('--in-process', action='store_true', help='不启动子进程（调试用，峰值内存不可比）')
+    parser.add_argument('--oi-latency-ms', type=float, default=0.0,
+                        help='开启持仓量预取并模拟接口延迟（毫秒，默认0关闭持仓量）')
+    parser.add_argument('--log-level', default='ERROR')
+    args = parser.parse_args()
+
+    counts = [0] if args.frames else [int(s) for s in args.symbols.split(',') if s.strip()]
+    results = {}
+    for count in counts:
+        options = {
+            'symbols': count, 'bars': args.bars, 'warmup_bars': args.warmup_bars, 'updates': args.updates,
+            'speed': args.speed, 'debounce': args.debounce, 'anomaly_rate': args.anomaly_rate, 'frames': args.frames,
+            'store_dir': args.store_dir, 'oi_latency_ms': args.oi_latency_ms, 'log_level': args.log_level,
+        }
+        result = median_result([run_scenario(options, isolated=not args.in_process) for _ in range(args.repeat)])
+        results[str(result['symbols'])] = result
+        rss = f"{result['peak_rss_mb']:.0f}MB" if result['peak_rss_mb'] is not None else '-'
+        print(f"交易对 {result['symbols']:5d}: {result['msgs_per_sec']:9.0f} 条/秒, "
+              f"收盘→告警 P50={result['latency_p50_ms']:.2f}ms P99={result['latency_p99_ms']:.2f}ms "
+              f"({result['alerts']}条告警), 峰值内存 {rss}, 校准 {result['calibration_seconds'] * 1000:.1f}ms")
+        for name, stage in result['stages'].items():
+            print(f"    {name:18s} P50={stage['p50_ms']:.3f}ms P99={stage['p99_ms']:.3f}ms")
+
+    output = {
+        'options': {'bars': args.bars, 'warmup_bars': args.warmup_bars, 'updates': args.updates,
+                    'speed': args.speed, 'debounce': args.debounce, 'anomaly_rate': args.anomaly_rate},
+        'machine': machine_info(),
+        'scenarios': results,
+    }
+    if args.oi_latency_ms:
+        output['options']['oi_latency_ms'] = args.oi_latency_ms
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(output, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('options') != output['options']:
+            print(f"警告: 基线选项 {baseline.get('options')} 与本次不同，比较结果仅供参考")
+        if baseline.get('machine') != output['machine']:
+            print("警告: 基线录制于其他机器/环境，吞吐与延迟按校准负载折算，建议在本机运行 make bench-baseline 重新录制")
+        regressions = compare_with_baseline(results, baseline.get('scenarios', {}), args.tolerance)
+        if regressions:
+            print("性能回归:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"与基线比较通过（容差 {args.tolerance:.0%}）")
+
+
+if __name__ == '__main__':
+    main()
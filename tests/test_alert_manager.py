@@ -0,0 +1,85 @@
+"""告警管理器测试：
+- 一批告警只由单个调度线程防抖后合并发送一次
+- 超出 max_batch_size 时按 anomaly_level 优先保留
+- 停止后 force_send_pending 取出尚未发送的告警
+- flush 立即发送，不等待防抖到期
+"""
+import os
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor.alerts.manager import AlertManager
+from modules.monitor.data.models import AnomalyResult
+
+
+def make_config(max_batch_size=10, debounce_seconds=0.2):
+    return {'alert': {'cooldown_minutes': 0, 'max_batch_size': max_batch_size, 'debounce_seconds': debounce_seconds}}
+
+
+def make_alert(symbol, level, triggered=2):
+    return AnomalyResult(symbol, 0, 1.0, 0.01, 3.0, 3.0, 3.0, level, ['ATR'] * triggered)
+
+
+def test_burst_is_debounced_into_one_batch():
+    manager = AlertManager(make_config())
+    batches = []
+    sent = threading.Event()
+    manager.set_send_callback(lambda alerts: (batches.append(alerts), sent.set()))
+
+    threads_before = threading.active_count()
+    for i in range(30):
+        manager.add_alert(make_alert(f"S{i}USDT", 1))
+    assert threading.active_count() == threads_before + 1
+    assert manager.get_pending_count() > 0
+
+    assert sent.wait(2)
+    time.sleep(0.3)
+    manager.stop()
+    assert len(batches) == 1 and len(batches[0]) == 10
+    assert manager.get_pending_count() == 0
+
+
+def test_truncation_keeps_highest_levels():
+    manager = AlertManager(make_config(max_batch_size=3))
+    sent = threading.Event()
+    batches = []
+    manager.set_send_callback(lambda alerts: (batches.append(alerts), sent.set()))
+
+    for symbol, level, triggered in [('A', 1, 5), ('B', 3, 2), ('C', 2, 2), ('D', 3, 4), ('E', 2, 3)]:
+        manager.add_alert(make_alert(symbol, level, triggered))
+
+    assert sent.wait(2)
+    manager.stop()
+    assert [a.symbol for a in batches[0]] == ['D', 'B', 'E']
+
+
+def test_force_send_pending_after_stop():
+    manager = AlertManager(make_config(debounce_seconds=60))
+    manager.set_send_callback(lambda alerts: None)
+    manager.add_alert(make_alert('A', 1))
+    manager.add_alert(make_alert('B', 2))
+    manager.add_alert(make_alert('A', 3))
+
+    manager.stop()
+    pending = manager.force_send_pending()
+    assert [(a.symbol, a.anomaly_level) for a in pending] == [('A', 3), ('B', 2)]
+    assert manager.force_send_pending() == []
+
+
+def test_flush_sends_without_waiting_for_debounce():
+    manager = AlertManager(make_config(debounce_seconds=60))
+    sent = threading.Event()
+    batches = []
+    manager.set_send_callback(lambda alerts: (batches.append(alerts), sent.set()))
+    manager.add_alert(make_alert('A', 1))
+    manager.add_alert(make_alert('B', 2))
+
+    manager.flush()
+    assert sent.wait(2)
+    manager.stop()
+    assert [a.symbol for a in batches[0]] == ['B', 'A']
+    assert manager.get_pending_count() == 0
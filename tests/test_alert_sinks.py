@@ -0,0 +1,100 @@
+"""告警输出管道测试：
+- 邮件输出阻塞或失败时 JSONL 与事件总线照常输出
+- 失败按次数重试，并记录投递/失败/重试指标
+- 停止时处理完已入队的告警
+"""
+import json
+import os
+import sys
+import threading
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor.alerts.callbacks import build_aggregate_record
+from modules.monitor.alerts.sinks import (
+    AlertEventBus,
+    AlertSink,
+    AlertSinkPipeline,
+    EventBusAlertSink,
+    JsonlAlertSink,
+)
+from modules.monitor.data.models import AnomalyResult
+
+CONFIG = {'kline': {'interval': '15m'}}
+
+
+def make_alert(symbol, level=2):
+    return AnomalyResult(symbol, 1_700_000_000_000, 1.0, 0.01, 3.0, 3.0, 3.0, level, ['ATR', 'ENGULFING'], '看涨外包')
+
+
+class BlockingSink(AlertSink):
+    name = 'email'
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def deliver(self, alerts, record):
+        self.calls += 1
+        self.release.wait(5)
+
+
+class FlakySink(AlertSink):
+    name = 'flaky'
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.delivered = []
+
+    def deliver(self, alerts, record):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("connection reset")
+        self.delivered.append(record)
+
+
+def test_slow_email_does_not_block_jsonl(tmp_path):
+    path = str(tmp_path / 'alerts' / 'alerts.jsonl')
+    bus = AlertEventBus()
+    received = []
+    got = threading.Event()
+    bus.subscribe(lambda record: (received.append(record), got.set()))
+    email = BlockingSink()
+    pipeline = AlertSinkPipeline(
+        [JsonlAlertSink(path), email, EventBusAlertSink(bus)],
+        build_record=lambda alerts: build_aggregate_record(alerts, CONFIG),
+    )
+
+    pipeline.publish([make_alert('BTCUSDT'), make_alert('ETHUSDT')])
+    assert got.wait(2)
+    assert pipeline.sink_names == ['jsonl', 'email', 'event_bus']
+
+    email.release.set()
+    pipeline.stop()
+    with open(path, encoding='utf-8') as f:
+        record = json.loads(f.readline())
+    assert record['symbols'] == ['BTCUSDT', 'ETHUSDT']
+    assert record['entries'][0]['reasons'] == ['ATR波动超阈值', '看涨外包']
+    assert received == [record]
+    assert email.calls == 1
+    assert pipeline.get_metrics()['email']['delivered'] == 1
+
+
+def test_retries_then_gives_up():
+    ok = FlakySink(failures=2)
+    broken = FlakySink(failures=10)
+    broken.name = 'broken'
+    pipeline = AlertSinkPipeline(
+        [ok, broken], build_record=lambda alerts: build_aggregate_record(alerts, CONFIG),
+        max_retries=2, retry_backoff=0.01,
+    )
+    pipeline.publish([make_alert('BTCUSDT')])
+    pipeline.publish([])
+    pipeline.stop()
+
+    metrics = pipeline.get_metrics()
+    assert len(ok.delivered) == 2 and ok.delivered[1]['symbols'] == []
+    assert metrics['flaky']['delivered'] == 2 and metrics['flaky']['retries'] == 2
+    assert metrics['broken']['failed'] == 2 and metrics['broken']['delivered'] == 0
+    assert metrics['flaky']['queued'] == 0
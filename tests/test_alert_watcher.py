@@ -0,0 +1,84 @@
+"""告警监控器测试：
+- 同进程有监控发布时，告警经事件总线直接送达，文件中的同一记录不会重复触发
+- 无进程内发布者时，通过文件系统事件读取 alerts.jsonl 新增的完整行（半行等待写完）
+"""
+import json
+import os
+import sys
+import threading
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.agent.utils.alert_watcher import AlertFileWatcher
+from modules.monitor.alerts.sinks import AlertEventBus, EventBusAlertSink
+
+
+def make_record(*symbols):
+    return {
+        'type': 'aggregate', 'source': 'monitor', 'symbols': list(symbols),
+        'pending_count': len(symbols), 'entries': [{'symbol': s} for s in symbols],
+    }
+
+
+class Collector:
+    def __init__(self):
+        self.records = []
+        self.event = threading.Event()
+
+    def __call__(self, record):
+        self.records.append(record)
+        self.event.set()
+
+    def wait(self, timeout=3):
+        ok = self.event.wait(timeout)
+        self.event.clear()
+        return ok
+
+
+def make_watcher(tmp_path, bus):
+    collector = Collector()
+    watcher = AlertFileWatcher(str(tmp_path / 'alerts.jsonl'), collector, event_bus=bus)
+    watcher.DEDUP_WINDOW_SECONDS = 0
+    return watcher, collector
+
+
+def test_in_process_delivery_skips_file(tmp_path):
+    bus = AlertEventBus()
+    sink = EventBusAlertSink(bus)
+    watcher, collector = make_watcher(tmp_path, bus)
+    watcher.start()
+    try:
+        record = make_record('BTCUSDT')
+        with open(watcher.alerts_file_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+        sink.deliver([], record)
+        assert collector.wait()
+        assert collector.records[0]['symbols'] == ['BTCUSDT']
+        assert not collector.wait(0.5)
+        assert len(collector.records) == 1
+    finally:
+        watcher.stop()
+        sink.close()
+    assert not bus.has_publishers()
+
+
+def test_file_events_without_publisher(tmp_path):
+    bus = AlertEventBus()
+    path = tmp_path / 'alerts.jsonl'
+    path.write_text(json.dumps(make_record('OLDUSDT')) + '\n', encoding='utf-8')
+    watcher, collector = make_watcher(tmp_path, bus)
+    watcher.start()
+    try:
+        second = json.dumps(make_record('ETHUSDT'))
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(make_record('BTCUSDT')) + '\n' + second[:10])
+        assert collector.wait()
+        assert collector.records[-1]['symbols'] == ['BTCUSDT']
+
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(second[10:] + '\n')
+        assert collector.wait()
+        assert [r['symbols'] for r in collector.records] == [['BTCUSDT'], ['ETHUSDT']]
+    finally:
+        watcher.stop()
@@ -0,0 +1,133 @@
+"""回测历史K线并发下载测试：
+- 本地缺失区间按单次请求上限分页，多页并发请求并报告进度
+- 每页下载后立即写入仓库，失败的页在后续轮次/再次回测时只下载剩余部分
+- 上线前不存在的K线确认后不重复请求，重复回测（含新进程）不再下载
+- 回测K线提供者从仓库读取下载结果
+"""
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.backtest.providers import kline_provider
+from modules.backtest.providers.kline_downloader import KlineDownloader
+from modules.monitor.data.kline_repository import MAX_KLINES_PER_REQUEST, KlineRepository
+from modules.monitor.data.kline_store import KlineStore
+from modules.monitor.utils.helpers import interval_to_ms
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+START_MS = int(START.timestamp() * 1000)
+DAY_MS = 24 * 3600 * 1000
+
+
+class FakeRestClient:
+    """返回开盘时间在 [max(start, listed), end] 内的K线；fail 中的 (交易对, 起始时间) 首次请求抛出异常"""
+
+    def __init__(self, listed=None, fail=()):
+        self.listed = listed or {}
+        self.fail = set(fail)
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def get_klines(self, symbol, interval, limit=500, start_time=None, end_time=None):
+        with self._lock:
+            self.calls.append((symbol, interval, start_time))
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(0.01)
+            with self._lock:
+                if (symbol, start_time) in self.fail:
+                    self.fail.discard((symbol, start_time))
+                    raise ConnectionError("timeout")
+            step = interval_to_ms(interval)
+            first = max(start_time, self.listed.get(symbol, 0))
+            first = -(-first // step) * step
+            return [
+                [t, "1", "2", "0.5", str(t // step), "10"]
+                for t in range(first, end_time + 1, step)
+            ][:limit]
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def close(self):
+        pass
+
+
+def test_pages_download_concurrently_and_resume(tmp_path):
+    step = interval_to_ms('15m')
+    end = START_MS + 40 * DAY_MS
+    failing_page = START_MS + MAX_KLINES_PER_REQUEST * step
+    client = FakeRestClient(listed={'ETHUSDT': START_MS + 20 * DAY_MS}, fail=[('BTCUSDT', failing_page)])
+    repository = KlineRepository(KlineStore(str(tmp_path)), client)
+    tasks = [(symbol, interval, START_MS, end) for symbol in ('BTCUSDT', 'ETHUSDT') for interval in ('15m', '1h')]
+
+    pages = repository.plan_pages('BTCUSDT', '15m', START_MS, end)
+    assert len(pages) == 3 and pages[0] == (START_MS, failing_page - step) and pages[-1][1] == end
+    assert all((e - s) // step + 1 <= MAX_KLINES_PER_REQUEST for s, e in pages)
+
+    progress = []
+    failed = KlineDownloader(repository, max_workers=4, max_rounds=1,
+                             on_progress=lambda done, total: progress.append((done, total))).download(tasks)
+    assert failed == [('BTCUSDT', '15m', failing_page, failing_page + (MAX_KLINES_PER_REQUEST - 1) * step)]
+    assert progress[-1] == (7, 8)
+    assert 1 < client.max_running <= 4
+
+    # 再次下载只请求失败的页，之后不再请求（含上线前的区间）
+    calls = len(client.calls)
+    assert KlineDownloader(repository, max_workers=4).download(tasks) == []
+    assert client.calls[calls:] == [('BTCUSDT', '15m', failing_page)]
+    assert KlineDownloader(repository, max_workers=4).download(tasks) == []
+    assert len(client.calls) == calls + 1
+
+    klines = repository.get_range('BTCUSDT', '15m', START_MS, end)
+    assert [k.timestamp for k in klines] == list(range(START_MS, end + 1, step))
+    # ETHUSDT 上线前的区间跨两页，已确认的页合并后覆盖整个缺口
+    for interval in ('15m', '1h'):
+        assert repository.get_range('ETHUSDT', interval, START_MS, end)[0].timestamp == START_MS + 20 * DAY_MS
+    assert len(client.calls) == calls + 1
+
+    # 新进程：已写入存储的K线不再下载
+    reopened = KlineRepository(KlineStore(str(tmp_path)), client)
+    assert reopened.plan_pages('BTCUSDT', '15m', START_MS, end) == []
+    assert reopened.plan_pages('BTCUSDT', '1h', START_MS, end) == []
+
+
+def test_retry_rounds_within_one_download(tmp_path):
+    client = FakeRestClient(fail=[('BTCUSDT', START_MS)])
+    repository = KlineRepository(KlineStore(str(tmp_path)), client)
+
+    failed = KlineDownloader(repository, max_rounds=2).download([('BTCUSDT', '1h', START_MS, START_MS + DAY_MS)])
+
+    assert failed == []
+    assert client.calls == [('BTCUSDT', '1h', START_MS)] * 2
+    assert len(repository.get_range('BTCUSDT', '1h', START_MS, START_MS + DAY_MS)) == 25
+
+
+def test_provider_reads_downloaded_klines(tmp_path, monkeypatch):
+    client = FakeRestClient()
+    repository = KlineRepository(KlineStore(str(tmp_path)), client)
+    monkeypatch.setattr(kline_provider, 'get_kline_repository', lambda: repository)
+    progress = []
+
+    provider = kline_provider.BacktestKlineProvider(
+        ['ethusdt'], START, START + timedelta(days=3), '15m',
+        on_progress=lambda done, total: progress.append((done, total)),
+    )
+    provider.set_current_time(START + timedelta(days=1))
+
+    assert progress[-1][0] == progress[-1][1] == len(client.calls) == 8
+    klines = provider.get_klines('ETHUSDT', '1h', 200)
+    assert [k.timestamp for k in klines] == list(range(START_MS - 100 * 3600000, START_MS + 24 * 3600000, 3600000))
+
+    again = kline_provider.BacktestKlineProvider(['ETHUSDT'], START, START + timedelta(days=2), '15m')
+    again.set_current_time(START + timedelta(days=1))
+    assert len(client.calls) == 8
+    assert again.get_klines('BTCUSDT', '15m', 500) == provider.get_klines('BTCUSDT', '15m', 500)
@@ -0,0 +1,94 @@
+"""回测K线提供者时间切片测试：
+- get_klines / get_kline_at_time 的二分查找结果与逐根扫描一致（含缺失K线与边界时刻）
+- get_kline_rows 返回开盘时间区间内的数组视图
+- 预加载的K线按开盘时间去重并排序
+"""
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.backtest.providers.kline_provider import BacktestKlineProvider
+from modules.monitor.data.models import Kline
+
+INTERVAL_MS = 15 * 60 * 1000
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+START_MS = int(START.timestamp() * 1000)
+
+
+def make_klines(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    klines = []
+    for i in range(count):
+        # 随机缺失约5%的K线（停机维护等）
+        if rng.random() < 0.05:
+            continue
+        price = 100 + rng.random()
+        klines.append(Kline(START_MS + i * INTERVAL_MS, price, price + 1, price - 1, price, 10.0, True))
+    return klines
+
+
+class StaticKlineProvider(BacktestKlineProvider):
+    """不下载数据，直接使用给定K线"""
+
+    def __init__(self, klines):
+        self._klines = klines
+        super().__init__(['BTCUSDT'], START, START + timedelta(days=10), '15m')
+
+    def _load_historical_data(self):
+        shuffled = self._klines + self._klines[:10]
+        random.Random(0).shuffle(shuffled)
+        self._set_klines('BTCUSDT', '15m', shuffled)
+
+
+def scan_klines(klines, current_ms, limit):
+    filtered = [k for k in klines if k.timestamp + INTERVAL_MS <= current_ms]
+    return filtered[-limit:]
+
+
+def scan_kline_at(klines, target_ms):
+    for k in klines:
+        if k.timestamp <= target_ms < k.timestamp + INTERVAL_MS:
+            return k
+    return None
+
+
+def test_slices_match_linear_scan():
+    klines = make_klines(500)
+    provider = StaticKlineProvider(klines)
+    rng = random.Random(2)
+    offsets = [0, 1, INTERVAL_MS - 1, INTERVAL_MS, 499 * INTERVAL_MS, 600 * INTERVAL_MS]
+    offsets += [rng.randrange(-INTERVAL_MS, 520 * INTERVAL_MS) for _ in range(300)]
+    for offset in offsets:
+        current = START + timedelta(milliseconds=offset)
+        provider.set_current_time(current)
+        for limit in (1, 7, 100, 1000):
+            assert provider.get_klines('btcusdt', '15m', limit) == scan_klines(klines, START_MS + offset, limit)
+        assert provider.get_kline_at_time('BTCUSDT', '15m', current) == scan_kline_at(klines, START_MS + offset)
+    assert provider.get_klines('BTCUSDT', '15m', 0) == []
+
+
+def test_kline_rows_view():
+    klines = make_klines(200)
+    provider = StaticKlineProvider(klines)
+    start = START + timedelta(minutes=15 * 10)
+    end = START + timedelta(minutes=15 * 50)
+    rows = provider.get_kline_rows('BTCUSDT', '15m', start, end)
+
+    expected = [k for k in klines if START_MS + 10 * INTERVAL_MS <= k.timestamp <= START_MS + 50 * INTERVAL_MS]
+    assert rows.base is not None
+    assert rows[:, 0].astype(np.int64).tolist() == [k.timestamp for k in expected]
+    assert rows[:, 4].tolist() == [k.close for k in expected]
+    assert provider.get_kline_rows('ETHUSDT', '15m', start, end).shape[0] == 0
+
+
+def test_preloaded_klines_are_deduplicated_and_sorted():
+    klines = make_klines(100)
+    provider = StaticKlineProvider(klines)
+    provider.set_current_time(START + timedelta(days=5))
+    assert provider.get_klines('BTCUSDT', '15m', 1000) == klines
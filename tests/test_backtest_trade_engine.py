@@ -0,0 +1,82 @@
+"""回测交易引擎测试：
+- 共享只读配置（禁用持久化、不修改原配置），不创建 REST 客户端与 WebSocket 订阅
+- 最新价取自模拟价格，开平仓、止盈止损按内存账户结算
+- 引擎池复用引擎：归还后再取出时账户、持仓、挂单已重置，引擎数量只随并发增长
+"""
+import os
+import sys
+
+import pytest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.agent.trade_simulator.utils.file_utils import WriteQueue
+from modules.backtest.engine.backtest_trade_engine import (
+    BacktestTradeEngine,
+    BacktestTradeEnginePool,
+    create_backtest_config,
+)
+from modules.config.settings import get_config
+
+
+@pytest.fixture(scope="module", autouse=True)
+def stop_write_queue():
+    yield
+    WriteQueue.get_instance().shutdown()
+
+
+def test_backtest_config_is_frozen_copy():
+    base = {'api': {'base_url': 'x'}, 'agent': {'state_path': 'a.json', 'simulator': {'max_leverage': 20}}}
+    frozen = create_backtest_config(base, 5000.0)
+
+    assert frozen['agent']['disable_persistence'] is True
+    assert frozen['agent']['state_path'] is None
+    assert frozen['agent']['simulator'] == {'max_leverage': 20, 'initial_balance': 5000.0}
+    assert base['agent'] == {'state_path': 'a.json', 'simulator': {'max_leverage': 20}}
+    with pytest.raises(TypeError):
+        frozen['agent']['simulator']['max_leverage'] = 1
+
+
+def test_engine_trades_in_memory():
+    engine = BacktestTradeEngine(get_config(), 'bt_test', initial_balance=10000.0)
+    engine.start()
+    engine.update_mark_prices({'BTCUSDT': 100.0})
+
+    assert engine.position_manager.get_latest_close_price('BTCUSDT') == 100.0
+    opened = engine.open_position('BTCUSDT', 'long', 1000, 10, tp_price=110.0, sl_price=95.0)
+    assert 'error' not in opened and opened['entry_price'] == 100.0
+    assert engine.check_tp_sl('BTCUSDT', 104.0, high_price=105.0, low_price=101.0) is None
+
+    closed = engine.check_tp_sl('BTCUSDT', 108.0, high_price=111.0, low_price=107.0)
+    assert closed['close_price'] == 110.0 and '止盈' in closed['close_reason']
+    summary = engine.get_account_summary()
+    assert summary['reserved_margin_sum'] == 0
+    assert summary['balance'] == pytest.approx(10000.0 + 100.0 - summary['total_fees'])
+
+    engine.stop()
+    assert engine.position_manager._rest is None
+    assert not hasattr(engine, 'market_service')
+
+
+def test_pool_resets_and_reuses_engines():
+    pool = BacktestTradeEnginePool(get_config(), 'bt_pool', 10000.0)
+
+    first = pool.acquire('step_1')
+    first.update_mark_prices({'ETHUSDT': 50.0})
+    first.open_position('ETHUSDT', 'short', 500, 5, tp_price=45.0, sl_price=55.0)
+    first.create_limit_order('ETHUSDT', 'short', 52.0, 100, 5)
+    assert first.get_account_summary()['reserved_margin_sum'] > 0
+    second = pool.acquire('step_2')
+    assert second is not first and pool.created == 2
+    pool.release(first)
+    pool.release(second)
+
+    reused = pool.acquire('step_3')
+    assert reused in (first, second) and pool.created == 2
+    assert reused.backtest_id == 'bt_pool_step_3'
+    assert reused.positions == {} and reused.get_pending_limit_orders() == []
+    assert reused.get_simulated_price('ETHUSDT') is None
+    assert reused.get_account_summary()['balance'] == 10000.0
+    assert reused.get_account_summary()['reserved_margin_sum'] == 0
+    assert reused.config is first.config
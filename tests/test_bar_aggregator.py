@@ -0,0 +1,77 @@
+"""多周期K线合成测试：
+- 1m 合成 5m/1h：开盘时间对齐、OHLCV 正确、未收盘时输出当前合成K线
+- 启动时不完整的周期与缺失分钟的周期不输出
+- 周/月线与基础周期本身不接受合成
+- 快速路径的实时最低价
+"""
+import os
+import sys
+
+import pytest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor.data.bar_aggregator import BarAggregator
+from modules.monitor.data.models import Kline
+
+MINUTE = 60000
+DAY_START = 1_700_006_400_000  # UTC 0 点
+
+
+def minute(i: int, closed: bool = True, low: float = None) -> Kline:
+    price = 100.0 + i
+    return Kline(DAY_START + i * MINUTE, price, price + 2, price - 1 if low is None else low, price + 1, 1.0, closed)
+
+
+def closed_bars(results, interval):
+    return [bar for iv, bar in results if iv == interval and bar.is_closed]
+
+
+def test_builds_aligned_higher_timeframes():
+    aggregator = BarAggregator(['5m', '1h'])
+    out = []
+    for i in range(60):
+        out.extend(aggregator.update('BTCUSDT', minute(i)))
+
+    five = closed_bars(out, '5m')
+    assert [b.timestamp for b in five] == [DAY_START + k * 5 * MINUTE for k in range(12)]
+    first = five[0]
+    assert (first.open, first.high, first.low, first.close, first.volume) == (100.0, 106.0, 99.0, 105.0, 5.0)
+
+    hour = closed_bars(out, '1h')
+    assert len(hour) == 1 and hour[0].timestamp == DAY_START
+    assert (hour[0].open, hour[0].high, hour[0].low, hour[0].close, hour[0].volume) == (100.0, 161.0, 99.0, 160.0, 60.0)
+
+
+def test_partial_bar_includes_open_minute():
+    aggregator = BarAggregator(['5m'])
+    aggregator.update('BTCUSDT', minute(0))
+    (interval, bar), = aggregator.update('BTCUSDT', minute(1, closed=False, low=50.0))
+    assert interval == '5m' and not bar.is_closed
+    assert (bar.open, bar.low, bar.close, bar.volume) == (100.0, 50.0, 102.0, 2.0)
+    assert aggregator.realtime_low('BTCUSDT', '5m', DAY_START + MINUTE, 40.0) == (DAY_START, 40.0)
+    assert aggregator.realtime_low('BTCUSDT', '5m', DAY_START + 2 * MINUTE, 40.0) is None
+
+
+def test_incomplete_periods_are_dropped():
+    aggregator = BarAggregator(['5m'])
+    out = []
+    # 启动于周期中间：第一个周期不输出
+    for i in range(3, 10):
+        out.extend(aggregator.update('BTCUSDT', minute(i)))
+    assert [b.timestamp for b in closed_bars(out, '5m')] == [DAY_START + 5 * MINUTE]
+    assert all(bar.timestamp != DAY_START for _, bar in out)
+
+    # 缺失分钟：该周期作废，下一周期恢复
+    out = []
+    for i in (10, 11, 13, 14, 15, 16, 17, 18, 19):
+        out.extend(aggregator.update('BTCUSDT', minute(i)))
+    assert [b.timestamp for b in closed_bars(out, '5m')] == [DAY_START + 15 * MINUTE]
+
+
+def test_rejects_unaligned_intervals():
+    with pytest.raises(ValueError):
+        BarAggregator(['1w'])
+    with pytest.raises(ValueError):
+        BarAggregator(['1h', '1m'])
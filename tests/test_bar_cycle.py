@@ -0,0 +1,90 @@
+"""K线周期收盘协调器测试：
+- 订阅交易对全部登记后立即发出周期事件（含异常统计）
+- 超时后以已登记的交易对发出，并列出缺失交易对
+- 周期发出后迟到的收盘单独发出迟到事件
+- 跳过检测的交易对不再等待，计入缺失
+"""
+import os
+import sys
+import threading
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor.core.bar_cycle import BarCycleCoordinator
+from modules.monitor.data.models import AnomalyResult
+
+INTERVAL_MS = 15 * 60 * 1000
+
+
+def make_coordinator(expected, timeout_seconds):
+    events = []
+    fired = threading.Event()
+
+    def on_event(event):
+        events.append(event)
+        fired.set()
+
+    coordinator = BarCycleCoordinator(lambda: expected, INTERVAL_MS, timeout_seconds)
+    coordinator.subscribe(on_event)
+    coordinator.start()
+    return coordinator, events, fired
+
+
+def test_cycle_fires_when_all_symbols_arrive():
+    coordinator, events, fired = make_coordinator(['A', 'B', 'C'], timeout_seconds=30)
+    anomaly = AnomalyResult('B', 0, 1.0, 0.01, 3.0, 3.0, 3.0, 2, ['ATR', 'VOLUME'])
+    try:
+        coordinator.add('A', 1000)
+        coordinator.add('B', 1000, anomaly)
+        assert not fired.wait(0.05)
+        coordinator.add('C', 1000)
+        assert fired.wait(2)
+    finally:
+        coordinator.stop()
+
+    assert len(events) == 1
+    event = events[0]
+    assert (event.open_time, event.symbols, event.missing) == (1000, ['A', 'B', 'C'], [])
+    assert event.complete and not event.late
+    assert event.anomaly_count == 1 and event.top_indicators == {'ATR': 1, 'VOLUME': 1}
+    assert event.spread_ms >= 0
+    assert coordinator.get_last_event()['closed'] == 3
+
+
+def test_cycle_times_out_with_missing_symbols():
+    coordinator, events, fired = make_coordinator(['A', 'B', 'C'], timeout_seconds=0.05)
+    try:
+        coordinator.add('B', 2000)
+        assert fired.wait(2)
+    finally:
+        coordinator.stop()
+
+    assert [(e.open_time, e.symbols, e.missing, e.complete) for e in events] == [(2000, ['B'], ['A', 'C'], False)]
+
+
+def test_late_close_is_emitted_separately():
+    coordinator, events, fired = make_coordinator(['A', 'B'], timeout_seconds=0.05)
+    try:
+        coordinator.add('A', 3000)
+        assert fired.wait(2)
+        fired.clear()
+        coordinator.add('B', 3000)
+        assert fired.wait(2)
+    finally:
+        coordinator.stop()
+
+    assert [(e.symbols, e.late) for e in events] == [(['A'], False), (['B'], True)]
+    assert coordinator.get_last_event()['late'] is False
+
+
+def test_skipped_symbol_counts_as_missing():
+    coordinator, events, fired = make_coordinator(['A', 'B'], timeout_seconds=30)
+    try:
+        coordinator.add('A', 4000, skipped=True)
+        coordinator.add('B', 4000)
+        assert fired.wait(2)
+    finally:
+        coordinator.stop()
+
+    assert [(e.symbols, e.missing, e.complete) for e in events] == [(['B'], ['A'], False)]
@@ -0,0 +1,137 @@
+"""跨交易对批量检测测试：
+- 批量矩阵计算的指标与逐个全量计算一致
+- 向量化初筛 + 候选确认的检测结果与逐个检测一致
+- 启用批量检测时忽略增量引擎，逐个回退的交易对与批量结果口径一致
+- 最新K线为REST补齐的历史K线时不告警
+"""
+import dataclasses
+import math
+import os
+import random
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor.data.kline_manager import KlineManager
+from modules.monitor.data.models import Kline
+from modules.monitor.indicators.calculator import IndicatorCalculator
+from modules.monitor.indicators.batch import BatchIndicatorCalculator
+from modules.monitor.detection.detector import AnomalyDetector
+
+INTERVAL_MS = 15 * 60 * 1000
+HISTORY_SIZE = 80
+SYMBOLS = [f"S{i}USDT" for i in range(12)]
+
+CONFIG = {
+    'indicators': {
+        'atr_period': 14,
+        'stddev_period': 20,
+        'volume_ma_period': 20,
+        'incremental': False,
+    },
+    'kline': {'interval': '15m'},
+    'open_interest': {'enabled': False},
+}
+
+
+def make_klines(count: int, seed: int, spike: bool = False):
+    rng = random.Random(seed)
+    price = 10.0 + seed
+    klines = []
+    for i in range(count):
+        open_ = price
+        move = rng.gauss(0, 0.01)
+        volume = rng.lognormvariate(10, 0.4)
+        if spike and i == count - 1:
+            move, volume = 0.12, volume * 40
+        close = open_ * (1 + move)
+        high = max(open_, close) * (1 + abs(rng.gauss(0, 0.004)))
+        low = min(open_, close) * (1 - abs(rng.gauss(0, 0.004)))
+        klines.append(Kline(i * INTERVAL_MS, open_, high, low, close, volume, True))
+        price = close
+    return klines
+
+
+def build_manager():
+    km = KlineManager(history_size=HISTORY_SIZE, shared_matrix=True, rows_per_block=5)
+    for seed, symbol in enumerate(SYMBOLS):
+        km.initialize_symbol(symbol, make_klines(HISTORY_SIZE + 10, seed, spike=seed % 3 == 0))
+    # 历史不足的交易对回退逐个计算
+    km.initialize_symbol('NEWUSDT', make_klines(30, 99))
+    return km
+
+
+def test_batch_indicators_match_full_calculation():
+    km = build_manager()
+    calculator = IndicatorCalculator(km, CONFIG)
+    batch_calculator = BatchIndicatorCalculator(km, CONFIG)
+
+    eligible, others = batch_calculator.split_eligible(SYMBOLS + ['NEWUSDT'])
+    assert eligible == SYMBOLS and others == ['NEWUSDT']
+
+    batch = batch_calculator.calculate(eligible)
+    for index, symbol in enumerate(eligible):
+        expected, price_changes = calculator._calculate_full(symbol)
+        actual = batch_calculator.to_indicator_values(batch, index)
+        for field, value in vars(expected).items():
+            got = getattr(actual, field)
+            if isinstance(value, float):
+                assert math.isclose(got, value, rel_tol=1e-9, abs_tol=1e-9), (symbol, field, got, value)
+            else:
+                assert got == value, (symbol, field)
+        assert batch.price_changes[index].tolist() == price_changes
+
+
+def test_detect_batch_matches_per_symbol_detection():
+    km = build_manager()
+    calculator = IndicatorCalculator(km, CONFIG)
+    batch_calculator = BatchIndicatorCalculator(km, CONFIG)
+    detector = AnomalyDetector(CONFIG)
+
+    batch = batch_calculator.calculate(SYMBOLS)
+    results = detector.detect_batch(batch, lambda i: batch_calculator.to_indicator_values(batch, i))
+
+    expected = {}
+    for symbol in SYMBOLS:
+        anomaly = detector.detect(calculator.calculate_all(symbol))
+        if anomaly:
+            expected[symbol] = (anomaly.anomaly_level, anomaly.triggered_indicators)
+
+    assert expected
+    assert {r.symbol: (r.anomaly_level, r.triggered_indicators) for r in results} == expected
+
+
+def test_batch_mode_disables_incremental_engine():
+    config = dict(CONFIG, indicators=dict(CONFIG['indicators'], incremental=True),
+                  detection={'batch_mode': {'enabled': True}})
+    km = build_manager()
+    calculator = IndicatorCalculator(km, config)
+    assert calculator.incremental_engine is None
+
+    batch_calculator = BatchIndicatorCalculator(km, config)
+    batch = batch_calculator.calculate(SYMBOLS)
+    for index, symbol in enumerate(SYMBOLS):
+        expected = calculator.calculate_all(symbol)
+        actual = batch_calculator.to_indicator_values(batch, index)
+        assert math.isclose(actual.atr_zscore, expected.atr_zscore, rel_tol=1e-9, abs_tol=1e-9)
+        assert math.isclose(actual.rsi_zscore, expected.rsi_zscore, rel_tol=1e-9, abs_tol=1e-9)
+
+
+def test_backfilled_latest_bar_does_not_alert():
+    km = KlineManager(history_size=HISTORY_SIZE, shared_matrix=True, rows_per_block=5)
+    klines = make_klines(HISTORY_SIZE + 10, 0, spike=True)
+    klines[-1].is_backfilled = True
+    km.initialize_symbol('S0USDT', klines)
+    calculator = IndicatorCalculator(km, CONFIG)
+    batch_calculator = BatchIndicatorCalculator(km, CONFIG)
+    detector = AnomalyDetector(CONFIG)
+
+    indicators = calculator.calculate_all('S0USDT')
+    assert indicators.is_backfilled
+    assert detector.detect(indicators) is None
+    # 同样的行情未补齐时会告警
+    assert detector.detect(dataclasses.replace(indicators, is_backfilled=False)) is not None
+
+    batch = batch_calculator.calculate(['S0USDT'])
+    assert detector.detect_batch(batch, lambda i: batch_calculator.to_indicator_values(batch, i)) == []
@@ -0,0 +1,121 @@
+"""K线缺口补齐测试：
+- 相邻K线间隔超过一个周期时记录缺口
+- REST补齐后窗口连续、补齐K线带 is_backfilled 标记、缺口清除
+- 请求失败时保留缺口
+- 缺口未补齐的交易对本周期不参与批量检测，周期事件中列为缺失
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor import main
+from modules.monitor.core.bar_cycle import BarCycleCoordinator
+from modules.monitor.core.kline_backfiller import KlineBackfiller
+from modules.monitor.data.kline_manager import KlineManager
+from modules.monitor.data.models import Kline
+from modules.monitor.utils.logger import get_logger
+
+MINUTE = 60000
+CONFIG = {'kline': {'interval': '1m', 'history_size': 6, 'backfill_max_concurrent': 2}}
+
+
+def make_kline(i: int) -> Kline:
+    return Kline(i * MINUTE, i, i + 1.0, i - 1.0, float(i), 10.0, True)
+
+
+def rest_row(i: int) -> list:
+    return [i * MINUTE, str(i), str(i + 1.0), str(i - 1.0), str(float(i)), "10.0",
+            i * MINUTE + MINUTE - 1, "0", 0, "0", "0", "0"]
+
+
+class FakeRestClient:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = []
+
+    def get_klines(self, symbol, interval, limit=500, start_time=None, end_time=None):
+        self.calls.append((symbol, interval, limit, start_time, end_time))
+        if self.fail:
+            raise ConnectionError("timeout")
+        first = start_time // MINUTE
+        last = end_time // MINUTE
+        return [rest_row(i) for i in range(first, last + 1)][:limit]
+
+
+@pytest.mark.parametrize('shared', [False, True])
+def test_gap_detected_and_backfilled(shared):
+    km = KlineManager(history_size=6, shared_matrix=shared, interval_ms=MINUTE)
+    for i in (0, 1, 2):
+        km.update('BTCUSDT', make_kline(i))
+    assert km.get_gap('BTCUSDT') is None
+
+    km.update('BTCUSDT', make_kline(5))  # 断线期间缺失 3、4
+    assert km.get_gap('BTCUSDT') == 3 * MINUTE
+
+    rest = FakeRestClient()
+    assert KlineBackfiller(rest, km, CONFIG).backfill('BTCUSDT')
+    assert rest.calls == [('BTCUSDT', '1m', 2, 3 * MINUTE, 5 * MINUTE - 1)]
+
+    klines = km.get_klines('BTCUSDT')
+    assert [k.timestamp // MINUTE for k in klines] == [0, 1, 2, 3, 4, 5]
+    assert [k.is_backfilled for k in klines] == [False, False, False, True, True, False]
+    assert km.get_gap('BTCUSDT') is None
+    assert not km.get_latest_kline('BTCUSDT').is_backfilled
+
+
+def test_long_gap_only_fetches_window():
+    km = KlineManager(history_size=6, interval_ms=MINUTE)
+    km.update('ETHUSDT', make_kline(0))
+    km.update('ETHUSDT', make_kline(100))
+
+    rest = FakeRestClient()
+    assert KlineBackfiller(rest, km, CONFIG).backfill('ETHUSDT')
+    assert rest.calls[0][2:4] == (6, 94 * MINUTE)
+    assert [k.timestamp // MINUTE for k in km.get_klines('ETHUSDT')] == list(range(95, 101))
+
+
+def test_failed_backfill_keeps_gap():
+    km = KlineManager(history_size=6, interval_ms=MINUTE)
+    km.update('SOLUSDT', make_kline(0))
+    km.update('SOLUSDT', make_kline(3))
+
+    backfiller = KlineBackfiller(FakeRestClient(fail=True), km, CONFIG)
+    assert not backfiller.backfill('SOLUSDT')
+    assert km.get_gap('SOLUSDT') == MINUTE
+    assert backfiller.get_metrics()['failed'] == 1
+
+
+def test_unfilled_gap_is_left_out_of_batch_detection(monkeypatch):
+    monkeypatch.setattr(main, 'logger', get_logger('test'))
+    km = KlineManager(history_size=6, interval_ms=MINUTE)
+    for i in (0, 1, 2):
+        km.update('ETHUSDT', make_kline(i))
+    km.update('BTCUSDT', make_kline(0))
+    km.update('BTCUSDT', make_kline(2))  # 缺失 1 且无法补齐
+
+    batches, fired = [], threading.Event()
+    bar_cycle = BarCycleCoordinator(lambda: ['BTCUSDT', 'ETHUSDT'], MINUTE, timeout_seconds=30)
+    bar_cycle.subscribe(lambda event: batches.append((event.symbols, event.missing, event.complete)))
+    bar_cycle.subscribe(lambda event: fired.set())
+    bar_cycle.start()
+    components = {
+        'config': CONFIG,
+        'kline_manager': km,
+        'kline_repository': None,
+        'backfiller': KlineBackfiller(FakeRestClient(fail=True), km, CONFIG),
+        'batch_calculator': object(),
+        'bar_cycle': bar_cycle,
+    }
+    try:
+        main._process_interval_kline('BTCUSDT', make_kline(3), components)
+        main._process_interval_kline('ETHUSDT', make_kline(3), components)
+        assert fired.wait(2)
+    finally:
+        bar_cycle.stop()
+
+    assert batches == [(['ETHUSDT'], ['BTCUSDT'], False)]
@@ -0,0 +1,72 @@
+"""列式K线环形缓冲区测试：
+- 环形覆盖后视图仍按时间升序且连续（零拷贝）
+- 实时更新替换最新一根
+- 共享模式跨交易对矩阵与逐个视图一致
+"""
+import os
+import sys
+
+import numpy as np
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor.data.kline_manager import KlineManager
+from modules.monitor.data.models import Kline
+
+
+def make_kline(i: int, closed: bool = True, close: float = None) -> Kline:
+    c = float(i) if close is None else close
+    return Kline(i * 60000, c - 0.5, c + 1.0, c - 1.0, c, 10.0 + i, closed)
+
+
+def test_ring_wraps_and_views_are_contiguous():
+    km = KlineManager(history_size=5)
+    for i in range(12):
+        km.update('BTCUSDT', make_kline(i))
+
+    closes = km.get_array('BTCUSDT', 'close')
+    assert closes.tolist() == [7.0, 8.0, 9.0, 10.0, 11.0]
+    assert closes.flags['C_CONTIGUOUS']
+    assert not closes.flags.writeable
+    assert km.get_closes('BTCUSDT', 2) == [10.0, 11.0]
+    assert [k.timestamp for k in km.get_klines('BTCUSDT')] == [i * 60000 for i in range(7, 12)]
+    assert km.get_latest_kline('BTCUSDT').close == 11.0
+
+
+def test_realtime_update_replaces_last_bar():
+    km = KlineManager(history_size=4)
+    for i in range(3):
+        km.update('ETHUSDT', make_kline(i))
+    km.update('ETHUSDT', make_kline(3, closed=False, close=3.2))
+    km.update('ETHUSDT', make_kline(3, closed=True, close=3.4))
+
+    assert km.get_kline_count('ETHUSDT') == 4
+    latest = km.get_latest_kline('ETHUSDT')
+    assert latest.close == 3.4 and latest.is_closed
+
+
+def test_initialize_symbol_keeps_latest_window():
+    km = KlineManager(history_size=3)
+    km.initialize_symbol('SOLUSDT', [make_kline(i) for i in range(10)])
+    assert km.get_closes('SOLUSDT') == [7.0, 8.0, 9.0]
+    km.update('SOLUSDT', make_kline(10))
+    assert km.get_closes('SOLUSDT') == [8.0, 9.0, 10.0]
+
+
+def test_shared_matrix_matches_per_symbol_views():
+    km = KlineManager(history_size=6, shared_matrix=True, rows_per_block=2)
+    symbols = ['A', 'B', 'C']
+    for offset, symbol in enumerate(symbols):
+        for i in range(8 + offset):
+            km.update(symbol, make_kline(i, close=i + offset * 100.0))
+
+    matrix = km.get_matrix('close', symbols, 4)
+    expected = np.stack([km.get_array(s, 'close', 4) for s in symbols])
+    assert matrix.shape == (3, 4)
+    np.testing.assert_array_equal(matrix, expected)
+
+    km.clear('B')
+    km.update('D', make_kline(0, close=42.0))
+    assert km.get_closes('D') == [42.0]
+    np.testing.assert_array_equal(km.get_matrix('close', ['A', 'C'], 4), expected[[0, 2]])
@@ -0,0 +1,36 @@
+"""未收盘K线快速解析测试：
+- 解析结果与完整 json 解析一致
+- 收盘K线与非K线消息交由完整解析处理
+"""
+import json
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor.clients.kline_fast_parser import parse_realtime_update
+
+
+def make_message(symbol: str, closed: bool) -> str:
+    return json.dumps({
+        "stream": f"{symbol.lower()}@kline_15m",
+        "data": {
+            "e": "kline", "E": 1700000123456, "s": symbol,
+            "k": {
+                "t": 1700000100000, "T": 1700001000000 - 1, "s": symbol, "i": "15m",
+                "f": 100, "L": 200, "o": "0.0010", "c": "0.0020", "h": "0.0025", "l": "0.0009",
+                "v": "1000", "n": 100, "x": closed, "q": "1.0000", "V": "500", "Q": "0.500", "B": "0",
+            },
+        },
+    }, separators=(',', ':'))
+
+
+def test_parses_realtime_fields():
+    assert parse_realtime_update(make_message('BTCUSDT', False)) == ('BTCUSDT', 1700000100000, 0.0009, 0.002)
+
+
+def test_closed_and_other_messages_fall_back():
+    assert parse_realtime_update(make_message('BTCUSDT', True)) is None
+    assert parse_realtime_update('{"result":null,"id":1}') is None
+    assert parse_realtime_update('{"e":"kline","x":false}') is None
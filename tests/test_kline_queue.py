@@ -0,0 +1,87 @@
+"""K线处理队列测试：
+- 同一根K线的未收盘更新合并为最新一条
+- 收盘K线超出容量也不丢弃，且同一交易对按顺序处理
+- 深度与延迟指标
+"""
+import os
+import sys
+import threading
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor.core.kline_queue import KlineWorkQueue
+
+
+def kline(t: int, close: float, closed: bool) -> dict:
+    return {'t': t, 'c': str(close), 'x': closed}
+
+
+def test_coalesces_realtime_updates_and_keeps_closed_bars():
+    processed = []
+    queue = KlineWorkQueue(lambda s, k: processed.append((s, k['t'], k['c'], k['x'])), workers=1, capacity=3)
+
+    # 未启动时入队，便于检查合并结果
+    for i in range(5):
+        queue.put('BTCUSDT', kline(0, 100 + i, False))
+    queue.put('BTCUSDT', kline(0, 110, True))
+    queue.put('BTCUSDT', kline(1, 111, False))
+    queue.put('ETHUSDT', kline(0, 10, True))
+    queue.put('SOLUSDT', kline(0, 1, False))  # 超出容量的未收盘更新被丢弃
+
+    metrics = queue.get_metrics()
+    assert metrics['depth'] == 4
+    assert metrics['closed_pending'] == 2
+    assert metrics['coalesced'] == 4
+    assert metrics['dropped'] == 1
+
+    done = threading.Event()
+    original = queue.handler
+
+    def handler(symbol, data):
+        original(symbol, data)
+        if len(processed) == 4:
+            done.set()
+
+    queue.handler = handler
+    queue.start()
+    try:
+        assert done.wait(2)
+    finally:
+        queue.stop()
+
+    btc = [p for p in processed if p[0] == 'BTCUSDT']
+    assert btc == [('BTCUSDT', 0, '104', False), ('BTCUSDT', 0, '110', True), ('BTCUSDT', 1, '111', False)]
+    assert ('ETHUSDT', 0, '10', True) in processed
+    assert queue.get_metrics()['processed'] == 4
+
+
+def test_symbol_is_never_processed_concurrently():
+    active = set()
+    overlaps = []
+    count = [0]
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def handler(symbol, data):
+        with lock:
+            if symbol in active:
+                overlaps.append(symbol)
+            active.add(symbol)
+        threading.Event().wait(0.001)
+        with lock:
+            active.discard(symbol)
+            count[0] += 1
+            if count[0] == 60:
+                done.set()
+
+    queue = KlineWorkQueue(handler, workers=4)
+    queue.start()
+    try:
+        for t in range(20):
+            for symbol in ('A', 'B', 'C'):
+                queue.put(symbol, kline(t, t, True))
+        assert done.wait(5)
+    finally:
+        queue.stop()
+    assert overlaps == []
@@ -0,0 +1,225 @@
+"""本地K线存储与仓库测试：
+- 追加、去重（后写入优先）、忽略未收盘K线与残缺行、超量压缩
+- 仓库只通过REST请求本地缺失的区间，已确认不存在的K线不重复请求
+- 热启动只请求上次关闭后缺失的部分
+- REST补齐期间不阻塞同一交易对的写入
+- 批量写入：新增K线排队，flush/close 后才写入存储
+- 保留上限：内存数据与已确认区间随存储一起裁剪
+- 未收盘K线在有效期内走内存（REST结果或监控推送），过期后重新请求
+"""
+import os
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor.core.initializer import SystemInitializer
+from modules.monitor.data.kline_manager import KlineManager
+from modules.monitor.data.kline_repository import KlineRepository
+from modules.monitor.data.kline_store import KlineStore
+from modules.monitor.data.models import Kline
+
+MINUTE = 60000
+
+
+def make_kline(i: int, close: float = None, closed: bool = True) -> Kline:
+    c = float(i) if close is None else close
+    return Kline(i * MINUTE, c, c + 1.0, c - 1.0, c, 10.0, closed)
+
+
+def test_append_load_dedup_and_compaction(tmp_path):
+    store = KlineStore(str(tmp_path), max_rows=4)
+    store.append('BTCUSDT', '1m', [make_kline(0), make_kline(1), make_kline(2, closed=False)])
+    store.append('BTCUSDT', '1m', [make_kline(1, close=99.0)])
+    assert [(k.timestamp // MINUTE, k.close) for k in store.load('BTCUSDT', '1m')] == [(0, 0.0), (1, 99.0)]
+
+    # 进程异常退出留下的半行被忽略
+    path = tmp_path / '1m' / 'BTCUSDT.bin'
+    with open(path, 'ab') as f:
+        f.write(b'\x00' * 10)
+    assert store.last_timestamp('BTCUSDT', '1m') == MINUTE
+
+    store.append('BTCUSDT', '1m', [make_kline(i) for i in range(2, 10)])
+    assert os.path.getsize(path) <= 8 * 8 * 8
+    assert [k.timestamp // MINUTE for k in store.load('BTCUSDT', '1m')] == [6, 7, 8, 9]
+    assert [k.timestamp // MINUTE for k in store.load('BTCUSDT', '1m', limit=2)] == [8, 9]
+    assert store.load('ETHUSDT', '1m') == []
+
+
+class FakeRestClient:
+    """按开盘时间返回 [listed, now_index] 的K线，now_index 为当前未收盘K线"""
+
+    def __init__(self, now_index: int, listed: int = 0):
+        self.now_index = now_index
+        self.listed = listed
+        self.calls = []
+
+    def get_klines(self, symbol, interval, limit=500, start_time=None, end_time=None):
+        self.calls.append((start_time // MINUTE if start_time is not None else None, limit))
+        last = self.now_index if end_time is None else min(end_time // MINUTE, self.now_index)
+        first = last - limit + 1 if start_time is None else start_time // MINUTE
+        first = max(first, self.listed)
+        return [
+            [i * MINUTE, str(i), str(i + 1), str(i - 1), str(i), "10"]
+            for i in range(first, last + 1)
+        ][:limit]
+
+
+def test_repository_fetches_only_missing_ranges(tmp_path):
+    now_index = int(time.time() * 1000) // MINUTE
+    rest = FakeRestClient(now_index)
+    repo = KlineRepository(KlineStore(str(tmp_path)), rest)
+
+    klines = repo.get_klines('BTCUSDT', '1m', 10, include_open=True)
+    assert [k.timestamp // MINUTE for k in klines] == list(range(now_index - 9, now_index + 1))
+    assert not klines[-1].is_closed and all(k.is_closed for k in klines[:-1])
+    assert rest.calls == [(now_index - 9, 10)]
+
+    # 已收盘部分走本地，只请求当前未收盘K线（未设置有效期）
+    rest.calls.clear()
+    assert len(repo.get_klines('BTCUSDT', '1m', 5, include_open=True)) == 5
+    assert rest.calls == [(now_index, 1)]
+
+    # 历史区间只请求本地没有的部分
+    rest.calls.clear()
+    end_ms = (now_index - 9) * MINUTE
+    assert len(repo.get_klines('BTCUSDT', '1m', 20, end_time=(now_index - 1) * MINUTE)) == 20
+    assert rest.calls == [(now_index - 21, 12)]
+
+    # 新实例从存储读取，无需请求
+    fresh = KlineRepository(KlineStore(str(tmp_path)), FakeRestClient(now_index))
+    closed = fresh.get_range('BTCUSDT', '1m', (now_index - 20) * MINUTE, end_ms)
+    assert [k.timestamp // MINUTE for k in closed] == list(range(now_index - 20, now_index - 8))
+    assert fresh.rest_client.calls == []
+
+
+def test_repository_does_not_refetch_nonexistent_bars(tmp_path):
+    now_index = int(time.time() * 1000) // MINUTE
+    rest = FakeRestClient(now_index, listed=now_index - 5)
+    repo = KlineRepository(KlineStore(str(tmp_path)), rest)
+
+    assert len(repo.get_klines('NEWUSDT', '1m', 20)) == 5
+    assert len(repo.get_klines('NEWUSDT', '1m', 20)) == 5
+    assert len(rest.calls) == 1
+
+
+def test_warm_start_fetches_only_delta(tmp_path):
+    config = {'kline': {'interval': '1m', 'warmup_size': 20, 'history_size': 20}}
+    now_index = int(time.time() * 1000) // MINUTE
+    repo = KlineRepository(KlineStore(str(tmp_path)), FakeRestClient(now_index))
+    # 上次运行保存到 now_index - 4
+    repo.add('BTCUSDT', '1m', [make_kline(i) for i in range(now_index - 30, now_index - 3)])
+
+    rest = FakeRestClient(now_index)
+    repo = KlineRepository(KlineStore(str(tmp_path)), rest)
+    km = KlineManager(history_size=20)
+    initializer = SystemInitializer(rest, km, config, repository=repo)
+    initializer.initialize_historical_data(['BTCUSDT'])
+
+    assert rest.calls == [(now_index - 3, 3)]
+    assert [k.timestamp // MINUTE for k in km.get_klines('BTCUSDT')] == list(range(now_index - 20, now_index))
+
+    km.update('BTCUSDT', make_kline(now_index))
+    initializer.persist(['BTCUSDT'])
+    assert KlineStore(str(tmp_path)).last_timestamp('BTCUSDT', '1m') == now_index * MINUTE
+
+
+def test_backfill_does_not_block_add(tmp_path):
+    now_index = int(time.time() * 1000) // MINUTE
+    rest = FakeRestClient(now_index)
+    started, release = threading.Event(), threading.Event()
+    fetch = rest.get_klines
+
+    def slow_get_klines(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return fetch(*args, **kwargs)
+
+    rest.get_klines = slow_get_klines
+    repo = KlineRepository(KlineStore(str(tmp_path)), rest)
+    reader = threading.Thread(target=repo.get_range, args=('BTCUSDT', '1m', (now_index - 50) * MINUTE,
+                                                            (now_index - 10) * MINUTE))
+    reader.start()
+    try:
+        assert started.wait(5)
+        writer = threading.Thread(target=repo.add, args=('BTCUSDT', '1m', [make_kline(now_index - 1)]))
+        writer.start()
+        writer.join(1)
+        assert not writer.is_alive()
+    finally:
+        release.set()
+        reader.join(5)
+
+    stored = KlineStore(str(tmp_path)).load('BTCUSDT', '1m')
+    assert [k.timestamp // MINUTE for k in stored] == list(range(now_index - 50, now_index - 9)) + [now_index - 1]
+
+
+def test_batched_writes_flush_on_close(tmp_path):
+    repo = KlineRepository(KlineStore(str(tmp_path)), flush_interval=60)
+    repo.add('BTCUSDT', '1m', [make_kline(i) for i in range(5)])
+    repo.add('BTCUSDT', '1m', [make_kline(5)])
+    assert KlineStore(str(tmp_path)).load('BTCUSDT', '1m') == []
+    assert len(repo.get_range('BTCUSDT', '1m', 0, 5 * MINUTE)) == 6
+
+    repo.close()
+    assert [k.timestamp // MINUTE for k in KlineStore(str(tmp_path)).load('BTCUSDT', '1m')] == list(range(6))
+
+
+def test_appends_grow_buffer_by_doubling(tmp_path):
+    repo = KlineRepository(KlineStore(str(tmp_path)), flush_interval=60)
+    repo.add('AUSDT', '1m', [make_kline(0)])
+    series = repo._get_series('AUSDT', '1m')
+    before = series.rows
+
+    buffers = set()
+    for i in range(1, 200):
+        repo.add('AUSDT', '1m', [make_kline(i)])
+        buffers.add(id(series._buffer))
+
+    assert series.rows[:, 0].tolist() == [i * MINUTE for i in range(200)]
+    # 64 → 128 → 256，只在容量不足时重新分配
+    assert len(buffers) == 3 and len(series._buffer) == 256
+    # 之前取得的视图不受后续追加影响
+    assert before[:, 0].tolist() == [0]
+    repo.close()
+
+
+def test_retention_cap_trims_memory_and_checked_ranges(tmp_path):
+    now_index = int(time.time() * 1000) // MINUTE
+    rest = FakeRestClient(now_index, listed=now_index - 100)
+    repo = KlineRepository(KlineStore(str(tmp_path), max_rows=30), rest)
+
+    assert len(repo.get_klines('NEWUSDT', '1m', 50)) == 50
+    assert len(rest.calls) == 1
+    repo.add('NEWUSDT', '1m', [make_kline(i) for i in range(now_index - 200, now_index - 150)])
+
+    # 超过 2*max_rows 后只保留最近 max_rows 根，裁掉的区间之后重新请求
+    series = repo._get_series('NEWUSDT', '1m')
+    assert len(series.rows) == 30 and series.rows[0, 0] == (now_index - 30) * MINUTE
+    assert all(cs >= (now_index - 30) * MINUTE for cs, _ in series.checked)
+    assert len(repo.get_klines('NEWUSDT', '1m', 40)) == 40
+    assert rest.calls[-1] == (now_index - 40, 10)
+
+
+def test_open_kline_served_from_memory_within_ttl(tmp_path):
+    now_index = int(time.time() * 1000) // MINUTE
+    rest = FakeRestClient(now_index)
+    repo = KlineRepository(KlineStore(str(tmp_path)), rest, open_ttl=0.2)
+
+    assert len(repo.get_klines('BTCUSDT', '1m', 10, include_open=True)) == 10
+    rest.calls.clear()
+    klines = repo.get_klines('BTCUSDT', '1m', 10, include_open=True)
+    assert klines[-1].timestamp == now_index * MINUTE and not klines[-1].is_closed
+    assert rest.calls == []
+
+    # 监控推送的实时K线优先，且刷新有效期
+    repo.update_open('BTCUSDT', '1m', make_kline(now_index, close=123.0, closed=False))
+    assert repo.get_klines('BTCUSDT', '1m', 3, include_open=True)[-1].close == 123.0
+    assert rest.calls == []
+
+    # 过期后重新请求当前K线
+    time.sleep(0.25)
+    assert repo.get_klines('BTCUSDT', '1m', 3, include_open=True)[-1].close == float(now_index)
+    assert rest.calls == [(now_index, 1)]
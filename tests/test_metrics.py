@@ -0,0 +1,86 @@
+"""热路径耗时统计测试：
+- 直方图分位数与精确分位数的相对误差在分桶精度内
+- 注册表的计时、分段计时与组件指标来源汇总
+- 采样 cProfile 按间隔剖析，/api/system/metrics 与剖析开关接口可用
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor.utils.metrics import LatencyHistogram, MetricsRegistry, get_metrics_registry
+
+
+def test_histogram_percentiles_within_bucket_precision():
+    rng = np.random.default_rng(0)
+    samples_us = rng.lognormal(6, 1.5, 50000).astype(np.int64)
+    histogram = LatencyHistogram()
+    for value in samples_us.tolist():
+        histogram.record_us(value)
+
+    for p in (50, 90, 99, 99.9):
+        exact = np.percentile(samples_us, p)
+        assert histogram.percentile(p) == pytest.approx(exact, rel=1 / 16)
+    summary = histogram.summary()
+    assert summary['count'] == len(samples_us)
+    assert summary['max_ms'] == samples_us.max() / 1000.0
+    assert summary['mean_ms'] == pytest.approx(samples_us.mean() / 1000.0)
+
+
+def test_registry_timers_and_sources():
+    registry = MetricsRegistry()
+    with registry.timer('detect'):
+        sum(range(1000))
+    start = registry.lap('indicators.atr', 0.0)
+    registry.lap('indicators.rsi', start)
+    registry.register_source('queue', lambda: {'depth': 3})
+    registry.register_source('broken', lambda: 1 / 0)
+
+    snapshot = registry.snapshot()
+    assert set(snapshot['stages']) == {'detect', 'indicators.atr', 'indicators.rsi'}
+    assert snapshot['stages']['detect']['count'] == 1
+    assert snapshot['components']['queue'] == {'depth': 3}
+    assert 'error' in snapshot['components']['broken']
+    assert registry.format_summary(['indicators.']).startswith('indicators.atr P50=')
+
+    registry.enabled = False
+    with registry.timer('detect'):
+        pass
+    assert registry.snapshot()['stages']['detect']['count'] == 1
+
+
+def test_sampled_cprofile():
+    registry = MetricsRegistry()
+    profiler = registry.profiler
+    assert profiler.sample(lambda x: x + 1, 1) == 2
+
+    profiler.start_cprofile(sample_every=3)
+    for i in range(9):
+        assert profiler.sample(sorted, [3, 1, 2]) == [1, 2, 3]
+    profiler.stop_cprofile()
+    assert profiler.get_status()['sampled_calls'] == 3
+    assert 'sorted' in profiler.cprofile_stats(top=10)
+
+
+def test_metrics_api():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.routes.system import router
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    get_metrics_registry().record('bar.total', 0.002)
+
+    body = client.get('/api/system/metrics').json()
+    assert body['stages']['bar.total']['count'] >= 1
+
+    status = client.post('/api/system/profiling', json={'cprofile': True, 'sample_every': 5}).json()['status']
+    assert status['cprofile'] and status['sample_every'] == 5
+    status = client.post('/api/system/profiling', json={'cprofile': False}).json()['status']
+    assert not status['cprofile']
+    assert 'cprofile' in client.get('/api/system/profiling').json()
@@ -0,0 +1,213 @@
+"""持仓量预取测试：
+- 预取线程池刷新共享缓存并记录耗时/失败指标
+- 指标计算器在缓存模式下只读缓存，不发起REST请求
+- 缓存不含收盘K线的持仓量时检测不等待（标记过期），预取服务刷新后补算持仓量指标并重新检测告警
+- 预取跳过本周期已刷新的交易对，同一交易对的在途请求合并
+- 滑动窗口限频器在超出配额时阻塞
+"""
+import os
+import sys
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor import main
+from modules.monitor.core.oi_prefetcher import OIPrefetcher
+from modules.monitor.data.kline_manager import KlineManager
+from modules.monitor.data.models import AnomalyResult, Kline
+from modules.monitor.data.oi_cache import OpenInterestCache
+from modules.monitor.indicators.calculator import IndicatorCalculator
+from modules.monitor.utils.rate_limiter import SlidingWindowRateLimiter
+
+CONFIG = {
+    'indicators': {'atr_period': 14, 'stddev_period': 20, 'volume_ma_period': 20},
+    'kline': {'interval': '15m'},
+    'open_interest': {'enabled': True, 'history_size': 30, 'prefetch_workers': 4},
+}
+
+
+class FakeRestClient:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = []
+
+    def get_open_interest_hist(self, symbol, period, limit):
+        self.calls.append(symbol)
+        if symbol in self.failing:
+            raise RuntimeError("boom")
+        return [
+            {'sumOpenInterest': str(1000 + i * (50 if i == limit - 1 else 1)),
+             'sumOpenInterestValue': str(5000 + i), 'timestamp': i * 900000}
+            for i in range(limit)
+        ]
+
+
+def test_refresh_all_populates_cache_and_metrics():
+    rest = FakeRestClient(failing={'BADUSDT'})
+    cache = OpenInterestCache()
+    prefetcher = OIPrefetcher(rest, cache, CONFIG, get_symbols=lambda: ['AUSDT', 'BUSDT', 'BADUSDT'])
+    prefetcher.start()
+    try:
+        prefetcher.refresh_all()
+    finally:
+        prefetcher.stop()
+
+    assert cache.get('AUSDT')['last_update'] == 29 * 900000
+    assert cache.get('BADUSDT') is None
+    metrics = prefetcher.get_metrics()
+    assert metrics['cached_symbols'] == 2
+    assert metrics['fetch_errors'] >= 1
+    assert metrics['stale_symbols'] == 0
+
+
+def test_calculator_reads_cache_without_rest_calls():
+    rest = FakeRestClient()
+    cache = OpenInterestCache()
+    cache.set('AUSDT', rest.get_open_interest_hist('AUSDT', '15m', 30))
+    rest.calls.clear()
+
+    km = KlineManager(history_size=40)
+    for i in range(40):
+        price = 100 + (i % 5)
+        km.update('AUSDT', Kline(i * 900000, price, price + 1, price - 1, price + 0.5, 10.0 + i, True))
+
+    calculator = IndicatorCalculator(km, CONFIG, oi_cache=cache)
+    indicators = calculator.calculate_all('AUSDT')
+
+    assert rest.calls == []
+    assert indicators.open_interest == 1000 + 29 * 50
+    assert indicators.is_oi_surge
+
+
+class ClosingBarRestClient:
+    """持仓量数据截止到 end（毫秒），最后一个点的持仓量为 9999"""
+
+    def __init__(self, end, delay=0.0):
+        self.end = end
+        self.delay = delay
+        self.calls = []
+
+    def get_open_interest_hist(self, symbol, period, limit):
+        self.calls.append(symbol)
+        time.sleep(self.delay)
+        return [
+            {'sumOpenInterest': '9999' if i == limit - 1 else str(1000 + i),
+             'sumOpenInterestValue': str(5000 + i), 'timestamp': self.end - (limit - 1 - i) * 900000}
+            for i in range(limit)
+        ]
+
+
+def _closing_bar_setup(rest_delay):
+    # 收盘时间在未来，缓存只能是收盘前获取的
+    first_open = (int(time.time() * 1000) // 900000 + 100) * 900000
+    km = KlineManager(history_size=40)
+    for i in range(40):
+        price = 100 + (i % 5)
+        km.update('AUSDT', Kline(first_open + i * 900000, price, price + 1, price - 1, price + 0.5, 10.0, True))
+    close_ms = first_open + 40 * 900000
+
+    cache = OpenInterestCache()
+    cache.set('AUSDT', ClosingBarRestClient(close_ms - 900000).get_open_interest_hist('AUSDT', '15m', 30))
+    rest = ClosingBarRestClient(close_ms, delay=rest_delay)
+    prefetcher = OIPrefetcher(rest, cache, CONFIG, get_symbols=lambda: [])
+    calculator = IndicatorCalculator(km, CONFIG, oi_cache=cache)
+    return km, cache, rest, prefetcher, calculator, close_ms
+
+
+def test_detection_does_not_wait_for_open_interest_of_closing_bar():
+    km, cache, rest, prefetcher, calculator, close_ms = _closing_bar_setup(rest_delay=0.3)
+    prefetcher.start()
+    try:
+        started = time.monotonic()
+        indicators = calculator.calculate_all('AUSDT')
+        assert time.monotonic() - started < 0.2
+        assert indicators.is_oi_stale
+        # 计算器只读缓存，沿用上一周期持仓量
+        assert rest.calls == []
+        assert cache.get('AUSDT')['last_update'] == close_ms - 900000
+        assert not calculator.refresh_open_interest(indicators, km.get_latest_kline('AUSDT').timestamp)
+
+        assert prefetcher.request('AUSDT').result(timeout=2)
+        assert calculator.refresh_open_interest(indicators, km.get_latest_kline('AUSDT').timestamp)
+        assert indicators.open_interest == 9999
+        assert not indicators.is_oi_stale
+    finally:
+        prefetcher.stop()
+
+    assert rest.calls == ['AUSDT']
+    assert prefetcher.rate_limiter.get_usage() == 1
+
+
+class _OIDetector:
+    """持仓量未过期时报告 OI_SURGE（与 DetectionStrategy 一致）"""
+
+    def detect(self, indicators):
+        if indicators.is_oi_stale:
+            return None
+        return AnomalyResult(indicators.symbol, 0, 0.0, 0.0, 0.0, 0.0, 0.0, 1, ['OI_SURGE'])
+
+
+class _RecordingAlertManager:
+    def __init__(self):
+        self.alerts = []
+
+    def should_alert(self, symbol):
+        return True
+
+    def add_alert(self, anomaly):
+        self.alerts.append(anomaly)
+
+
+def test_stale_open_interest_rechecked_when_fetch_lands():
+    km, cache, rest, prefetcher, calculator, close_ms = _closing_bar_setup(rest_delay=0.1)
+    alert_manager = _RecordingAlertManager()
+    components = {
+        'oi_prefetcher': prefetcher, 'indicator_calculator': calculator,
+        'detector': _OIDetector(), 'alert_manager': alert_manager,
+    }
+    kline = km.get_latest_kline('AUSDT')
+    prefetcher.start()
+    try:
+        indicators = calculator.calculate_all('AUSDT')
+        assert indicators.is_oi_stale
+        assert components['detector'].detect(indicators) is None
+        main._schedule_oi_recheck(indicators, kline, None, components)
+        assert alert_manager.alerts == []
+
+        deadline = time.monotonic() + 2
+        while not alert_manager.alerts and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        prefetcher.stop()
+
+    assert [a.triggered_indicators for a in alert_manager.alerts] == [['OI_SURGE']]
+    assert alert_manager.alerts[0].price == kline.close
+    assert cache.get('AUSDT')['last_update'] == close_ms
+    # 首次检测的指标对象不被后台补算修改
+    assert indicators.is_oi_stale
+
+
+def test_prefetch_skips_symbols_refreshed_this_interval():
+    rest = FakeRestClient()
+    cache = OpenInterestCache()
+    cache.set('AUSDT', rest.get_open_interest_hist('AUSDT', '15m', 30))
+    rest.calls.clear()
+    prefetcher = OIPrefetcher(rest, cache, CONFIG, get_symbols=lambda: ['AUSDT', 'BUSDT'])
+    prefetcher.start()
+    try:
+        prefetcher.refresh_all()
+    finally:
+        prefetcher.stop()
+
+    assert set(rest.calls) == {'BUSDT'}
+
+
+def test_rate_limiter_blocks_over_quota():
+    limiter = SlidingWindowRateLimiter(3, 0.2)
+    started = time.monotonic()
+    for _ in range(3):
+        assert limiter.acquire()
+    assert not limiter.acquire(timeout=0.05)
+    assert limiter.acquire()
+    assert time.monotonic() - started >= 0.15
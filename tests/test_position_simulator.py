@@ -0,0 +1,172 @@
+"""仓位模拟器向量化结果测试：
+- 止盈止损首次触发位置、平仓原因（同K线按止损）、持仓K线数与逐根K线检查一致
+- 限价单成交时间及后续止盈止损结果与逐根K线检查一致
+- 未触发时按回测结束强制平仓
+"""
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.agent.trade_simulator.utils.file_utils import WriteQueue
+from modules.backtest.engine.backtest_trade_engine import BacktestTradeEngine
+from modules.backtest.engine.position_simulator import PositionSimulator
+from modules.backtest.models import BacktestConfig
+from modules.backtest.providers.kline_provider import BacktestKlineProvider
+from modules.config.settings import get_config
+from modules.monitor.data.models import Kline
+
+INTERVAL = timedelta(minutes=15)
+INTERVAL_MS = 15 * 60 * 1000
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+START_MS = int(START.timestamp() * 1000)
+END = START + timedelta(days=3)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def stop_write_queue():
+    yield
+    WriteQueue.get_instance().shutdown()
+
+
+def make_klines(count: int, seed: int):
+    rng = random.Random(seed)
+    klines = []
+    price = 100.0
+    for i in range(count):
+        price *= 1 + rng.gauss(0, 0.004)
+        if rng.random() < 0.05:
+            continue
+        high = price * (1 + abs(rng.gauss(0, 0.004)))
+        low = price * (1 - abs(rng.gauss(0, 0.004)))
+        klines.append(Kline(START_MS + i * INTERVAL_MS, price, high, low, price, 10.0, True))
+    return klines
+
+
+class StaticKlineProvider(BacktestKlineProvider):
+    """不下载数据，直接使用给定K线"""
+
+    def __init__(self, klines):
+        self._klines = klines
+        super().__init__(['BTCUSDT'], START, END, '15m')
+
+    def _load_historical_data(self):
+        self._set_klines('BTCUSDT', '15m', self._klines)
+
+
+def reference_position(provider, engine, symbol, after):
+    """逐根K线检查止盈止损"""
+    current_time = after + INTERVAL
+    holding_bars = 0
+    while current_time <= END and holding_bars < 1000:
+        kline = provider.get_kline_at_time(symbol, '15m', current_time)
+        if kline:
+            holding_bars += 1
+            result = engine.check_tp_sl(symbol, kline.close, kline.high, kline.low)
+            if result and 'error' not in result:
+                return current_time, holding_bars, result['close_reason'], result['close_price']
+        current_time += INTERVAL
+    return END, holding_bars, None, None
+
+
+def reference_limit(provider, engine, order, after):
+    """逐根K线检查限价单成交"""
+    current_time = after + INTERVAL
+    while current_time <= END:
+        kline = provider.get_kline_at_time(order['symbol'], '15m', current_time)
+        if kline:
+            filled = engine.check_limit_orders(order['symbol'], kline.high, kline.low, kline.close)
+            if any(f['id'] == order['id'] for f in filled):
+                return current_time, reference_position(provider, engine, order['symbol'], current_time)
+        current_time += INTERVAL
+    return None, None
+
+
+def new_engine():
+    return BacktestTradeEngine(get_config(), 'bt_test', initial_balance=10000.0)
+
+
+def cases(klines, seed):
+    rng = random.Random(seed)
+    for _ in range(40):
+        entry = START + INTERVAL * rng.randrange(0, 290)
+        if rng.random() < 0.3:
+            entry += timedelta(minutes=rng.randrange(1, 15))
+        price = klines[rng.randrange(len(klines) // 2)].close
+        side = rng.choice(['long', 'short'])
+        tp_pct, sl_pct = rng.uniform(0.002, 0.08), rng.uniform(0.002, 0.08)
+        sign = 1 if side == 'long' else -1
+        yield entry, price, side, price * (1 + sign * tp_pct), price * (1 - sign * sl_pct)
+
+
+def test_position_outcome_matches_bar_by_bar():
+    klines = make_klines(300, seed=3)
+    provider = StaticKlineProvider(klines)
+    config = BacktestConfig(['BTCUSDT'], START, END, '15m')
+    simulator = PositionSimulator(config, provider, 'bt_test')
+    exit_types = set()
+
+    for entry, price, side, tp, sl in cases(klines, seed=4):
+        expected_engine, engine = new_engine(), new_engine()
+        for e in (expected_engine, engine):
+            assert 'error' not in e.open_position('BTCUSDT', side, 1000, 10, tp, sl, entry_price=price)
+
+        exit_time, holding_bars, reason, close_price = reference_position(provider, expected_engine, 'BTCUSDT', entry)
+        result = simulator.simulate_position_outcome(engine, 'BTCUSDT', entry, 'run')
+
+        assert result.holding_bars == holding_bars
+        if reason is None:
+            assert result.exit_type == 'timeout'
+        else:
+            assert (result.exit_time, result.close_reason, result.exit_price) == (exit_time, reason, close_price)
+        exit_types.add(result.exit_type)
+
+    assert {'tp', 'sl', 'timeout'} <= exit_types
+
+
+def test_tp_and_sl_in_same_bar_closes_at_sl():
+    klines = [Kline(START_MS + i * INTERVAL_MS, 100.0, 101.0, 99.0, 100.0, 1.0, True) for i in range(10)]
+    klines[4] = Kline(START_MS + 4 * INTERVAL_MS, 100.0, 106.0, 94.0, 100.0, 1.0, True)
+    provider = StaticKlineProvider(klines)
+    simulator = PositionSimulator(BacktestConfig(['BTCUSDT'], START, END, '15m'), provider, 'bt_test')
+    engine = new_engine()
+    engine.open_position('BTCUSDT', 'long', 1000, 10, tp_price=105.0, sl_price=95.0, entry_price=100.0)
+
+    result = simulator.simulate_position_outcome(engine, 'BTCUSDT', START, 'run')
+
+    assert (result.exit_type, result.exit_price, result.holding_bars) == ('sl', 95.0, 4)
+    assert result.exit_time == START + 4 * INTERVAL
+
+
+def test_limit_order_outcome_matches_bar_by_bar():
+    klines = make_klines(300, seed=5)
+    provider = StaticKlineProvider(klines)
+    simulator = PositionSimulator(BacktestConfig(['BTCUSDT'], START, END, '15m'), provider, 'bt_test')
+    filled_count = 0
+
+    for entry, price, side, tp, sl in cases(klines, seed=6):
+        limit_price = price * (0.99 if side == 'long' else 1.01)
+        expected_engine, engine = new_engine(), new_engine()
+        orders = [e.create_limit_order('BTCUSDT', side, limit_price, 100, 10, tp, sl) for e in (expected_engine, engine)]
+
+        filled_time, expected = reference_limit(provider, expected_engine, orders[0], entry)
+        result = simulator.simulate_limit_order_outcome(engine, orders[1], entry, 'run')
+
+        if filled_time is None:
+            assert result is None
+            assert engine.get_pending_limit_orders('BTCUSDT') == []
+            continue
+        filled_count += 1
+        exit_time, holding_bars, reason, close_price = expected
+        assert (result.order_type, result.kline_time) == ('limit', filled_time)
+        assert result.entry_price == pytest.approx(limit_price)
+        assert result.holding_bars == holding_bars
+        if reason is not None:
+            assert (result.exit_time, result.close_reason, result.exit_price) == (exit_time, reason, close_price)
+
+    assert filled_count > 0
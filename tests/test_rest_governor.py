@@ -0,0 +1,101 @@
+"""REST请求权重限频与请求合并测试：
+- 权重超出本分钟预算时阻塞，响应头用量校准本地计数
+- 429 按 Retry-After 暂停
+- 相同的并发请求只发送一次，不同请求互不影响
+"""
+import os
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor.clients import binance_rest
+from modules.monitor.clients.binance_rest import BinanceRestClient
+from modules.monitor.utils.rate_limiter import RequestWeightGovernor
+
+
+class FakeResponse:
+    def __init__(self, content: bytes, status_code: int = 200, headers: dict = None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise binance_rest.requests.HTTPError(f"{self.status_code}")
+
+
+def make_client(base_url: str) -> BinanceRestClient:
+    return BinanceRestClient({'api': {'base_url': base_url, 'timeout': 1, 'retry_times': 1}})
+
+
+def test_governor_budget_and_header_sync(monkeypatch):
+    clock = [120.0]
+    monkeypatch.setattr('modules.monitor.utils.rate_limiter.time.time', lambda: clock[0])
+    governor = RequestWeightGovernor(max_weight_per_minute=100, safety_ratio=0.5)
+
+    assert governor.acquire(30)
+    assert governor.acquire(20)
+    assert not governor.acquire(1, timeout=0)
+
+    # 新的一分钟重置
+    clock[0] = 180.0
+    assert governor.acquire(10)
+    governor.update_used_weight(45)  # 同IP其他进程也在请求
+    assert governor.get_usage()['used'] == 45
+    assert not governor.acquire(10, timeout=0)
+
+    clock[0] = 240.0
+    governor.pause(30)
+    assert not governor.acquire(1, timeout=0)
+    clock[0] = 271.0
+    assert governor.acquire(1)
+
+
+def test_rate_limited_response_pauses_shared_governor():
+    client = make_client('https://governor.invalid')
+    other = make_client('https://governor.invalid')
+    assert client.governor is other.governor
+
+    client.session.get = lambda *a, **k: FakeResponse(
+        b'{}', 429, {'X-MBX-USED-WEIGHT-1M': '2400', 'Retry-After': '5'}
+    )
+    try:
+        client._public_get('/fapi/v1/exchangeInfo')
+    except binance_rest.requests.HTTPError:
+        pass
+    usage = other.governor.get_usage()
+    assert usage['paused_seconds'] > 4
+    assert usage['used'] == 2400
+
+
+def test_identical_inflight_requests_are_coalesced():
+    client = make_client('https://coalesce.invalid')
+    calls = []
+    release = threading.Event()
+
+    def fake_get(url, params=None, timeout=None):
+        calls.append(dict(params))
+        release.wait(2)
+        return FakeResponse(b'[[1,"1","2","0.5","1.5","10"]]', headers={'X-MBX-USED-WEIGHT-1M': '3'})
+
+    client.session.get = fake_get
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(client.get_klines('BTCUSDT', '1m', limit=10)))
+        for _ in range(5)
+    ]
+    threads.append(threading.Thread(target=lambda: results.append(client.get_klines('ETHUSDT', '1m', limit=10))))
+    for t in threads:
+        t.start()
+    time.sleep(0.2)
+    release.set()
+    for t in threads:
+        t.join(2)
+
+    assert len(results) == 6
+    assert sorted(c['symbol'] for c in calls) == ['BTCUSDT', 'ETHUSDT']
+    assert all(r == [[1, "1", "2", "0.5", "1.5", "10"]] for r in results)
+    assert client._inflight == {}
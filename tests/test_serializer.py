@@ -0,0 +1,40 @@
+"""JSON序列化后端测试：orjson 与标准库输出可互相解析、结果一致"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor.utils import serializer
+
+RECORD = {'symbol': 'BTCUSDT', 'reasons': ['成交量异常'], 'level': 3, 'price': 0.00012345, 1: 'int-key'}
+
+
+@pytest.fixture
+def restore_backend():
+    original = serializer.get_backend()
+    yield
+    serializer.set_backend(original)
+
+
+@pytest.mark.parametrize('backend', ['json', 'orjson'])
+def test_round_trip(backend, restore_backend):
+    try:
+        serializer.set_backend(backend)
+    except ValueError:
+        pytest.skip(f"{backend} 未安装")
+    line = serializer.dumps_line(RECORD)
+    assert line.endswith('\n') and '成交量异常' in line
+    decoded = serializer.loads(line.encode('utf-8'))
+    assert decoded == {**{k: v for k, v in RECORD.items() if k != 1}, '1': 'int-key'}
+    assert serializer.loads(serializer.dumps({'v': np.float64(1.5)})) == {'v': 1.5}
+    with pytest.raises(serializer.JSONDecodeError):
+        serializer.loads('{bad')
+
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError):
+        serializer.set_backend('simdjson')
@@ -0,0 +1,141 @@
+"""流式 Z-Score 估计器测试：
+- RollingMedianMAD 与按窗口重算的修正Z-Score一致（含重复值）
+- EwmaStats 与 EWMA Z-Score 函数、按行批量版本一致（NaN 跳过）
+- robust 口径下增量引擎、全量计算与批量矩阵计算的 Z-Score 逐值一致
+- 启用增量引擎时 robust/ewma 口径由流式估计器计算，不调用全量历史函数
+"""
+import math
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor.data.kline_manager import KlineManager
+from modules.monitor.data.models import Kline
+from modules.monitor.indicators.batch import BatchIndicatorCalculator
+from modules.monitor.indicators.calculator import IndicatorCalculator
+from modules.monitor.detection.zscore import (
+    EwmaStats,
+    RollingMedianMAD,
+    calculate_ewma_zscore,
+    calculate_modified_zscore,
+    calculate_zscore_rows_by_method,
+)
+
+INTERVAL_MS = 15 * 60 * 1000
+HISTORY_SIZE = 80
+ZSCORE_FIELDS = [
+    'atr_zscore', 'price_change_zscore', 'volume_zscore',
+    'bb_width_zscore', 'rsi_zscore', 'ma_deviation_zscore',
+]
+
+
+def make_config(method: str, incremental: bool):
+    return {
+        'indicators': {
+            'atr_period': 14,
+            'stddev_period': 20,
+            'volume_ma_period': 20,
+            'incremental': incremental,
+        },
+        'detection': {'zscore_method': method},
+        'kline': {'interval': '15m'},
+        'open_interest': {'enabled': False},
+    }
+
+
+def make_klines(count: int, seed: int):
+    rng = random.Random(seed)
+    price = 10.0 + seed
+    klines = []
+    for i in range(count):
+        open_ = price
+        close = open_ * (1 + rng.gauss(0, 0.01))
+        high = max(open_, close) * (1 + abs(rng.gauss(0, 0.004)))
+        low = min(open_, close) * (1 - abs(rng.gauss(0, 0.004)))
+        # 帕累托分布成交量模拟厚尾
+        volume = 1000 * rng.paretovariate(1.5)
+        klines.append(Kline(i * INTERVAL_MS, open_, high, low, close, volume, True))
+        price = close
+    return klines
+
+
+@pytest.mark.parametrize('size', [1, 2, 7, 30])
+def test_rolling_median_mad_matches_window(size):
+    rng = random.Random(size)
+    window = RollingMedianMAD(size)
+    values = []
+    for _ in range(300):
+        v = float(rng.randint(0, 20))  # 大量重复值
+        expected = calculate_modified_zscore(v, values[-size:])
+        assert math.isclose(window.zscore(v), expected, rel_tol=1e-12, abs_tol=1e-12)
+        window.push(v)
+        values.append(v)
+    assert len(window) == size
+
+
+def test_ewma_stats_matches_functions():
+    rng = np.random.default_rng(3)
+    history = rng.standard_t(3, size=(3, 40))
+    history[1, :6] = np.nan
+    values = np.array([2.0, -1.0, 0.5])
+
+    rows = calculate_zscore_rows_by_method(values, history, 'ewma')
+    for i in range(3):
+        clean = history[i][~np.isnan(history[i])]
+        stats = EwmaStats(len(clean))
+        for v in clean:
+            stats.push(v)
+        assert math.isclose(stats.zscore(values[i]), calculate_ewma_zscore(values[i], clean), rel_tol=1e-12)
+        assert math.isclose(rows[i], stats.zscore(values[i]), rel_tol=1e-9)
+
+
+def test_robust_method_parity_across_paths():
+    km = KlineManager(history_size=HISTORY_SIZE)
+    inc = IndicatorCalculator(km, make_config('robust', True))
+    full = IndicatorCalculator(km, make_config('robust', False))
+    for kline in make_klines(200, 1):
+        km.update('BTCUSDT', kline)
+        a = inc.calculate_all('BTCUSDT')
+        b = full.calculate_all('BTCUSDT')
+        if a is None:
+            continue
+        for name in ('price_change_zscore', 'volume_zscore', 'bb_width_zscore'):
+            assert math.isclose(getattr(a, name), getattr(b, name), rel_tol=1e-9, abs_tol=1e-9), name
+
+    matrix = KlineManager(history_size=HISTORY_SIZE, shared_matrix=True)
+    symbols = [f"S{i}USDT" for i in range(5)]
+    for seed, symbol in enumerate(symbols):
+        matrix.initialize_symbol(symbol, make_klines(HISTORY_SIZE + 5, seed))
+    per_symbol = IndicatorCalculator(matrix, make_config('robust', False))
+    batch_calculator = BatchIndicatorCalculator(matrix, make_config('robust', False))
+    batch = batch_calculator.calculate(symbols)
+    for index, symbol in enumerate(symbols):
+        expected, _ = per_symbol._calculate_full(symbol)
+        actual = batch_calculator.to_indicator_values(batch, index)
+        for name in ZSCORE_FIELDS:
+            assert math.isclose(getattr(actual, name), getattr(expected, name), rel_tol=1e-9, abs_tol=1e-9), name
+
+
+@pytest.mark.parametrize('method', ['robust', 'ewma'])
+def test_incremental_path_uses_streaming_estimators(method, monkeypatch):
+    import modules.monitor.indicators.calculator as calculator_module
+
+    def full_history(*args, **kwargs):
+        raise AssertionError("增量路径不应按完整历史重算Z-Score")
+
+    monkeypatch.setattr(calculator_module, 'calculate_zscore_by_method', full_history)
+
+    km = KlineManager(history_size=HISTORY_SIZE)
+    calculator = IndicatorCalculator(km, make_config(method, True))
+    results = []
+    for kline in make_klines(2 * HISTORY_SIZE, 2):
+        km.update('BTCUSDT', kline)
+        results.append(calculator.calculate_all('BTCUSDT'))
+    assert results[-1] is not None
+    assert any(r.volume_zscore != 0 for r in results if r is not None)
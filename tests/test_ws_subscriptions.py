@@ -0,0 +1,86 @@
+"""WebSocket 动态订阅测试：
+- 增减交易对只向所属连接发送 SUBSCRIBE/UNSUBSCRIBE，不重建其他连接
+- 已有连接满载时才新建连接，连接变空时关闭
+"""
+import json
+import os
+import sys
+
+import pytest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BASE_DIR)
+
+from modules.monitor.clients import binance_ws
+from modules.monitor.clients.binance_ws import MultiConnectionManager
+
+CONFIG = {
+    'websocket': {
+        'base_url': 'wss://example.invalid',
+        'max_streams_per_connection': 3,
+        'reconnect_delay': 1,
+        'max_reconnect_attempts': 1,
+    },
+}
+
+
+class FakeApp:
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    def send(self, message):
+        self.sent.append(json.loads(message))
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    connected = []
+
+    def fake_connect(self, symbols, interval):
+        self.symbols = set(symbols)
+        self.interval = interval
+        self.ws = FakeApp()
+        self.is_running = True
+        connected.append(self)
+
+    monkeypatch.setattr(binance_ws.BinanceWSClient, 'connect', fake_connect)
+    monkeypatch.setattr(binance_ws.time, 'sleep', lambda _: None)
+    mgr = MultiConnectionManager(CONFIG, lambda *_: None)
+    mgr.connect_all(['A', 'B', 'C', 'D'], '15m')
+    mgr.connected = connected
+    return mgr
+
+
+def test_changes_only_touch_affected_connection(manager):
+    first, second = manager.clients
+    assert first.symbols == {'A', 'B', 'C'} and second.symbols == {'D'}
+
+    manager.update_symbols(added=['E'], removed=['B'])
+
+    # 退订腾出的容量直接被新交易对复用，第二个连接不受影响
+    assert first.ws.sent == [
+        {'method': 'UNSUBSCRIBE', 'params': ['b@kline_15m'], 'id': 1},
+        {'method': 'SUBSCRIBE', 'params': ['e@kline_15m'], 'id': 2},
+    ]
+    assert second.ws.sent == []
+    assert manager.clients == [first, second]
+    assert len(manager.connected) == 2
+    assert manager.get_subscribed_count() == 4
+
+
+def test_new_connection_only_when_full_and_empty_connection_closed(manager):
+    first, second = manager.clients
+
+    manager.update_symbols(added=['E', 'F', 'G', 'H'], removed=[])
+    assert second.symbols == {'D', 'E', 'F'}
+    assert len(manager.clients) == 3
+    third = manager.clients[2]
+    assert third.symbols == {'G', 'H'} and third.ws.sent == []
+
+    manager.update_symbols(added=[], removed=['G', 'H'])
+    assert third not in manager.clients and third.ws.closed
+    assert manager.clients == [first, second]